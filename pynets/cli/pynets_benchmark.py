@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:02:51 2020
+Copyright (C) 2016
+@author: Derek Pisner (dPys)
+"""
+import sys
+import warnings
+warnings.filterwarnings("ignore")
+
+
+def get_parser():
+    """Parse command-line inputs"""
+    import argparse
+    from pynets.__about__ import __version__
+    from pynets.core.perfbench import SCALES
+
+    verstr = f"pynets v{__version__}"
+
+    # Parse args
+    parser = argparse.ArgumentParser(
+        description="PyNets: Benchmark the workflow hot paths on synthetic "
+                    "data and flag performance regressions against the "
+                    "timing history of this host.")
+    parser.add_argument(
+        "-only",
+        metavar="Benchmarks",
+        default=None,
+        nargs="+",
+        help="Names of the benchmarks to run. Default is all of them (see "
+             "-list).\n",
+    )
+    parser.add_argument(
+        "-scale",
+        metavar="Problem size",
+        default="small",
+        choices=list(SCALES.keys()),
+        help="Size of the synthetic inputs. Default is small.\n",
+    )
+    parser.add_argument(
+        "-repeat",
+        metavar="Number of repeats",
+        default=3,
+        type=int,
+        help="Number of timed samples per benchmark, of which the fastest "
+             "is kept. Default is 3.\n",
+    )
+    parser.add_argument(
+        "-history",
+        metavar="History file",
+        default=None,
+        help="Path to the JSON-lines timing history. Default is "
+             "$PYNETS_BENCHMARKS, or ~/.pynets/benchmarks.jsonl.\n",
+    )
+    parser.add_argument(
+        "-max_ratio",
+        metavar="Regression threshold",
+        default=1.25,
+        type=float,
+        help="Ratio of a timing to its baseline above which a benchmark is "
+             "reported as regressed. Default is 1.25.\n",
+    )
+    parser.add_argument(
+        "-window",
+        metavar="Baseline window",
+        default=5,
+        type=int,
+        help="Number of most recent timings of the same benchmark, scale, "
+             "and host whose median forms the baseline. Default is 5.\n",
+    )
+    parser.add_argument(
+        "-work_dir",
+        metavar="Working directory",
+        default=None,
+        help="Directory for the synthetic inputs. Default is a temporary "
+             "directory.\n",
+    )
+    parser.add_argument(
+        "-no_record",
+        default=False,
+        action="store_true",
+        help="Do not append the timings to the history.\n",
+    )
+    parser.add_argument(
+        "-list",
+        default=False,
+        action="store_true",
+        help="List the available benchmarks and exit.\n",
+    )
+    parser.add_argument(
+        "-v",
+        default=False,
+        action="store_true",
+        help="Verbose print of the benchmarked functions.\n",
+    )
+    parser.add_argument("--version", action="version", version=verstr)
+    return parser
+
+
+def main():
+    """Initializes benchmarking of PyNets."""
+    import os
+
+    try:
+        from pynets.core.perfbench import BENCHMARKS, run_benchmarks
+    except ImportError:
+        print(
+            "PyNets not installed! Ensure that you are referencing the correct"
+            " site-packages and using Python3.6+"
+        )
+
+    if len(sys.argv) < 1:
+        print("\nMissing command-line inputs! See help options with the -h"
+              " flag.\n")
+        sys.exit(1)
+
+    args = get_parser().parse_args()
+
+    if args.list is True:
+        for name in BENCHMARKS.keys():
+            print(name)
+        return
+
+    if args.work_dir is not None:
+        os.makedirs(args.work_dir, exist_ok=True)
+
+    results = run_benchmarks(names=args.only, scale=args.scale,
+                             repeat=args.repeat, history=args.history,
+                             max_ratio=args.max_ratio, window=args.window,
+                             record=not args.no_record,
+                             work_dir=args.work_dir, verbose=args.v)
+
+    failed = [i["name"] for i in results if i["status"] != "ok"]
+    if len(failed) > 0:
+        print(f"\n{len(failed)} of {len(results)} benchmark(s) regressed or "
+              f"failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\nAll {len(results)} benchmark(s) passed.")
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+    __spec__ = "ModuleSpec(name='builtins', loader=<class '_frozen" \
+               "_importlib.BuiltinImporter'>)"
+    main()
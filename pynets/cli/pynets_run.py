@@ -1106,6 +1106,7 @@ def build_workflow(args, retval):
                 execution_dict[
                     list(hardcoded_params["execution_dict"][i].keys())[0]
                 ] = list(hardcoded_params["execution_dict"][i].values())[0][0]
+            telemetry = hardcoded_params.get("telemetry", [False])[0]
         except FileNotFoundError:
             print("ERROR: Failed to parse runconfig.yaml")
             retval["return_code"] = 1
@@ -2637,6 +2638,32 @@ def build_workflow(args, retval):
         if graph or multi_graph:
             from pynets.core.workflows import raw_graph_workflow
 
+            # Analyze all proportional thresholds of each raw graph in one
+            # incremental pass
+            if hardcoded_params.get("threshold_sweep", [False])[0] is True \
+                    and multi_thr is True and not min_span_tree \
+                    and not dens_thresh and not disp_filt \
+                    and int(norm) not in [3, 4, 5]:
+                from pynets.core.interfaces import NetworkAnalysisSweep
+
+                net_mets_node = pe.MapNode(
+                    interface=NetworkAnalysisSweep(),
+                    name="NetworkAnalysis",
+                    iterfield=[
+                        "ID",
+                        "network",
+                        "conn_model",
+                        "est_path",
+                        "roi",
+                        "prune",
+                        "norm",
+                        "binary",
+                    ],
+                    imports=import_list,
+                )
+                net_mets_node._n_procs = 1
+                net_mets_node._mem_gb = 4
+
             if multi_graph:
                 print("Using multiple custom input graphs...")
                 if op.basename(op.dirname(multi_graph[0])) == 'graphs':
@@ -3253,6 +3280,14 @@ def build_workflow(args, retval):
                 "memory_gb": int(procmem[1]),
                 "scheduler": "mem_thread",
             }
+        if telemetry is True:
+            from nipype import config
+            from pynets.core.telemetry import TelemetryCallback
+
+            config.enable_resource_monitor()
+            plugin_args["status_callback"] = TelemetryCallback(
+                run_id=retval["run_uuid"],
+                chain=plugin_args.get("status_callback", None))
         print(f"Running with {str(plugin_args)}\n")
         retval["execution_dict"] = execution_dict
         retval["plugin_settings"] = plugin_args
@@ -3455,6 +3490,14 @@ def build_workflow(args, retval):
                 "memory_gb": int(procmem[1]),
                 "scheduler": "mem_thread",
             }
+        if telemetry is True:
+            from nipype import config
+            from pynets.core.telemetry import TelemetryCallback
+
+            config.enable_resource_monitor()
+            plugin_args["status_callback"] = TelemetryCallback(
+                run_id=retval["run_uuid"],
+                chain=plugin_args.get("status_callback", None))
         print(f"Running with {str(plugin_args)}\n")
         retval["execution_dict"] = execution_dict
         retval["plugin_settings"] = plugin_args
@@ -10,6 +10,14 @@ import os
 import sys
 import boto3
 
+TRANSFER_WORKERS = 8
+PART_CONCURRENCY = 4
+MULTIPART_THRESHOLD = 64 * 1024 ** 2
+MULTIPART_CHUNKSIZE = 16 * 1024 ** 2
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+MANIFEST_VERSION = 1
+
 
 def get_credentials():
     """Searches for and returns AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY
@@ -40,7 +48,7 @@ def get_credentials():
     return ACCESS, SECRET
 
 
-def s3_client(service="s3"):
+def s3_client(service="s3", max_attempts=None):
     """
     create an s3 client.
 
@@ -48,21 +56,37 @@ def s3_client(service="s3"):
     ----------
     service : str
         Type of service.
+    max_attempts : int, optional
+        Total number of attempts of each request by botocore. Default is
+        `MAX_RETRIES`. Clients whose calls are wrapped by `with_retries`
+        should use 1, so that requests are not retried twice over.
 
     Returns
     -------
     boto3.client
         client with proper credentials.
+
+    Notes
+    -----
+    The connection pool is sized for `TRANSFER_WORKERS` concurrent
+    transfers of `PART_CONCURRENCY` parts each, so that a single client can
+    be shared across the threads of `s3_transfer`.
     """
+    from botocore.config import Config
 
+    config = Config(
+        max_pool_connections=TRANSFER_WORKERS * PART_CONCURRENCY,
+        retries={"total_max_attempts": MAX_RETRIES if max_attempts is None
+                 else int(max_attempts), "mode": "standard"})
     try:
         ACCESS, SECRET = get_credentials()
     except AttributeError:
-        return boto3.client(service)
+        return boto3.client(service, config=config)
     return boto3.client(
         service,
         aws_access_key_id=ACCESS,
-        aws_secret_access_key=SECRET)
+        aws_secret_access_key=SECRET,
+        config=config)
 
 
 def parse_path(s3_datapath):
@@ -87,7 +111,300 @@ def parse_path(s3_datapath):
     return bucket, prefix
 
 
-def get_matching_s3_objects(bucket, prefix="", suffix=""):
+def transfer_config():
+    """
+    Return the multipart settings shared by all transfers. Files of at
+    least `MULTIPART_THRESHOLD` bytes (e.g. large NIfTI images and
+    tractograms) are split into parts of `MULTIPART_CHUNKSIZE` bytes, of
+    which `PART_CONCURRENCY` are transferred at a time. Interrupted
+    downloads are not retried here, but by `with_retries`.
+
+    Returns
+    -------
+    boto3.s3.transfer.TransferConfig
+        Transfer configuration.
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        max_concurrency=PART_CONCURRENCY,
+        num_download_attempts=1,
+        use_threads=True)
+
+
+def s3_etag(path, chunksize=None):
+    """
+    Compute the ETag that S3 assigns to a file.
+
+    Parameters
+    ----------
+    path : str
+        Path to a local file.
+    chunksize : int, optional
+        Part size of a multipart upload. Default is None, for a file
+        uploaded in a single part.
+
+    Returns
+    -------
+    etag : str
+        MD5 digest of the file or, for multipart uploads, MD5 digest of the
+        concatenated digests of its parts followed by the number of parts.
+    """
+    import hashlib
+
+    if chunksize is None:
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    digests = []
+    with open(path, "rb") as f:
+        for part in iter(lambda: f.read(chunksize), b""):
+            digests.append(hashlib.md5(part).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+def upload_etag(path):
+    """
+    Compute the ETag of a file once uploaded with `transfer_config`.
+
+    Parameters
+    ----------
+    path : str
+        Path to a local file.
+
+    Returns
+    -------
+    etag : str
+        Expected ETag.
+    """
+    if os.path.getsize(path) >= MULTIPART_THRESHOLD:
+        return s3_etag(path, MULTIPART_CHUNKSIZE)
+    return s3_etag(path)
+
+
+def _etag_matches(path, etag, size):
+    """Whether a local file has the content of an object on S3."""
+    etag = etag.strip('"')
+    if os.path.getsize(path) != size:
+        return False
+    if "-" not in etag:
+        return s3_etag(path) == etag
+
+    # S3 does not record the part size of multipart uploads, so try that of
+    # `transfer_config` and those of common clients.
+    parts = int(etag.split("-")[1])
+    mib = 1024 ** 2
+    smallest = -(-size // parts)
+    candidates = [MULTIPART_CHUNKSIZE, 8 * mib, 16 * mib,
+                  -(-smallest // mib) * mib]
+    for chunksize in dict.fromkeys(candidates):
+        if -(-size // chunksize) == parts and \
+                s3_etag(path, chunksize) == etag:
+            return True
+    return False
+
+
+def _is_retryable(e):
+    """Whether an S3 error is transient."""
+    from botocore.exceptions import BotoCoreError, ClientError
+    from boto3.exceptions import S3UploadFailedError
+    from s3transfer.exceptions import RetriesExceededError
+
+    if isinstance(e, S3UploadFailedError):
+        cause = e.__cause__ or e.__context__
+        return cause is None or _is_retryable(cause)
+    if isinstance(e, ClientError):
+        status = e.response.get("ResponseMetadata", {}).get(
+            "HTTPStatusCode", 0)
+        code = e.response.get("Error", {}).get("Code", "")
+        return status >= 500 or status in (408, 429) or \
+            code in ("RequestTimeout", "SlowDown", "Throttling")
+    return isinstance(e, (BotoCoreError, RetriesExceededError,
+                          ConnectionError))
+
+
+def with_retries(func, *args, retries=None, backoff=None, **kwargs):
+    """
+    Call a function, retrying transient S3 errors with exponential backoff.
+
+    Parameters
+    ----------
+    func : callable
+        Function to call with `args` and `kwargs`.
+    retries : int, optional
+        Maximum number of attempts. Default is `MAX_RETRIES`.
+    backoff : float, optional
+        Delay in seconds before the first retry, doubled (with jitter) on
+        each subsequent retry. Default is `RETRY_BACKOFF`.
+
+    Returns
+    -------
+    out
+        Return value of `func`.
+    """
+    import random
+    import time
+
+    retries = MAX_RETRIES if retries is None else retries
+    backoff = RETRY_BACKOFF if backoff is None else backoff
+    for attempt in range(retries):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries - 1 or not _is_retryable(e):
+                raise
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+def _manifest_path(bucket, prefix, local, direction):
+    """Location of the transfer manifest of a local directory."""
+    from pynets.core.utils import content_hash, get_cache_dir
+
+    key = content_hash(bucket=bucket, prefix=prefix,
+                       local=os.path.abspath(local), direction=direction,
+                       version=MANIFEST_VERSION)
+    return f"{get_cache_dir('s3')}/{key}.json"
+
+
+def _load_manifest(path):
+    import json
+
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(path, manifest):
+    import json
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def _transfer_one(client, bucket, key, path, remote, entry, upload,
+                  extra_args):
+    """
+    Upload or download one file unless unchanged. Returns the status of the
+    transfer and the manifest entry of the file.
+    """
+    import threading
+
+    etag = None if remote is None else remote["ETag"].strip('"')
+    if os.path.isfile(path) and (upload is False or remote is not None):
+        if remote is None:
+            # Nothing is known of the remote object, so keep the local copy
+            print(f"File {os.path.basename(path)} already exists at {path}")
+            return "skipped", None
+        stat = os.stat(path)
+        if entry is not None and entry["etag"] == etag and \
+                entry["size"] == stat.st_size and \
+                entry["mtime_ns"] == stat.st_mtime_ns:
+            return "skipped", entry
+        if _etag_matches(path, etag, remote["Size"]):
+            return "skipped", {"etag": etag, "size": stat.st_size,
+                               "mtime_ns": stat.st_mtime_ns}
+
+    if upload is True:
+        print(f"Uploading {path} to s3://{bucket}/{key}...")
+        with_retries(client.upload_file, path, bucket, key,
+                     ExtraArgs=extra_args, Config=transfer_config())
+        etag = upload_etag(path)
+    else:
+        print(f"Downloading {key} from {bucket} s3 bucket...")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with_retries(client.download_file, bucket, key, tmp,
+                         ExtraArgs=extra_args, Config=transfer_config())
+            os.replace(tmp, path)
+        finally:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+    stat = os.stat(path)
+    return "transferred", {"etag": etag, "size": stat.st_size,
+                           "mtime_ns": stat.st_mtime_ns}
+
+
+def s3_transfer(client, bucket, transfers, upload=False, manifest=None,
+                workers=None, extra_args=None):
+    """
+    Upload or download files concurrently on a bounded pool of threads.
+
+    Parameters
+    ----------
+    client : boto3.client
+        S3 client, shared by all threads. Transfers are retried by
+        `with_retries`, so the client should not retry requests itself
+        (see `s3_client`).
+    bucket : str
+        Name of the s3 bucket.
+    transfers : iterable
+        Tuples of (key, local path, remote), where remote is the listing
+        entry of the object (with its `ETag` and `Size`), or None if it is
+        not known. The iterable is consumed lazily, so that transfers start
+        while a listing is still being paginated.
+    upload : bool, optional
+        Whether to upload the local files rather than download the objects,
+        by default False.
+    manifest : dict, optional
+        ETags, sizes, and modification times of the files at their previous
+        transfer, keyed by object key. Files whose local copy and remote
+        listing entry are both unchanged are skipped without further
+        requests to S3. Updated in place.
+    workers : int, optional
+        Number of concurrent transfers. Default is `TRANSFER_WORKERS`.
+    extra_args : dict, optional
+        Extra arguments passed to every upload or download.
+
+    Returns
+    -------
+    status : dict
+        'transferred', 'skipped', or 'failed', keyed by object key.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    manifest = {} if manifest is None else manifest
+    workers = TRANSFER_WORKERS if workers is None else workers
+    verb = "upload" if upload is True else "download"
+
+    status = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        try:
+            for key, path, remote in transfers:
+                futures[pool.submit(_transfer_one, client, bucket, key, path,
+                                    remote, manifest.get(key), upload,
+                                    extra_args)] = key
+        finally:
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    status[key], entry = future.result()
+                except Exception as e:
+                    print(f"Error: failed to {verb} {key}: {e}")
+                    status[key] = "failed"
+                    continue
+                if entry is not None:
+                    manifest[key] = entry
+
+    counts = [list(status.values()).count(i) for i in
+              ("transferred", "skipped", "failed")]
+    print(f"{verb.capitalize()}ed {counts[0]} file(s), skipped {counts[1]} "
+          f"unchanged, {counts[2]} failed.")
+    return status
+
+
+def get_matching_s3_objects(bucket, prefix="", suffix="", client=None,
+                            meta=False):
     """
     Generate objects in an S3 bucket.
 
@@ -99,8 +416,14 @@ def get_matching_s3_objects(bucket, prefix="", suffix=""):
         Only fetch objects whose key starts with this prefix, by default ''
     suffix : str, optional
         Only fetch objects whose keys end with this suffix, by default ''
+    client : boto3.client, optional
+        S3 client to reuse. Default is a new client.
+    meta : bool, optional
+        Whether to generate the listing entries of the objects (with their
+        `Key`, `ETag`, and `Size`) rather than their keys, by default False.
     """
-    s3 = s3_client(service="s3")
+    s3 = s3_client(service="s3", max_attempts=1) if client is None else \
+        client
     kwargs = {"Bucket": bucket}
 
     # If the prefix is a single string (not a tuple of strings), we can
@@ -112,7 +435,7 @@ def get_matching_s3_objects(bucket, prefix="", suffix=""):
 
         # The S3 API response is a large blob of metadata.
         # 'Contents' contains information about the listed objects.
-        resp = s3.list_objects_v2(**kwargs)
+        resp = with_retries(s3.list_objects_v2, **kwargs)
 
         try:
             contents = resp["Contents"]
@@ -123,7 +446,7 @@ def get_matching_s3_objects(bucket, prefix="", suffix=""):
         for obj in contents:
             key = obj["Key"]
             if key.startswith(prefix) and key.endswith(suffix):
-                yield key
+                yield obj if meta is True else key
 
         # The S3 API is paginated, returning up to 1000 keys at a time.
         # Pass the continuation token into the next response, until we
@@ -134,28 +457,57 @@ def get_matching_s3_objects(bucket, prefix="", suffix=""):
             break
 
 
-def s3_fetch(client, bucket, remote, local, bpath, mod):
-    # go through all folders inside of remote directory and download relevant
-    # files
-    for obj in bpath:
-        bdir, data = os.path.split(obj)
-        localpath = os.path.join(local, bdir.replace(f"{remote}/", ""))
-        if (mod in localpath) or ("anat" in localpath):
-            # Make directory for data if it doesn't exist
-            if not os.path.exists(localpath):
-                os.makedirs(localpath)
-            if not os.path.exists(f"{localpath}/{data}"):
-                print(f"Downloading {bdir}/{data} from {bucket} s3 bucket...")
-                # Download file
-                client.download_file(
-                    bucket, f"{bdir}/{data}", f"{localpath}/{data}")
-                if os.path.exists(f"{localpath}/{data}"):
-                    print("Success!")
-                else:
-                    print("Error: File not downloaded")
-            else:
-                print(f"File {data} already exists at {localpath}/{data}")
-    return
+def s3_fetch(client, bucket, remote, local, bpath, mod, workers=None):
+    """
+    Download the objects of a BIDS dataset on S3 that belong to one or more
+    modalities, along with its anatomical data.
+
+    Parameters
+    ----------
+    client : boto3.client
+        S3 client.
+    bucket : str
+        s3 bucket you are accessing data from
+    remote : str
+        The path to the data on your S3 bucket.
+    local : str
+        Local directory where you want the files copied to.
+    bpath : iterable
+        Object keys, or listing entries as generated by
+        `get_matching_s3_objects` with `meta=True`. Files that already
+        exist locally are only downloaded again if their listing entry
+        shows that the object has changed.
+    mod : str or list
+        Modality (or modalities) to download.
+    workers : int, optional
+        Number of concurrent downloads. Default is `TRANSFER_WORKERS`.
+
+    Returns
+    -------
+    status : dict
+        'transferred', 'skipped', or 'failed', keyed by object key.
+    """
+    mods = [mod] if isinstance(mod, str) else list(mod)
+
+    def transfers():
+        for obj in bpath:
+            key, entry = (obj, None) if isinstance(obj, str) else \
+                (obj["Key"], obj)
+            bdir, data = os.path.split(key)
+            localpath = os.path.join(local, bdir.replace(f"{remote}/", ""))
+            if not data:
+                continue
+            if any(i in localpath for i in mods) or ("anat" in localpath):
+                yield key, f"{localpath}/{data}", entry
+
+    manifest_path = _manifest_path(bucket, remote, local, "download")
+    manifest = _load_manifest(manifest_path)
+    try:
+        status = s3_transfer(client, bucket, transfers(), manifest=manifest,
+                             workers=workers)
+    finally:
+        _save_manifest(manifest_path, manifest)
+    return status
 
 
 def s3_get_data(bucket, remote, local, modality, info=None, force=False):
@@ -173,6 +525,8 @@ def s3_get_data(bucket, remote, local, modality, info=None, force=False):
     local : list
         Local input directory where you want the files copied to and
         subject/session info [input, sub-#/ses-#]
+    modality : list
+        Modalities to download, along with anatomical data.
     info : str, optional
         Relevant subject and session information in the form of sub-#/ses-#/
     force : bool, optional
@@ -180,63 +534,47 @@ def s3_get_data(bucket, remote, local, modality, info=None, force=False):
         already exists, by default False
     """
 
-    # get client with credentials if they exist
-    client = s3_client(service="s3")
+    # get client with credentials if they exist. Requests are retried by
+    # with_retries.
+    client = s3_client(service="s3", max_attempts=1)
 
     # check that bucket exists
-    bkts = [bk["Name"] for bk in client.list_buckets()["Buckets"]]
+    bkts = [bk["Name"] for bk in
+            with_retries(client.list_buckets)["Buckets"]]
     if bucket not in bkts:
         raise ValueError(
             "Error: could not locate bucket. Available buckets: " +
             ", ".join(bkts))
 
+    prefix = f"{remote}/"
     if info is not None:
         if info == "sub-":
             print("Subject not specified. Check BIDS formatting.")
-        else:
-            if os.path.exists(os.path.join(local, info)) and not force:
-                if os.listdir(os.path.join(local, info)):
-                    print(
-                        f"Local directory: {os.path.join(local, info)} already"
-                        f" exists. Not pulling s3 data. Delete contents to"
-                        f" re-download data.")
-                    return
-            run_str = info.split("/")
-
-        if len(modality) > 1:
-            for mod in modality:
-                if len(run_str) == 1:
-                    bpath = get_matching_s3_objects(
-                        bucket, f"{remote}/{'/'.join(run_str[:-1])}/"
-                    )
-                else:
-                    bpath = get_matching_s3_objects(
-                        bucket, f"{remote}/{'/'.join(run_str)}/"
-                    )
-                s3_fetch(client, bucket, remote, local, bpath, mod)
-        else:
-            if len(run_str) == 1:
-                bpath = get_matching_s3_objects(
-                    bucket, f"{remote}/{'/'.join(run_str[:-1])}/"
-                )
-            else:
-                bpath = get_matching_s3_objects(
-                    bucket, f"{remote}/{'/'.join(run_str)}/"
-                )
-            s3_fetch(client, bucket, remote, local, bpath, modality[0])
-    else:
-        if len(modality) > 1:
-            for mod in modality:
-                bpath = get_matching_s3_objects(bucket, f"{remote}/")
-                s3_fetch(client, bucket, remote, local, bpath, mod)
-        else:
-            bpath = get_matching_s3_objects(bucket, f"{remote}/")
-            s3_fetch(client, bucket, remote, local, bpath, modality[0])
+            return
+        if os.path.exists(os.path.join(local, info)) and not force:
+            if os.listdir(os.path.join(local, info)):
+                print(
+                    f"Local directory: {os.path.join(local, info)} already"
+                    f" exists. Not pulling s3 data. Delete contents to"
+                    f" re-download data.")
+                return
+        info = info.strip("/")
+        if info.startswith("sub-"):
+            prefix = f"{remote}/{info}/"
+
+    # List the objects once for all modalities, and download them while the
+    # listing is paginated
+    bpath = get_matching_s3_objects(bucket, prefix, client=client, meta=True)
+    if info is not None and not info.startswith("sub-"):
+        # Sessions are nested within subjects
+        bpath = (obj for obj in bpath if f"/{info}/" in obj["Key"])
+    s3_fetch(client, bucket, remote, local, bpath, modality)
     return
 
 
 def s3_push_data(
-    bucket, remote, outDir, modality, subject=None, session=None, creds=True
+    bucket, remote, outDir, modality, subject=None, session=None, creds=True,
+    workers=None
 ):
     """Pushes data to a specified S3 bucket
 
@@ -258,73 +596,66 @@ def s3_push_data(
     creds : bool, optional
         Whether s3 credentials are being provided, may fail to push big files
         if False, by default True
-    """
-    import re
-    import hashlib
-    from boto3.session import Session
-
-    [access_key, secret_key] = get_credentials()
-
-    session = Session(
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key)
-
-    s3 = session.resource("s3")
-
-    # Shortcut to MD5
-    def get_md5(filename):
-        f = open(filename, "rb")
-        m = hashlib.md5()
-        while True:
-            data = f.read(10240)
-            if len(data) == 0:
-                break
-            m.update(data)
-        return m.hexdigest()
-
-    def to_uri(outDir, f):
-        return os.path.join(f"{remote}/{re.sub(outDir, '', f)}")
+    workers : int, optional
+        Number of concurrent uploads. Default is `TRANSFER_WORKERS`.
 
-    # get client with credentials if they exist
-    client = s3_client(service="s3")
+    Returns
+    -------
+    status : dict
+        'transferred', 'skipped', or 'failed', keyed by object key.
+
+    Notes
+    -----
+    The remote directory is listed once, and files whose size and
+    modification time are unchanged since they were last pushed to an
+    unchanged object are skipped. Other files are compared with their
+    object by ETag, and only uploaded if they differ.
+    """
+    # get client with credentials if they exist. Requests are retried by
+    # with_retries.
+    client = s3_client(service="s3", max_attempts=1)
 
     # check that bucket exists
-    bkts = [bk["Name"] for bk in client.list_buckets()["Buckets"]]
+    bkts = [bk["Name"] for bk in
+            with_retries(client.list_buckets)["Buckets"]]
     if bucket not in bkts:
         sys.exit(
             "Error: could not locate bucket. Available buckets: " +
             ", ".join(bkts))
 
-    # List all files and upload
-    bucket_boto = s3.Bucket(bucket)
-
-    for root, _, files in os.walk(outDir):
-        files_to_upload = []
-        for file_ in files:
-            # Compare them to S3 checksums
-            uri = to_uri(outDir, os.path.join(root, file_))
-            key = list(bucket_boto.objects.filter(Prefix=uri))
-            if len(key) == 0:
-                # new file, upload
-                files_to_upload.append(os.path.join(root, file_))
-            else:
-                # check MD5
-                md5 = get_md5(os.path.join(root, file_))
-                try:
-                    s3_resp = client.head_object(Bucket=bucket, Key=uri)
-                except BaseException:
-                    continue
-                etag = s3_resp["ETag"].strip('"')
-                if etag != md5:
-                    print(file_ + ": " + md5 + " != " + etag)
-                    files_to_upload.append(os.path.join(root, file_))
-        if len(files_to_upload) > 0:
-            print(f"Uploading: {files_to_upload}")
-            for file_ in files_to_upload:
-                uri = to_uri(outDir, os.path.join(root, file_))
-                client.upload_file(
-                    f"{file_}/{modality[0]}",
-                    bucket,
-                    uri,
-                    ExtraArgs={"ACL": "public-read"},
-                )
+    # Only push the outputs of the subject and session, if found
+    local = outDir
+    if subject is not None:
+        sub_dir = os.path.join(outDir, f"sub-{subject}")
+        if session is not None and \
+                os.path.isdir(os.path.join(sub_dir, f"ses-{session}")):
+            local = os.path.join(sub_dir, f"ses-{session}")
+        elif os.path.isdir(sub_dir):
+            local = sub_dir
+
+    def to_uri(f):
+        rel = os.path.relpath(f, outDir)
+        return "/".join([i for i in (remote.strip("/"), rel)
+                         if i not in ("", ".")])
+
+    prefix = to_uri(local)
+    existing = {
+        obj["Key"]: obj for obj in get_matching_s3_objects(
+            bucket, f"{prefix}/" if prefix else "", client=client, meta=True)
+    }
+
+    def transfers():
+        for root, _, files in os.walk(local):
+            for file_ in files:
+                uri = to_uri(os.path.join(root, file_))
+                yield uri, os.path.join(root, file_), existing.get(uri)
+
+    manifest_path = _manifest_path(bucket, remote, outDir, "upload")
+    manifest = _load_manifest(manifest_path)
+    try:
+        status = s3_transfer(client, bucket, transfers(), upload=True,
+                             manifest=manifest, workers=workers,
+                             extra_args={"ACL": "public-read"})
+    finally:
+        _save_manifest(manifest_path, manifest)
+    return status
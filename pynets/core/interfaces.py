@@ -411,6 +411,56 @@ class NetworkAnalysis(BaseInterface):
         return {"out_path_neat": op.abspath(getattr(self, "_outpath"))}
 
 
+class NetworkAnalysisSweepInputSpec(BaseInterfaceInputSpec):
+    """Input interface wrapper for NetworkAnalysisSweep"""
+
+    ID = traits.Any(mandatory=True)
+    network = traits.Any(mandatory=False)
+    thrs = traits.List(mandatory=True)
+    conn_model = traits.Str(mandatory=True)
+    est_path = File(exists=True, mandatory=True)
+    roi = traits.Any(mandatory=False)
+    prune = traits.Any(mandatory=False)
+    norm = traits.Any(mandatory=False)
+    binary = traits.Bool(False, usedefault=True)
+
+
+class NetworkAnalysisSweepOutputSpec(TraitedSpec):
+    """Output interface wrapper for NetworkAnalysisSweep"""
+
+    out_path_neat = traits.List(File(exists=True), mandatory=True)
+
+
+class NetworkAnalysisSweep(BaseInterface):
+    """Interface wrapper for NetworkAnalysisSweep"""
+
+    input_spec = NetworkAnalysisSweepInputSpec
+    output_spec = NetworkAnalysisSweepOutputSpec
+
+    def _run_interface(self, runtime):
+        from pynets.stats.sweep import sweep_netstats
+
+        out, _ = sweep_netstats(
+            self.inputs.ID,
+            self.inputs.network,
+            self.inputs.thrs,
+            self.inputs.conn_model,
+            self.inputs.est_path,
+            self.inputs.roi,
+            self.inputs.prune,
+            self.inputs.norm,
+            self.inputs.binary,
+        )
+        setattr(self, "_outpaths", out)
+        return runtime
+
+    def _list_outputs(self):
+        import os.path as op
+
+        return {"out_path_neat": [op.abspath(i) for i in
+                                  getattr(self, "_outpaths")]}
+
+
 class CombineOutputsInputSpec(BaseInterfaceInputSpec):
     """Input interface wrapper for CombineOutputs"""
 
@@ -472,6 +522,7 @@ class _IndividualClusteringInputSpec(BaseInterfaceInputSpec):
     mni2t1_xfm = File(exists=True, mandatory=True)
     template_name = traits.Str("MNI152_T1", mandatory=True, usedefault=True)
     simple = traits.Bool(False, usedefault=True)
+    k_max = traits.Any(None, usedefault=True)
 
 
 class _IndividualClusteringOutputSpec(TraitedSpec):
@@ -501,13 +552,10 @@ class IndividualClustering(SimpleInterface):
         from nipype.utils.filemanip import fname_presuffix, copyfile
         from pynets.fmri import clustools
         from pynets.registration.reg_utils import check_orient_and_dims
-        from joblib import Parallel, delayed
         from joblib.externals.loky.backend import resource_tracker
         from pynets.registration import reg_utils as regutils
         from pynets.core.utils import decompress_nifti
         import pkg_resources
-        import shutil
-        import tempfile
         resource_tracker.warnings = None
 
         template = pkg_resources.resource_filename(
@@ -578,7 +626,6 @@ class IndividualClustering(SimpleInterface):
             template_tmp_path,
             self.inputs.simple,
         )
-        time.sleep(0.5)
 
         if self.inputs.mask:
             out_name_mask = fname_presuffix(
@@ -630,106 +677,24 @@ class IndividualClustering(SimpleInterface):
 
         if self.inputs.clust_type in clust_list:
             if float(c_boot) > 1:
-                import random
-                from joblib import Memory
-                from joblib.externals.loky import get_reusable_executor
                 print(
                     f"Performing circular block bootstrapping with {c_boot}"
                     f" iterations..."
                 )
                 ts_data, block_size = nip.prep_boot()
 
-                cache_dir = tempfile.mkdtemp()
-                memory = Memory(cache_dir, verbose=0)
-                ts_data = memory.cache(ts_data)
-
-                def create_bs_imgs(ts_data, block_size, clust_mask_corr_img):
-                    import nibabel as nib
-                    from nilearn.masking import unmask
-                    from pynets.fmri.estimation import timeseries_bootstrap
-                    boot_series = timeseries_bootstrap(
-                        ts_data.func, block_size)[0].astype('float32')
-                    return unmask(boot_series, clust_mask_corr_img)
-
-                def run_bs_iteration(i, ts_data, work_dir, local_corr,
-                                     clust_type, _local_conn_mat_path,
-                                     num_conn_comps, _clust_mask_corr_img,
-                                     _standardize, _detrending, k,
-                                     _local_conn, conf, _dir_path,
-                                     _conn_comps):
-                    import os
-                    import time
-                    import gc
-                    from pynets.fmri.clustools import parcellate
-                    print(f"\nBootstrapped iteration: {i}")
-                    out_path = f"{work_dir}/boot_parc_tmp_{str(i)}.nii.gz"
-
-                    boot_img = create_bs_imgs(ts_data, block_size,
-                                              _clust_mask_corr_img)
-                    try:
-                        parcellation = parcellate(boot_img, local_corr,
-                                                  clust_type,
-                                                  _local_conn_mat_path,
-                                                  num_conn_comps,
-                                                  _clust_mask_corr_img,
-                                                  _standardize,
-                                                  _detrending, k, _local_conn,
-                                                  conf, _dir_path,
-                                                  _conn_comps)
-                        parcellation.to_filename(out_path)
-                        parcellation.uncache()
-                        boot_img.uncache()
-                        gc.collect()
-                    except BaseException:
-                        boot_img.uncache()
-                        gc.collect()
-                        return None
-                    _clust_mask_corr_img.uncache()
-                    return out_path
-
-                time.sleep(random.randint(1, 5))
-                counter = 0
-                boot_parcellations = []
-                while float(counter) < float(c_boot):
-                    with Parallel(n_jobs=nthreads, max_nbytes='8000M',
-                                  backend='loky', mmap_mode='r+',
-                                  temp_folder=cache_dir,
-                                  verbose=10) as parallel:
-                        iter_bootedparcels = parallel(
-                            delayed(run_bs_iteration)(
-                                i, ts_data, runtime.cwd, nip.local_corr,
-                                nip.clust_type, nip._local_conn_mat_path,
-                                nip.num_conn_comps, nip._clust_mask_corr_img,
-                                nip._standardize, nip._detrending, nip.k,
-                                nip._local_conn, nip.conf, nip._dir_path,
-                                nip._conn_comps) for i in
-                            range(c_boot))
-
-                        boot_parcellations.extend([i for i in
-                                                   iter_bootedparcels if
-                                                   i is not None])
-                        counter = len(boot_parcellations)
-                        del iter_bootedparcels
-                        gc.collect()
-
-                print('Bootstrapped samples complete:')
-                print(boot_parcellations)
                 print("Creating spatially-constrained consensus "
                       "parcellation...")
-                consensus_parcellation = clustools.ensemble_parcellate(
-                    boot_parcellations,
-                    int(self.inputs.k)
-                )
+                consensus_parcellation = clustools.bootstrap_parcellate(
+                    ts_data, nip._clust_mask_corr_img, nip.k, nip.clust_type,
+                    block_size, int(c_boot), local_corr=nip.local_corr,
+                    connectivity=nip._local_conn,
+                    conn_comps=nip._conn_comps if nip.num_conn_comps > 1
+                    else None, thresh=0.4, n_jobs=nthreads,
+                    temp_folder=runtime.cwd)
                 nib.save(consensus_parcellation, nip.uatlas)
-                memory.clear(warn=False)
-                shutil.rmtree(cache_dir, ignore_errors=True)
-                del parallel, memory, cache_dir
-                get_reusable_executor().shutdown(wait=True)
+                del ts_data
                 gc.collect()
-
-                for i in boot_parcellations:
-                    if os.path.isfile(i):
-                        os.remove(i)
             else:
                 print(
                     "Creating spatially-constrained parcellation...")
@@ -745,7 +710,8 @@ class IndividualClustering(SimpleInterface):
                                                     nip._detrending, nip.k,
                                                     nip._local_conn,
                                                     nip.conf, nip._dir_path,
-                                                    nip._conn_comps)
+                                                    nip._conn_comps,
+                                                    self.inputs.k_max)
                 parcellation.to_filename(out_path)
 
         else:
@@ -1148,7 +1114,6 @@ class RegisterDWI(SimpleInterface):
 
     def _run_interface(self, runtime):
         import gc
-        import time
         import glob
         import os.path as op
         from pynets.registration import register
@@ -1290,11 +1255,9 @@ class RegisterDWI(SimpleInterface):
 
         # Generate T1w brain mask
         reg.gen_mask(mask_tmp_path)
-        time.sleep(0.5)
 
         # Perform anatomical segmentation
         reg.gen_tissue(wm_mask, gm_mask, csf_mask, self.inputs.overwrite)
-        time.sleep(0.5)
 
         # Align t1w to mni template
         # from joblib import Memory
@@ -1306,20 +1269,17 @@ class RegisterDWI(SimpleInterface):
         # t1w2mni_align = memory.cache(reg.t1w2mni_align)
         # t1w2mni_align()
         reg.t1w2mni_align()
-        time.sleep(0.5)
 
         if (self.inputs.overwrite is True) or (
                 op.isfile(reg.t1w2dwi) is False):
             # Align t1w to dwi
             reg.t1w2dwi_align()
-            time.sleep(0.5)
 
         if (self.inputs.overwrite is True) or (
             op.isfile(reg.wm_gm_int_in_dwi) is False
         ):
             # Align tissue
             reg.tissue2dwi_align()
-            time.sleep(0.5)
 
         self._results["wm_in_dwi"] = reg.wm_in_dwi
         self._results["gm_in_dwi"] = reg.gm_in_dwi
@@ -1414,7 +1374,6 @@ class RegisterAtlasDWI(SimpleInterface):
 
     def _run_interface(self, runtime):
         import gc
-        import time
         import os
         from pynets.registration import reg_utils as regutils
         from pynets.core.nodemaker import \
@@ -1668,7 +1627,6 @@ class RegisterAtlasDWI(SimpleInterface):
                 template_tmp_path,
                 self.inputs.simple,
             )
-            time.sleep(0.5)
             os.remove(waymask_tmp_path)
         else:
             waymask_in_dwi = None
@@ -1791,7 +1749,6 @@ class RegisterROIDWI(SimpleInterface):
     def _run_interface(self, runtime):
         import gc
         import os
-        import time
         from pynets.registration import reg_utils as regutils
         from nipype.utils.filemanip import fname_presuffix, copyfile
         import pkg_resources
@@ -1905,7 +1862,6 @@ class RegisterROIDWI(SimpleInterface):
                 template_tmp_path,
                 self.inputs.simple,
             )
-            time.sleep(0.5)
         else:
             roi_in_dwi = None
 
@@ -1965,7 +1921,6 @@ class RegisterFunc(SimpleInterface):
     def _run_interface(self, runtime):
         import gc
         import glob
-        import time
         import os.path as op
         from pynets.registration import register
         from nipype.utils.filemanip import fname_presuffix, copyfile
@@ -2061,11 +2016,9 @@ class RegisterFunc(SimpleInterface):
 
         # Generate T1w brain mask
         reg.gen_mask(mask_tmp_path)
-        time.sleep(0.5)
 
         # Perform anatomical segmentation
         reg.gen_tissue(wm_mask, gm_mask, self.inputs.overwrite)
-        time.sleep(0.5)
 
         # Align t1w to mni template
         # from joblib import Memory
@@ -2077,7 +2030,6 @@ class RegisterFunc(SimpleInterface):
         # t1w2mni_align = memory.cache(reg.t1w2mni_align)
         # t1w2mni_align()
         reg.t1w2mni_align()
-        time.sleep(0.5)
 
         self._results["reg_fmri_complete"] = True
         self._results["basedir_path"] = runtime.cwd
@@ -2124,7 +2076,6 @@ class RegisterParcellation2MNIFunc(SimpleInterface):
         import gc
         import os
         import pkg_resources
-        import time
         from pynets.core.utils import prune_suffices
         from pynets.registration import reg_utils as regutils
         from nipype.utils.filemanip import fname_presuffix, copyfile
@@ -2216,7 +2167,6 @@ class RegisterParcellation2MNIFunc(SimpleInterface):
             t1w2mni_warp_tmp_path,
             self.inputs.simple
         )
-        time.sleep(0.5)
 
         out_dir = f"{self.inputs.dir_path}/t1w_clustered_parcellations/"
         os.makedirs(out_dir, exist_ok=True)
@@ -2287,7 +2237,6 @@ class RegisterAtlasFunc(SimpleInterface):
     def _run_interface(self, runtime):
         import gc
         import os
-        import time
         import glob
         from pynets.registration import reg_utils as regutils
         from pynets.core.nodemaker import \
@@ -2429,7 +2378,6 @@ class RegisterAtlasFunc(SimpleInterface):
                 aligned_atlas_gm,
                 self.inputs.simple,
             )
-            time.sleep(0.5)
 
             # Correct coords and labels
             [aligned_atlas_gm, coords, labels] = \
@@ -2522,7 +2470,6 @@ class RegisterROIEPI(SimpleInterface):
     def _run_interface(self, runtime):
         import gc
         import os
-        import time
         from pynets.registration import reg_utils as regutils
         from nipype.utils.filemanip import fname_presuffix, copyfile
         import pkg_resources
@@ -2592,7 +2539,6 @@ class RegisterROIEPI(SimpleInterface):
                 template_tmp_path,
                 self.inputs.simple,
             )
-            time.sleep(0.5)
         else:
             roi_in_t1w = None
 
@@ -2612,6 +2558,66 @@ class RegisterROIEPI(SimpleInterface):
         return runtime
 
 
+class _WarpImagesInputSpec(BaseInterfaceInputSpec):
+    """Input interface wrapper for WarpImages"""
+
+    in_files = traits.List(File(exists=True), mandatory=True)
+    ref_file = File(exists=True, mandatory=True)
+    xfm = traits.Any(None, usedefault=True)
+    warp = traits.Any(None, usedefault=True)
+    mask = traits.Any(None, usedefault=True)
+    interps = traits.Any(None, usedefault=True)
+    sup = traits.Bool(False, usedefault=True)
+    suffix = traits.Str("_warped", usedefault=True)
+
+
+class _WarpImagesOutputSpec(TraitedSpec):
+    """Output interface wrapper for WarpImages"""
+
+    out_files = traits.List(File(exists=True), mandatory=True)
+
+
+class WarpImages(SimpleInterface):
+    """
+    Interface wrapper for WarpImages, which applies one transformation
+    matrix and/or warp to a list of images (e.g. atlases, ROIs, and tissue
+    maps), loading the transform only once. Label images are interpolated
+    by nearest-neighbour and continuous images trilinearly, unless `interps`
+    specifies the method of each image.
+    """
+
+    input_spec = _WarpImagesInputSpec
+    output_spec = _WarpImagesOutputSpec
+
+    def _run_interface(self, runtime):
+        from nipype.utils.filemanip import fname_presuffix
+        from pynets.registration import reg_utils as regutils
+
+        out_files = []
+        for i, in_file in enumerate(self.inputs.in_files):
+            out_file = fname_presuffix(in_file, suffix=self.inputs.suffix,
+                                       newpath=runtime.cwd)
+            # Inputs of the same name, from different directories
+            if out_file in out_files:
+                out_file = fname_presuffix(
+                    in_file, suffix=f"{self.inputs.suffix}_{i}",
+                    newpath=runtime.cwd)
+            out_files.append(out_file)
+
+        self._results["out_files"] = regutils.apply_warps(
+            self.inputs.ref_file,
+            self.inputs.in_files,
+            out_files,
+            warp=self.inputs.warp,
+            xfm=self.inputs.xfm,
+            mask=self.inputs.mask,
+            interps=self.inputs.interps,
+            sup=self.inputs.sup,
+        )
+
+        return runtime
+
+
 class _TrackingInputSpec(BaseInterfaceInputSpec):
     """Input interface wrapper for Tracking"""
 
@@ -2709,7 +2715,10 @@ class Tracking(SimpleInterface):
             reconstruction,
             create_density_map,
             track_ensemble,
+            StreamlineAccumulator,
         )
+        from pynets.dmri.estimation import StreamlineConnectome, \
+            connectome_state_path
         from dipy.io.stateful_tractogram import Space, StatefulTractogram, \
             Origin
         from dipy.io.streamline import save_tractogram
@@ -2722,6 +2731,13 @@ class Tracking(SimpleInterface):
             use_life = hardcoded_params['tracking']["use_life"][0]
             roi_neighborhood_tol = hardcoded_params['tracking']["roi_neighborhood_tol"][0]
             sphere = hardcoded_params['tracking']["sphere"][0]
+            run_dsn = hardcoded_params['tracking']["DSN"][0]
+            fa_wei = hardcoded_params[
+                "StructuralNetworkWeighting"]["fa_weighting"][0]
+            overlap_thr = hardcoded_params[
+                "StructuralNetworkWeighting"]["overlap_thr"][0]
+            endpoints_only = hardcoded_params[
+                "StructuralNetworkWeighting"]["endpoints_only"][0]
 
         stream.close()
 
@@ -2950,6 +2966,32 @@ class Tracking(SimpleInterface):
 
         print(Style.RESET_ALL)
 
+        # Unless LiFE needs them all in memory, accepted streamlines are
+        # streamed to disk, while the density map and the structural
+        # connectome that streams2graph would estimate are accumulated. With
+        # DSN, streams2graph instead receives the MNI-normalized streamlines
+        # and atlas, so a native-space connectome would never be restored.
+        if use_life is True:
+            accumulator = None
+        else:
+            connectomes = {}
+            if self.inputs.error_margin is not None and \
+                    not isinstance(self.inputs.error_margin, list) and \
+                    run_dsn is not True:
+                atlas_img = nib.load(labels_im_file_tmp_path)
+                connectomes["streams2graph"] = StreamlineConnectome(
+                    np.around(np.asarray(atlas_img.dataobj)),
+                    self.inputs.error_margin,
+                    atlas_img.header.get_zooms(),
+                    fa_data=np.asarray(fa_img.dataobj, dtype=np.float32)
+                    if fa_wei is True else None,
+                    overlap_thr=overlap_thr,
+                    endpoints_only=endpoints_only)
+                del atlas_img
+            accumulator = StreamlineAccumulator(
+                f"{runtime.cwd}/streamlines_tmp.h5", reference=fa_img,
+                connectomes=connectomes)
+
         # Commence Ensemble Tractography
         streamlines = track_ensemble(
             self.inputs.target_samples,
@@ -2969,7 +3011,9 @@ class Tracking(SimpleInterface):
             t1w2dwi_tmp_path, gm_in_dwi_tmp_path,
             vent_csf_in_dwi_tmp_path, wm_in_dwi_tmp_path,
             self.inputs.tiss_class,
-            runtime.cwd
+            runtime.cwd,
+            accumulator=accumulator,
+            error_margin=self.inputs.error_margin
         )
 
         gc.collect()
@@ -3040,18 +3084,23 @@ class Tracking(SimpleInterface):
                                  'in the tractogram!')
             del dwi_data, mask_data
 
-        stf = StatefulTractogram(
-            streamlines,
-            fa_img,
-            origin=Origin.NIFTI,
-            space=Space.VOXMM)
-        stf.remove_invalid_streamlines()
-        save_tractogram(
-            stf,
-            streams,
-        )
+        if accumulator is None:
+            stf = StatefulTractogram(
+                streamlines,
+                fa_img,
+                origin=Origin.NIFTI,
+                space=Space.VOXMM)
+            stf.remove_invalid_streamlines()
+            save_tractogram(
+                stf,
+                streams,
+            )
 
-        del stf
+            del stf
+        else:
+            accumulator.save(streams, fa_img)
+            for connectome in accumulator.connectomes.values():
+                connectome.save(connectome_state_path(streams), streams)
 
         copyfile(
             streams,
@@ -3065,7 +3114,7 @@ class Tracking(SimpleInterface):
             [dir_path, dm_path] = create_density_map(
                 dwi_img,
                 dir_path,
-                streamlines,
+                streamlines if accumulator is None else None,
                 self.inputs.conn_model,
                 self.inputs.target_samples,
                 self.inputs.node_size,
@@ -3077,11 +3126,14 @@ class Tracking(SimpleInterface):
                 self.inputs.min_length,
                 self.inputs.error_margin,
                 namer_dir,
+                dm=None if accumulator is None else accumulator.density,
             )
         except BaseException:
             print('Density map failed. Check tractography output.')
             dm_path = None
 
+        if accumulator is not None:
+            accumulator.close(remove=True)
         del streamlines
         dwi_img.uncache()
         gc.collect()
@@ -3153,13 +3205,12 @@ class MakeGtabBmask(SimpleInterface):
 
     def _run_interface(self, runtime):
         import os
-        import time
         from dipy.io import save_pickle
         from dipy.io import read_bvals_bvecs
         from dipy.core.gradients import gradient_table
         from nipype.utils.filemanip import copyfile, fname_presuffix
         # from dipy.segment.mask import median_otsu
-        from pynets.registration.reg_utils import median
+        from pynets.registration.reg_utils import median, run_command
         from pynets.dmri.dmri_utils import normalize_gradients, extract_b0
 
         B0_bet = f"{runtime.cwd}/mean_B0_bet.nii.gz"
@@ -3250,8 +3301,7 @@ class MakeGtabBmask(SimpleInterface):
 
         # Get mean B0 brain mask
         cmd = f"bet {med_b0_file} {B0_bet} -m -f 0.2"
-        os.system(cmd)
-        time.sleep(2)
+        run_command(cmd)
 
         self._results["gtab_file"] = gtab_file
         self._results["B0_bet"] = B0_bet
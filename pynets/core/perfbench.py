@@ -0,0 +1,888 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 11:05:37 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import os
+import warnings
+import numpy as np
+import nibabel as nib
+
+warnings.filterwarnings("ignore")
+
+# Module-level memos that persist across calls within a process
+MEMOS = (
+    ("pynets.stats.communities", "_PARTITIONS"),
+    ("pynets.dmri.track", "_TRACKING_CONTEXT"),
+    ("pynets.core.utils", "_PRUNED_CACHES"),
+)
+
+# Problem sizes of the synthetic inputs
+SCALES = {
+    "small": {
+        "n_nodes": 60,
+        "vol_shape": (16, 16, 12),
+        "n_vols": 80,
+        "n_parcels": 20,
+        "dwi_shape": (20, 20, 12),
+        "n_dirs": 64,
+        "n_streamlines": 500,
+        "target_samples": 500,
+        "n_subjects": 8,
+    },
+    "medium": {
+        "n_nodes": 200,
+        "vol_shape": (32, 32, 24),
+        "n_vols": 150,
+        "n_parcels": 60,
+        "dwi_shape": (32, 32, 20),
+        "n_dirs": 64,
+        "n_streamlines": 5000,
+        "target_samples": 5000,
+        "n_subjects": 20,
+    },
+}
+
+# Topological metrics of the synthetic test-retest subject dictionary
+REPRODUCIBILITY_METRICS = ["global_efficiency",
+                           "average_shortest_path_length",
+                           "degree_assortativity_coefficient",
+                           "average_betweenness_centrality",
+                           "average_eigenvector_centrality",
+                           "smallworldness",
+                           "modularity"]
+
+
+def get_history_path():
+    """
+    Return the path to the benchmark history, a JSON-lines file residing in
+    ~/.pynets, unless the PYNETS_BENCHMARKS environment variable points
+    elsewhere.
+    """
+    history = os.environ.get(
+        "PYNETS_BENCHMARKS",
+        f"{os.path.expanduser('~')}/.pynets/benchmarks.jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(history)), exist_ok=True)
+    return history
+
+
+def _ellipsoid(shape):
+    grid = np.meshgrid(*[np.linspace(-1, 1, i) for i in shape],
+                       indexing="ij")
+    return np.sum([i ** 2 for i in grid], axis=0) <= 0.9
+
+
+def _voronoi_labels(mask, n_parcels, rng):
+    """
+    Divide a mask into contiguous parcels, labelled 1..n_parcels, around
+    random seed voxels.
+    """
+    from scipy.spatial import cKDTree
+
+    vox = np.argwhere(mask)
+    seeds = vox[rng.choice(len(vox), n_parcels, replace=False)]
+    labels = np.zeros(mask.shape, dtype="int16")
+    labels[tuple(vox.T)] = cKDTree(seeds).query(vox)[1] + 1
+    return labels
+
+
+def synthetic_connectome(n_nodes, n_vols=200, n_communities=4, seed=42):
+    """
+    Correlation matrix of a synthetic time-series with modular structure.
+
+    Parameters
+    ----------
+    n_nodes : int
+        Number of nodes.
+    n_vols : int
+        Number of time points of the underlying time-series.
+    n_communities : int
+        Number of latent communities.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    conn_matrix : NxN np.ndarray
+        Symmetric correlation matrix with a zero diagonal.
+
+    """
+    rng = np.random.RandomState(seed)
+    ts = synthetic_time_series(n_vols, n_nodes, n_communities, rng)
+    conn_matrix = np.corrcoef(ts.T)
+    np.fill_diagonal(conn_matrix, 0)
+    return conn_matrix
+
+
+def synthetic_time_series(n_vols, n_nodes, n_communities, rng):
+    """
+    Node time-series driven by autocorrelated community signals plus noise.
+    """
+    factors = rng.standard_normal((n_vols, n_communities))
+    for t in range(1, n_vols):
+        factors[t] += 0.5 * factors[t - 1]
+    membership = rng.randint(0, n_communities, n_nodes)
+    loadings = rng.uniform(0.5, 1, n_nodes)
+    return factors[:, membership] * loadings + \
+        rng.standard_normal((n_vols, n_nodes))
+
+
+def synthetic_bold(out_dir, vol_shape, n_vols, n_parcels, seed=42):
+    """
+    Write a small synthetic 4D BOLD image, with parcel-wise correlated
+    signal, a brain mask, and the parcellation that generated it.
+
+    Parameters
+    ----------
+    out_dir : str
+        Output directory.
+    vol_shape : tuple
+        Spatial dimensions of the image.
+    n_vols : int
+        Number of volumes.
+    n_parcels : int
+        Number of parcels.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    paths : dict
+        Dictionary with keys `func` (3mm, TR=2s BOLD image), `mask`, `atlas`,
+        `labels`, and `coords` (parcel centroids in mm).
+
+    """
+    rng = np.random.RandomState(seed)
+    affine = np.diag([3.0, 3.0, 3.0, 1.0])
+    mask = _ellipsoid(vol_shape)
+    atlas = _voronoi_labels(mask, n_parcels, rng)
+
+    parcel_ts = synthetic_time_series(n_vols, n_parcels,
+                                      max(n_parcels // 5, 2), rng)
+    data = np.zeros(vol_shape + (n_vols,), dtype="float32")
+    data[mask] = parcel_ts.T[atlas[mask] - 1] + 0.5 * rng.standard_normal(
+        (mask.sum(), n_vols))
+    data[mask] += 1000
+
+    func_img = nib.Nifti1Image(data, affine)
+    func_img.header.set_zooms((3.0, 3.0, 3.0, 2.0))
+    paths = {
+        "func": f"{out_dir}/sub-synth_task-rest_bold.nii.gz",
+        "mask": f"{out_dir}/sub-synth_desc-brain_mask.nii.gz",
+        "atlas": f"{out_dir}/synthetic_atlas.nii.gz",
+    }
+    nib.save(func_img, paths["func"])
+    nib.save(nib.Nifti1Image(mask.astype("uint8"), affine), paths["mask"])
+    nib.save(nib.Nifti1Image(atlas, affine), paths["atlas"])
+
+    paths["labels"] = list(range(1, n_parcels + 1))
+    paths["coords"] = [tuple(nib.affines.apply_affine(
+        affine, np.argwhere(atlas == i).mean(axis=0)))
+        for i in paths["labels"]]
+    return paths
+
+
+def synthetic_dwi(out_dir, dwi_shape, n_dirs, n_parcels, seed=42):
+    """
+    Write a toy 1mm diffusion dataset, in which a slab of white matter
+    oriented along x crosses an isotropic background, along with its
+    gradient table, tissue segmentations, FA map and parcellation.
+
+    Parameters
+    ----------
+    out_dir : str
+        Output directory.
+    dwi_shape : tuple
+        Spatial dimensions of the image.
+    n_dirs : int
+        Number of diffusion-weighted directions (b=1000). Two b0 volumes are
+        added.
+    n_parcels : int
+        Number of parcels.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    paths : dict
+        Dictionary with keys `dwi`, `gtab` (DiPy GradientTable), `bvals`,
+        `bvecs`, `B0_mask`, `wm`, `gm`, `csf`, `wm_gm_int`, `fa`, `atlas`,
+        `labels`, and `coords`.
+
+    """
+    from dipy.core.gradients import gradient_table
+    from dipy.core.sphere import disperse_charges, HemiSphere
+    from dipy.sims.voxel import single_tensor
+
+    rng = np.random.RandomState(seed)
+    affine = np.eye(4)
+
+    theta = np.pi * rng.rand(n_dirs)
+    phi = 2 * np.pi * rng.rand(n_dirs)
+    hemi, _ = disperse_charges(HemiSphere(theta=theta, phi=phi), 500)
+    bvals = np.r_[0, 0, 1000 * np.ones(n_dirs)]
+    bvecs = np.vstack([np.zeros((2, 3)), hemi.vertices])
+    gtab = gradient_table(bvals, bvecs)
+
+    mask = _ellipsoid(dwi_shape)
+    wm = np.zeros(dwi_shape, dtype=bool)
+    y0, z0 = dwi_shape[1] // 2, dwi_shape[2] // 2
+    wm[:, y0 - 3:y0 + 3, z0 - 2:z0 + 2] = True
+    wm &= mask
+    csf = np.zeros(dwi_shape, dtype=bool)
+    csf[dwi_shape[0] // 2 - 1:dwi_shape[0] // 2 + 1, 1:3, 1:3] = True
+    csf &= mask & ~wm
+    gm = mask & ~wm & ~csf
+
+    evals_wm = np.array([1.7e-3, 0.3e-3, 0.3e-3])
+    evals_iso = np.array([0.8e-3, 0.8e-3, 0.8e-3])
+    sig_wm = single_tensor(gtab, S0=100, evals=evals_wm,
+                           evecs=np.eye(3), snr=None)
+    sig_iso = single_tensor(gtab, S0=100, evals=evals_iso,
+                            evecs=np.eye(3), snr=None)
+    data = np.zeros(dwi_shape + (len(bvals),), dtype="float32")
+    data[mask] = sig_iso
+    data[wm] = sig_wm
+    data[mask] += rng.standard_normal((mask.sum(), len(bvals))) * 2
+    data = np.clip(data, 0, None)
+
+    fa_wm = np.sqrt(0.5) * np.linalg.norm(
+        evals_wm - evals_wm.mean()) / np.linalg.norm(evals_wm)
+    fa = np.where(wm, fa_wm, 0.05 * mask).astype("float32")
+
+    atlas = _voronoi_labels(mask, n_parcels, rng)
+
+    paths = {
+        "dwi": f"{out_dir}/sub-synth_dwi.nii.gz",
+        "bvals": f"{out_dir}/sub-synth_dwi.bval",
+        "bvecs": f"{out_dir}/sub-synth_dwi.bvec",
+        "B0_mask": f"{out_dir}/sub-synth_desc-brain_mask.nii.gz",
+        "wm": f"{out_dir}/sub-synth_label-WM_probseg.nii.gz",
+        "gm": f"{out_dir}/sub-synth_label-GM_probseg.nii.gz",
+        "csf": f"{out_dir}/sub-synth_label-CSF_probseg.nii.gz",
+        "wm_gm_int": f"{out_dir}/sub-synth_wmgm_int.nii.gz",
+        "fa": f"{out_dir}/sub-synth_FA.nii.gz",
+        "atlas": f"{out_dir}/synthetic_atlas_dwi.nii.gz",
+    }
+    nib.save(nib.Nifti1Image(data, affine), paths["dwi"])
+    np.savetxt(paths["bvals"], bvals[None], fmt="%d")
+    np.savetxt(paths["bvecs"], bvecs.T, fmt="%.6f")
+    for key, img in [("B0_mask", mask), ("wm", wm), ("gm", gm),
+                     ("csf", csf), ("wm_gm_int", wm)]:
+        nib.save(nib.Nifti1Image(img.astype("float32"), affine), paths[key])
+    nib.save(nib.Nifti1Image(fa, affine), paths["fa"])
+    nib.save(nib.Nifti1Image(atlas, affine), paths["atlas"])
+
+    paths["gtab"] = gtab
+    paths["labels"] = list(range(1, n_parcels + 1))
+    paths["coords"] = [tuple(np.argwhere(atlas == i).mean(axis=0))
+                       for i in paths["labels"]]
+    return paths
+
+
+def synthetic_streamlines(out_path, reference, atlas_path, n_streamlines,
+                          seed=42):
+    """
+    Write a tractogram of jittered straight streamlines between random pairs
+    of parcel centroids.
+
+    Parameters
+    ----------
+    out_path : str
+        Output .trk file path.
+    reference : str
+        File path to the Nifti1Image defining the space of the tractogram.
+    atlas_path : str
+        File path to the parcellation Nifti1Image.
+    n_streamlines : int
+        Number of streamlines.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    out_path : str
+        Output .trk file path.
+
+    """
+    from dipy.io.stateful_tractogram import Space, StatefulTractogram, \
+        Origin
+    from dipy.io.streamline import save_tractogram
+
+    rng = np.random.RandomState(seed)
+    atlas_img = nib.load(atlas_path)
+    atlas = np.asarray(atlas_img.dataobj)
+    zooms = np.array(atlas_img.header.get_zooms()[:3])
+    centroids = np.array([np.argwhere(atlas == i).mean(axis=0) for i in
+                          np.unique(atlas) if i != 0])
+
+    pairs = rng.randint(0, len(centroids), (n_streamlines, 2))
+    n_points = 20
+    steps = np.linspace(0, 1, n_points)[None, :, None]
+    streamlines = centroids[pairs[:, 0]][:, None] + steps * (
+        centroids[pairs[:, 1]] - centroids[pairs[:, 0]])[:, None]
+    streamlines = streamlines + rng.normal(0, 0.3, streamlines.shape)
+    streamlines = np.clip(streamlines, 0, np.array(atlas.shape) - 1) * zooms
+
+    sft = StatefulTractogram([i.astype("float32") for i in streamlines],
+                             nib.load(reference), Space.VOXMM,
+                             origin=Origin.NIFTI)
+    save_tractogram(sft, out_path, bbox_valid_check=False)
+    return out_path
+
+
+def synthetic_subject_dict(n_subjects, n_sessions, metrics, seed=42):
+    """
+    Nested subject dictionary of test-retest topological metric vectors, in
+    the format consumed by `pynets.stats.benchmarking`.
+
+    Parameters
+    ----------
+    n_subjects : int
+        Number of subjects.
+    n_sessions : int
+        Number of sessions per subject.
+    metrics : list
+        Names of the topological metrics.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    sub_dict : dict
+        Dictionary of the form sub_dict[ID][ses]['func']['topology'][grid].
+    comb : tuple
+        Functional hyperparameter combination of the grid.
+    ids : list
+        Subject identifiers.
+
+    """
+    rng = np.random.RandomState(seed)
+    comb = ("mean", "0", "corr", "200", "synthetic", "0")
+    extract, hpass, model, res, atlas, smooth = comb
+    grid = (atlas, extract, hpass, model, res, smooth)
+    ids = [f"{i:04d}" for i in range(n_subjects)]
+
+    sub_dict = {}
+    for ID in ids:
+        trait = rng.standard_normal((len(metrics), 1))
+        sub_dict[ID] = {}
+        for ses in range(1, n_sessions + 1):
+            sub_dict[ID][str(ses)] = {"func": {"topology": {
+                grid: trait + 0.5 * rng.standard_normal(trait.shape)}}}
+    return sub_dict, comb, ids
+
+
+class SyntheticData(object):
+    """
+    Lazily generated synthetic inputs, shared by all benchmarks of a run.
+    """
+
+    def __init__(self, work_dir, scale="small", seed=42):
+        self.work_dir = work_dir
+        self.scale = scale
+        self.params = SCALES[scale]
+        self.seed = seed
+        self._cache = {}
+
+    def _get(self, name, func):
+        if name not in self._cache:
+            out_dir = f"{self.work_dir}/{name}"
+            os.makedirs(out_dir, exist_ok=True)
+            self._cache[name] = func(out_dir)
+        return self._cache[name]
+
+    @property
+    def connectome(self):
+        return self._get("connectome", lambda out_dir: synthetic_connectome(
+            self.params["n_nodes"], seed=self.seed))
+
+    @property
+    def time_series(self):
+        return self._get("time_series", lambda out_dir: synthetic_time_series(
+            self.params["n_vols"], self.params["n_parcels"], 4,
+            np.random.RandomState(self.seed)))
+
+    @property
+    def bold(self):
+        return self._get("bold", lambda out_dir: synthetic_bold(
+            out_dir, self.params["vol_shape"], self.params["n_vols"],
+            self.params["n_parcels"], self.seed))
+
+    @property
+    def dwi(self):
+        return self._get("dwi", lambda out_dir: synthetic_dwi(
+            out_dir, self.params["dwi_shape"], self.params["n_dirs"],
+            self.params["n_parcels"], self.seed))
+
+    @property
+    def recon(self):
+        def _recon(out_dir):
+            import h5py
+            from pynets.dmri.estimation import csa_mod_est
+
+            dwi = self.dwi
+            mod_fit, _ = csa_mod_est(dwi["gtab"],
+                                     np.asarray(nib.load(dwi["dwi"]).dataobj),
+                                     dwi["B0_mask"])
+            recon_path = f"{out_dir}/model_file.hdf5"
+            with h5py.File(recon_path, "w") as hf:
+                hf.create_dataset("reconstruction",
+                                  data=mod_fit.astype("float32"))
+            return recon_path
+
+        return self._get("recon", _recon)
+
+    @property
+    def streams(self):
+        return self._get("streams", lambda out_dir: synthetic_streamlines(
+            f"{out_dir}/streamlines_synthetic.trk", self.dwi["fa"],
+            self.dwi["atlas"], self.params["n_streamlines"], self.seed))
+
+    @property
+    def subject_dict(self):
+        return self._get("subject_dict", lambda out_dir: synthetic_subject_dict(
+            self.params["n_subjects"], len(REPRODUCIBILITY_METRICS),
+            REPRODUCIBILITY_METRICS, self.seed))
+
+
+def _bench_extractnetstats(data):
+    from pynets.core.utils import save_mat
+    from pynets.stats.netstats import extractnetstats
+
+    graph_dir = f"{data.work_dir}/extractnetstats/graphs"
+    os.makedirs(graph_dir, exist_ok=True)
+    est_path = f"{graph_dir}/rawgraph_sub-synth_modality-func_model-corr_" \
+               f"nodetype-parc_thrtype-PROP_thr-1.0.npy"
+    save_mat(np.abs(data.connectome), est_path, fmt="npy")
+
+    return lambda: extractnetstats("synth", None, 1.0, "corr", est_path,
+                                   None, 1, 1, False)
+
+
+def _bench_perform_thresholding(method):
+    def _setup(data):
+        from pynets.core.thresholding import perform_thresholding
+
+        flags = {"prop": (False, False, False), "dens": (False, True, False),
+                 "mst": (True, False, False), "disp": (False, False, True)}
+        min_span_tree, dens_thresh, disp_filt = flags[method]
+        conn_matrix = np.abs(data.connectome)
+        thr = 0.2 if method == "dens" else 0.5
+        return lambda: perform_thresholding(conn_matrix.copy(), thr,
+                                            min_span_tree, dens_thresh,
+                                            disp_filt)
+    return _setup
+
+
+def _bench_get_conn_matrix(conn_model):
+    def _setup(data):
+        from pynets.fmri.estimation import get_conn_matrix
+
+        time_series = data.time_series
+        labels = list(range(1, time_series.shape[1] + 1))
+        coords = [(0, 0, 0)] * len(labels)
+        dir_path = f"{data.work_dir}/get_conn_matrix"
+        os.makedirs(dir_path, exist_ok=True)
+        return lambda: get_conn_matrix(
+            time_series, conn_model, dir_path, None, 0, False, None, "synth",
+            None, False, False, True, 1, "synthetic", None, labels, coords,
+            1, False, 0, "mean")
+    return _setup
+
+
+def _bench_extract_ts_parc(data):
+    from pynets.fmri.estimation import TimeseriesExtraction
+
+    bold = data.bold
+    dir_path = f"{data.work_dir}/extract_ts_parc"
+    os.makedirs(dir_path, exist_ok=True)
+
+    def _run():
+        te = TimeseriesExtraction(
+            net_parcels_nii_path=bold["atlas"], node_size=None, conf=None,
+            func_file=bold["func"], roi=None, dir_path=dir_path, ID="synth",
+            network=None, smooth=0, hpass=None, mask=bold["mask"],
+            extract_strategy="mean")
+        te.prepare_inputs()
+        te.extract_ts_parc()
+        return te.ts_within_nodes
+    return _run
+
+
+def _bench_extract_ts_multi(data):
+    from pynets.fmri.estimation import TimeseriesExtraction
+
+    bold = data.bold
+    dir_path = f"{data.work_dir}/extract_ts_multi"
+    os.makedirs(dir_path, exist_ok=True)
+
+    # A small multiverse of coarser parcellations of the synthetic atlas
+    atlas_img = nib.load(bold["atlas"])
+    atlas = np.asarray(atlas_img.dataobj)
+    atlases = []
+    for i, n_merge in enumerate([1, 2, 3, 4]):
+        atlases.append(f"{dir_path}/atlas_{i}.nii.gz")
+        nib.save(nib.Nifti1Image(
+            np.ceil(atlas / n_merge).astype("int16"), atlas_img.affine),
+            atlases[-1])
+
+    def _run():
+        te = TimeseriesExtraction(
+            net_parcels_nii_path=atlases, node_size=None, conf=None,
+            func_file=bold["func"], roi=None, dir_path=dir_path, ID="synth",
+            network=None, smooth=0, hpass=None, mask=bold["mask"],
+            extract_strategy="mean")
+        te.prepare_inputs()
+        te.extract_ts_parc()
+        return te.ts_within_nodes
+    return _run
+
+
+def _bench_parcellate(clust_type):
+    def _setup(data):
+        from pynets.fmri.clustools import parcellate, \
+            make_local_connectivity_tcorr
+
+        bold = data.bold
+        func_img = nib.load(bold["func"])
+        mask_img = nib.load(bold["mask"])
+        k = max(data.params["n_parcels"] // 2, 2)
+        dir_path = f"{data.work_dir}/parcellate"
+        os.makedirs(dir_path, exist_ok=True)
+        if clust_type == "ncut":
+            local_corr = "tcorr"
+            local_conn = make_local_connectivity_tcorr(func_img, mask_img,
+                                                       0.5)
+        else:
+            local_corr = "allcorr"
+            local_conn = None
+        return lambda: parcellate(func_img, local_corr, clust_type, None, 1,
+                                  mask_img, True, True, k, local_conn, None,
+                                  dir_path, None)
+    return _setup
+
+
+def _bench_bootstrap_parcellate(data):
+    from nilearn.masking import apply_mask
+    from pynets.fmri.clustools import bootstrap_parcellate
+
+    bold = data.bold
+    mask_img = nib.load(bold["mask"])
+    ts_data = apply_mask(nib.load(bold["func"]), mask_img)
+    k = max(data.params["n_parcels"] // 2, 2)
+    block_size = int(np.sqrt(ts_data.shape[0]))
+
+    return lambda: bootstrap_parcellate(ts_data, mask_img, k, "kmeans",
+                                        block_size, 4,
+                                        temp_folder=data.work_dir)
+
+
+def _bench_track_ensemble(data):
+    from dipy.data import get_sphere
+    from pynets.dmri.track import track_ensemble
+
+    dwi = data.dwi
+    recon_path = data.recon
+    sphere = get_sphere("repulsion724")
+    cache_dir = f"{data.work_dir}/track_ensemble"
+    os.makedirs(cache_dir, exist_ok=True)
+
+    return lambda: track_ensemble(
+        data.params["target_samples"], dwi["wm_gm_int"], dwi["atlas"],
+        recon_path, sphere, "det", [40, 30], [0.2, 0.5], "local", 2, 6, 5,
+        None, dwi["B0_mask"], dwi["B0_mask"], dwi["gm"], dwi["csf"],
+        dwi["wm"], "wm", cache_dir)
+
+
+def _bench_streams2graph(data):
+    from pynets.dmri.estimation import streams2graph
+
+    dwi = data.dwi
+    streams = data.streams
+    dir_path = f"{data.work_dir}/streams2graph"
+    os.makedirs(dir_path, exist_ok=True)
+
+    return lambda: streams2graph(
+        dwi["atlas"], streams, dir_path, "local", data.params["n_streamlines"],
+        "csa", None, None, False, "synth", None, False, False, True, 1,
+        "synthetic", dwi["atlas"], list(dwi["labels"]), list(dwi["coords"]),
+        1, False, "det", dwi["fa"], 5, 2)
+
+
+def _bench_benchmark_reproducibility(data):
+    import pandas as pd
+    from pynets.stats import benchmarking
+
+    sub_dict, comb, ids = data.subject_dict
+    missingness = pd.DataFrame(columns=["id", "modality", "alg", "grid"])
+
+    # benchmark_reproducibility reads these from its module namespace
+    benchmarking.ids = ids
+    benchmarking.mets = REPRODUCIBILITY_METRICS
+    benchmarking.icc = False
+
+    return lambda: benchmarking.benchmark_reproducibility(
+        comb, "func", "topology", sub_dict, True, False, missingness)
+
+
+# Benchmark name -> setup function, which prepares the synthetic inputs
+# (untimed) and returns the zero-argument callable to be timed
+BENCHMARKS = {
+    "extractnetstats": _bench_extractnetstats,
+    "perform_thresholding:prop": _bench_perform_thresholding("prop"),
+    "perform_thresholding:dens": _bench_perform_thresholding("dens"),
+    "perform_thresholding:mst": _bench_perform_thresholding("mst"),
+    "perform_thresholding:disp": _bench_perform_thresholding("disp"),
+    "get_conn_matrix:corr": _bench_get_conn_matrix("corr"),
+    "get_conn_matrix:partcorr": _bench_get_conn_matrix("partcorr"),
+    "get_conn_matrix:cov": _bench_get_conn_matrix("cov"),
+    "get_conn_matrix:sps": _bench_get_conn_matrix("sps"),
+    "extract_ts_parc": _bench_extract_ts_parc,
+    "extract_ts_parc:multi": _bench_extract_ts_multi,
+    "parcellate:kmeans": _bench_parcellate("kmeans"),
+    "parcellate:ncut": _bench_parcellate("ncut"),
+    "bootstrap_parcellate:kmeans": _bench_bootstrap_parcellate,
+    "track_ensemble": _bench_track_ensemble,
+    "streams2graph": _bench_streams2graph,
+    "benchmark_reproducibility": _bench_benchmark_reproducibility,
+}
+
+
+def _reset_caches(cache_dir):
+    """
+    Point the PyNets on-disk caches at an empty directory and clear
+    in-process memos, so that every timed call starts cold.
+    """
+    import importlib
+
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ["PYNETS_CACHE"] = cache_dir
+    for module, name in MEMOS:
+        getattr(importlib.import_module(module), name).clear()
+
+
+def _time_calls(func, number, cache_root):
+    """
+    Mean duration of `number` calls of a benchmark, each with cold caches.
+    """
+    import time
+    import uuid
+
+    elapsed = 0.0
+    for _ in range(number):
+        _reset_caches(f"{cache_root}/{uuid.uuid4().hex}")
+        start = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - start
+    return elapsed / number
+
+
+def read_history(history=None):
+    """
+    Read the benchmark history.
+
+    Parameters
+    ----------
+    history : str
+        Path to the history file. Default is `get_history_path()`.
+
+    Returns
+    -------
+    records : list
+        List of dictionaries, one per timed benchmark, oldest first.
+
+    """
+    import json
+
+    if history is None:
+        history = get_history_path()
+    if not os.path.isfile(history):
+        return []
+    records = []
+    with open(history, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def append_history(records, history=None):
+    """
+    Append timed benchmarks to the history.
+
+    Parameters
+    ----------
+    records : list
+        List of dictionaries, as returned by `run_benchmarks`.
+    history : str
+        Path to the history file. Default is `get_history_path()`.
+
+    """
+    import json
+
+    if history is None:
+        history = get_history_path()
+    with open(history, "a") as f:
+        for record in records:
+            f.write(f"{json.dumps(record, sort_keys=True)}\n")
+
+
+def baseline_seconds(records, name, scale, host, window=5):
+    """
+    Median of the most recent successful timings of a benchmark at a given
+    scale on a given host, or None if there are none.
+    """
+    times = [i["seconds"] for i in records if i.get("name") == name and
+             i.get("scale") == scale and i.get("host") == host and
+             i.get("status") == "ok"]
+    if len(times) == 0:
+        return None
+    return float(np.median(times[-window:]))
+
+
+def run_benchmarks(names=None, scale="small", repeat=3, history=None,
+                   max_ratio=1.25, window=5, record=True, work_dir=None,
+                   seed=42, min_time=0.2, verbose=False):
+    """
+    Time the PyNets hot paths on synthetic inputs, and compare each timing
+    against the recent history of the same benchmark on the same host.
+
+    Parameters
+    ----------
+    names : list
+        Names of the benchmarks to run (see `BENCHMARKS`). Default is all.
+    scale : str
+        Problem size of the synthetic inputs (see `SCALES`).
+    repeat : int
+        Number of timed calls per benchmark, of which the fastest is kept.
+    history : str
+        Path to the history file. Default is `get_history_path()`.
+    max_ratio : float
+        Ratio of a timing to its historical baseline above which a
+        benchmark is considered to have regressed.
+    window : int
+        Number of most recent timings forming the baseline.
+    record : bool
+        Whether to append the timings to the history.
+    work_dir : str
+        Directory for the synthetic inputs and outputs. Default is a
+        temporary directory, removed afterwards.
+    seed : int
+        Random seed of the synthetic inputs.
+    min_time : float
+        Minimum duration, in seconds, of a timed sample. Faster benchmarks
+        are called repeatedly within each sample and timed per call.
+    verbose : bool
+        If False, the output of the benchmarked functions is silenced.
+
+    Returns
+    -------
+    results : list
+        List of dictionaries with the benchmark `name`, `scale`, `status`
+        (ok, regressed, or error), `seconds` (fastest call), `number`
+        (calls per timed sample), `baseline`, `ratio`, and `error`.
+
+    """
+    import io
+    import sys
+    import shutil
+    import socket
+    import tempfile
+    import platform
+    import contextlib
+    from datetime import datetime
+    from pynets.__about__ import __version__
+
+    if names is None:
+        names = list(BENCHMARKS.keys())
+    unknown = [i for i in names if i not in BENCHMARKS]
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(unknown)}")
+    if scale not in SCALES:
+        raise ValueError(f"Scale {scale} not recognized!")
+
+    cleanup = work_dir is None
+    if cleanup:
+        work_dir = tempfile.mkdtemp(prefix="pynets_benchmark_")
+    past = read_history(history)
+    host = socket.gethostname()
+    data = SyntheticData(f"{work_dir}/inputs", scale, seed)
+    cache_env = os.environ.get("PYNETS_CACHE")
+
+    results = []
+    try:
+        for name in names:
+            result = {"name": name, "scale": scale, "host": host,
+                      "version": __version__,
+                      "python": platform.python_version(),
+                      "timestamp": datetime.now().isoformat(),
+                      "repeat": int(repeat), "status": "ok",
+                      "seconds": None, "number": None, "baseline": None,
+                      "ratio": None, "error": None}
+            sink = sys.stdout if verbose else io.StringIO()
+            try:
+                with contextlib.redirect_stdout(sink):
+                    func = BENCHMARKS[name](data)
+
+                    # Calls shorter than min_time are looped, so that every
+                    # timed sample is long enough to be measured reliably
+                    cache_root = f"{work_dir}/cache/{name}"
+                    elapsed = _time_calls(func, 1, cache_root)
+                    number = int(np.clip(np.ceil(
+                        min_time / max(elapsed, 1e-6)), 1, 1000))
+                    times = [elapsed]
+                    if number > 1:
+                        times = []
+                    for i in range(int(repeat) - len(times)):
+                        times.append(_time_calls(func, number, cache_root))
+                result["seconds"] = float(min(times))
+                result["number"] = number
+            except BaseException as e:
+                if isinstance(e, KeyboardInterrupt):
+                    raise
+                result["status"] = "error"
+                result["error"] = f"{type(e).__name__}: {e}"
+
+            if result["status"] == "ok":
+                baseline = baseline_seconds(past, name, scale, host, window)
+                if baseline is not None and baseline > 0:
+                    result["baseline"] = baseline
+                    result["ratio"] = result["seconds"] / baseline
+                    if result["ratio"] > max_ratio:
+                        result["status"] = "regressed"
+            results.append(result)
+            print(format_result(result))
+    finally:
+        if cache_env is None:
+            os.environ.pop("PYNETS_CACHE", None)
+        else:
+            os.environ["PYNETS_CACHE"] = cache_env
+        if cleanup:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if record is True:
+        append_history([i for i in results if i["status"] != "error"],
+                       history)
+    return results
+
+
+def format_result(result):
+    """
+    One-line summary of a benchmark result.
+    """
+    if result["status"] == "error":
+        return f"{result['name']:<32} ERROR    {result['error']}"
+    line = f"{result['name']:<32} {result['seconds']:>9.3f}s"
+    if result["baseline"] is not None:
+        line = f"{line}  (baseline {result['baseline']:.3f}s, " \
+               f"x{result['ratio']:.2f})"
+    if result["status"] == "regressed":
+        line = f"{line}  REGRESSED"
+    return line
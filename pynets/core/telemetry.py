@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 16:21:45 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import os
+import sqlite3
+import warnings
+import numpy as np
+
+warnings.filterwarnings("ignore")
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS node_runs (
+    run_id TEXT,
+    version TEXT,
+    host TEXT,
+    node TEXT,
+    fullname TEXT,
+    status TEXT,
+    start REAL,
+    finish REAL,
+    wall_s REAL,
+    cpu_s REAL,
+    cpu_percent REAL,
+    peak_rss_gb REAL,
+    input_bytes INTEGER,
+    output_bytes INTEGER,
+    n_items INTEGER,
+    n_procs INTEGER,
+    mem_gb REAL
+)
+"""
+
+LEDGER_COLUMNS = ["run_id", "version", "host", "node", "fullname", "status",
+                  "start", "finish", "wall_s", "cpu_s", "cpu_percent",
+                  "peak_rss_gb", "input_bytes", "output_bytes", "n_items",
+                  "n_procs", "mem_gb"]
+
+# Columns renamed since the ledger was introduced, old name -> new name
+LEDGER_RENAMES = {"bytes_read": "input_bytes", "bytes_written": "output_bytes"}
+
+
+def get_ledger_path():
+    """
+    Return the path to the telemetry ledger, a sqlite database residing in
+    ~/.pynets, unless the PYNETS_TELEMETRY environment variable points
+    elsewhere.
+    """
+    ledger = os.environ.get(
+        "PYNETS_TELEMETRY",
+        f"{os.path.expanduser('~')}/.pynets/telemetry.sqlite")
+    os.makedirs(os.path.dirname(os.path.abspath(ledger)), exist_ok=True)
+    return ledger
+
+
+def _connect(ledger):
+    con = sqlite3.connect(ledger, timeout=60)
+    con.execute(LEDGER_SCHEMA)
+    columns = [i[1] for i in con.execute("PRAGMA table_info(node_runs)")]
+    for old, new in LEDGER_RENAMES.items():
+        if old in columns and new not in columns:
+            con.execute(f"ALTER TABLE node_runs RENAME COLUMN {old} TO {new}")
+    return con
+
+
+def _to_epoch(stamp):
+    from datetime import datetime
+
+    if stamp is None:
+        return None
+    if isinstance(stamp, (int, float)):
+        return float(stamp)
+    try:
+        return datetime.fromisoformat(str(stamp)).timestamp()
+    except ValueError:
+        return None
+
+
+def _file_bytes(value, seen):
+    """
+    Total size of the existing files referenced by a (nested) trait value,
+    each counted once.
+    """
+    if isinstance(value, dict):
+        return sum(_file_bytes(i, seen) for i in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_file_bytes(i, seen) for i in value)
+    if isinstance(value, str) and value not in seen and \
+            os.path.isfile(value):
+        seen.add(value)
+        return os.path.getsize(value)
+    return 0
+
+
+def _runtime_usage(runtime):
+    """
+    Wall time, CPU time, peak CPU load and peak RSS of a nipype runtime. CPU
+    time is integrated over the resource monitor's samples where available,
+    and otherwise bounded by the peak load over the wall time.
+    """
+    wall = getattr(runtime, "duration", None)
+    cpu_percent = getattr(runtime, "cpu_percent", None)
+    peak_rss = getattr(runtime, "mem_peak_gb", None)
+    prof = getattr(runtime, "prof_dict", None)
+    if prof and len(prof.get("time", [])) > 1:
+        cpu_s = float(np.trapz(np.asarray(prof["cpus"]) / 100,
+                               np.asarray(prof["time"])))
+    elif cpu_percent is not None and wall is not None:
+        cpu_s = cpu_percent / 100 * wall
+    else:
+        cpu_s = None
+    return wall, cpu_s, cpu_percent, peak_rss
+
+
+def node_record(node, status="end", run_id=None):
+    """
+    Summarize the resources used by an executed nipype node. MapNodes are
+    summarized over all of their subnodes.
+
+    Parameters
+    ----------
+    node : nipype.pipeline.engine.Node
+        Executed node (including expanded iterables, JoinNodes and MapNodes).
+    status : str
+        Status reported by the nipype plugin (`end` or `exception`).
+    run_id : str
+        Identifier of the workflow run.
+
+    Returns
+    -------
+    record : dict
+        Row of the telemetry ledger (see `LEDGER_COLUMNS`). Resources that
+        were not measured are None. `input_bytes` and `output_bytes` are the
+        total sizes of the files referenced by the node's inputs and
+        outputs, not measured I/O.
+
+    """
+    import socket
+    from pynets.__about__ import __version__
+
+    record = dict.fromkeys(LEDGER_COLUMNS)
+    record.update(run_id=run_id, version=__version__,
+                  host=socket.gethostname(), node=node.name,
+                  fullname=getattr(node, "fullname", node.name),
+                  status=status, n_procs=getattr(node, "n_procs", None),
+                  mem_gb=getattr(node, "mem_gb", None))
+
+    try:
+        result = node.result
+    except Exception:
+        result = None
+    if result is None:
+        return record
+
+    runtimes = result.runtime
+    if not isinstance(runtimes, list):
+        runtimes = [runtimes]
+    runtimes = [i for i in runtimes if i is not None]
+    usage = np.array([[np.nan if j is None else j for j in
+                       _runtime_usage(i)] for i in runtimes],
+                     dtype="float64").reshape(-1, 4)
+
+    def _agg(func, vals):
+        vals = vals[~np.isnan(vals)]
+        return float(func(vals)) if len(vals) > 0 else None
+
+    starts = [_to_epoch(getattr(i, "startTime", None)) for i in runtimes]
+    finishes = [_to_epoch(getattr(i, "endTime", None)) for i in runtimes]
+    record.update(
+        start=min([i for i in starts if i is not None], default=None),
+        finish=max([i for i in finishes if i is not None], default=None),
+        wall_s=_agg(np.sum, usage[:, 0]),
+        cpu_s=_agg(np.sum, usage[:, 1]),
+        cpu_percent=_agg(np.max, usage[:, 2]),
+        peak_rss_gb=_agg(np.max, usage[:, 3]),
+        n_items=len(runtimes),
+    )
+
+    # Outputs that merely pass inputs through are not counted as written
+    seen = set()
+    try:
+        inputs = node.inputs.get_traitsfree()
+    except Exception:
+        inputs = {}
+    record["input_bytes"] = _file_bytes(inputs, seen)
+    # MapNodes collate the outputs of their subnodes into a Bunch
+    try:
+        if hasattr(result.outputs, "get_traitsfree"):
+            outputs = result.outputs.get_traitsfree()
+        elif result.outputs is not None:
+            outputs = dict(result.outputs.items())
+        else:
+            outputs = {}
+    except Exception:
+        outputs = {}
+    record["output_bytes"] = _file_bytes(outputs, seen)
+    return record
+
+
+def write_records(records, ledger=None):
+    """
+    Append records to the telemetry ledger.
+
+    Parameters
+    ----------
+    records : list
+        List of dictionaries with keys among `LEDGER_COLUMNS`.
+    ledger : str
+        Path to the sqlite ledger. Default is `get_ledger_path()`.
+
+    """
+    if ledger is None:
+        ledger = get_ledger_path()
+    con = _connect(ledger)
+    with con:
+        con.executemany(
+            f"INSERT INTO node_runs ({', '.join(LEDGER_COLUMNS)}) VALUES "
+            f"({', '.join(['?'] * len(LEDGER_COLUMNS))})",
+            [[i.get(col) for col in LEDGER_COLUMNS] for i in records])
+    con.close()
+
+
+def read_ledger(ledger=None, run_id=None, version=None):
+    """
+    Read the telemetry ledger into a dataframe.
+
+    Parameters
+    ----------
+    ledger : str
+        Path to the sqlite ledger. Default is `get_ledger_path()`.
+    run_id : str
+        If given, only the records of this run are returned.
+    version : str
+        If given, only the records of this PyNets version are returned.
+
+    Returns
+    -------
+    df : DataFrame
+        One row per executed node.
+
+    """
+    import pandas as pd
+
+    if ledger is None:
+        ledger = get_ledger_path()
+    clauses = []
+    params = []
+    if run_id is not None:
+        clauses.append("run_id = ?")
+        params.append(run_id)
+    if version is not None:
+        clauses.append("version = ?")
+        params.append(version)
+    query = "SELECT * FROM node_runs"
+    if clauses:
+        query = f"{query} WHERE {' AND '.join(clauses)}"
+    con = _connect(ledger)
+    df = pd.read_sql_query(query, con, params=params)
+    con.close()
+    return df
+
+
+class TelemetryCallback(object):
+    """
+    Nipype `status_callback` that records the wall time, CPU time, peak RSS
+    and input and output file sizes of every executed node to the telemetry
+    ledger. CPU time and peak RSS are only measured when the nipype
+    resource monitor is enabled.
+
+    Parameters
+    ----------
+    run_id : str
+        Identifier of the workflow run. Default is a random UUID.
+    ledger : str
+        Path to the sqlite ledger. Default is `get_ledger_path()`.
+    chain : callable
+        Another status callback (e.g. `nipype.utils.profiler.log_nodes_cb`)
+        to be called as well.
+
+    Examples
+    --------
+    >>> from nipype import config
+    >>> config.enable_resource_monitor()
+    >>> wf.run(plugin="MultiProc", plugin_args={
+    ...     "status_callback": TelemetryCallback()})
+
+    """
+
+    def __init__(self, run_id=None, ledger=None, chain=None):
+        import uuid
+
+        self.run_id = run_id if run_id is not None else str(uuid.uuid4())
+        self.ledger = ledger if ledger is not None else get_ledger_path()
+        self.chain = chain
+
+    def __call__(self, node, status):
+        if self.chain is not None:
+            self.chain(node, status)
+        if status == "start":
+            return
+        try:
+            write_records([node_record(node, status, self.run_id)],
+                          self.ledger)
+        except Exception as e:
+            print(f"Failed to record telemetry for {node.name}: {e}")
+
+
+def _round_up(x, step):
+    return float(np.ceil(x / step) * step)
+
+
+def suggest_runtime_dict(ledger=None, version=None, quantile=0.95,
+                         headroom=1.2, min_runs=3, mem_step=0.25):
+    """
+    Suggest `resource_dict` settings (threads, memory in GB) for each node
+    from the resources it used in past runs.
+
+    Parameters
+    ----------
+    ledger : str
+        Path to the sqlite ledger. Default is `get_ledger_path()`.
+    version : str
+        If given, only runs of this PyNets version are considered.
+    quantile : float
+        Quantile of the observed usage to provision for.
+    headroom : float
+        Multiplicative safety margin on memory.
+    min_runs : int
+        Minimum number of measured runs of a node for it to be sized.
+    mem_step : float
+        Memory suggestions are rounded up to multiples of this many GB.
+
+    Returns
+    -------
+    runtime_dict : dict
+        Dictionary mapping node names to (n_procs, mem_gb) tuples, in the
+        format of the `resource_dict` of runconfig.yaml.
+
+    """
+    df = read_ledger(ledger, version=version)
+    df = df[(df["status"] == "end") & df["peak_rss_gb"].notnull() &
+            df["cpu_percent"].notnull()]
+
+    runtime_dict = {}
+    for node, runs in df.groupby("node"):
+        if len(runs) < min_runs:
+            continue
+        threads = max(int(np.ceil(
+            np.quantile(runs["cpu_percent"], quantile) / 100)), 1)
+        mem_gb = max(_round_up(np.quantile(runs["peak_rss_gb"], quantile) *
+                               headroom, mem_step), mem_step)
+        runtime_dict[node] = (threads, mem_gb)
+    return runtime_dict
+
+
+def suggest_procmem(ledger=None, run_id=None, headroom=1.2):
+    """
+    Suggest the `-pm` (threads, memory in GB) of the MultiProc pool from the
+    peak concurrent usage of past runs.
+
+    Parameters
+    ----------
+    ledger : str
+        Path to the sqlite ledger. Default is `get_ledger_path()`.
+    run_id : str
+        If given, only this run is considered. Otherwise, the busiest of all
+        recorded runs is provisioned for.
+    headroom : float
+        Multiplicative safety margin on memory.
+
+    Returns
+    -------
+    procmem : list
+        Suggested number of threads and GB of memory.
+
+    """
+    df = read_ledger(ledger, run_id=run_id)
+    df = df[df["start"].notnull() & df["finish"].notnull()]
+
+    peak_threads = 1.0
+    peak_mem = 0.0
+    for _, runs in df.groupby("run_id"):
+        threads = (runs["cpu_percent"].fillna(100) / 100).clip(lower=1)
+        mem = runs["peak_rss_gb"].fillna(runs["mem_gb"]).fillna(0)
+
+        # Sweep over node starts and finishes, finishes first on ties
+        times = np.concatenate([runs["start"], runs["finish"]])
+        order = np.lexsort((np.r_[np.ones(len(runs)), np.zeros(len(runs))],
+                            times))
+        sign = np.r_[np.ones(len(runs)), -np.ones(len(runs))][order]
+        peak_threads = max(peak_threads, np.max(np.cumsum(
+            sign * np.tile(threads.values, 2)[order])))
+        peak_mem = max(peak_mem, np.max(np.cumsum(
+            sign * np.tile(mem.values, 2)[order])))
+
+    return [int(np.ceil(peak_threads - 1e-9)),
+            int(np.ceil(peak_mem * headroom))]
+
+
+def compare_versions(baseline, candidate, ledger=None, tolerance=1.1,
+                     min_runs=3):
+    """
+    Flag nodes that have slowed down, or grown in memory, between two
+    PyNets versions.
+
+    Parameters
+    ----------
+    baseline : str
+        Reference PyNets version.
+    candidate : str
+        PyNets version to compare against the reference.
+    ledger : str
+        Path to the sqlite ledger. Default is `get_ledger_path()`.
+    tolerance : float
+        Ratio of the candidate's to the baseline's median wall time or peak
+        RSS above which a node is flagged.
+    min_runs : int
+        Minimum number of runs of a node in each version for it to be
+        compared.
+
+    Returns
+    -------
+    df : DataFrame
+        Median wall time and peak RSS of each node in both versions, their
+        ratios, and whether the node regressed.
+
+    """
+    import pandas as pd
+
+    medians = []
+    for version in [baseline, candidate]:
+        df = read_ledger(ledger, version=version)
+        df = df[df["status"] == "end"]
+        grouped = df.groupby("node")
+        med = grouped[["wall_s", "peak_rss_gb"]].median()
+        med = med[grouped.size() >= min_runs]
+        medians.append(med)
+
+    df = pd.concat(medians, axis=1, join="inner",
+                   keys=["baseline", "candidate"])
+    df.columns = [f"{i}_{j}" for i, j in df.columns]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["wall_ratio"] = df["candidate_wall_s"] / df["baseline_wall_s"]
+        df["rss_ratio"] = df["candidate_peak_rss_gb"] / \
+            df["baseline_peak_rss_gb"]
+    df["regressed"] = (df["wall_ratio"] > tolerance) | \
+        (df["rss_ratio"] > tolerance)
+    return df.sort_values("wall_ratio", ascending=False)
@@ -47,6 +47,45 @@ def threshold_absolute(W, thr, copy=True):
     return W
 
 
+def rank_edges(W):
+    """
+    Rank the edges of a connectivity matrix by descending weight. This is the
+    shared sorting kernel of proportional and density thresholding: edges
+    are sorted once, after which any number of cuts can be taken by
+    indexing.
+
+    Parameters
+    ----------
+    W : np.ndarray
+        weighted connectivity matrix. The main diagonal is ignored.
+
+    Returns
+    -------
+    rows : np.ndarray
+        Row indices of the nonzero edges, strongest first.
+    cols : np.ndarray
+        Column indices of the nonzero edges, strongest first.
+    weights : np.ndarray
+        Edge weights, in descending order.
+    ud : int
+        2 if W is symmetric, in which case only the upper triangle is
+        ranked, and 1 otherwise.
+
+    """
+    W = np.asarray(W)
+    n = len(W)
+    if np.allclose(W, W.T):
+        mask = np.triu(W, 1) != 0
+        ud = 2
+    else:
+        mask = W != 0
+        mask[np.diag_indices(n)] = False
+        ud = 1
+    ind = np.where(mask)
+    I = np.argsort(W[ind])[::-1]
+    return ind[0][I], ind[1][I], W[ind][I], ud
+
+
 def threshold_proportional(W, p, copy=True):
     """
     This function "thresholds" the connectivity matrix by preserving a
@@ -101,15 +140,11 @@ def threshold_proportional(W, p, copy=True):
         W = W.copy()
     n = len(W)
     np.fill_diagonal(W, 0)
-    if np.allclose(W, W.T):
-        W[np.tril_indices(n)] = 0
-        ud = 2
-    else:
-        ud = 1
-    ind = np.where(W)
-    I = np.argsort(W[ind])[::-1]
+    rows, cols, _, ud = rank_edges(W)
     en = int(round((n * n - n) * p / ud))
-    W[(ind[0][I][en:], ind[1][I][en:])] = 0
+    if ud == 2:
+        W[np.tril_indices(n)] = 0
+    W[(rows[en:], cols[en:])] = 0
     if ud == 2:
         W[:, :] = W + W.T
     return W
@@ -163,9 +198,70 @@ def standardize(W):
     return W
 
 
+def density_cuts(conn_matrix, thrs, max_iters=10000, interval=0.01):
+    """
+    Find the absolute thresholds that achieve each of a set of target
+    densities. The threshold is raised in steps of `interval` until the
+    density of the thresholded matrix falls to or below the target, but the
+    density of every step is read off a single sort of the edge weights
+    rather than by rebuilding the graph.
+
+    Parameters
+    ----------
+    conn_matrix : np.ndarray
+        Weighted connectivity matrix
+    thrs : list
+        Density values between 0-1.
+    max_iters : int
+        Maximum number of threshold steps. Default is 10000.
+    interval : float
+        Interval for increasing the absolute threshold for each step.
+        Default is 0.01.
+
+    Returns
+    -------
+    cuts : np.ndarray
+        Absolute threshold for each target density, or NaN if the target
+        is already met by the raw matrix or is never reached.
+    densities : np.ndarray
+        Density of the matrix after applying each cut (NaN if no cut).
+
+    """
+    W = np.array(conn_matrix, dtype="float64")
+    np.fill_diagonal(W, 0)
+    n = len(W)
+
+    # An undirected pair survives an absolute threshold if either of its
+    # directed weights does
+    pairs = np.maximum(W, W.T)
+    pairs[np.isnan(pairs)] = np.inf
+    weights = rank_edges(pairs)[2][::-1]
+
+    steps = np.cumsum(np.full(max(int(max_iters) - 1, 0), float(interval)))
+    steps = steps[np.concatenate([[0.0], steps[:-1]]) < 1]
+    n_edges = len(weights) - np.searchsorted(weights, steps, side="left")
+    if n > 1:
+        step_densities = n_edges / (n * (n - 1)) * 2
+    else:
+        step_densities = np.zeros(len(steps))
+    raw_density = est_density(W)
+
+    thrs = np.atleast_1d(np.asarray(thrs, dtype="float64"))
+    cuts = np.full(len(thrs), np.nan)
+    densities = np.full(len(thrs), np.nan)
+    for i, thr in enumerate(thrs):
+        if thr >= raw_density:
+            continue
+        hits = np.flatnonzero(thr >= step_densities)
+        if len(hits) > 0:
+            cuts[i] = steps[hits[0]]
+            densities[i] = step_densities[hits[0]]
+    return cuts, densities
+
+
 def density_thresholding(conn_matrix, thr, max_iters=10000, interval=0.01):
     """
-    Iteratively apply an absolute threshold to achieve a target density.
+    Apply an absolute threshold to achieve a target density.
 
     Parameters
     ----------
@@ -174,10 +270,10 @@ def density_thresholding(conn_matrix, thr, max_iters=10000, interval=0.01):
     thr : float
         Density value between 0-1.
     max_iters : int
-        Maximum number of iterations for performing absolute thresholding.
-        Default is 1000.
+        Maximum number of increments of the absolute threshold.
+        Default is 10000.
     interval : float
-        Interval for increasing the absolute threshold for each iteration.
+        Interval for increasing the absolute threshold for each increment.
         Default is 0.01.
 
     Returns
@@ -195,38 +291,23 @@ def density_thresholding(conn_matrix, thr, max_iters=10000, interval=0.01):
       interpretations. Rubinov M, Sporns O (2010) NeuroImage 52:1059-69.
 
     """
-    from pynets.core import thresholding
-
     np.fill_diagonal(conn_matrix, 0)
 
-    work_thr = 0
-    i = 1
-    density = nx.density(nx.from_numpy_matrix(conn_matrix))
-    if float(thr) < float(density):
-        while float(i) < max_iters and float(work_thr) < float(1):
-            work_thr = float(work_thr) + float(interval)
-            density = nx.density(
-                nx.from_numpy_matrix(
-                    thresholding.threshold_absolute(conn_matrix, work_thr)
-                )
-            )
+    if float(thr) < float(est_density(conn_matrix)):
+        cuts, densities = density_cuts(conn_matrix, [thr], max_iters,
+                                       interval)
+        if not np.isnan(cuts[0]):
             print(
-                "%s%d%s%.2f%s%.2f%s"
+                "%s%.2f%s%.2f%s"
                 % (
-                    "Iteration ",
-                    i,
-                    " -- with Thresh: ",
-                    float(work_thr),
-                    " and Density: ",
-                    float(density),
+                    "Thresh: ",
+                    float(cuts[0]),
+                    " achieves Density: ",
+                    float(densities[0]),
                     "...",
                 )
             )
-            if float(thr) >= float(density):
-                conn_matrix = thresholding.threshold_absolute(
-                    conn_matrix, work_thr)
-                break
-            i = i + 1
+            conn_matrix = threshold_absolute(conn_matrix, cuts[0])
     else:
         print(
             "Density of raw matrix is already greater than or equal to the "
@@ -252,7 +333,16 @@ def est_density(in_mat):
         Density of the graph.
 
     """
-    return nx.density(nx.from_numpy_matrix(in_mat))
+    in_mat = np.asarray(in_mat)
+    n = len(in_mat)
+    if n <= 1:
+        return 0
+    # Undirected pairs with a nonzero weight in either direction, plus
+    # self-loops, as counted by networkx
+    edges = in_mat != 0
+    m = np.count_nonzero(np.triu(edges | edges.T, 1)) + np.count_nonzero(
+        np.diag(edges))
+    return m / (n * (n - 1)) * 2
 
 
 def thr2prob(W, copy=True):
@@ -444,6 +534,138 @@ def autofix(W, copy=True):
     return np.nan_to_num(W)
 
 
+def _is_directed(W):
+    """
+    Whether a dense or sparse connectivity matrix is asymmetric.
+    """
+    from scipy import sparse
+
+    if sparse.issparse(W):
+        W = sparse.csr_matrix(W)
+        return abs(W - W.T).max() > 1e-08 + 1e-05 * abs(W).max()
+    return not np.allclose(W, W.T)
+
+
+def disparity_alphas(W, directed=None):
+    """
+    Compute the disparity filter significance (alpha) of every edge of a
+    weighted connectivity matrix at once, using the closed form
+    alpha_ij = (1 - p_ij) ** (k_i - 1) of the null-model integral, where p_ij
+    is the normalized weight of edge ij at node i and k_i is the degree of
+    node i.
+
+    Parameters
+    ----------
+    W : np.ndarray or scipy.sparse matrix
+        Weighted connectivity matrix. Absolute weights are used, and the
+        main diagonal is ignored.
+    directed : bool
+        If True, W is treated as a directed graph with edges running from
+        rows to columns. If False, W is treated as undirected, with
+        asymmetric matrices symmetrized by their maximum absolute weight. If
+        None, the choice is inferred from the symmetry of W.
+
+    Returns
+    -------
+    rows : np.ndarray
+        Source nodes of the edges.
+    cols : np.ndarray
+        Target nodes of the edges.
+    weights : np.ndarray
+        Edge weights.
+    alpha_out : np.ndarray
+        Significance of each edge with respect to its source node (the
+        out-strength of that node in the directed case).
+    alpha_in : np.ndarray
+        Significance of each edge with respect to its target node (the
+        in-strength of that node in the directed case).
+
+    References
+    ----------
+    .. [1] M. A. Serrano et al. (2009) Extracting the Multiscale backbone of
+      complex weighted networks. PNAS, 106:16, pp. 6483-6488.
+
+    """
+    from scipy import sparse
+
+    if directed is None:
+        directed = _is_directed(W)
+    W = sparse.coo_matrix(W)
+    if directed is False:
+        W = abs(W).maximum(abs(W).T).tocoo()
+    n = W.shape[0]
+    keep = (W.row != W.col) & (W.data != 0)
+    rows, cols, weights = W.row[keep], W.col[keep], W.data[keep]
+    abs_weights = np.abs(weights)
+
+    k_out = np.bincount(rows, minlength=n)
+    s_out = np.bincount(rows, weights=abs_weights, minlength=n)
+    k_in = np.bincount(cols, minlength=n)
+    s_in = np.bincount(cols, weights=abs_weights, minlength=n)
+
+    alpha_out = (1 - abs_weights / s_out[rows]) ** (k_out[rows] - 1)
+    alpha_in = (1 - abs_weights / s_in[cols]) ** (k_in[cols] - 1)
+
+    if directed is True:
+        # An edge that is both the only way out of its source and the only
+        # way into its target is kept to preserve connectivity
+        bridge = (k_out[rows] == 1) & (k_in[cols] == 1)
+        alpha_out[bridge] = 0
+        alpha_in[bridge] = 0
+
+    return rows, cols, weights, alpha_out, alpha_in
+
+
+def disparity_backbone(W, alpha_t=0.4, directed=None, cut_mode="or"):
+    """
+    Extract the multiscale backbone of a weighted connectivity matrix with
+    the disparity filter of Serrano et al. 2009.
+
+    Parameters
+    ----------
+    W : np.ndarray or scipy.sparse matrix
+        Weighted connectivity matrix.
+    alpha_t : float
+        The threshold, between 0 and 1, for the alpha parameter
+        used to select the surviving edges. Default is 0.4.
+    directed : bool
+        Whether to treat W as directed. If None, the choice is inferred from
+        the symmetry of W. See `disparity_alphas`.
+    cut_mode : str
+        In the case of directed graphs. It represents the logic operation
+        used to combine the in and out significance of each edge. In the
+        undirected case, an edge survives if it is significant for either of
+        its nodes. Default is 'or'. Possible strings: 'or', 'and'.
+
+    Returns
+    -------
+    B : scipy.sparse.csr_matrix
+        Backbone matrix containing the weights of the surviving edges.
+
+    References
+    ----------
+    .. [1] M. A. Serrano et al. (2009) Extracting the Multiscale backbone of
+      complex weighted networks. PNAS, 106:16, pp. 6483-6488.
+
+    """
+    from scipy import sparse
+
+    if cut_mode not in ["or", "and"]:
+        raise ValueError(f"Cut mode {cut_mode} not recognized. Possible "
+                         f"strings: 'or', 'and'.")
+
+    if directed is None:
+        directed = _is_directed(W)
+    rows, cols, weights, alpha_out, alpha_in = disparity_alphas(W, directed)
+    if cut_mode == "and" and directed is True:
+        keep = (alpha_out < alpha_t) & (alpha_in < alpha_t)
+    else:
+        keep = (alpha_out < alpha_t) | (alpha_in < alpha_t)
+
+    return sparse.csr_matrix(
+        (weights[keep], (rows[keep], cols[keep])), shape=W.shape)
+
+
 def disparity_filter(G, weight="weight"):
     """
     Compute significance scores (alpha) for weighted edges in G as defined in
@@ -463,79 +685,53 @@ def disparity_filter(G, weight="weight"):
         Weighted NetworkX graph with a significance score (alpha) assigned to
         each edge.
 
+    Notes
+    -----
+    In the undirected case, each edge is assigned the smaller of the alphas
+    of its two nodes. See `disparity_alphas` for the computation.
+
     References
     ----------
     .. [1] M. A. Serrano et al. (2009) Extracting the Multiscale backbone of
       complex weighted networks. PNAS, 106:16, pp. 6483-6488.
 
     """
-    from scipy import integrate
-
-    if nx.is_directed(G):  # directed case
+    nodes = list(G)
+    directed = nx.is_directed(G)
+    rows, cols, weights, alpha_out, alpha_in = disparity_alphas(
+        nx.to_scipy_sparse_matrix(G, nodelist=nodes, weight=weight),
+        directed=directed)
+    n = len(nodes)
+    k_out = np.bincount(rows, minlength=n)
+    k_in = np.bincount(cols, minlength=n)
+
+    if directed:  # directed case
         N = nx.DiGraph()
-        for u in G:
-
-            k_out = G.out_degree(u)
-            k_in = G.in_degree(u)
-
-            if k_out > 1:
-                sum_w_out = sum(np.absolute(G[u][v][weight])
-                                for v in G.successors(u))
-                for v in G.successors(u):
-                    w = G[u][v][weight]
-                    p_ij_out = float(np.absolute(w)) / sum_w_out
-                    alpha_ij_out = (
-                        1
-                        - (k_out - 1)
-                        * integrate.quad(lambda x: (1 - x) ** (k_out - 2), 0,
-                                         p_ij_out)[0]
-                    )
-                    N.add_edge(
-                        u, v, weight=w, alpha_out=float(f"{alpha_ij_out:.4f}"))
-
-            elif k_out == 1 and G.in_degree(list(G.successors(u))[0]) == 1:
-                # we need to keep the connection as it is the only way to
-                # maintain the connectivity of the network
-                v = list(G.successors(u))[0]
-                w = G[u][v][weight]
-                N.add_edge(u, v, weight=w, alpha_out=0.0, alpha_in=0.0)
-                # there is no need to do the same for the k_in, since the link
-                # is built already from the tail
-
-            if k_in > 1:
-                sum_w_in = sum(np.absolute(G[v][u][weight])
-                               for v in G.predecessors(u))
-                for v in G.predecessors(u):
-                    w = G[v][u][weight]
-                    p_ij_in = float(np.absolute(w)) / sum_w_in
-                    alpha_ij_in = (
-                        1
-                        - (k_in - 1)
-                        * integrate.quad(lambda x: (1 - x) ** (k_in - 2), 0,
-                                         p_ij_in)[0]
-                    )
-                    N.add_edge(
-                        v, u, weight=w, alpha_in=float(f"{alpha_ij_in:.4f}"))
+        # Alphas are only defined for nodes with more than one edge, aside
+        # from edges kept to maintain the connectivity of the network
+        bridge = (k_out[rows] == 1) & (k_in[cols] == 1)
+        has_out = (k_out[rows] > 1) | bridge
+        has_in = (k_in[cols] > 1) | bridge
+        for u, v, w, a_out, a_in, o, i in zip(rows, cols, weights, alpha_out,
+                                              alpha_in, has_out, has_in):
+            attrs = {"weight": w}
+            if o:
+                attrs["alpha_out"] = float(f"{a_out:.4f}")
+            if i:
+                attrs["alpha_in"] = float(f"{a_in:.4f}")
+            if o or i:
+                N.add_edge(nodes[u], nodes[v], **attrs)
         return N
 
     else:  # undirected case
         B = nx.Graph()
-        for u in G:
-            k = len(G[u])
-            if k > 1:
-                sum_w = sum(np.absolute(G[u][v][weight]) for v in G[u])
-                for v in G[u]:
-                    w = G[u][v][weight]
-                    p_ij = float(np.absolute(w)) / sum_w
-                    alpha_ij = (
-                        1
-                        - (k - 1)
-                        * integrate.quad(lambda x: (1 - x) ** (k - 2), 0,
-                                         p_ij)[0]
-                    )
-                    B.add_edge(u, v, weight=w, alpha=float(f"{alpha_ij:.4f}"))
-            else:
-                B.add_node(u)
+        B.add_nodes_from(nodes)
+        upper = (rows < cols) & ((k_out[rows] > 1) | (k_out[cols] > 1))
+        B.add_edges_from(
+            (nodes[u], nodes[v], {"weight": G[nodes[u]][nodes[v]][weight],
+                                  "alpha": float(f"{a:.4f}")})
+            for u, v, a in zip(rows[upper], cols[upper],
+                               np.minimum(alpha_out, alpha_in)[upper]))
         return B
 
 
@@ -576,39 +772,25 @@ def disparity_filter_alpha_cut(G, weight="weight", alpha_t=0.4, cut_mode="or"):
       complex weighted networks. PNAS, 106:16, pp. 6483-6488.
 
     """
+    edges = list(G.edges(data=True))
 
     if nx.is_directed(G):
         B = nx.DiGraph()
-        for u, v, w in G.edges(data=True):
-            try:
-                alpha_in = w["alpha_in"]
-            except KeyError:
-                alpha_in = 1
-            try:
-                alpha_out = w["alpha_out"]
-            except KeyError:
-                alpha_out = 1
-
-            if cut_mode == "or":
-                if alpha_in < alpha_t or alpha_out < alpha_t:
-                    B.add_edge(u, v, weight=w[weight])
-            elif cut_mode == "and":
-                if alpha_in < alpha_t and alpha_out < alpha_t:
-                    B.add_edge(u, v, weight=w[weight])
-        return B
-
+        alpha_in = np.array([w.get("alpha_in", 1) for _, _, w in edges])
+        alpha_out = np.array([w.get("alpha_out", 1) for _, _, w in edges])
+        if cut_mode == "or":
+            keep = (alpha_in < alpha_t) | (alpha_out < alpha_t)
+        elif cut_mode == "and":
+            keep = (alpha_in < alpha_t) & (alpha_out < alpha_t)
+        else:
+            keep = np.zeros(len(edges), dtype=bool)
     else:
         B = nx.Graph()  # Undirected case:
-        for u, v, w in G.edges(data=True):
-            try:
-                alpha = w["alpha"]
-            except KeyError:
-                alpha = 1
-
-            if alpha < alpha_t:
-                B.add_edge(u, v, weight=w[weight])
+        keep = np.array([w.get("alpha", 1) for _, _, w in edges]) < alpha_t
 
-        return B
+    B.add_edges_from((u, v, {"weight": w[weight]}) for (u, v, w), k in
+                     zip(edges, keep) if k)
+    return B
 
 
 def weight_to_distance(G):
@@ -805,7 +987,6 @@ def perform_thresholding(
 
     """
     import numpy as np
-    import networkx as nx
     from pynets.core import thresholding
 
     thr_perc = 100 - np.abs(100 * float(thr))
@@ -828,17 +1009,15 @@ def perform_thresholding(
 
         thr_type = "DISPARITY"
         edge_threshold = f"{str(thr_perc)}%"
-        G1 = thresholding.disparity_filter(
-            nx.from_numpy_array(np.abs(conn_matrix)))
         print(f"Computing edge disparity significance with alpha = {thr}")
+        backbone = thresholding.disparity_backbone(
+            np.abs(conn_matrix), alpha_t=float(thr), directed=False)
         print(
-            f"Filtered graph: nodes = {G1.number_of_nodes()}, "
-            f"edges = {G1.number_of_edges()}"
+            f"Filtered graph: nodes = {backbone.shape[0]}, "
+            f"edges = {backbone.nnz // 2}"
         )
-        conn_matrix_bin = thresholding.binarize(nx.to_numpy_array(
-            G1, nodelist=sorted(G1.nodes()), dtype=np.float64))
-        # Enforce original dimensionality by padding with zeros.
-        conn_matrix_thr = np.multiply(conn_matrix, conn_matrix_bin)
+        conn_matrix_thr = np.multiply(conn_matrix,
+                                      backbone.toarray() != 0)
     else:
         if dens_thresh is False:
             thr_type = "PROP"
@@ -1015,6 +1194,15 @@ def thresh_func(
         raise ValueError("Raw connectivity matrix contains only"
                          " zeros.")
 
+    meta = {
+        "ID": ID,
+        "network": network,
+        "conn_model": conn_model,
+        "atlas": atlas,
+        "labels": labels,
+        "coords": coords,
+    }
+
     # Save unthresholded
     utils.save_mat(
         conn_matrix,
@@ -1030,6 +1218,7 @@ def thresh_func(
             parc,
             extract_strategy,
         ),
+        meta=meta,
     )
 
     [thr_type, edge_threshold, conn_matrix_thr] = \
@@ -1055,7 +1244,11 @@ def thresh_func(
         extract_strategy,
     )
 
-    utils.save_mat(conn_matrix_thr, est_path)
+    utils.save_mat(conn_matrix_thr, est_path,
+                   meta=dict(meta, thr=thr, thr_type=thr_type,
+                             edge_threshold=edge_threshold,
+                             min_span_tree=min_span_tree,
+                             dens_thresh=dens_thresh, disp_filt=disp_filt))
     gc.collect()
 
     if check_consistency is True:
@@ -1260,6 +1453,15 @@ def thresh_struct(
         raise ValueError("Raw connectivity matrix contains only"
                          " zeros.")
 
+    meta = {
+        "ID": ID,
+        "network": network,
+        "conn_model": conn_model,
+        "atlas": atlas,
+        "labels": labels,
+        "coords": coords,
+    }
+
     # Save unthresholded
     utils.save_mat(
         conn_matrix,
@@ -1277,6 +1479,7 @@ def thresh_struct(
             min_length,
             error_margin
         ),
+        meta=meta,
     )
 
     [thr_type, edge_threshold, conn_matrix_thr] = \
@@ -1304,7 +1507,11 @@ def thresh_struct(
         error_margin
     )
 
-    utils.save_mat(conn_matrix_thr, est_path)
+    utils.save_mat(conn_matrix_thr, est_path,
+                   meta=dict(meta, thr=thr, thr_type=thr_type,
+                             edge_threshold=edge_threshold,
+                             min_span_tree=min_span_tree,
+                             dens_thresh=dens_thresh, disp_filt=disp_filt))
     gc.collect()
 
     if check_consistency is True:
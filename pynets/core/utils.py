@@ -634,6 +634,146 @@ def create_csv_path(dir_path, est_path):
     return out_path
 
 
+def _undirected_mat(W):
+    """
+    Symmetrize an adjacency matrix the way an undirected networkx graph does
+    when built from it: for each pair of nodes, the lower-triangle weight
+    takes precedence over the upper-triangle weight unless it is zero.
+    """
+    W = np.asarray(W, dtype="float64")
+    if np.array_equal(W, W.T):
+        return W
+    lower = np.tril(W, -1).T
+    upper = np.where(lower != 0, lower, np.triu(W, 1))
+    return upper + upper.T + np.diag(np.diag(W))
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def connectome_meta_path(est_path):
+    """
+    Return the path to the JSON sidecar holding the metadata of a connectome
+    .npy file.
+
+    Parameters
+    ----------
+    est_path : str
+        File path to .npy file containing graph.
+
+    Returns
+    -------
+    meta_path : str
+        File path to the .json sidecar.
+
+    """
+    return f"{os.path.splitext(est_path)[0]}.json"
+
+
+def save_connectome(conn_matrix, est_path, meta=None):
+    """
+    Save an adjacency matrix as a memory-mappable binary .npy array, with its
+    metadata in a JSON sidecar.
+
+    Parameters
+    ----------
+    conn_matrix : array
+        Adjacency matrix stored as an m x n array of nodes and edges.
+    est_path : str
+        File path to .npy file containing graph.
+    meta : dict
+        JSON-serializable metadata to store (e.g. node labels, coordinates,
+        and thresholding parameters). If None, any existing sidecar is
+        removed.
+
+    Returns
+    -------
+    est_path : str
+        File path to the saved .npy file.
+
+    """
+    import json
+
+    if not est_path.endswith(".npy"):
+        est_path = f"{est_path}.npy"
+
+    tmp_path = f"{est_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.lib.format.write_array(f, np.ascontiguousarray(conn_matrix),
+                                  allow_pickle=False)
+    os.replace(tmp_path, est_path)
+
+    meta_path = connectome_meta_path(est_path)
+    if meta is None:
+        if os.path.isfile(meta_path):
+            os.remove(meta_path)
+        return est_path
+
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, default=_json_default)
+    os.replace(tmp_path, meta_path)
+
+    return est_path
+
+
+def load_connectome_meta(est_path):
+    """
+    Read the metadata of a connectome .npy file from its JSON sidecar.
+
+    Parameters
+    ----------
+    est_path : str
+        File path to .npy file containing graph.
+
+    Returns
+    -------
+    meta : dict
+        Metadata, or an empty dictionary if the file has no sidecar.
+
+    """
+    import json
+
+    meta_path = connectome_meta_path(est_path)
+    if not os.path.isfile(meta_path):
+        return {}
+    with open(meta_path, "r") as f:
+        return json.load(f)
+
+
+def load_connectome(est_path, mmap_mode="c"):
+    """
+    Load an adjacency matrix and its metadata from a connectome .npy file
+    and its JSON sidecar.
+
+    Parameters
+    ----------
+    est_path : str
+        File path to .npy file containing graph.
+    mmap_mode : str
+        Memory-map mode passed to `np.load`. The default, 'c'
+        (copy-on-write), maps the file without reading it up front while
+        keeping it safe from in-place modification. Use None to read the
+        array into memory.
+
+    Returns
+    -------
+    conn_matrix : np.ndarray
+        Adjacency matrix.
+    meta : dict
+        Metadata, or an empty dictionary if the file has no sidecar.
+
+    """
+    conn_matrix = np.asarray(np.load(est_path, mmap_mode=mmap_mode,
+                                     allow_pickle=False))
+    return conn_matrix, load_connectome_meta(est_path)
+
+
 def load_mat(est_path):
     """
     Load an adjacency matrix using any of a variety of methods.
@@ -646,9 +786,16 @@ def load_mat(est_path):
     import numpy as np
     import networkx as nx
     import os.path as op
+    from pynets.core.utils import load_connectome, _undirected_mat
 
     fmt = op.splitext(est_path)[1]
 
+    # Binary arrays are read directly, without a networkx round-trip
+    if fmt == ".npy":
+        return _undirected_mat(load_connectome(est_path)[0])
+    elif fmt == ".txt":
+        return _undirected_mat(np.genfromtxt(est_path))
+
     if fmt == ".edgelist_csv" or fmt == ".csv":
         with open(est_path, "rb") as stream:
             G = nx.read_weighted_edgelist(stream, delimiter=",")
@@ -664,17 +811,13 @@ def load_mat(est_path):
         G = nx.read_gpickle(est_path)
     elif fmt == ".graphml":
         G = nx.read_graphml(est_path)
-    elif fmt == ".txt":
-        G = nx.from_numpy_array(np.genfromtxt(est_path))
-    elif fmt == ".npy":
-        G = nx.from_numpy_array(np.load(est_path))
     else:
         raise ValueError("\nFile format not supported!")
 
     G.graph["ecount"] = nx.number_of_edges(G)
     G = nx.convert_node_labels_to_integers(G, first_label=1)
 
-    return nx.to_numpy_matrix(G, weight="weight")
+    return nx.to_numpy_array(G, weight="weight")
 
 
 def load_mat_ext(
@@ -709,7 +852,7 @@ def load_mat_ext(
     )
 
 
-def save_mat(conn_matrix, est_path, fmt=None):
+def save_mat(conn_matrix, est_path, fmt=None, meta=None):
     """
     Save an adjacency matrix using any of a variety of methods.
 
@@ -722,12 +865,17 @@ def save_mat(conn_matrix, est_path, fmt=None):
     fmt : str
         Format to save connectivity matrix/graph (e.g. .npy, .pkl, .graphml,
          .txt, .ssv, .csv).
+    meta : dict
+        Metadata (e.g. node labels, coordinates, and thresholding
+        parameters) to store in a JSON sidecar of the binary .npy store.
+        Ignored for other formats.
 
     """
     import numpy as np
     import networkx as nx
     import pkg_resources
     import yaml
+    from pynets.core.utils import save_connectome, _undirected_mat
 
     if fmt is None:
         with open(
@@ -737,6 +885,19 @@ def save_mat(conn_matrix, est_path, fmt=None):
             fmt = hardcoded_params["graph_file_format"][0]
         stream.close()
 
+    # Binary arrays are written directly, without a networkx round-trip
+    if fmt == "npy":
+        if os.path.isfile(est_path):
+            os.remove(est_path)
+        save_connectome(_undirected_mat(conn_matrix), est_path, meta)
+        return
+    elif fmt == "txt":
+        if os.path.isfile(f"{est_path.split('.npy')[0]}{'.txt'}"):
+            os.remove(f"{est_path.split('.npy')[0]}{'.txt'}")
+        np.savetxt(f"{est_path.split('.npy')[0]}{'.txt'}",
+                   _undirected_mat(conn_matrix))
+        return
+
     G = nx.from_numpy_array(conn_matrix)
     G.graph["ecount"] = nx.number_of_edges(G)
     G = nx.convert_node_labels_to_integers(G, first_label=1)
@@ -754,16 +915,6 @@ def save_mat(conn_matrix, est_path, fmt=None):
         if os.path.isfile(f"{est_path.split('.npy')[0]}.graphml"):
             os.remove(f"{est_path.split('.npy')[0]}.graphml")
         nx.write_graphml(G, f"{est_path.split('.npy')[0]}.graphml")
-    elif fmt == "txt":
-        if os.path.isfile(f"{est_path.split('.npy')[0]}{'.txt'}"):
-            os.remove(f"{est_path.split('.npy')[0]}{'.txt'}")
-        np.savetxt(
-            f"{est_path.split('.npy')[0]}{'.txt'}",
-            nx.to_numpy_matrix(G))
-    elif fmt == "npy":
-        if os.path.isfile(est_path):
-            os.remove(est_path)
-        np.save(est_path, nx.to_numpy_matrix(G))
     elif fmt == "edgelist_ssv":
         if os.path.isfile(f"{est_path.split('.npy')[0]}.ssv"):
             os.remove(f"{est_path.split('.npy')[0]}.ssv")
@@ -778,6 +929,28 @@ def save_mat(conn_matrix, est_path, fmt=None):
     return
 
 
+def remove_mat(est_path):
+    """
+    Remove a graph saved with `save_mat`, along with its metadata sidecar and
+    any of its exports to other formats.
+
+    Parameters
+    ----------
+    est_path : str
+        File path to .npy file containing graph.
+
+    """
+    from pynets.core.utils import connectome_meta_path
+
+    stem = est_path.split('.npy')[0]
+    for path in [est_path, connectome_meta_path(est_path)] + \
+            [f"{stem}{ext}" for ext in
+             [".txt", ".csv", ".pkl", ".graphml", ".ssv"]]:
+        if os.path.isfile(path):
+            os.remove(path)
+    return
+
+
 def mergedicts(dict1, dict2):
     for k in set(dict1.keys()).union(dict2.keys()):
         if k in dict1 and k in dict2:
@@ -806,12 +979,21 @@ def save_mat_thresholded(
     norm,
     binary,
 ):
-    from pynets.core.utils import save_mat
+    import os
+    from pynets.core.utils import save_mat, load_connectome_meta
     from nipype.utils.filemanip import fname_presuffix
 
     est_path = fname_presuffix(est_path_orig,
                                suffix=f"_thrtype-{thr_type}_thr-{thr}")
-    save_mat(conn_matrix, est_path, fmt="npy")
+
+    # Carry over the metadata of the raw graph
+    if est_path_orig.endswith(".npy") and os.path.isfile(est_path_orig):
+        meta = load_connectome_meta(est_path_orig)
+    else:
+        meta = {}
+    meta.update({"thr": thr, "thr_type": thr_type, "prune": prune,
+                 "norm": norm, "binary": binary})
+    save_mat(conn_matrix, est_path, fmt="npy", meta=meta)
 
     return est_path, ID, network, thr, conn_model, roi, prune, norm, binary
 
@@ -1194,7 +1376,6 @@ def decompress_nifti(infile):
     import gzip
     import os
     import shutil
-    from time import sleep
 
     _, base, ext = split_filename(infile)
 
@@ -1205,7 +1386,6 @@ def decompress_nifti(infile):
         with open(os.path.abspath(base + ext), "wb") as out_file:
             shutil.copyfileobj(in_file, out_file, 128*1024)
 
-    sleep(5)
     # in_file.close()
     # out_file.close()
     os.remove(infile)
@@ -1707,14 +1887,154 @@ def merge_dicts(x, y):
     return z
 
 
+# Default bounds of the on-disk cache, overridden by the
+# PYNETS_CACHE_MAX_GB and PYNETS_CACHE_MAX_AGE_DAYS environment variables
+CACHE_MAX_GB = 20
+CACHE_MAX_AGE_DAYS = 30
+
+# Cache roots already pruned by this process
+_PRUNED_CACHES = set()
+
+
+def prune_cache(cache_root, max_bytes=None, max_age=None):
+    """
+    Evict the files of an on-disk cache that were last used more than
+    `max_age` seconds ago, then the least recently used files until the
+    cache holds at most `max_bytes`. Files still being written (`.tmp`)
+    are left alone.
+
+    Parameters
+    ----------
+    cache_root : str
+        Directory of the cache.
+    max_bytes : int
+        Maximum total size of the cache. Default is None, for no bound.
+    max_age : float
+        Maximum time since last use, in seconds. Default is None, for no
+        bound.
+
+    Returns
+    -------
+    n_removed : int
+        Number of files evicted.
+
+    """
+    entries = []
+    for root, _, files in os.walk(cache_root):
+        for file_ in files:
+            if ".tmp" in file_:
+                continue
+            path = op.join(root, file_)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size,
+                            path))
+
+    # Least recently used first, such that eviction stops at the first
+    # file that is neither expired nor needed to meet the size bound
+    entries.sort()
+    now = time.time()
+    total = sum([i[1] for i in entries])
+    n_removed = 0
+    for used, size, path in entries:
+        if (max_age is None or now - used <= max_age) and \
+                (max_bytes is None or total <= max_bytes):
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        n_removed += 1
+    return n_removed
+
+
+def get_cache_dir(name):
+    """
+    Return (and create) a named subdirectory of the PyNets on-disk cache.
+    The cache resides in ~/.pynets/cache, unless the PYNETS_CACHE
+    environment variable points elsewhere. On first use by a process, the
+    whole cache is pruned (see `prune_cache`) to PYNETS_CACHE_MAX_GB
+    gigabytes and to files used within PYNETS_CACHE_MAX_AGE_DAYS days
+    (`CACHE_MAX_GB` and `CACHE_MAX_AGE_DAYS` by default). Set either to 0
+    to disable that bound.
+
+    Parameters
+    ----------
+    name : str
+        Name of the cache subdirectory (e.g. `nullmodels`).
+
+    Returns
+    -------
+    cache_dir : str
+        Path to the cache subdirectory.
+
+    """
+    cache_root = os.environ.get(
+        "PYNETS_CACHE", f"{os.path.expanduser('~')}/.pynets/cache")
+    if cache_root not in _PRUNED_CACHES and op.isdir(cache_root):
+        _PRUNED_CACHES.add(cache_root)
+        max_gb = float(os.environ.get("PYNETS_CACHE_MAX_GB", CACHE_MAX_GB))
+        max_days = float(os.environ.get("PYNETS_CACHE_MAX_AGE_DAYS",
+                                        CACHE_MAX_AGE_DAYS))
+        prune_cache(cache_root,
+                    max_bytes=int(max_gb * 1024 ** 3) if max_gb > 0 else None,
+                    max_age=max_days * 86400 if max_days > 0 else None)
+    cache_dir = f"{cache_root}/{name}"
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def content_hash(*arrays, **params):
+    """
+    Compute a content-addressed key from any number of arrays (or file
+    paths) and keyword parameters.
+
+    Parameters
+    ----------
+    arrays : np.ndarray or str
+        Arrays whose dtype, shape, and contents are hashed. Strings that
+        point to existing files are hashed by file contents.
+    params : dict
+        Additional parameters whose values are hashed by their repr.
+
+    Returns
+    -------
+    key : str
+        Hexadecimal SHA-1 digest.
+
+    """
+    import hashlib
+
+    sha = hashlib.sha1()
+    for arr in arrays:
+        if isinstance(arr, str) and op.isfile(arr):
+            with open(arr, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(chunk)
+            continue
+        arr = np.ascontiguousarray(arr)
+        sha.update(str((arr.dtype.str, arr.shape)).encode())
+        sha.update(arr.tobytes())
+    for key in sorted(params):
+        sha.update(f"{key}={params[key]!r};".encode())
+    return sha.hexdigest()
+
+
 def timeout(seconds):
     """
-    Timeout function for hung calculations.
+    Timeout function for hung calculations. SIGALRM can only be handled in
+    the main thread, so calls made from any other thread are left unbounded
+    (see `pynets.stats.netstats.MetricScheduler` for a process-based
+    budget).
     """
     from functools import wraps
     import errno
     import os
     import signal
+    import threading
 
     class TimeoutError(Exception):
         pass
@@ -1725,6 +2045,8 @@ def timeout(seconds):
             raise TimeoutError(error_message)
 
         def wrapper(*args, **kwargs):
+            if threading.current_thread() is not threading.main_thread():
+                return func(*args, **kwargs)
             signal.signal(signal.SIGALRM, _handle_timeout)
             signal.alarm(seconds)
             try:
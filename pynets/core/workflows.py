@@ -3993,6 +3993,12 @@ def fmri_connectometry(
             name="RegisterParcellation2MNIFunc_node"
         )
 
+        # Every k of a sweep reuses the ncut eigen decomposition at the
+        # largest k
+        if k_list:
+            clustering_node.inputs.k_max = int(max([int(i) for i in
+                                                    k_list]))
+
         fmri_connectometry_wf.connect(
             [
                 (
@@ -5749,6 +5755,7 @@ def raw_graph_workflow(
     import numpy as np
     from pynets.core.utils import load_mat, load_mat_ext, save_mat_thresholded
     from pynets.core.thresholding import thresh_raw_graph
+    from pynets.core.interfaces import NetworkAnalysisSweep
     from nipype.pipeline import engine as pe
     from nipype.interfaces import utility as niu
 
@@ -5762,6 +5769,39 @@ def raw_graph_workflow(
         "import nibabel as nib",
     ]
 
+    if multi_thr is True:
+        iter_thresh = sorted(
+            list(
+                set(
+                    [
+                        str(i)
+                        for i in np.round(
+                            np.arange(float(min_thr), float(max_thr),
+                                      float(step_thr)),
+                            decimals=2,
+                        ).tolist()
+                    ]
+                    + [str(float(max_thr))]
+                )
+            )
+        )
+
+    # A threshold sweep analyzes every threshold of each raw graph at once,
+    # so the graphs need not be thresholded and saved one by one
+    if isinstance(net_mets_node.interface, NetworkAnalysisSweep):
+        graphs = multi_graph if multi_graph else [graph]
+        net_mets_node.inputs.est_path = graphs
+        net_mets_node.inputs.thrs = iter_thresh
+        net_mets_node.inputs.ID = [ID] * len(graphs)
+        net_mets_node.inputs.network = [network] * len(graphs)
+        net_mets_node.inputs.conn_model = [conn_model] * len(graphs)
+        net_mets_node.inputs.roi = [roi] * len(graphs)
+        net_mets_node.inputs.prune = [prune] * len(graphs)
+        net_mets_node.inputs.norm = [norm] * len(graphs)
+        net_mets_node.inputs.binary = [binary] * len(graphs)
+        wf.add_nodes([net_mets_node])
+        return wf
+
     if multi_thr is True or float(thr) != 1.0:
         thresholding_node = pe.Node(
             niu.Function(
@@ -6048,22 +6088,6 @@ def raw_graph_workflow(
             )
 
     if multi_thr is True:
-        iter_thresh = sorted(
-            list(
-                set(
-                    [
-                        str(i)
-                        for i in np.round(
-                            np.arange(float(min_thr), float(max_thr),
-                                      float(step_thr)),
-                            decimals=2,
-                        ).tolist()
-                    ]
-                    + [str(float(max_thr))]
-                )
-            )
-        )
-
         join_iters_node_thr = pe.JoinNode(
             niu.IdentityInterface(
                 fields=[
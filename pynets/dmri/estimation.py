@@ -362,6 +362,382 @@ def sfm_mod_est(gtab, data, B0_mask):
     return sf_odf, model
 
 
+# Bump whenever the label neighborhoods change, so that stale lookups are
+# never served from the cache.
+NEIGHBORHOOD_VERSION = 1
+
+
+def label_neighborhoods(atlas_data, error_margin, vox_dims, cache_dir=None):
+    """
+    Sparse lookup of the atlas labels found within `error_margin` mm of
+    every voxel. The lookup is computed once per atlas and error margin,
+    and is kept in a content-addressed on-disk cache.
+
+    Parameters
+    ----------
+    atlas_data : array
+        3D atlas parcellation of integer label intensities.
+    error_margin : int
+        Euclidean margin of error, in mm, for classifying a streamline as a
+        connection to an ROI.
+    vox_dims : array/tuple
+        1D vector (x, y, z) of mm voxel resolution.
+    cache_dir : str
+        Directory of the cache. Default is the `label_neighborhoods`
+        subdirectory of the PyNets cache (see
+        `pynets.core.utils.get_cache_dir`).
+
+    Returns
+    -------
+    lut : scipy.sparse.csr_matrix
+        (n_voxels x n_labels) matrix whose (v, l) entry counts the voxels of
+        the l-th label within the spherical neighborhood of voxel v, where
+        voxels are indexed in C order.
+    node_labels : np.ndarray
+        Atlas label intensities, ordered as the columns of `lut`.
+
+    """
+    import os
+    from scipy import sparse
+    from pynets.core import utils, nodemaker
+
+    atlas_data = np.asarray(atlas_data).astype("uint16")
+    shape = atlas_data.shape
+    node_labels = np.unique(atlas_data)
+    node_labels = node_labels[node_labels > 0]
+    vox_dims = np.asarray(vox_dims[:3], dtype=float)
+
+    if cache_dir is None:
+        cache_dir = utils.get_cache_dir("label_neighborhoods")
+    os.makedirs(cache_dir, exist_ok=True)
+    key = utils.content_hash(atlas_data, error_margin=float(error_margin),
+                             vox_dims=tuple(vox_dims.tolist()),
+                             version=NEIGHBORHOOD_VERSION)
+    cache_file = f"{cache_dir}/{key}.npz"
+    if os.path.isfile(cache_file):
+        try:
+            return sparse.load_npz(cache_file).tocsr(), node_labels
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable label neighborhood cache: "
+                  f"{cache_file}")
+
+    # Offsets of the spherical neighborhood, as generated by get_sphere
+    # around a voxel that is far enough from the image bounds
+    center = np.ceil(float(error_margin) / vox_dims).astype(int) + 1
+    offsets = nodemaker.get_sphere(center, error_margin, vox_dims,
+                                   2 * center + 1) - center
+
+    columns = np.zeros(int(atlas_data.max()) + 1, dtype=np.int32)
+    columns[node_labels] = np.arange(len(node_labels))
+    vox_idx = np.arange(atlas_data.size).reshape(shape)
+    rows = []
+    cols = []
+    for offset in offsets:
+        # Labels at v + offset, for every voxel v whose neighbor is in bounds
+        src = tuple(slice(max(o, 0), d + min(o, 0)) for o, d in
+                    zip(offset, shape))
+        dst = tuple(slice(max(-o, 0), d - max(o, 0)) for o, d in
+                    zip(offset, shape))
+        labs = atlas_data[src]
+        hits = labs > 0
+        rows.append(vox_idx[dst][hits])
+        cols.append(columns[labs[hits]])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    lut = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32),
+                             (rows, cols)),
+                            shape=(atlas_data.size, len(node_labels)))
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+    sparse.save_npz(tmp_file, lut)
+    os.replace(tmp_file, cache_file)
+
+    return lut, node_labels
+
+
+def streamline_label_counts(points, lengths, lut, shape,
+                            endpoints_only=False):
+    """
+    Count, for each streamline, the atlas label voxels within the error
+    margin of its points, in a single sparse product over the concatenated
+    streamline coordinates.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        (n_points x 3) concatenated coordinates of the streamlines, in voxel
+        coordinates (i.e. VOXMM space with 1mm voxels, as used by
+        `streams2graph`).
+    lengths : np.ndarray
+        Number of points of each streamline.
+    lut : scipy.sparse.csr_matrix
+        Label neighborhoods of the atlas (see `label_neighborhoods`).
+    shape : tuple
+        Dimensions of the atlas.
+    endpoints_only : bool
+        If True, only the first and last points of each streamline are
+        labeled. Default is False (all points).
+
+    Returns
+    -------
+    counts : scipy.sparse.csr_matrix
+        (n_streamlines x n_labels) matrix of label overlap counts.
+
+    """
+    from scipy import sparse
+
+    lengths = np.asarray(lengths, dtype=np.intp)
+    sl_idx = np.repeat(np.arange(len(lengths)), lengths)
+    if endpoints_only is True:
+        ends = np.cumsum(lengths)
+        keep = np.unique(np.concatenate([ends - lengths, ends - 1]))
+        points = points[keep]
+        sl_idx = sl_idx[keep]
+
+    # Nearest voxel of each point. Points outside of the atlas are ignored.
+    vox = np.floor(points + 0.5).astype(np.intp)
+    inside = np.all((vox >= 0) & (vox < np.asarray(shape[:3])), axis=1)
+    flat = np.ravel_multi_index(tuple(vox[inside].T), shape[:3])
+    membership = sparse.csr_matrix(
+        (np.ones(len(flat), dtype=np.int32), (sl_idx[inside], flat)),
+        shape=(len(lengths), lut.shape[0]))
+
+    return membership @ lut
+
+
+def connectome_state_path(streams):
+    """
+    File path of the connectome state accumulated while tracking a
+    tractogram (see `StreamlineConnectome.save`).
+    """
+    import os
+
+    return f"{os.path.splitext(streams)[0]}_connectome.npz"
+
+
+class StreamlineConnectome(object):
+    """
+    Streamline-to-connectome engine. Streamlines are added in batches, and
+    the streamline counts, mean fiber lengths and mean FA of every edge are
+    accumulated as dense matrices, so that the weighted adjacency matrix is
+    available at any time, without another pass over the streamlines.
+    """
+
+    def __init__(self, atlas_data, error_margin, vox_dims, fa_data=None,
+                 overlap_thr=1, endpoints_only=False, cache_dir=None):
+        """
+        Parameters
+        ----------
+        atlas_data : array
+            3D atlas parcellation of integer label intensities.
+        error_margin : int
+            Euclidean margin of error, in mm, for classifying a streamline
+            as a connection to an ROI.
+        vox_dims : array/tuple
+            1D vector (x, y, z) of mm voxel resolution.
+        fa_data : array
+            3D FA image, in the space of the atlas. If None, FA weights are
+            not accumulated.
+        overlap_thr : int
+            Minimum number of label voxels within the error margin of a
+            streamline for that label to be considered an endpoint.
+        endpoints_only : bool
+            If True, only the first and last points of each streamline are
+            labeled. Default is False.
+        cache_dir : str
+            Directory of the label neighborhood cache.
+        """
+        from pynets.core.utils import content_hash
+
+        atlas_data = np.asarray(atlas_data).astype("uint16")
+        self.shape = atlas_data.shape[:3]
+        self.lut, self.node_labels = label_neighborhoods(
+            atlas_data, error_margin, vox_dims, cache_dir)
+        # Identifies the accumulated state across processes (see `save`)
+        self.key = content_hash(
+            atlas_data, *([] if fa_data is None else [fa_data]),
+            error_margin=float(error_margin),
+            vox_dims=tuple(float(i) for i in vox_dims[:3]),
+            overlap_thr=overlap_thr, endpoints_only=endpoints_only,
+            fa=fa_data is not None, version=NEIGHBORHOOD_VERSION)
+        self.roi_volumes = np.bincount(atlas_data.ravel(), minlength=int(
+            atlas_data.max()) + 1)[self.node_labels]
+        self.fa_data = fa_data
+        self.overlap_thr = overlap_thr
+        self.endpoints_only = endpoints_only
+
+        n_nodes = len(self.node_labels)
+        self.counts = np.zeros((n_nodes, n_nodes))
+        self.length_sums = np.zeros((n_nodes, n_nodes))
+        self.fa_sums = np.zeros((n_nodes, n_nodes))
+        self.fa_counts = np.zeros((n_nodes, n_nodes))
+        self.fa_min = np.inf
+        self.fa_max = -np.inf
+        self.n_streamlines = 0
+
+    def add(self, streamlines, chunk_size=50000):
+        """
+        Add a batch of streamlines, in voxel coordinates, to the connectome.
+        """
+        from scipy import sparse
+        from dipy.tracking.streamline import Streamlines, values_from_volume
+
+        if not isinstance(streamlines, Streamlines):
+            streamlines = Streamlines(streamlines)
+
+        for start in range(0, len(streamlines), chunk_size):
+            chunk = streamlines[start:start + chunk_size]
+            points = chunk.get_data()
+            lengths = np.asarray(chunk._lengths, dtype=np.intp)
+            counts = streamline_label_counts(
+                points, lengths, self.lut, self.shape, self.endpoints_only)
+            counts.data = (counts.data >= self.overlap_thr).astype(
+                np.float64)
+            counts.eliminate_zeros()
+            ends = counts.T.tocsr()
+
+            self.counts += (ends @ counts).toarray()
+            self.length_sums += (ends @ sparse.diags(
+                lengths.astype(np.float64)) @ counts).toarray()
+
+            if self.fa_data is not None:
+                fa_vals = np.asarray(values_from_volume(
+                    self.fa_data, points[None, :, :],
+                    np.eye(4))[0], dtype=np.float64)
+                finite = np.isfinite(fa_vals)
+                if np.any(fa_vals[finite] > 0):
+                    self.fa_min = min(self.fa_min, np.min(
+                        fa_vals[finite][fa_vals[finite] > 0]))
+                if np.any(finite):
+                    self.fa_max = max(self.fa_max,
+                                      np.max(fa_vals[finite]))
+                sl_idx = np.repeat(np.arange(len(lengths)), lengths)
+                n_finite = np.bincount(sl_idx, weights=finite,
+                                       minlength=len(lengths))
+                fa_means = np.bincount(sl_idx, weights=np.where(
+                    finite, fa_vals, 0), minlength=len(lengths))
+                fa_means = np.divide(fa_means, n_finite,
+                                     out=np.zeros(len(lengths)),
+                                     where=n_finite > 0)
+                self.fa_sums += (ends @ sparse.diags(fa_means) @
+                                 counts).toarray()
+                self.fa_counts += (ends @ sparse.diags(
+                    (n_finite > 0).astype(np.float64)) @ counts).toarray()
+
+            self.n_streamlines += len(lengths)
+
+        return self
+
+    def save(self, path, tractogram=None):
+        """
+        Save the accumulated state, so that the connectome of a tractogram
+        can be restored without another pass over its streamlines.
+
+        Parameters
+        ----------
+        path : str
+            File path of the .npz state.
+        tractogram : str
+            File path to the tractogram holding the streamlines added so
+            far, whose size is recorded to detect stale states.
+        """
+        import os
+
+        tmp_file = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_file, key=self.key, counts=self.counts,
+                 length_sums=self.length_sums, fa_sums=self.fa_sums,
+                 fa_counts=self.fa_counts, fa_min=self.fa_min,
+                 fa_max=self.fa_max, n_streamlines=self.n_streamlines,
+                 tractogram_size=-1 if tractogram is None else
+                 os.path.getsize(tractogram))
+        os.replace(tmp_file, path)
+        return path
+
+    def restore(self, path, tractogram=None):
+        """
+        Restore a state saved by a connectome of identical atlas, FA and
+        parameters.
+
+        Returns
+        -------
+        restored : bool
+            False if the state is missing, stale, or was accumulated with
+            different inputs, in which case the connectome is unchanged.
+        """
+        import os
+
+        if not os.path.isfile(path):
+            return False
+        try:
+            with np.load(path) as state:
+                if str(state["key"]) != self.key:
+                    return False
+                if tractogram is not None and int(
+                    state["tractogram_size"]) != os.path.getsize(
+                        tractogram):
+                    return False
+                for attr in ["counts", "length_sums", "fa_sums",
+                             "fa_counts"]:
+                    setattr(self, attr, np.array(state[attr]))
+                self.fa_min = float(state["fa_min"])
+                self.fa_max = float(state["fa_max"])
+                self.n_streamlines = int(state["n_streamlines"])
+        except (OSError, ValueError, KeyError):
+            print(f"Ignoring unreadable connectome state: {path}")
+            return False
+        return True
+
+    def conn_matrix(self, fiber_density=True, fa_weighting=True):
+        """
+        Weighted adjacency matrix of the streamlines added so far.
+
+        Parameters
+        ----------
+        fiber_density : bool
+            If True, scale fiber counts by mean length relative to the volume
+            of ROI node pairs.
+        fa_weighting : bool
+            If True, scale edge weights by the average normalized FA along
+            the streamlines defining each edge.
+
+        Returns
+        -------
+        conn_matrix : array
+            Adjacency matrix stored as an m x n array of nodes and edges.
+
+        """
+        weight = self.counts.copy()
+        np.fill_diagonal(weight, 0)
+        edges = weight > 0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            final_weight = weight.copy()
+            if fiber_density is True:
+                # Adapted from the normalized fiber-density estimation
+                # routines of Sebastian Tourbier.
+                upper = np.triu(edges, 1)
+                total_fibers = float(np.count_nonzero(upper))
+                total_volume = float(np.sum(
+                    self.roi_volumes[upper.any(axis=1)]))
+                mean_length = self.length_sums / weight
+                pair_volume = self.roi_volumes[:, None] + \
+                    self.roi_volumes[None, :]
+                final_weight = ((weight / total_fibers) / mean_length) * \
+                    ((2.0 * total_volume) / pair_volume) * 1000
+
+            if fa_weighting is True:
+                if self.fa_data is None:
+                    raise ValueError("FA weighting requires that fa_data "
+                                     "be provided.")
+                # Here we normalize by global FA
+                fa_weight = ((self.fa_sums / self.fa_counts) - self.fa_min) \
+                    / (self.fa_max - self.fa_min)
+                final_weight = fa_weight * final_weight
+
+        final_weight[~edges] = 0
+        return np.maximum(final_weight, final_weight.T)
+
+
 def streams2graph(
     atlas_mni,
     streams,
@@ -531,20 +907,13 @@ def streams2graph(
       Analysis in Diffusion Tensor Imaging. Brain Connectivity.
       https://doi.org/10.1089/brain.2016.0481
     """
-    import gc
     import time
     import pkg_resources
-    import sys
     import yaml
-    from dipy.tracking.streamline import Streamlines, values_from_volume
-    from dipy.tracking._utils import _mapping_to_voxel, _to_voxel_coordinates
-    import networkx as nx
-    from itertools import combinations
-    from collections import defaultdict
-    from pynets.core import utils, nodemaker
-    from pynets.dmri.dmri_utils import generate_sl
     from dipy.io.streamline import load_tractogram
     from dipy.io.stateful_tractogram import Space, Origin
+    from pynets.dmri.estimation import (StreamlineConnectome,
+                                        connectome_state_path)
 
     with open(
         pkg_resources.resource_filename("pynets", "runconfig.yaml"), "r"
@@ -556,6 +925,8 @@ def streams2graph(
             "StructuralNetworkWeighting"]["fiber_density"][0]
         overlap_thr = hardcoded_params[
             "StructuralNetworkWeighting"]["overlap_thr"][0]
+        endpoints_only = hardcoded_params[
+            "StructuralNetworkWeighting"]["endpoints_only"][0]
         roi_neighborhood_tol = \
         hardcoded_params['tracking']["roi_neighborhood_tol"][0]
     stream.close()
@@ -576,208 +947,44 @@ def streams2graph(
     roi_img = nib.load(atlas_mni)
     atlas_data = np.around(np.asarray(roi_img.dataobj))
     roi_zooms = roi_img.header.get_zooms()
-    roi_shape = roi_img.shape
-
-    # Read Streamlines
-    streamlines = [
-        i.astype(np.float32)
-        for i in Streamlines(
-            load_tractogram(
-                streams,
-                fa_img,
-                to_origin=Origin.NIFTI,
-                to_space=Space.VOXMM
-            ).streamlines
-        )
-    ]
-
-    # from fury import actor, window
-    # renderer = window.Renderer()
-    # template_actor = actor.contour_from_roi(roi_img.get_fdata(),
-    #                                         color=(50, 50, 50), opacity=0.05)
-    # renderer.add(template_actor)
-    # lines_actor = actor.streamtube(streamlines, window.colors.orange,
-    #                                linewidth=0.3)
-    # renderer.add(lines_actor)
-    # window.show(renderer)
-
     roi_img.uncache()
 
     if fa_wei is True:
-        fa_weights = values_from_volume(
-            np.asarray(fa_img.dataobj, dtype=np.float32),
-            streamlines, np.eye(4)
-        )
-        global_fa_weights = list(utils.flatten(fa_weights))
-        min_global_fa_wei = min([i for i in global_fa_weights if i > 0])
-        max_global_fa_wei = max(global_fa_weights)
-        fa_weights_norm = []
-        # Here we normalize by global FA
-        for val_list in fa_weights:
-            fa_weights_norm.append(
-                np.nanmean(
-                    (val_list - min_global_fa_wei)
-                    / (max_global_fa_wei - min_global_fa_wei)
-                )
-            )
-
-    # Make streamlines into generators to keep memory at a minimum
-    total_streamlines = len(streamlines)
-    sl = [generate_sl(i) for i in streamlines]
-    del streamlines
-
-    # Instantiate empty networkX graph object & dictionary and create
-    # voxel-affine mapping
-    lin_T, offset = _mapping_to_voxel(np.eye(4))
-    mx = len(np.unique(atlas_data.astype("uint16"))) - 1
-    g = nx.Graph(ecount=0, vcount=mx)
-    edge_dict = defaultdict(int)
-    node_dict = dict(
-        zip(np.unique(atlas_data.astype("uint16"))[1:], np.arange(mx) + 1))
-
-    # Add empty vertices with label volume attributes
-    for node in range(1, mx + 1):
-        g.add_node(node, roi_volume=np.sum(
-            atlas_data.astype("uint16") == node)
-                   )
-
-    # Build graph
-    pc = 0
-    bad_idxs = []
-    fiberlengths = {}
-    fa_weights_dict = {}
-    print(f"Quantifying fiber-ROI intersection for {atlas}:")
-    for ix, s in enumerate(sl):
-        # Percent counter
-        pcN = int(round(100*float(ix / total_streamlines)))
-        if pcN % 10 == 0 and ix > 0 and pcN > pc:
-            pc = pcN
-            print(f"{pcN}%")
-
-        # Map the streamlines coordinates to voxel coordinates and get labels
-        # for label_volume
-        vox_coords = _to_voxel_coordinates(Streamlines(s), lin_T, offset)
-
-        lab_coords = [
-            nodemaker.get_sphere(coord, error_margin, roi_zooms, roi_shape)
-            for coord in vox_coords
-        ]
-        [i, j, k] = np.vstack(np.array(lab_coords)).T
-
-        # get labels for label_volume
-        lab_arr = atlas_data[i, j, k]
-        # print(lab_arr)
-        endlabels = []
-        for jx, lab in enumerate(np.unique(lab_arr).astype("uint32")):
-            if (lab > 0) and (np.sum(lab_arr == lab) >= overlap_thr):
-                try:
-                    endlabels.append(node_dict[lab])
-                except BaseException:
-                    bad_idxs.append(jx)
-                    print(
-                        f"Label {lab} missing from parcellation. Check "
-                        f"registration and ensure valid input parcellation "
-                        f"file.")
-
-        edges = combinations(endlabels, 2)
-        for edge in edges:
-            # Get fiber lengths along edge
-            if fiber_density is True:
-                if not (edge[0], edge[1]) in fiberlengths.keys():
-                    fiberlengths[(edge[0], edge[1])] = [len(vox_coords)]
-                else:
-                    fiberlengths[(edge[0], edge[1])].append(len(vox_coords))
-
-            # Get FA values along edge
-            if fa_wei is True:
-                if not (edge[0], edge[1]) in fa_weights_dict.keys():
-                    fa_weights_dict[(edge[0],
-                                     edge[1])] = [fa_weights_norm[ix]]
-                else:
-                    fa_weights_dict[(edge[0],
-                                     edge[1])].append(fa_weights_norm[ix])
-
-            lst = tuple([int(node) for node in edge])
-            edge_dict[tuple(sorted(lst))] += 1
-
-        edge_list = [(k[0], k[1], count) for k, count in edge_dict.items()]
-
-        g.add_weighted_edges_from(edge_list)
-
-        del lab_coords, lab_arr, endlabels, edges, edge_list
-
-    gc.collect()
+        fa_data = np.asarray(fa_img.dataobj, dtype=np.float32)
+    else:
+        fa_data = None
+
+    # Label lookups of all streamline points are batched against the
+    # dilated atlas, and edges are accumulated as sparse products
+    connectome = StreamlineConnectome(atlas_data, error_margin, roi_zooms,
+                                      fa_data=fa_data,
+                                      overlap_thr=overlap_thr,
+                                      endpoints_only=endpoints_only)
+    del atlas_data, fa_data
+
+    # The connectome may already have been accumulated during tracking
+    if connectome.restore(connectome_state_path(streams), streams) is True:
+        print(f"Restored fiber-ROI intersection for {atlas} from tracking.")
+    else:
+        print(f"Quantifying fiber-ROI intersection for {atlas}:")
+        streamlines = load_tractogram(
+            streams,
+            fa_img,
+            to_origin=Origin.NIFTI,
+            to_space=Space.VOXMM
+        ).streamlines
+        connectome.add(streamlines)
+        del streamlines
 
-    # Add fiber density attributes for each edge
-    # Adapted from the nnormalized fiber-density estimation routines of
-    # Sebastian Tourbier.
     if fiber_density is True:
         print("Weighting edges by fiber density...")
-        # Summarize total fibers and total label volumes
-        total_fibers = 0
-        total_volume = 0
-        u_start = -1
-        for u, v, d in g.edges(data=True):
-            total_fibers += len(d)
-            if u != u_start:
-                total_volume += g.nodes[int(u)]['roi_volume']
-            u_start = u
-
-        ix = 0
-        for u, v, d in g.edges(data=True):
-            if d['weight'] > 0:
-                edge_fiberlength_mean = np.nanmean(fiberlengths[(u, v)])
-                fiber_density = (float(((float(d['weight']) /
-                                         float(total_fibers)) /
-                       float(edge_fiberlength_mean)) *
-                      ((2.0 * float(total_volume)) /
-                       (g.nodes[int(u)]['roi_volume'] +
-                        g.nodes[int(v)]['roi_volume'])))) * 1000
-            else:
-                fiber_density = 0
-            g.edges[u, v].update({"fiber_density": fiber_density})
-            ix += 1
-
     if fa_wei is True:
         print("Weighting edges by FA...")
-        # Add FA attributes for each edge
-        ix = 0
-        for u, v, d in g.edges(data=True):
-            if d['weight'] > 0:
-                edge_average_fa = np.nanmean(fa_weights_dict[(u, v)])
-            else:
-                edge_average_fa = np.nan
-            g.edges[u, v].update({"fa_weight": edge_average_fa})
-            ix += 1
-
-    # Summarize weights
-    if fa_wei is True and fiber_density is True:
-        for u, v, d in g.edges(data=True):
-            g.edges[u, v].update({"final_weight":
-                                      (d['fa_weight'])*d['fiber_density']})
-    elif fiber_density is True and fa_wei is False:
-        for u, v, d in g.edges(data=True):
-            g.edges[u, v].update({"final_weight": d['fiber_density']})
-    elif fa_wei is True and fiber_density is False:
-        for u, v, d in g.edges(data=True):
-            g.edges[u, v].update({"final_weight": d['fa_weight']*d['weight']})
-    else:
-        for u, v, d in g.edges(data=True):
-            g.edges[u, v].update({"final_weight": d['weight']})
-
-    # Convert weighted graph to numpy matrix
-    conn_matrix_raw = nx.to_numpy_array(g, weight='final_weight')
-
-    # Enforce symmetry
-    conn_matrix = np.maximum(conn_matrix_raw, conn_matrix_raw.T)
+    conn_matrix = connectome.conn_matrix(fiber_density=fiber_density,
+                                         fa_weighting=fa_wei)
 
     print("Structural graph completed:\n", str(time.time() - start))
 
-    if len(bad_idxs) > 0:
-        bad_idxs = sorted(list(set(bad_idxs)), reverse=True)
-        for j in bad_idxs:
-            del labels[j], coords[j]
-
     coords = np.array(coords)
     labels = np.array(labels)
 
@@ -14,6 +14,14 @@ if sys.platform.startswith('win') is False:
 
 warnings.filterwarnings("ignore")
 
+# Order in which tissue images are staged for the tracking workers
+TRACKING_TISSUES = ["B0_mask", "atlas", "seeding_mask", "t1w2dwi",
+                    "gm_in_dwi", "vent_csf_in_dwi", "wm_in_dwi"]
+
+# Inputs of the current tracking run, held by each tracking worker process
+# across seed batches (see `_tracking_context`)
+_TRACKING_CONTEXT = {}
+
 
 def reconstruction(conn_model, gtab, dwi_data, B0_mask):
     """
@@ -213,6 +221,7 @@ def create_density_map(
     min_length,
     error_margin,
     namer_dir,
+    dm=None
 ):
     """
     Create a density map of the list of streamlines.
@@ -247,6 +256,9 @@ def create_density_map(
         closest (clos), boot (bootstrapped), and prob (probabilistic).
     min_length : int
         Minimum fiber length threshold in mm to restrict tracking.
+    dm : ndarray
+        Precomputed density map (e.g. by a `StreamlineAccumulator`), in
+        which case `streamlines` is ignored.
 
     Returns
     -------
@@ -263,10 +275,11 @@ def create_density_map(
     from dipy.tracking import utils
 
     # Create density map
-    dm = utils.density_map(
-        streamlines,
-        affine=np.eye(4),
-        vol_dims=dwi_img.shape)
+    if dm is None:
+        dm = utils.density_map(
+            streamlines,
+            affine=np.eye(4),
+            vol_dims=dwi_img.shape)
 
     # Save density map
     dm_img = nib.Nifti1Image(dm.astype("float32"), dwi_img.affine)
@@ -307,6 +320,326 @@ def create_density_map(
     return dir_path, dm_path
 
 
+def connectome_change(previous, current, metric="tv"):
+    """
+    Change in connectome edge weights between two rounds of tracking.
+
+    Parameters
+    ----------
+    previous : array
+        Adjacency matrix of the previous round.
+    current : array
+        Adjacency matrix of the current round.
+    metric : str
+        'tv' for the total variation distance between the edge weights, each
+        normalized to sum to one, or 'corr' for one minus the Pearson
+        correlation of the edge weights.
+
+    Returns
+    -------
+    change : float
+        Change between 0 (identical) and 1 (or 2 for anticorrelated edge
+        weights with 'corr').
+
+    """
+    iu = np.triu_indices_from(current, 1)
+    prev = np.asarray(previous, dtype=np.float64)[iu]
+    curr = np.asarray(current, dtype=np.float64)[iu]
+    if metric == "tv":
+        if prev.sum() == 0 or curr.sum() == 0:
+            return 1.0
+        return float(0.5 * np.sum(np.abs(prev / prev.sum() -
+                                         curr / curr.sum())))
+    elif metric == "corr":
+        if np.std(prev) == 0 or np.std(curr) == 0:
+            return 1.0
+        return float(1 - np.corrcoef(prev, curr)[0, 1])
+    else:
+        raise ValueError(f"Convergence metric {metric} not recognized!")
+
+
+class SeedScheduler(object):
+    """
+    Adaptive allocation of tracking seeds. Each round, seeds are shared
+    across the ensemble cells (i.e. combinations of direction getter, step
+    size and curvature threshold) in proportion to their streamline
+    acceptance rates, and are drawn preferentially from the parcels that are
+    least covered by the connectome tracked so far.
+    """
+
+    def __init__(self, cells, seeding_data, atlas_data, seeds_per_round,
+                 min_share=0.25, min_seeds=100, random_state=None):
+        """
+        Parameters
+        ----------
+        cells : list
+            Tuples of (directget, step, curvature) ensemble cells.
+        seeding_data : array
+            3D seeding mask.
+        atlas_data : array
+            3D atlas parcellation, in the space of the seeding mask.
+        seeds_per_round : int
+            Total number of seeds to allocate per round.
+        min_share : float
+            Fraction of an even share of seeds that every cell is allocated,
+            whatever its acceptance rate, so that no cell is abandoned.
+        min_seeds : int
+            Minimum number of seeds per cell and round.
+        random_state : int or RandomState
+            Random state of the seed draws.
+        """
+        self.cells = list(cells)
+        self.seeds_per_round = int(seeds_per_round)
+        self.min_share = float(min_share)
+        self.min_seeds = int(min_seeds)
+        self.rng = np.random.RandomState(random_state) if not \
+            isinstance(random_state, np.random.RandomState) else random_state
+        self.seeded = {cell: 0 for cell in self.cells}
+        self.accepted = {cell: 0 for cell in self.cells}
+
+        self.seed_voxels = np.argwhere(np.asarray(seeding_data) > 0)
+        atlas_data = np.asarray(atlas_data).astype("uint16")
+        self.node_labels = np.unique(atlas_data[atlas_data > 0])
+        self.voxel_nodes = np.searchsorted(
+            self.node_labels, atlas_data[tuple(self.seed_voxels.T)])
+        self.voxel_nodes[atlas_data[tuple(self.seed_voxels.T)] == 0] = -1
+        self.node_volumes = np.bincount(
+            np.searchsorted(self.node_labels, atlas_data[atlas_data > 0]),
+            minlength=len(self.node_labels))
+        self.voxel_weights = np.ones(len(self.seed_voxels))
+
+    def acceptance_rates(self):
+        """
+        Acceptance rate of each cell, with a uniform prior.
+        """
+        return {cell: (self.accepted[cell] + 1) / (self.seeded[cell] + 2)
+                for cell in self.cells}
+
+    def allocate(self):
+        """
+        Number of seeds to track in each cell on the next round.
+        """
+        rates = np.array(list(self.acceptance_rates().values()))
+        floor = self.min_share / len(self.cells)
+        shares = floor + (1 - floor * len(self.cells)) * rates / rates.sum()
+        n_seeds = np.maximum(np.round(shares * self.seeds_per_round),
+                             self.min_seeds).astype(int)
+        return dict(zip(self.cells, n_seeds.tolist()))
+
+    def draw_seeds(self, n_seeds):
+        """
+        Draw seed points, in voxel coordinates, from the seeding mask.
+        """
+        prob = self.voxel_weights / self.voxel_weights.sum()
+        idx = self.rng.choice(len(self.seed_voxels), size=int(n_seeds),
+                              p=prob)
+        return self.seed_voxels[idx] + self.rng.uniform(
+            -0.5, 0.5, size=(int(n_seeds), 3))
+
+    def update(self, cell, n_seeds, n_accepted):
+        """
+        Record the number of streamlines accepted from a batch of seeds.
+        """
+        self.seeded[cell] += int(n_seeds)
+        self.accepted[cell] += int(n_accepted)
+
+    def update_coverage(self, conn_matrix):
+        """
+        Reweight seeding toward the parcels with the fewest streamlines per
+        voxel in the connectome tracked so far.
+        """
+        density = np.asarray(conn_matrix).sum(axis=1) / \
+            np.maximum(self.node_volumes, 1)
+        if density.mean() > 0:
+            node_weights = 1 / (1 + density / density.mean())
+        else:
+            node_weights = np.ones(len(density))
+        self.voxel_weights = np.where(
+            self.voxel_nodes >= 0,
+            node_weights[np.maximum(self.voxel_nodes, 0)], 0.5)
+
+
+class StreamlineAccumulator(object):
+    """
+    Bounded-memory store of the streamlines accepted during tracking. Each
+    batch is appended to an on-disk hdf5 array sequence, and the streamline
+    density map and any number of connectomes are updated as batches
+    arrive, such that neither requires another pass over the tractogram.
+    """
+
+    def __init__(self, out_file, reference=None, connectomes=None,
+                 chunk_size=10000):
+        """
+        Parameters
+        ----------
+        out_file : str
+            File path to the hdf5 store.
+        reference : Nifti1Image
+            Image in whose space (VOXMM) the streamlines are tracked. If
+            provided, streamlines falling outside of its bounding box are
+            rejected, as by `StatefulTractogram.remove_invalid_streamlines`,
+            and a density map is accumulated.
+        connectomes : dict
+            StreamlineConnectome objects to update with every batch.
+        chunk_size : int
+            Number of streamlines per chunk when iterating.
+        """
+        import h5py
+
+        self.out_file = out_file
+        self.reference = reference
+        self.connectomes = {} if connectomes is None else connectomes
+        self.chunk_size = int(chunk_size)
+        self._h5 = h5py.File(out_file, "w")
+        self._h5.create_dataset("data", shape=(0, 3), maxshape=(None, 3),
+                                dtype="float32", chunks=(65536, 3))
+        self._h5.create_dataset("lengths", shape=(0,), maxshape=(None,),
+                                dtype="int64", chunks=(65536,))
+        self.n_points = 0
+        if reference is not None:
+            self.density = np.zeros(reference.shape[:3], dtype="int64")
+        else:
+            self.density = None
+
+    def __len__(self):
+        return int(self._h5["lengths"].shape[0])
+
+    def _valid(self, streamlines):
+        """
+        Streamlines with all points inside the reference bounding box.
+        """
+        lengths = np.asarray(streamlines._lengths)
+        if self.reference is None or len(lengths) == 0:
+            return np.ones(len(lengths), dtype="bool")
+        epsilon = 1e-3
+        vox = streamlines.get_data() / np.asarray(
+            self.reference.header.get_zooms()[:3]) + 0.5
+        invalid_points = (np.min(vox, axis=1) < epsilon) | np.any(
+            vox > np.asarray(self.reference.shape[:3]) - epsilon, axis=1)
+        sl_idx = np.repeat(np.arange(len(lengths)), lengths)
+        return np.bincount(sl_idx, weights=invalid_points,
+                           minlength=len(lengths)) == 0
+
+    def add(self, streamlines):
+        """
+        Append a batch of streamlines to the store.
+
+        Returns
+        -------
+        n_added : int
+            Number of streamlines added.
+        """
+        from nibabel.streamlines.array_sequence import ArraySequence
+
+        if not isinstance(streamlines, ArraySequence):
+            streamlines = ArraySequence(streamlines)
+        streamlines = streamlines[np.where(self._valid(streamlines))[0]]
+        if len(streamlines) == 0:
+            return 0
+
+        data = np.asarray(streamlines.get_data(), dtype="float32")
+        lengths = np.asarray(streamlines._lengths, dtype="int64")
+        n_streamlines = len(self)
+        self._h5["data"].resize((self.n_points + len(data), 3))
+        self._h5["data"][self.n_points:] = data
+        self._h5["lengths"].resize((n_streamlines + len(lengths),))
+        self._h5["lengths"][n_streamlines:] = lengths
+        self.n_points += len(data)
+
+        if self.density is not None:
+            # Each streamline counts once per voxel that it visits
+            vox = np.floor(data + 0.5).astype(np.intp)
+            inside = np.all((vox >= 0) & (vox < self.density.shape), axis=1)
+            sl_idx = np.repeat(np.arange(len(lengths)), lengths)
+            n_voxels = self.density.size
+            visits = np.unique(sl_idx[inside] * n_voxels +
+                               np.ravel_multi_index(tuple(vox[inside].T),
+                                                    self.density.shape))
+            self.density += np.bincount(
+                visits % n_voxels, minlength=n_voxels).reshape(
+                self.density.shape)
+
+        for connectome in self.connectomes.values():
+            connectome.add(streamlines)
+
+        return len(lengths)
+
+    def iter_chunks(self, chunk_size=None):
+        """
+        Iterate over the stored streamlines, in ArraySequence chunks.
+        """
+        from nibabel.streamlines.array_sequence import ArraySequence
+
+        chunk_size = self.chunk_size if chunk_size is None else \
+            int(chunk_size)
+        lengths = self._h5["lengths"][:]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        for start in range(0, len(lengths), chunk_size):
+            stop = min(start + chunk_size, len(lengths))
+            chunk = ArraySequence()
+            chunk._data = self._h5["data"][offsets[start]:offsets[stop]]
+            chunk._offsets = offsets[start:stop] - offsets[start]
+            chunk._lengths = lengths[start:stop]
+            yield chunk
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            for streamline in chunk:
+                yield streamline
+
+    def streamlines(self):
+        """
+        Load all stored streamlines into memory.
+        """
+        from nibabel.streamlines.array_sequence import ArraySequence, \
+            concatenate
+
+        chunks = list(self.iter_chunks())
+        if len(chunks) == 0:
+            return ArraySequence()
+        return concatenate(chunks, axis=0)
+
+    def save(self, out_file, reference):
+        """
+        Stream the stored streamlines to a .trk or .tck tractogram, one chunk
+        at a time, in the same way as `dipy.io.streamline.save_tractogram`
+        with streamlines in VOXMM space and NIFTI origin.
+        """
+        from dipy.io.stateful_tractogram import Space, StatefulTractogram, \
+            Origin
+        from dipy.io.utils import create_tractogram_header, \
+            get_reference_info
+        from nibabel.streamlines import detect_format, LazyTractogram
+
+        def _rasmm_streamlines():
+            for chunk in self.iter_chunks():
+                sft = StatefulTractogram(chunk, reference, origin=Origin.NIFTI,
+                                         space=Space.VOXMM)
+                sft.to_rasmm()
+                sft.to_center()
+                for streamline in sft.streamlines:
+                    yield streamline
+
+        tractogram_type = detect_format(out_file)
+        header = create_tractogram_header(tractogram_type,
+                                          *get_reference_info(reference))
+        tractogram = LazyTractogram(lambda: _rasmm_streamlines(),
+                                    affine_to_rasmm=np.eye(4))
+        nib.streamlines.save(tractogram, out_file, header=header)
+        return out_file
+
+    def close(self, remove=False):
+        """
+        Close the hdf5 store, and optionally delete it.
+        """
+        import os
+
+        if self._h5.id.valid:
+            self._h5.close()
+        if remove is True and os.path.isfile(self.out_file):
+            os.remove(self.out_file)
+
+
 def track_ensemble(
     target_samples,
     atlas_data_wm_gm_int,
@@ -327,7 +660,9 @@ def track_ensemble(
     vent_csf_in_dwi,
     wm_in_dwi,
     tiss_class,
-    cache_dir
+    cache_dir,
+    accumulator=None,
+    error_margin=None
 ):
     """
     Perform native-space ensemble tractography, restricted to a vector of ROI
@@ -391,11 +726,22 @@ def track_ensemble(
         Number of particles to use in the particle filter.
     min_separation_angle : float
         The minimum angle between directions [0, 90].
+    accumulator : StreamlineAccumulator
+        Store to which accepted streamlines are streamed. If None, the
+        streamlines are accumulated in a temporary store, and returned in
+        memory.
+    error_margin : int
+        Euclidean margin of error, in mm, of the structural connectome whose
+        edge weights steer adaptive seeding and the convergence-based
+        stopping rule. Required if either is enabled in runconfig.yaml,
+        unless `accumulator` already updates a `streams2graph` connectome.
+        If a list, the smallest margin is used.
 
     Returns
     -------
-    streamlines : ArraySequence
-        DiPy list/array-like object of streamline points from tractography.
+    streamlines : ArraySequence or StreamlineAccumulator
+        DiPy list/array-like object of streamline points from tractography,
+        or the `accumulator` if provided.
 
     References
     ----------
@@ -412,11 +758,12 @@ def track_ensemble(
     import shutil
     from joblib import Parallel, delayed
     import itertools
-    from pynets.dmri.track import run_tracking
+    from pynets.dmri.track import run_tracking, prepare_tracking_context, \
+        release_tracking_context, SeedScheduler, StreamlineAccumulator, \
+        connectome_change
+    from pynets.dmri.estimation import StreamlineConnectome
     from colorama import Fore, Style
-    from pynets.dmri.dmri_utils import generate_sl
     from nibabel.streamlines.array_sequence import concatenate, ArraySequence
-    from pynets.core.utils import save_3d_to_4d
     from nilearn.masking import intersect_masks
     from nilearn.image import math_img
 
@@ -440,6 +787,18 @@ def track_ensemble(
             hardcoded_params['tracking']["particle_count"][0]
         min_separation_angle = \
             hardcoded_params['tracking']["min_separation_angle"][0]
+        adaptive_seeding = \
+            hardcoded_params['tracking']["adaptive_seeding"][0]
+        convergence_tol = \
+            hardcoded_params['tracking']["convergence_tol"][0]
+        convergence_metric = \
+            hardcoded_params['tracking']["convergence_metric"][0]
+        convergence_patience = \
+            hardcoded_params['tracking']["convergence_patience"][0]
+        overlap_thr = hardcoded_params[
+            "StructuralNetworkWeighting"]["overlap_thr"][0]
+        endpoints_only = hardcoded_params[
+            "StructuralNetworkWeighting"]["endpoints_only"][0]
     stream.close()
 
     all_combs = list(itertools.product(step_list, curv_thr_list))
@@ -468,216 +827,425 @@ def track_ensemble(
         )
         nib.save(atlas_data_wm_gm_int_img, seeding_mask)
 
-    tissues4d = save_3d_to_4d([B0_mask, labels_im_file, seeding_mask,
-                               t1w2dwi, gm_in_dwi, vent_csf_in_dwi, wm_in_dwi])
+    # Stage the inputs once, to be memory-mapped by each worker of the pool
+    context = prepare_tracking_context(
+        recon_path, [B0_mask, labels_im_file, seeding_mask, t1w2dwi,
+                     gm_in_dwi, vent_csf_in_dwi, wm_in_dwi],
+        waymask, f"{cache_dir}/context")
+
+    # Accepted streamlines are streamed to disk, to bound memory use
+    if accumulator is None:
+        streams_store = StreamlineAccumulator(f"{cache_dir}/streamlines.h5")
+    else:
+        streams_store = accumulator
+
+    # The connectome is accumulated round by round, to steer seeding
+    # toward under-covered parcels and to detect convergence of its edge
+    # weights. That which streams2graph will save is used if available.
+    # Otherwise, one is estimated with the same parameters from the
+    # streamlines accepted by the store.
+    track_connectome = adaptive_seeding is True or float(convergence_tol) > 0
+    connectome = streams_store.connectomes.get("streams2graph")
+    if track_connectome is True and connectome is None:
+        if error_margin is None:
+            raise ValueError("An error_margin is required for adaptive "
+                             "seeding and convergence-based stopping.")
+        if isinstance(error_margin, list):
+            error_margin = min(error_margin)
+        connectome = StreamlineConnectome(
+            np.asarray(np.load(context["atlas"], mmap_mode="r")),
+            error_margin, nib.load(labels_im_file).header.get_zooms(),
+            overlap_thr=overlap_thr, endpoints_only=endpoints_only)
+        streams_store.connectomes["convergence"] = connectome
+    if adaptive_seeding is True:
+        scheduler = SeedScheduler(
+            [(directget,) + i for i in all_combs],
+            np.load(context["seeding_mask"], mmap_mode="r"),
+            np.asarray(np.load(context["atlas"], mmap_mode="r")),
+            n_seeds_per_iter * len(all_combs))
+    else:
+        scheduler = None
+    conn_matrix = None
+    converged_rounds = 0
 
     # Commence Ensemble Tractography
     start = time.time()
     stream_counter = 0
-
-    all_streams = []
     ix = 0
-    while float(stream_counter) < float(target_samples) and \
-        float(ix) < 0.50*float(len(all_combs)):
-        with Parallel(n_jobs=nthreads, backend='loky',
-                      mmap_mode='r+', temp_folder=cache_dir,
+    try:
+        # The worker pool persists across iterations, such that each worker
+        # builds its tracking inputs only once
+        with Parallel(n_jobs=nthreads, backend='loky', temp_folder=cache_dir,
                       verbose=10) as parallel:
-            out_streams = parallel(
-                delayed(run_tracking)(
-                    i, recon_path, n_seeds_per_iter, directget, maxcrossing,
-                    max_length, pft_back_tracking_dist,
-                    pft_front_tracking_dist, particle_count,
-                    roi_neighborhood_tol, waymask, min_length,
-                    track_type, min_separation_angle, sphere, tiss_class,
-                    tissues4d, cache_dir) for i in
-                all_combs)
-
-            out_streams = [i for i in out_streams if i is not None and i is
-                           not ArraySequence() and len(i) > 0]
-
-            if len(out_streams) > 1:
-                out_streams = concatenate(out_streams, axis=0)
-
-            if len(out_streams) < 100:
-                ix += 1
-                print("Fewer than 100 streamlines tracked on last iteration."
-                      " loosening tolerance and anatomical constraints...")
-                if track_type != 'particle':
-                    tiss_class = 'wb'
-                roi_neighborhood_tol = float(roi_neighborhood_tol) * 1.05
-                min_length = float(min_length) * 0.95
-                continue
-            else:
-                ix -= 1
-
-            # Append streamline generators to prevent exponential growth
-            # in memory consumption
-            all_streams.extend([generate_sl(i) for i in out_streams])
-            stream_counter += len(out_streams)
-            del out_streams
-
-            print(
-                "%s%s%s%s"
-                % (
-                    "\nCumulative Streamline Count: ",
-                    Fore.CYAN,
-                    stream_counter,
-                    "\n",
+            while float(stream_counter) < float(target_samples) and \
+                float(ix) < 0.50*float(len(all_combs)):
+                if scheduler is not None:
+                    allocation = scheduler.allocate()
+                    batch_seeds = [scheduler.draw_seeds(
+                        allocation[(directget,) + i]) for i in all_combs]
+                else:
+                    batch_seeds = [None] * len(all_combs)
+
+                out_streams = parallel(
+                    delayed(run_tracking)(
+                        i, context, n_seeds_per_iter, directget, maxcrossing,
+                        max_length, pft_back_tracking_dist,
+                        pft_front_tracking_dist, particle_count,
+                        roi_neighborhood_tol, min_length,
+                        track_type, min_separation_angle, sphere, tiss_class,
+                        seeds=seeds)
+                    for i, seeds in zip(all_combs, batch_seeds))
+
+                if scheduler is not None:
+                    for i, seeds, streams in zip(all_combs, batch_seeds,
+                                                 out_streams):
+                        scheduler.update(
+                            (directget,) + i, len(seeds),
+                            0 if streams is None else len(streams))
+
+                out_streams = [i for i in out_streams if i is not None and i is
+                               not ArraySequence() and len(i) > 0]
+
+                if len(out_streams) > 1:
+                    out_streams = concatenate(out_streams, axis=0)
+
+                if len(out_streams) < 100:
+                    ix += 1
+                    print("Fewer than 100 streamlines tracked on last "
+                          "iteration. loosening tolerance and anatomical "
+                          "constraints...")
+                    if track_type != 'particle':
+                        tiss_class = 'wb'
+                    roi_neighborhood_tol = float(roi_neighborhood_tol) * 1.05
+                    min_length = float(min_length) * 0.95
+                    continue
+                else:
+                    ix -= 1
+
+                # Only streamlines that pass the store's validity filter count
+                # toward target_samples
+                stream_counter += streams_store.add(out_streams)
+                del out_streams
+
+                print(
+                    "%s%s%s%s"
+                    % (
+                        "\nCumulative Streamline Count: ",
+                        Fore.CYAN,
+                        stream_counter,
+                        "\n",
+                    )
                 )
-            )
-            gc.collect()
-            print(Style.RESET_ALL)
+                gc.collect()
+                print(Style.RESET_ALL)
+
+                if track_connectome is False:
+                    continue
+                prev_conn_matrix = conn_matrix
+                conn_matrix = connectome.conn_matrix(fiber_density=False,
+                                                     fa_weighting=False)
+                if scheduler is not None:
+                    scheduler.update_coverage(conn_matrix)
+                if prev_conn_matrix is not None and float(convergence_tol) > 0:
+                    change = connectome_change(prev_conn_matrix, conn_matrix,
+                                               convergence_metric)
+                    print(f"Change in connectome edge weights: {change:.4f}")
+                    if change < float(convergence_tol):
+                        converged_rounds += 1
+                    else:
+                        converged_rounds = 0
+                    if converged_rounds >= int(convergence_patience):
+                        print(f"Connectome edge weights converged after "
+                              f"{stream_counter} streamlines.")
+                        break
+    finally:
+        # Release the inputs held by this process and by each worker
+        release_tracking_context(nthreads, cache_dir)
+
+    streams_store.connectomes.pop("convergence", None)
 
     if ix >= 0.75*len(all_combs) and \
         float(stream_counter) < float(target_samples):
         print(f"Tractography failed. >{len(all_combs)} consecutive sampling "
               f"iterations with <50 streamlines. Are you using a waymask? "
               f"If so, it may be too restrictive.")
-        return ArraySequence()
+        if accumulator is None:
+            streams_store.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return ArraySequence() if accumulator is None else accumulator
     else:
         print("Tracking Complete: ", str(time.time() - start))
 
     del parallel, all_combs
-    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if accumulator is not None:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return accumulator
 
     if stream_counter != 0:
         print('Generating final ArraySequence...')
-        return ArraySequence([ArraySequence(i) for i in all_streams])
+        streamlines = streams_store.streamlines()
     else:
         print('No streamlines generated!')
-        return ArraySequence()
+        streamlines = ArraySequence()
+    streams_store.close()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return streamlines
 
 
-def run_tracking(step_curv_combinations, recon_path,
-                 n_seeds_per_iter, directget, maxcrossing, max_length,
-                 pft_back_tracking_dist, pft_front_tracking_dist,
-                 particle_count, roi_neighborhood_tol, waymask, min_length,
-                 track_type, min_separation_angle, sphere, tiss_class,
-                 tissues4d, cache_dir, min_seeds=100):
+def prepare_tracking_context(recon_path, tissue_files, waymask, out_dir):
+    """
+    Stage the inputs of ensemble tractography as uncompressed arrays, which
+    the tracking workers map into memory once and share without copying,
+    rather than reloading and copying them for every seed batch.
 
-    import gc
+    Parameters
+    ----------
+    recon_path : str
+        File path to diffusion reconstruction model.
+    tissue_files : list
+        File paths to the B0 mask, atlas parcellation, seeding mask, T1w
+        mask, grey-matter, ventricular CSF, and white-matter images in native
+        diffusion space, in the order of `TRACKING_TISSUES`.
+    waymask : str
+        File path to the tractography constraint mask, or None.
+    out_dir : str
+        Directory in which to stage the arrays.
+
+    Returns
+    -------
+    context : dict
+        File paths of the staged arrays, along with a unique `token`
+        identifying the tracking run.
+
+    """
     import os
+    import uuid
     import h5py
-    from dipy.tracking import utils
-    from dipy.tracking.streamline import select_by_rois
-    from dipy.tracking.local_tracking import LocalTracking, \
-        ParticleFilteringTracking
+
+    os.makedirs(out_dir, exist_ok=True)
+    context = {"token": uuid.uuid4().hex}
+
+    with h5py.File(recon_path, 'r') as hf:
+        # Staged in the precision dipy consumes, so that the workers can map
+        # it without copying
+        np.save(f"{out_dir}/reconstruction.npy",
+                np.asarray(hf['reconstruction'][:], dtype=np.float64))
+    hf.close()
+    context["reconstruction"] = f"{out_dir}/reconstruction.npy"
+
+    for name, tissue_file in zip(TRACKING_TISSUES, tissue_files):
+        tissue_img = nib.load(tissue_file)
+        np.save(f"{out_dir}/{name}.npy",
+                np.asarray(tissue_img.dataobj, dtype=np.float32))
+        context[name] = f"{out_dir}/{name}.npy"
+    np.save(f"{out_dir}/affine.npy", tissue_img.affine)
+    context["affine"] = f"{out_dir}/affine.npy"
+
+    if waymask is not None and os.path.isfile(waymask):
+        np.save(f"{out_dir}/waymask.npy",
+                np.asarray(nib.load(waymask).dataobj).astype("bool"))
+        context["waymask"] = f"{out_dir}/waymask.npy"
+    else:
+        context["waymask"] = None
+
+    return context
+
+
+def _tracking_context(context, tiss_class):
+    """
+    Inputs of the current tracking run, loaded by each worker process for
+    its first seed batch and reused for all subsequent ones.
+    """
+    from pynets.dmri.track import prep_tissues
+
+    if _TRACKING_CONTEXT.get("token") != context["token"]:
+        _TRACKING_CONTEXT.clear()
+        tissues = {name: np.load(context[name], mmap_mode="r") for name in
+                   TRACKING_TISSUES}
+
+        # Build mask vector from atlas for later roi filtering
+        atlas_data = np.asarray(tissues["atlas"]).astype("uint16")
+        intensities = [i for i in np.unique(atlas_data) if i != 0]
+        parcels = [atlas_data == roi_val for roi_val in intensities]
+        del atlas_data
+
+        if context["waymask"] is not None:
+            waymask_data = np.load(context["waymask"], mmap_mode="r")
+        else:
+            waymask_data = None
+
+        _TRACKING_CONTEXT.update(
+            token=context["token"],
+            affine=np.load(context["affine"]),
+            tissues=tissues,
+            # Copy-on-write, since dipy requires a writeable buffer, which
+            # it only reads
+            mod_fit=np.load(context["reconstruction"], mmap_mode="c"),
+            B0_mask_data=np.asarray(tissues["B0_mask"]).astype("bool"),
+            seeding_data=np.asarray(tissues["seeding_mask"]) > 0,
+            parcels=parcels,
+            waymask_data=waymask_data,
+            classifiers={},
+            pmf_generators={},
+        )
+
+    if tiss_class not in _TRACKING_CONTEXT["classifiers"]:
+        imgs = {name: nib.Nifti1Image(np.asarray(data),
+                                      affine=_TRACKING_CONTEXT["affine"])
+                for name, data in _TRACKING_CONTEXT["tissues"].items()}
+        _TRACKING_CONTEXT["classifiers"][tiss_class] = prep_tissues(
+            imgs["t1w2dwi"],
+            imgs["gm_in_dwi"],
+            imgs["vent_csf_in_dwi"],
+            imgs["wm_in_dwi"],
+            tiss_class,
+            imgs["B0_mask"]
+        )
+        del imgs
+
+    return _TRACKING_CONTEXT
+
+
+def _release_tracking_context(barrier=None):
+    """
+    Release the inputs of the tracking run held by the calling process. Given
+    a barrier, wait for as many other processes as it has parties to do the
+    same.
+    """
+    import threading
+
+    _TRACKING_CONTEXT.clear()
+    if barrier is not None:
+        try:
+            barrier.wait(timeout=60)
+        except threading.BrokenBarrierError:
+            print("Not every tracking worker released its inputs.")
+
+
+def release_tracking_context(nthreads, temp_folder=None):
+    """
+    Release the inputs of the tracking run held by the calling process and
+    by each worker of its pool, which would otherwise keep them in memory
+    until the next tracking run.
+
+    Parameters
+    ----------
+    nthreads : int
+        Number of workers of the pool.
+    temp_folder : str
+        Folder used by the pool for memory-mapping large arrays.
+
+    """
+    import multiprocessing
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    _TRACKING_CONTEXT.clear()
+    n_jobs = effective_n_jobs(nthreads)
+    if n_jobs <= 1:
+        return
+
+    # Each worker runs a single task at a time, so the barrier ensures that
+    # every one of them runs one
+    with multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(n_jobs)
+        Parallel(n_jobs=n_jobs, backend='loky', batch_size=1,
+                 temp_folder=temp_folder)(
+            delayed(_release_tracking_context)(barrier)
+            for _ in range(n_jobs))
+    return
+
+
+def _pmf_generator(ctx, sphere):
+    """
+    Probability mass function generator of the SH coefficients held by the
+    worker, built once per sphere and shared by the direction getters of
+    all curvature thresholds.
+    """
+    from dipy.direction.pmf import SHCoeffPmfGen
+    from pynets.core.utils import content_hash
+
+    key = content_hash(sphere.vertices)
+    if key not in ctx["pmf_generators"]:
+        ctx["pmf_generators"][key] = SHCoeffPmfGen(ctx["mod_fit"], sphere,
+                                                   None)
+    return ctx["pmf_generators"][key]
+
+
+def _direction_getter(pmf_gen, directget, max_angle, sphere,
+                      min_separation_angle):
+    """
+    Instantiate a DirectionGetter from a PMF generator of SH coefficients,
+    as by `from_shcoeff`, without copying the coefficients.
+    """
     from dipy.direction import (
         ProbabilisticDirectionGetter,
         ClosestPeakDirectionGetter,
         DeterministicMaximumDirectionGetter
     )
-    from nilearn.image import index_img
-    from pynets.dmri.track import prep_tissues
-    from nibabel.streamlines.array_sequence import ArraySequence
-    from nipype.utils.filemanip import copyfile, fname_presuffix
 
-    recon_path_tmp_path = fname_presuffix(
-        recon_path, suffix=f"_{step_curv_combinations}",
-        newpath=cache_dir
-    )
-    copyfile(
-        recon_path,
-        recon_path_tmp_path,
-        copy=True,
-        use_hardlink=False)
-
-    if waymask is not None:
-        waymask_tmp_path = fname_presuffix(
-            waymask, suffix=f"_{step_curv_combinations}",
-            newpath=cache_dir
-        )
-        copyfile(
-            waymask,
-            waymask_tmp_path,
-            copy=True,
-            use_hardlink=False)
+    if directget == "prob" or directget == "probabilistic":
+        dg_class = ProbabilisticDirectionGetter
+    elif directget == "clos" or directget == "closest":
+        dg_class = ClosestPeakDirectionGetter
+    elif directget == "det" or directget == "deterministic":
+        dg_class = DeterministicMaximumDirectionGetter
     else:
-        waymask_tmp_path = None
-
-    tissue_img = nib.load(tissues4d)
-
-    # Order:
-    B0_mask = index_img(tissue_img, 0)
-    atlas_img = index_img(tissue_img, 1)
-    atlas_data_wm_gm_int = index_img(tissue_img, 2)
-    t1w2dwi = index_img(tissue_img, 3)
-    gm_in_dwi = index_img(tissue_img, 4)
-    vent_csf_in_dwi = index_img(tissue_img, 5)
-    wm_in_dwi = index_img(tissue_img, 6)
-
-    tiss_classifier = prep_tissues(
-        t1w2dwi,
-        gm_in_dwi,
-        vent_csf_in_dwi,
-        wm_in_dwi,
-        tiss_class,
-        B0_mask
+        raise ValueError(
+            "ERROR: No valid direction getter(s) specified."
+        )
+
+    return dg_class(
+        pmf_gen,
+        float(max_angle),
+        sphere,
+        0.1,
+        min_separation_angle=min_separation_angle,
     )
 
-    B0_mask_data = np.asarray(B0_mask.dataobj).astype("bool")
-    atlas_data = np.array(atlas_img.dataobj).astype("uint16")
-    atlas_data_wm_gm_int_data = np.asarray(
-        atlas_data_wm_gm_int.dataobj
-    ).astype("bool").astype("int16")
 
-    # Build mask vector from atlas for later roi filtering
-    parcels = []
-    i = 0
-    intensities = [i for i in np.unique(atlas_data) if i != 0]
-    for roi_val in intensities:
-        parcels.append(atlas_data == roi_val)
-        i += 1
+def run_tracking(step_curv_combinations, context,
+                 n_seeds_per_iter, directget, maxcrossing, max_length,
+                 pft_back_tracking_dist, pft_front_tracking_dist,
+                 particle_count, roi_neighborhood_tol, min_length,
+                 track_type, min_separation_angle, sphere, tiss_class,
+                 min_seeds=100, seeds=None):
 
-    del atlas_data
+    from dipy.tracking import utils
+    from dipy.tracking.streamline import select_by_rois
+    from dipy.tracking.local_tracking import LocalTracking, \
+        ParticleFilteringTracking
+    from nibabel.streamlines.array_sequence import ArraySequence
 
+    # The reconstruction, tissue classifier, ROI masks and PMF generator
+    # are only built on the first seed batch of each worker
+    ctx = _tracking_context(context, tiss_class)
+    tiss_classifier = ctx["classifiers"][tiss_class]
+    parcels = ctx["parcels"]
     parcel_vec = list(np.ones(len(parcels)).astype("bool"))
 
-    with h5py.File(recon_path_tmp_path, 'r+') as hf:
-        mod_fit = hf['reconstruction'][:].astype('float32')
-    hf.close()
-
     print("%s%s" % ("Curvature: ", step_curv_combinations[1]))
 
     # Instantiate DirectionGetter
-    if directget == "prob" or directget == "probabilistic":
-        dg = ProbabilisticDirectionGetter.from_shcoeff(
-            mod_fit,
-            max_angle=float(step_curv_combinations[1]),
-            sphere=sphere,
-            min_separation_angle=min_separation_angle,
-        )
-    elif directget == "clos" or directget == "closest":
-        dg = ClosestPeakDirectionGetter.from_shcoeff(
-            mod_fit,
-            max_angle=float(step_curv_combinations[1]),
-            sphere=sphere,
-            min_separation_angle=min_separation_angle,
-        )
-    elif directget == "det" or directget == "deterministic":
+    if directget == "det" or directget == "deterministic":
         maxcrossing = 1
-        dg = DeterministicMaximumDirectionGetter.from_shcoeff(
-            mod_fit,
-            max_angle=float(step_curv_combinations[1]),
-            sphere=sphere,
-            min_separation_angle=min_separation_angle,
-        )
-    else:
-        raise ValueError(
-            "ERROR: No valid direction getter(s) specified."
-        )
+    dg = _direction_getter(_pmf_generator(ctx, sphere), directget,
+                           step_curv_combinations[1], sphere,
+                           min_separation_angle)
 
     print("%s%s" % ("Step: ", step_curv_combinations[0]))
 
-    # Perform wm-gm interface seeding, using n_seeds at a time
-    seeds = utils.random_seeds_from_mask(
-        atlas_data_wm_gm_int_data > 0,
-        seeds_count=n_seeds_per_iter,
-        seed_count_per_voxel=False,
-    #     seeds_count=1,
-    #     seed_count_per_voxel=True,
-        affine=np.eye(4),
-    )
+    # Perform wm-gm interface seeding, using n_seeds at a time, unless
+    # seeds were drawn by the scheduler
+    if seeds is None:
+        seeds = utils.random_seeds_from_mask(
+            ctx["seeding_data"],
+            seeds_count=n_seeds_per_iter,
+            seed_count_per_voxel=False,
+        #     seeds_count=1,
+        #     seed_count_per_voxel=True,
+            affine=np.eye(4),
+        )
     if len(seeds) < min_seeds:
         print(UserWarning(
             f"<{min_seeds} valid seed points found in wm-gm interface..."
@@ -726,7 +1294,7 @@ def run_tracking(step_curv_combinations, recon_path,
     try:
         roi_proximal_streamlines = utils.target(
             streamline_generator, np.eye(4),
-            B0_mask_data, include=True
+            ctx["B0_mask_data"], include=True
         )
     except BaseException:
         print('No streamlines found inside the brain! '
@@ -769,15 +1337,13 @@ def run_tracking(step_curv_combinations, recon_path,
         print('No streamlines remaining after minimal length criterion.')
         return None
 
-    if waymask is not None and os.path.isfile(waymask_tmp_path):
-        waymask_data = np.asarray(nib.load(waymask_tmp_path
-                                           ).dataobj).astype("bool")
+    if ctx["waymask_data"] is not None:
         try:
             roi_proximal_streamlines = roi_proximal_streamlines[
                 utils.near_roi(
                     roi_proximal_streamlines,
                     np.eye(4),
-                    waymask_data,
+                    ctx["waymask_data"],
                     tol=int(round(roi_neighborhood_tol*0.50, 1)),
                     mode="all"
                 )
@@ -791,11 +1357,7 @@ def run_tracking(step_curv_combinations, recon_path,
     out_streams = [s.astype("float32")
                    for s in roi_proximal_streamlines]
 
-    del dg, seeds, roi_proximal_streamlines, streamline_generator, \
-        atlas_data_wm_gm_int_data, mod_fit, B0_mask_data
-
-    os.remove(recon_path_tmp_path)
-    gc.collect()
+    del seeds, roi_proximal_streamlines, streamline_generator
 
     try:
         return ArraySequence(out_streams)
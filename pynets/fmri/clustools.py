@@ -14,6 +14,9 @@ import warnings
 
 warnings.filterwarnings("ignore")
 
+# Version of the on-disk cache of normalized cut eigendecompositions
+NCUT_VERSION = 1
+
 
 def indx_1dto3d(idx, sz):
     """
@@ -70,13 +73,67 @@ def indx_3dto1d(idx, sz):
     return idx1
 
 
-def ncut(W, nbEigenValues):
+def _normalized_laplacian(W):
+    """
+    Regularized normalized LaPlacian of a similarity matrix (Yu 2001), and
+    the inverse square root of its degrees.
+    """
+    from scipy.sparse import diags
+
+    # Parameters
+    offset = 0.5
+    eps = 2.2204e-16
+
+    m = np.shape(W)[1]
+
+    d = np.asarray(abs(W).sum(0)).flatten()
+    dr = 0.5 * (d - np.asarray(W.sum(0)).flatten())
+    d = d + offset * 2
+    dr = dr + offset
+
+    # Calculation of the normalized LaPlacian
+    W = W + diags(dr, 0, shape=(m, m), format="csc")
+    dinvsqrt = 1.0 / np.sqrt(d + eps)
+    Dinvsqrt = diags(dinvsqrt, 0, shape=(m, m), format="csc")
+    P = (Dinvsqrt * (W * Dinvsqrt)).tocsc()
+
+    # P is similar to D^-1 W, whose absolute row sums bound its spectrum
+    bound = float(np.max(np.asarray(abs(W).sum(1)).flatten() / d))
+    return P, dinvsqrt, bound
+
+
+def _leading_eigenvectors(P, k, bound):
+    """
+    The k largest eigenpairs of a symmetric sparse matrix, whose spectrum
+    does not exceed bound.
+    """
+    from scipy.sparse.linalg import eigsh
+
+    maxiterations = 100
+    eigsErrorTolerence = 1e-6
+
+    # Shift-invert about the top of the spectrum converges in a few Lanczos
+    # iterations, even for hundreds of clustered eigenvalues. Factorizing
+    # fails if the shift is an eigenvalue, or memory runs out, in which
+    # case the eigenvalues are sought directly.
+    try:
+        return eigsh(P, k, sigma=bound + 1e-6, which="LM",
+                     tol=eigsErrorTolerence)
+    except (RuntimeError, MemoryError) as e:
+        print(f"Shift-invert eigen decomposition failed ({e}). Falling back "
+              f"to Lanczos iterations...")
+    return eigsh(P, k, maxiter=maxiterations, tol=eigsErrorTolerence,
+                 which="LA")
+
+
+def ncut(W, nbEigenValues, eigen_cache=None):
     """
     This function performs the first step of normalized cut spectral clustering.
     The normalized LaPlacian is calculated on the similarity matrix W, and top
     nbEigenValues eigenvectors are calculated. The number of eigenvectors
     corresponds to the maximum number of classes (K) that will be produced by
-    the clustering algorithm.
+    the clustering algorithm. The eigenvectors are found by shift-invert
+    Lanczos iterations about the top of the spectrum of the LaPlacian.
 
     Parameters
     ----------
@@ -88,6 +145,11 @@ def ncut(W, nbEigenValues):
     nbEigenValues : int
         Number of eigenvectors that should be calculated, this determines the
         maximum number of clusters (K) that can be derived from the result.
+    eigen_cache : str
+        Directory of an on-disk cache of eigen decompositions, keyed by the
+        contents of W. A cached decomposition into at least nbEigenValues
+        eigenvectors is truncated rather than recomputed. Default is no
+        caching.
 
     Returns
     -------
@@ -110,32 +172,36 @@ def ncut(W, nbEigenValues):
       Ieee. doi: 10.1109/ICCV.2003.1238361
 
     """
-    from scipy.sparse.linalg import eigsh
-    from scipy.sparse import spdiags
-    from numpy.linalg import norm
+    import os
 
-    # Parameters
-    offset = 0.5
-    maxiterations = 100
-    eigsErrorTolerence = 1e-6
-    eps = 2.2204e-16
+    cache_file = None
+    if eigen_cache is not None:
+        from scipy.sparse import csr_matrix
+        from pynets.core.utils import content_hash
+
+        W = csr_matrix(W)
+        W.sum_duplicates()
+        W.sort_indices()
+        key = content_hash(W.data, W.indices, W.indptr, shape=W.shape,
+                           version=NCUT_VERSION)
+        os.makedirs(eigen_cache, exist_ok=True)
+        cache_file = f"{eigen_cache}/{key}.npz"
+        if os.path.isfile(cache_file):
+            try:
+                with np.load(cache_file) as f:
+                    if f["eigen_vec"].shape[1] >= nbEigenValues:
+                        print("Reusing cached ncut eigen decomposition...")
+                        return (f["eigen_val"][:nbEigenValues],
+                                f["eigen_vec"][:, :nbEigenValues].astype(
+                                    "float64"))
+            except (OSError, ValueError, KeyError):
+                print(f"Ignoring unreadable ncut cache: {cache_file}")
 
     m = np.shape(W)[1]
-
-    d = abs(W).sum(0)
-    dr = 0.5 * (d - W.sum(0))
-    d = d + offset * 2
-    dr = dr + offset
-
-    # Calculation of the normalized LaPlacian
-    W = W + spdiags(dr, [0], m, m, "csc")
-    Dinvsqrt = spdiags((1.0 / np.sqrt(d + eps)), [0], m, m, "csc")
-    P = Dinvsqrt * (W * Dinvsqrt)
+    P, dinvsqrt, bound = _normalized_laplacian(W)
 
     # Perform the eigen decomposition
-    eigen_val, eigen_vec = eigsh(
-        P, nbEigenValues, maxiter=maxiterations, tol=eigsErrorTolerence,
-        which="LA")
+    eigen_val, eigen_vec = _leading_eigenvectors(P, nbEigenValues, bound)
 
     # Sort the eigen_vals so that the first is the largest
     i = np.argsort(-eigen_val)
@@ -143,12 +209,16 @@ def ncut(W, nbEigenValues):
     eigen_vec = eigen_vec[:, i]
 
     # Normalize the returned eigenvectors
-    eigen_vec = Dinvsqrt * np.array(eigen_vec)
-    norm_ones = norm(np.ones((m, 1)))
-    for i in range(0, np.shape(eigen_vec)[1]):
-        eigen_vec[:, i] = (eigen_vec[:, i] / norm(eigen_vec[:, i])) * norm_ones
-        if eigen_vec[0, i] != 0:
-            eigen_vec[:, i] = -1 * eigen_vec[:, i] * np.sign(eigen_vec[0, i])
+    eigen_vec = dinvsqrt[:, np.newaxis] * np.array(eigen_vec)
+    eigen_vec *= np.sqrt(m) / np.linalg.norm(eigen_vec, axis=0)
+    signs = np.sign(eigen_vec[0])
+    eigen_vec[:, signs != 0] *= -signs[signs != 0]
+
+    if cache_file is not None:
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_file, eigen_val=eigen_val,
+                 eigen_vec=eigen_vec.astype("float32"))
+        os.replace(tmp_file, cache_file)
 
     return eigen_val, eigen_vec
 
@@ -201,10 +271,8 @@ def discretisation(eigen_vec):
       (1), 313-319 vol.1. Ieee. doi: 10.1109/ICCV.2003.1238361
 
     """
-    import scipy as sp
     from scipy.sparse import csc_matrix
     from scipy.linalg import LinAlgError, svd
-    from scipy import divide
 
     eps = 2.2204e-16
 
@@ -216,7 +284,7 @@ def discretisation(eigen_vec):
             np.multiply(
                 eigen_vec, eigen_vec).sum(1)))
     out_vec = np.reshape(vm, eigen_vec.shape)
-    eigen_vec = divide(eigen_vec, out_vec)
+    eigen_vec = np.divide(eigen_vec, out_vec)
 
     svd_restarts = 0
     exitLoop = 0
@@ -228,7 +296,7 @@ def discretisation(eigen_vec):
         c = np.zeros((n, 1))
         R = np.matrix(np.zeros((k, k)))
         R[:, 0] = np.reshape(
-            eigen_vec[int(sp.rand(1) * (n - 1)), :].transpose(), (k, 1)
+            eigen_vec[int(np.random.rand() * (n - 1)), :].transpose(), (k, 1)
         )
 
         for j in range(1, k):
@@ -290,7 +358,7 @@ def discretisation(eigen_vec):
         return eigenvec_discrete
 
 
-def parcellate_ncut(W, k, mask_img):
+def parcellate_ncut(W, k, mask_img, eigen_cache=None, k_max=None):
     """
     Converts a connectivity matrix into a nifti file where each voxel
     intensity corresponds to the number of the cluster to which it belongs.
@@ -302,11 +370,24 @@ def parcellate_ncut(W, k, mask_img):
         A Scipy sparse matrix, with weights corresponding to the
         temporal/spatial correlation between the time series from voxel i
         and voxel j.
-    k : int
-        Numbers of clusters that will be generated.
+    k : int or list
+        Numbers of clusters that will be generated. A list of them yields one
+        parcellation each, derived from a single eigen decomposition.
     mask_img : Nifti1Image
         3D NIFTI file containing a mask, which restricts the voxels used in
         the analysis.
+    eigen_cache : str
+        Directory of an on-disk cache of eigen decompositions of W (see
+        `ncut`). Default is no caching.
+    k_max : int
+        Largest number of clusters of a sweep over several calls, at which
+        the eigen decomposition is computed, so that every other k of the
+        sweep reuses it from `eigen_cache`. Default is the largest k.
+
+    Returns
+    -------
+    out_img : Nifti1Image or list
+        Parcellation, or list of parcellations if k is a list.
 
     References
     ----------
@@ -316,37 +397,192 @@ def parcellate_ncut(W, k, mask_img):
       https://doi.org/10.1002/hbm.21333
 
     """
+    mask = np.asarray(mask_img.dataobj) > 0
+
+    out_imgs = []
+    for labels in _ncut_labels(W, list(np.atleast_1d(k)),
+                               eigen_cache=eigen_cache, k_max=k_max):
+        imdat = np.zeros(mask.shape, dtype="uint16")
+        imdat[mask] = labels[0: int(np.sum(mask))]
+        out_imgs.append(
+            nib.Nifti1Image(imdat, mask_img.affine, mask_img.header))
+
+    del W
+
+    return out_imgs if isinstance(k, (list, tuple, np.ndarray)) else \
+        out_imgs[0]
+
+
+def _ncut_labels(W, k, eigen_cache=None, k_max=None):
+    """
+    Normalized cut of a connectivity matrix into k clusters, as a vector of
+    contiguous cluster numbers starting at 1, or a list of them if k is a
+    list.
+    """
+    k_list = [int(i) for i in np.atleast_1d(k)]
+
     # We only have to calculate the eigendecomposition of the LaPlacian once,
     # for the largest number of clusters provided. This provides a significant
     # speedup, without any difference to the results.
-    [_, eigenvec] = ncut(W, k)
+    [_, eigenvec] = ncut(W, max(k_list + [int(k_max or 0)]),
+                         eigen_cache=eigen_cache)
 
-    # Calculate each desired clustering result
-    eigenvec_discrete = discretisation(eigenvec[:, :k])
+    labels = []
+    for i in k_list:
+        # Calculate each desired clustering result
+        eigenvec_discrete = discretisation(eigenvec[:, :i])
 
-    # Transform the discretised eigenvectors into a single vector where the
-    # value corresponds to the cluster # of the corresponding ROI
-    a = eigenvec_discrete[:, 0].todense()
+        # Transform the discretised eigenvectors into a single vector where
+        # the value corresponds to the cluster # of the corresponding ROI,
+        # and renumber the clusters to make them contiguous
+        a = np.asarray(eigenvec_discrete.argmax(1)).flatten()
+        labels.append(np.unique(a, return_inverse=True)[1].flatten() + 1)
 
-    for i in range(1, k):
-        a = a + (i + 1) * eigenvec_discrete[:, i]
+    return labels if isinstance(k, (list, tuple, np.ndarray)) else labels[0]
 
-    unique_a = sorted(set(np.array(a.flatten().tolist()[0])))
 
-    # Renumber clusters to make them non-contiguous
-    b = np.zeros((len(a), 1))
-    for i in range(0, len(unique_a)):
-        b[a == unique_a[i]] = i + 1
+def ncut_cache_dir(local_conn_mat_path):
+    """
+    Directory of the cache of ncut eigen decompositions, next to a local
+    connectivity `.npz` file, or None without one.
+    """
+    if local_conn_mat_path is None:
+        return None
+    return f"{str(local_conn_mat_path).split('.npz')[0]}_ncut"
 
-    imdat = mask_img.get_fdata()
-    imdat[imdat > 0] = 1
-    imdat[imdat > 0] = np.short(b[0: int(np.sum(imdat))].flatten())
 
-    del a, b, W
+def local_neighborhoods(mask_data):
+    """
+    Pairs of in-mask voxels that lie within each other's 3x3x3
+    neighborhood (face, edge, and corner touching), including each voxel
+    paired with itself, computed for all voxels at once.
 
-    return nib.Nifti1Image(
-        imdat.astype("uint16"), mask_img.get_affine(), mask_img.get_header()
-    )
+    Parameters
+    ----------
+    mask_data : array
+        3D array, whose non-zero voxels form the mask.
+
+    Returns
+    -------
+    seeds : array
+        Index of the center voxel of each pair, among the in-mask voxels in
+        C order.
+    neighbors : array
+        Index of the neighboring voxel of each pair.
+
+    """
+    from itertools import product
+
+    mask = np.asarray(mask_data).astype("bool")
+    coords = np.argwhere(mask).astype("int32")
+    lut = np.full(mask.shape, -1, dtype="int64")
+    lut[mask] = np.arange(len(coords))
+
+    offsets = np.array(list(product((-1, 0, 1), repeat=3)), dtype="int32")
+    voxels = coords[:, np.newaxis, :] + offsets[np.newaxis, :, :]
+    inside = np.all((voxels >= 0) & (voxels < np.array(mask.shape)),
+                    axis=2)
+    voxels[~inside] = 0
+    neighbors = lut[voxels[..., 0], voxels[..., 1], voxels[..., 2]]
+    neighbors[~inside] = -1
+
+    seeds = np.broadcast_to(np.arange(len(coords))[:, np.newaxis],
+                            neighbors.shape)
+    valid = neighbors >= 0
+    return seeds[valid], neighbors[valid]
+
+
+def _masked_time_series(func_img, clust_mask_img):
+    """In-mask voxel time-series, as a num_voxels x num_timepoints array"""
+    mask = np.asarray(clust_mask_img.dataobj).astype("bool")
+    func_data = np.asarray(func_img.dataobj, dtype=np.float32)
+    return mask, func_data[mask]
+
+
+def _pair_products(A, B, rows, cols):
+    """Row-wise inner products A[rows] . B[cols], in blocks of pairs"""
+    out = np.empty(len(rows))
+    block = max(1024, (1 << 22) // max(A.shape[1], 1))
+    for start in range(0, len(rows), block):
+        stop = start + block
+        out[start:stop] = np.einsum(
+            "ij,ij->i", A[rows[start:stop]].astype("float64"),
+            B[cols[start:stop]].astype("float64"))
+    return out
+
+
+def _local_connectivity_matrix(weights, seeds, neighbors, thresh, m):
+    """
+    Threshold the weights of the neighborhood pairs and emit them as a
+    sparse m x m matrix.
+    """
+    from scipy.sparse import csr_matrix
+
+    weights[~np.isfinite(weights)] = 0
+    weights[weights < thresh] = 0
+    keep = weights != 0
+    return csr_matrix(
+        (weights[keep], (neighbors[keep], seeds[keep])), shape=(m, m),
+        dtype=np.float32)
+
+
+def _local_correlations(imdat, seeds, neighbors, local_corr="tcorr"):
+    """
+    Correlations between the time series (tcorr), or between the whole-brain
+    FC maps (scorr), of each pair of neighboring voxels of a num_voxels x
+    num_timepoints array. Pairs involving a voxel without variance are zero.
+    """
+    m = imdat.shape[0]
+
+    if local_corr == "tcorr":
+        # Center and scale the time courses to unit norm, so that
+        # correlations are inner products.
+        imdat = imdat - np.mean(imdat, 1)[:, np.newaxis]
+        imdat_n = np.sqrt(np.einsum("ij,ij->i", imdat, imdat))
+        has_var = imdat_n > 0
+        imdat /= np.where(has_var, imdat_n, 1)[:, np.newaxis]
+    elif local_corr == "scorr":
+        # Z-score fmri time courses, this makes calculation of the
+        # correlation coefficient a simple matrix product. Voxels with no
+        # variance are set to zero.
+        imdat_s = np.std(imdat, 1)
+        has_var = imdat_s > 0
+        imdat = (imdat - np.mean(imdat, 1)[:, np.newaxis]) / np.where(
+            has_var, imdat_s, 1)[:, np.newaxis]
+        imdat[~has_var] = 0
+    else:
+        raise ValueError("Local connectivity type not available")
+
+    R = np.zeros(len(seeds))
+    pairs = np.flatnonzero(has_var[seeds] & has_var[neighbors])
+    seeds, neighbors = seeds[pairs], neighbors[pairs]
+
+    if local_corr == "tcorr":
+        R[pairs] = _pair_products(imdat, imdat, seeds, neighbors)
+        return np.clip(R, -1, 1), has_var
+
+    # The whole-brain FC map of voxel i is imdat[i] . imdat.T, so the inner
+    # product of two FC maps is imdat[i] . G . imdat[j], with G the
+    # num_timepoints x num_timepoints Gram matrix of the data, and the sum of
+    # an FC map is imdat[i] . imdat.sum(0). Spatial correlations between FC
+    # maps follow without ever forming them.
+    G = np.dot(imdat.T.astype("float64"), imdat.astype("float64"))
+    fc_maps = np.empty_like(imdat)
+    block = max(1024, (1 << 22) // max(imdat.shape[1], 1))
+    for start in range(0, m, block):
+        fc_maps[start:start + block] = np.dot(imdat[start:start + block], G)
+    fc_sums = np.dot(imdat, imdat.sum(0).astype("float64"))
+    fc_norms = np.einsum("ij,ij->i", fc_maps.astype("float64"),
+                         imdat.astype("float64")) - fc_sums ** 2 / m
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        R[pairs] = (_pair_products(fc_maps, imdat, seeds, neighbors) -
+                    fc_sums[seeds] * fc_sums[neighbors] / m) / np.sqrt(
+            fc_norms[seeds] * fc_norms[neighbors])
+
+    del fc_maps, G
+
+    return np.clip(R, -1, 1), has_var
 
 
 def make_local_connectivity_scorr(func_img, clust_mask_img, thresh):
@@ -356,7 +592,9 @@ def make_local_connectivity_scorr(func_img, clust_mask_img, thresh):
     spatial correlation between the whole brain FC maps generated from the
     time series from voxel i and voxel j. Connectivity is only calculated
     between a voxel and the 27 voxels in its 3D neighborhood
-    (face touching and edge touching).
+    (face touching and edge touching). Neighborhoods are computed for all
+    voxels at once (see `local_neighborhoods`), and correlations in blocks
+    of voxel pairs.
 
     Parameters
     ----------
@@ -372,8 +610,9 @@ def make_local_connectivity_scorr(func_img, clust_mask_img, thresh):
     Returns
     -------
     W : Compressed Sparse Matrix
-        A Scipy sparse matrix, with weights corresponding to the spatial
-        correlation between the time series from voxel i and voxel j
+        A Scipy CSR matrix over the in-mask voxels (in C order), with
+        weights corresponding to the spatial correlation between the time
+        series from voxel i and voxel j
 
     References
     ----------
@@ -383,151 +622,16 @@ def make_local_connectivity_scorr(func_img, clust_mask_img, thresh):
       https://doi.org/10.1002/hbm.21333
 
     """
-    from scipy.sparse import csc_matrix
-    from scipy import prod
-    from itertools import product
-    from pynets.fmri.clustools import indx_1dto3d, indx_3dto1d
-
-    neighbors = np.array(
-        sorted(
-            sorted(
-                sorted(
-                    [list(x) for x in list(set(product({-1, 0, 1},
-                                                       repeat=3)))],
-                    key=lambda k: (k[0]),
-                ),
-                key=lambda k: (k[1]),
-            ),
-            key=lambda k: (k[2]),
-        )
-    )
-
-    # Read in the mask
-    msz = clust_mask_img.shape
-
-    # Convert the 3D mask array into a 1D vector
-    mskdat = np.reshape(
-        np.asarray(
-            clust_mask_img.dataobj).astype("bool"),
-        prod(msz))
-
-    # Determine the 1D coordinates of the non-zero
-    # elements of the mask
-    iv = np.nonzero(mskdat)[0]
-    sz = func_img.shape
-
-    # Reshape fmri data to a num_voxels x num_timepoints array
-    func_data = func_img.get_fdata(dtype=np.float32)
-    imdat = np.reshape(func_data, (prod(sz[:3]), sz[3]))
-    del func_data
-
-    # Mask the datset to only the in-mask voxels
-    imdat = imdat[iv, :]
-    imdat_sz = imdat.shape
-
-    # Z-score fmri time courses, this makes calculation of the
-    # correlation coefficient a simple matrix product
-    imdat_s = np.tile(np.std(imdat, 1), (imdat_sz[1], 1)).T
-
-    # Replace 0 with really large number to avoid div by zero
-    imdat_s[imdat_s == 0] = 1000000
-    imdat_m = np.tile(np.mean(imdat, 1), (imdat_sz[1], 1)).T
-    imdat = (imdat - imdat_m) / imdat_s
-
-    # Set values with no variance to zero
-    imdat[imdat_s == 0] = 0
-    imdat[np.isnan(imdat)] = 0
-
-    # Remove voxels with zero variance, do this here
-    # so that the mapping will be consistent across
-    # subjects
-    vndx = np.nonzero(np.var(imdat, 1) != 0)[0]
-    iv = iv[vndx]
-    m = len(iv)
-    print(m, " # of non-zero valued or non-zero variance voxels in the mask")
-
-    # Construct a sparse matrix from the mask
-    msk = csc_matrix(
-        (vndx + 1, (iv, np.zeros(m))), shape=(prod(msz), 1), dtype=np.float32
-    )
-
-    sparse_i = []
-    sparse_j = []
-    sparse_w = [[]]
-
-    for i in range(0, m):
-        if i % 1000 == 0:
-            print("voxel #", i)
-
-        # Convert index into 3D and calculate neighbors, then convert resulting
-        # 3D indices into 1D
-        ndx1d = indx_3dto1d(indx_1dto3d(iv[i], sz[:-1]) + neighbors, sz[:-1])
-
-        # Convert 1D indices into masked versions
-        ondx1d = msk[ndx1d].todense()
-
-        # Exclude indices not in the mask
-        ndx1d = ndx1d[np.nonzero(ondx1d)[0]].flatten()
-        ondx1d = np.array(ondx1d[np.nonzero(ondx1d)[0]])
-        ondx1d = ondx1d.flatten() - 1
-
-        # Keep track of the index corresponding to the "seed"
-        nndx = np.nonzero(ndx1d == iv[i])[0]
-
-        # Extract the time courses corresponding to the "seed"
-        # and 3D neighborhood voxels
-        tc = np.array(imdat[ondx1d.astype("int"), :])
-
-        # Ensure that the "seed" has variance, if not just skip it
-        if np.var(tc[nndx, :]) == 0:
-            continue
-
-        # Calculate functional connectivity maps for "seed"
-        # and 3D neighborhood voxels
-        R = np.corrcoef(np.dot(tc, imdat.T) / (sz[3] - 1))
-
-        if np.linalg.matrix_rank(R) == 1:
-            R = np.reshape(R, (1, 1))
-
-        # Set nans to 0
-        R[np.isnan(R)] = 0
-
-        # Set values below thresh to 0
-        R[R < thresh] = 0
-
-        # Calculate the spatial correlation between FC maps
-        if np.linalg.matrix_rank(R) == 0:
-            R = np.reshape(R, (1, 1))
-
-        # Keep track of the indices and the correlation weights
-        # to construct sparse connectivity matrix
-        sparse_i = np.append(sparse_i, ondx1d, 0)
-        sparse_j = np.append(sparse_j, (ondx1d[nndx]) * np.ones(len(ondx1d)))
-        sparse_w = np.append(sparse_w, R[nndx, :], 1)
-
-    # Ensure that the weight vector is the correct shape
-    sparse_w = np.reshape(sparse_w, prod(np.shape(sparse_w)))
+    mask, imdat = _masked_time_series(func_img, clust_mask_img)
+    m = imdat.shape[0]
 
-    # Concatenate the i, j, and w_ij vectors
-    outlist = sparse_i
-    outlist = np.append(outlist, sparse_j)
-    outlist = np.append(outlist, sparse_w)
+    seeds, neighbors = local_neighborhoods(mask)
+    R, has_var = _local_correlations(imdat, seeds, neighbors, "scorr")
+    print(np.sum(has_var),
+          " # of non-zero valued or non-zero variance voxels in the mask")
+    W = _local_connectivity_matrix(R, seeds, neighbors, thresh, m)
 
-    # Calculate the number of non-zero weights in the connectivity matrix
-    n = len(outlist) / 3
-
-    # Reshape the 1D vector read in from infile in to a 3xN array
-    outlist = np.reshape(outlist, (3, int(n)))
-
-    m = max(max(outlist[0, :]), max(outlist[1, :])) + 1
-
-    W = csc_matrix(
-        (outlist[2, :], (outlist[0, :], outlist[1, :])),
-        shape=(int(m), int(m)),
-        dtype=np.float32,
-    )
-
-    del imdat, msk, mskdat, outlist, m, sparse_i, sparse_j, sparse_w
+    del imdat
 
     return W
 
@@ -538,7 +642,9 @@ def make_local_connectivity_tcorr(func_img, clust_mask_img, thresh):
     The weights w_ij of the connectivity matrix W correspond to the
     temporal correlation between the time series from voxel i and voxel j.
     Connectivity is only calculated between a voxel and the 27 voxels in its 3D
-    neighborhood (face touching and edge touching).
+    neighborhood (face touching and edge touching). Neighborhoods are
+    computed for all voxels at once (see `local_neighborhoods`), and
+    correlations in blocks of voxel pairs.
 
     Parameters
     ----------
@@ -554,8 +660,9 @@ def make_local_connectivity_tcorr(func_img, clust_mask_img, thresh):
     Returns
     -------
     W : Compressed Sparse Matrix
-        A Scipy sparse matrix, with weights corresponding to the temporal
-        correlation between the time series from voxel i and voxel j
+        A Scipy CSR matrix over the in-mask voxels (in C order), with
+        weights corresponding to the temporal correlation between the time
+        series from voxel i and voxel j
 
     References
     ----------
@@ -565,164 +672,353 @@ def make_local_connectivity_tcorr(func_img, clust_mask_img, thresh):
       https://doi.org/10.1002/hbm.21333
 
     """
-    from scipy.sparse import csc_matrix
-    from scipy import prod
-    from itertools import product
-    from pynets.fmri.clustools import indx_1dto3d, indx_3dto1d
-
-    # Index array used to calculate 3D neigbors
-    neighbors = np.array(
-        sorted(
-            sorted(
-                sorted(
-                    [list(x) for x in list(set(product({-1, 0, 1},
-                                                       repeat=3)))],
-                    key=lambda k: (k[0]),
-                ),
-                key=lambda k: (k[1]),
-            ),
-            key=lambda k: (k[2]),
-        )
-    )
+    mask, imdat = _masked_time_series(func_img, clust_mask_img)
+    m = imdat.shape[0]
+    print(f"\nTotal non-zero voxels in the mask: {m}\n")
 
-    # Read in the mask
-    msz = np.shape(np.asarray(clust_mask_img.dataobj).astype("bool"))
+    seeds, neighbors = local_neighborhoods(mask)
+    R, _ = _local_correlations(imdat, seeds, neighbors, "tcorr")
+    W = _local_connectivity_matrix(R, seeds, neighbors, thresh, m)
 
-    # Convert the 3D mask array into a 1D vector
-    mskdat = np.reshape(
-        np.asarray(
-            clust_mask_img.dataobj).astype("bool"),
-        prod(msz))
+    del imdat
 
-    # Determine the 1D coordinates of the non-zero elements of the mask
-    iv = np.nonzero(mskdat)[0]
-    m = len(iv)
-    print(f"\nTotal non-zero voxels in the mask: {m}\n")
-    sz = func_img.shape
-
-    # Reshape fmri data to a num_voxels x num_timepoints array
-    func_data = func_img.get_fdata(dtype=np.float32)
-    imdat = np.reshape(func_data, (prod(sz[:3]), sz[3]))
-    del func_data
-
-    # Construct a sparse matrix from the mask
-    msk = csc_matrix(
-        (list(range(1, m + 1)), (iv, np.zeros(m))),
-        shape=(prod(sz[:-1]), 1),
-        dtype=np.float32,
-    )
-    sparse_i = []
-    sparse_j = []
-    sparse_w = []
-
-    negcount = 0
-
-    # Loop over all of the voxels in the mask
-    print("Voxels:")
-    for i in range(0, m):
-        if i % 1000 == 0:
-            print(str(i))
-        # Calculate the voxels that are in the 3D neighborhood of the center
-        # voxel
-        ndx1d = indx_3dto1d(indx_1dto3d(iv[i], sz[:-1]) + neighbors, sz[:-1])
-
-        # Restrict the neigborhood using the mask
-        ondx1d = msk[ndx1d].todense()
-        ndx1d = ndx1d[np.nonzero(ondx1d)[0]].flatten()
-        ondx1d = np.array(ondx1d[np.nonzero(ondx1d)[0]]).flatten()
-
-        # Determine the index of the seed voxel in the neighborhood
-        nndx = np.nonzero(ndx1d == iv[i])[0]
-
-        # Extract the timecourses for all of the voxels in the neighborhood
-        tc = np.array(imdat[ndx1d.astype("int"), :])
-
-        # Ensure that the "seed" has variance, if not just skip it
-        if np.var(tc[nndx, :]) == 0:
-            continue
+    return W
 
-        # Calculate the correlation between all of the voxel TCs
-        R = np.corrcoef(tc)
 
-        if np.linalg.matrix_rank(R) == 1:
-            R = np.reshape(R, (1, 1))
+def _consensus_parcellation(coassign, seeds, neighbors, k, mask_img):
+    """
+    Normalized cut of the co-assignment graph of an ensemble of
+    parcellations, whose weights are the fraction of parcellations in which
+    each pair of neighboring voxels shares a cluster.
+    """
+    from scipy.sparse import csr_matrix
 
-        # Set nans to 0
-        R[np.isnan(R)] = 0
+    mask = np.asarray(mask_img.dataobj).astype("bool")
+    m = int(np.sum(mask))
+    keep = coassign > 0
+    W = csr_matrix((coassign[keep], (neighbors[keep], seeds[keep])),
+                   shape=(m, m), dtype=np.float32)
 
-        # Set values below thresh to 0
-        R[R < thresh] = 0
+    imdat = np.zeros(mask.shape, dtype="uint16")
+    imdat[mask] = _ncut_labels(W, k)
+    out_img = nib.Nifti1Image(imdat, mask_img.affine, mask_img.header)
+    out_img.set_data_dtype(np.uint16)
+    return out_img
 
-        if np.linalg.matrix_rank(R) == 0:
-            R = np.reshape(R, (1, 1))
 
-        # Extract just the correlations with the seed TC
-        R = R[nndx, :].flatten()
+def _accumulate_coassignment(coassign, labels, seeds, neighbors):
+    """Add the co-assignment of neighboring voxels by one parcellation"""
+    coassign += (labels[seeds] == labels[neighbors]) & (labels[seeds] > 0)
+    return coassign
 
-        # Set NaN values to 0
-        negcount = negcount + sum(R < 0)
 
-        # Determine the non-zero correlations (matrix weights) and add their
-        # indices and values to the list
-        nzndx = np.nonzero(R)[0]
-        if len(nzndx) > 0:
-            sparse_i = np.append(sparse_i, ondx1d[nzndx] - 1, 0)
-            sparse_j = np.append(sparse_j,
-                                 (ondx1d[nndx] - 1) * np.ones(len(nzndx)))
-            sparse_w = np.append(sparse_w, R[nzndx], 0)
+def ensemble_parcellate(infiles, k):
+    """
+    Consensus of an ensemble of parcellations of the same mask, by normalized
+    cut of the fraction of parcellations in which neighboring voxels share a
+    cluster.
 
-    # Concatenate the i, j and w_ij into a single vector
-    outlist = sparse_i
-    outlist = np.append(outlist, sparse_j)
-    outlist = np.append(outlist, sparse_w)
+    Parameters
+    ----------
+    infiles : list
+        List of file paths to 3D Nifti1Image parcellations.
+    k : int
+        Numbers of clusters that will be generated.
 
-    # Calculate the number of non-zero weights in the connectivity matrix
-    n = len(outlist) / 3
+    Returns
+    -------
+    out_img : Nifti1Image
+        Consensus parcellation.
 
-    # Reshape the 1D vector read in from infile in to a 3xN array
-    outlist = np.reshape(outlist, (3, int(n)))
+    """
+    mask_img = None
+    for i, file_ in enumerate(infiles):
+        img = nib.load(file_)
+        img_data = np.asarray(img.dataobj).astype("int32")
+        if i == 0:
+            mask_img = nib.Nifti1Image((img_data > 0).astype("uint8"),
+                                       img.affine, img.header)
+            seeds, neighbors = local_neighborhoods(img_data > 0)
+            coassign = np.zeros(len(seeds), dtype=np.float32)
+        _accumulate_coassignment(
+            coassign, img_data[np.asarray(mask_img.dataobj) > 0], seeds,
+            neighbors)
+        img.uncache()
 
-    m = max(max(outlist[0, :]), max(outlist[1, :])) + 1
+    return _consensus_parcellation(coassign / len(infiles), seeds, neighbors,
+                                   k, mask_img)
 
-    W = csc_matrix(
-        (outlist[2, :], (outlist[0, :], outlist[1, :])),
-        shape=(int(m), int(m)),
-        dtype=np.float32,
-    )
 
-    del imdat, msk, mskdat, outlist, m, sparse_i, sparse_j, sparse_w
+def _cluster_features(ts_data, mask_img, k, clust_type, connectivity=None,
+                      random_state=None):
+    """
+    Cluster the voxels (columns) of a num_timepoints x num_voxels array,
+    with the voxel time-series as features.
+    """
+    if clust_type == "kmeans":
+        from sklearn.cluster import MiniBatchKMeans
+
+        est = MiniBatchKMeans(n_clusters=k, init="k-means++",
+                              random_state=random_state).fit(ts_data.T)
+    elif clust_type == "rena":
+        from nilearn.regions.rena_clustering import ReNA
+
+        est = ReNA(mask_img, n_clusters=k, scaling=False,
+                   n_iter=10).fit(ts_data)
+    elif clust_type in ["ward", "complete", "average", "single"]:
+        from sklearn.cluster import AgglomerativeClustering
+
+        est = AgglomerativeClustering(n_clusters=k, linkage=clust_type,
+                                      connectivity=connectivity).fit(
+            ts_data.T)
+    else:
+        raise ValueError(f"Clustering method {clust_type} not recognized.")
+    return np.unique(est.labels_, return_inverse=True)[1].flatten() + 1
 
-    return W
 
+def cluster_time_series(ts_data, mask_img, k, clust_type, connectivity=None,
+                        neighborhoods=None, local_corr="tcorr", thresh=0.4,
+                        components=None, random_state=None, eigen_cache=None,
+                        k_max=None):
+    """
+    Parcellate the voxels of a masked fMRI time-series array.
 
-def ensemble_parcellate(infiles, k):
-    from sklearn.feature_extraction import image
+    Parameters
+    ----------
+    ts_data : array
+        Array of shape (num_timepoints, num_voxels) of in-mask voxel
+        time-series, in C order (e.g. from `nilearn.masking.apply_mask`).
+    mask_img : Nifti1Image
+        3D NIFTI file containing the mask of the voxels.
+    k : int
+        Numbers of clusters that will be generated.
+    clust_type : str
+        Type of clustering to be performed (e.g. 'ward', 'kmeans',
+        'complete', 'average', 'single', 'rena', 'ncut').
+    connectivity : Compressed Sparse Matrix
+        Connectivity structure among the voxels used by the agglomerative
+        methods. Default is the grid adjacency of the mask.
+    neighborhoods : tuple
+        Pairs of neighboring voxels (see `local_neighborhoods`) over which
+        the local connectivity of 'ncut' is estimated. Default is computed
+        from the mask.
+    local_corr : str
+        Type of local connectivity of 'ncut'. Options are tcorr or scorr.
+    thresh : float
+        Local connectivity weights lower than this value are removed.
+    components : array
+        Connected component index of each voxel. When given, 'kmeans' and
+        'rena' allocate k across the components in proportion to their
+        number of voxels and cluster each separately.
+    random_state : int or None
+        Seed of the clustering.
+    eigen_cache : str
+        Directory of the cache of 'ncut' eigen decompositions (see `ncut`).
+    k_max : int
+        Number of clusters at which the 'ncut' eigen decomposition is
+        computed and cached, when larger than k.
 
-    # Read in the files, convert them to similarity matrices, and then average
-    # them
-    for i, file_ in enumerate(infiles):
+    Returns
+    -------
+    labels : array
+        Cluster number of each voxel, starting at 1. Voxels in components
+        too small to be clustered are 0.
 
-        img = nib.load(file_)
+    """
+    from pynets.core.utils import proportional
+
+    # Standardize each voxel's time-series, leaving those without variance
+    # at zero
+    ts_data = np.array(ts_data, dtype=np.float32)
+    ts_data -= ts_data.mean(0)
+    ts_std = ts_data.std(0)
+    ts_data /= np.where(ts_std > 0, ts_std, 1)
+    mask = np.asarray(mask_img.dataobj).astype("bool")
+    m = ts_data.shape[1]
+
+    if clust_type == "ncut":
+        if neighborhoods is None:
+            neighborhoods = local_neighborhoods(mask)
+        seeds, neighbors = neighborhoods
+        R, _ = _local_correlations(ts_data.T, seeds, neighbors, local_corr)
+        W = _local_connectivity_matrix(R, seeds, neighbors, thresh, m)
+        return _ncut_labels(W, k, eigen_cache=eigen_cache, k_max=k_max)
+
+    if clust_type in ["ward", "complete", "average", "single"] and \
+            connectivity is None:
+        from sklearn.feature_extraction import image
+
+        connectivity = image.grid_to_graph(*mask.shape, mask=mask)
+
+    if components is None or clust_type not in ["kmeans", "rena"]:
+        return _cluster_features(ts_data, mask_img, k, clust_type,
+                                 connectivity, random_state)
+
+    # Allocate k across connected components using Hagenbach-Bischoff
+    # Quota based on number of voxels
+    n_comps = int(components.max()) + 1
+    k_list = proportional(k, [int(np.sum(components == i)) for i in
+                              range(n_comps)])
+    labels = np.zeros(m, dtype="int64")
+    for i in range(n_comps):
+        if k_list[i] < 5:
+            print(f"Only {k_list[i]} voxels in component. Discarding...")
+            continue
+        in_comp = components == i
+        comp_mask = np.zeros(mask.shape, dtype="uint8")
+        comp_mask[mask] = in_comp
+        comp_labels = _cluster_features(
+            ts_data[:, in_comp],
+            nib.Nifti1Image(comp_mask, mask_img.affine, mask_img.header),
+            k_list[i], clust_type, random_state=random_state)
+        labels[in_comp] = comp_labels + labels.max()
+    return labels
+
+
+def _bootstrap_replicate(ts_data, block_size, seed, **kwargs):
+    """Cluster one circular-block bootstrap sample of the time-series"""
+    from pynets.fmri.estimation import timeseries_bootstrap
+
+    boot_series = timeseries_bootstrap(ts_data, block_size,
+                                       random_state=seed)[0]
+    try:
+        return cluster_time_series(boot_series, random_state=seed, **kwargs)
+    except (ValueError, ArithmeticError, RuntimeError,
+            np.linalg.LinAlgError) as e:
+        print(f"Bootstrapped clustering failed: {e}")
+        return None
+
+
+def bootstrap_parcellate(ts_data, mask_img, k, clust_type, block_size,
+                         n_boot, local_corr="tcorr", connectivity=None,
+                         conn_comps=None, thresh=0.4, n_jobs=1,
+                         random_state=42, temp_folder=None):
+    """
+    Spatially-constrained consensus of an ensemble of parcellations of
+    circular-block bootstrap samples of a masked fMRI time-series [1]_.
 
-        img_data = img.get_fdata().astype("int16")
+    The time-series is written once to a memory-mapped file, which all
+    parallel jobs share, and every bootstrap sample is clustered as a 2D
+    array (see `cluster_time_series`). The voxel neighborhoods and any
+    connectivity structure are computed once for all replicates. The labels
+    of each replicate are accumulated, as they arrive, into the fraction of
+    replicates in which each pair of neighboring voxels shares a cluster,
+    whose normalized cut is the consensus parcellation.
 
-        shape = img.shape
-        conn = image.grid_to_graph(
-            n_x=shape[0], n_y=shape[1], n_z=shape[2], mask=img_data
-        )
+    Parameters
+    ----------
+    ts_data : array
+        Array of shape (num_timepoints, num_voxels) of in-mask voxel
+        time-series, in C order.
+    mask_img : Nifti1Image
+        3D NIFTI file containing the mask of the voxels.
+    k : int
+        Numbers of clusters that will be generated.
+    clust_type : str
+        Type of clustering to be performed (e.g. 'ward', 'kmeans',
+        'complete', 'average', 'single', 'rena', 'ncut').
+    block_size : int
+        Size of the bootstrapped blocks of timepoints.
+    n_boot : int
+        Number of bootstrap replicates.
+    local_corr : str
+        Type of local connectivity of 'ncut'. Options are tcorr or scorr.
+    connectivity : Compressed Sparse Matrix
+        Connectivity structure among the voxels used by the agglomerative
+        methods (e.g. the local connectivity matrix). Default is the grid
+        adjacency of the mask.
+    conn_comps : Nifti1Image
+        4D image of the connected components of the mask, when there are
+        several of them.
+    thresh : float
+        Local connectivity weights lower than this value are removed.
+    n_jobs : int
+        Number of parallel jobs.
+    random_state : int
+        Seed of the bootstrap samples.
+    temp_folder : str
+        Directory under which the memory-mapped time-series is written.
+        Default is the system temporary directory.
 
-        if i == 0:
-            W = conn
-        else:
-            W = W + conn
+    Returns
+    -------
+    out_img : Nifti1Image
+        Consensus parcellation.
 
-    # compute the average
-    W = W / len(infiles)
+    References
+    ----------
+    .. [1] Bellec, P., Rosa-Neto, P., Lyttelton, O. C., Benali, H., &
+      Evans, A. C. (2010). Multi-level bootstrap analysis of stable
+      clusters in resting-state fMRI. NeuroImage.
+      https://doi.org/10.1016/j.neuroimage.2010.02.082
 
-    out_img = parcellate_ncut(W, k, img)
-    out_img.set_data_dtype(np.uint16)
+    """
+    import shutil
+    import tempfile
+    from joblib import Parallel, delayed, dump, load, effective_n_jobs
+    from scipy.sparse import issparse
+
+    mask = np.asarray(mask_img.dataobj).astype("bool")
+    seeds, neighbors = local_neighborhoods(mask)
+
+    components = None
+    if conn_comps is not None:
+        comps_data = np.asarray(conn_comps.dataobj)
+        if comps_data.ndim == 4 and comps_data.shape[-1] > 1:
+            comps_data = comps_data[mask]
+            components = np.where(comps_data.any(1), comps_data.argmax(1),
+                                  -1)
+
+    if issparse(connectivity):
+        connectivity = connectivity.tocsr()
+    else:
+        connectivity = None
+
+    kwargs = dict(mask_img=mask_img, k=k, clust_type=clust_type,
+                  connectivity=connectivity, neighborhoods=(seeds, neighbors),
+                  local_corr=local_corr, thresh=thresh,
+                  components=components)
+
+    rng = np.random.RandomState(random_state)
+    batch_size = effective_n_jobs(n_jobs)
+    coassign = np.zeros(len(seeds), dtype=np.float32)
+    n_done = 0
+    n_tried = 0
+
+    work_dir = tempfile.mkdtemp(dir=temp_folder)
+    try:
+        # One read-only copy of the time-series, mapped by every job
+        ts_path = f"{work_dir}/ts_data.mmap"
+        dump(np.asarray(ts_data, dtype=np.float32), ts_path)
+        ts_shared = load(ts_path, mmap_mode="r")
+
+        with Parallel(n_jobs=n_jobs, backend="loky", max_nbytes="1M",
+                      mmap_mode="r", temp_folder=work_dir) as parallel:
+            while n_done < n_boot:
+                if n_tried >= 2 * n_boot:
+                    raise ValueError(
+                        f"Only {n_done} of {n_tried} bootstrapped "
+                        f"clusterings succeeded.")
+                replicate_seeds = rng.randint(
+                    np.iinfo(np.int32).max,
+                    size=min(batch_size, n_boot - n_done))
+                for labels in parallel(
+                    delayed(_bootstrap_replicate)(ts_shared, block_size,
+                                                  seed, **kwargs)
+                        for seed in replicate_seeds):
+                    n_tried += 1
+                    if labels is None:
+                        continue
+                    _accumulate_coassignment(coassign, labels, seeds,
+                                             neighbors)
+                    n_done += 1
+                    print(f"Bootstrapped iteration: {n_done}")
+        del ts_shared
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-    return out_img
+    return _consensus_parcellation(coassign / n_done, seeds, neighbors, k,
+                                   mask_img)
 
 
 class NiParcellate(object):
@@ -888,6 +1184,7 @@ class NiParcellate(object):
         API for performing any of a variety of clustering routines available
          through NiLearn.
         """
+        import os
         import os.path as op
         from scipy.sparse import save_npz, load_npz
         from nilearn.regions import connected_regions
@@ -933,9 +1230,12 @@ class NiParcellate(object):
                     "the mask in the case of agglomerative clustering.")
 
             if self.local_corr == "tcorr" or self.local_corr == "scorr":
+                # The local connectivity does not depend on k, so every k
+                # of a sweep shares it, along with the cache of its ncut
+                # eigen decomposition
+                mask_name = op.basename(self.clust_mask).split(".nii")[0]
                 self._local_conn_mat_path = (
-                    f"{self.uatlas.split('.nii')[0]}_"
-                    f"{self.local_corr}_conn.npz"
+                    f"{self.outdir}/{mask_name}_{self.local_corr}_conn.npz"
                 )
 
                 if (not op.isfile(self._local_conn_mat_path)) or (
@@ -960,7 +1260,10 @@ class NiParcellate(object):
                         f"Saving spatially constrained connectivity structure"
                         f" to: {self._local_conn_mat_path}"
                     )
-                    save_npz(self._local_conn_mat_path, self._local_conn)
+                    tmp_path = f"{self._local_conn_mat_path}." \
+                               f"{os.getpid()}.tmp.npz"
+                    save_npz(tmp_path, self._local_conn)
+                    os.replace(tmp_path, self._local_conn_mat_path)
                 elif op.isfile(self._local_conn_mat_path):
                     self._local_conn = load_npz(self._local_conn_mat_path)
             elif self.local_corr == "allcorr":
@@ -981,18 +1284,35 @@ class NiParcellate(object):
         return
 
     def prep_boot(self, blocklength=1):
+        """
+        Masked, cleaned time-series of the clustering mask, and the block
+        size of its circular-block bootstrap.
+        """
+        from nilearn import signal
         from nilearn.masking import apply_mask
+        from pynets.fmri.estimation import load_confounds
 
         ts_data = apply_mask(self._func_img, self._clust_mask_corr_img)
+
+        # Confounds are regressed out of the time-series in their original
+        # order, before any resampling of the timepoints
+        ts_data = signal.clean(
+            ts_data, detrend=self._detrending,
+            standardize=self._standardize,
+            confounds=load_confounds(self.conf) if self.conf is not None
+            else None).astype(np.float32)
         return ts_data, int(int(np.sqrt(ts_data.shape[0])) * blocklength)
 
 
 def parcellate(func_boot_img, local_corr, clust_type, _local_conn_mat_path,
                num_conn_comps, _clust_mask_corr_img, _standardize,
-               _detrending, k, _local_conn, conf, _dir_path, _conn_comps):
+               _detrending, k, _local_conn, conf, _dir_path, _conn_comps,
+               k_max=None):
     """
     API for performing any of a variety of clustering routines available
-    through NiLearn.
+    through NiLearn. The ncut eigen decomposition is cached next to the
+    local connectivity matrix, at `k_max` clusters if given, so that the
+    other k of a sweep reuse it.
     """
     import time
     import os
@@ -1083,7 +1403,8 @@ def parcellate(func_boot_img, local_corr, clust_type, _local_conn_mat_path,
 
     elif clust_type == "ncut":
         out_img = parcellate_ncut(
-            _local_conn, k, _clust_mask_corr_img
+            _local_conn, k, _clust_mask_corr_img,
+            eigen_cache=ncut_cache_dir(_local_conn_mat_path), k_max=k_max
         )
         out_img.set_data_dtype(np.uint16)
         print(
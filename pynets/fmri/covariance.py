@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:08:33 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import os
+import json
+import warnings
+import numpy as np
+
+warnings.filterwarnings("ignore")
+
+# Bump whenever covariance estimation changes, so that stale solutions are
+# never served from the cache.
+COVARIANCE_VERSION = 1
+
+# Shrinkage intensities applied to the empirical covariance, in the order in
+# which they are tried when the graphical lasso is unstable
+SHRINKAGES = (0.0, 0.1, 0.3, 0.5, 0.7, 0.9, 0.99)
+
+_GLASSO_ERRORS = (FloatingPointError, ValueError, OverflowError,
+                  np.linalg.LinAlgError)
+
+
+def _graphical_lasso(emp_cov, alpha, cov_init=None, tol=1e-4, max_iter=100):
+    """
+    Graphical lasso of an empirical covariance, warm-started from
+    `cov_init`, across scikit-learn versions. Where the solver no longer
+    accepts `cov_init`, it is started cold.
+    """
+    import inspect
+
+    try:
+        from sklearn.covariance._graph_lasso import _graphical_lasso as \
+            graphical_lasso
+    except ImportError:
+        from sklearn.covariance import graphical_lasso
+
+    kwargs = {}
+    if "cov_init" in inspect.signature(graphical_lasso).parameters:
+        kwargs["cov_init"] = cov_init
+    covariance, precision = graphical_lasso(emp_cov, alpha, tol=tol,
+                                            max_iter=max_iter, **kwargs)[:2]
+    if not np.all(np.isfinite(precision)):
+        raise FloatingPointError("Non-finite precision matrix.")
+    return covariance, precision
+
+
+def _shrink(emp_cov, shrinkage):
+    from sklearn.covariance import shrunk_covariance
+
+    if shrinkage > 0:
+        return shrunk_covariance(emp_cov, shrinkage=shrinkage)
+    return emp_cov
+
+
+class CovariancePath(object):
+    """
+    Cross-validated graphical lasso along a path of regularization
+    strengths. The empirical covariance and the covariances of the
+    cross-validation folds are computed once. Each fold's solutions are
+    kept, so that every new alpha or shrinkage setting is warm-started from
+    the nearest setting solved so far.
+
+    Parameters
+    ----------
+    time_series : array
+        2D m x n array consisting of the time-series signal for each ROI node
+        where m = number of scans and n = number of ROI's.
+    cv : int
+        Number of cross-validation folds. Default is 5.
+    n_alphas : int
+        Number of alphas on each grid of the path. Default is 4.
+    n_refinements : int
+        Number of times the grid is refined around the best alpha. Default
+        is 4.
+    tol : float
+        Tolerance of the graphical lasso. Default is 1e-4.
+    max_iter : int
+        Maximum number of iterations of the final fit. Fits along the path
+        are limited to a tenth of it. Default is 100.
+
+    References
+    ----------
+    .. [1] Friedman, J., Hastie, T., & Tibshirani, R. (2008). Sparse inverse
+      covariance estimation with the graphical lasso. Biostatistics, 9(3),
+      432-441.
+
+    """
+
+    def __init__(self, time_series, cv=5, n_alphas=4, n_refinements=4,
+                 tol=1e-4, max_iter=100):
+        from sklearn.covariance import empirical_covariance
+        from sklearn.model_selection import KFold
+
+        X = np.asarray(time_series, dtype="float64")
+        self.emp_cov = empirical_covariance(X, assume_centered=True)
+        self.n_alphas = n_alphas
+        self.n_refinements = n_refinements
+        self.tol = tol
+        self.max_iter = max_iter
+        self._folds = [
+            (empirical_covariance(X[train]), empirical_covariance(X[test]))
+            for train, test in KFold(min(cv, X.shape[0])).split(X)]
+        self._solutions = [{} for _ in self._folds]
+        self.path_ = {}
+
+    def alpha_max(self, shrinkage=0.0):
+        """Smallest alpha for which all off-diagonal coefficients are 0"""
+        emp_cov = _shrink(self.emp_cov, shrinkage)
+        return float(np.max(np.abs(emp_cov - np.diag(np.diag(emp_cov)))))
+
+    def _warm_start(self, fold, alpha, shrinkage):
+        solutions = self._solutions[fold]
+        if len(solutions) == 0:
+            return None
+        nearest = min(solutions, key=lambda setting: (
+            abs(setting[0] - shrinkage),
+            abs(np.log(setting[1]) - np.log(alpha))))
+        return solutions[nearest]
+
+    def score(self, alpha, shrinkage=0.0):
+        """
+        Mean held-out log-likelihood of the graphical lasso at a given
+        setting, or -inf if it is unstable on any fold.
+        """
+        from sklearn.covariance import log_likelihood
+
+        if (shrinkage, alpha) in self.path_:
+            return self.path_[(shrinkage, alpha)]
+
+        scores = []
+        for fold, (train_cov, test_cov) in enumerate(self._folds):
+            try:
+                covariance, precision = _graphical_lasso(
+                    _shrink(train_cov, shrinkage), alpha,
+                    cov_init=self._warm_start(fold, alpha, shrinkage),
+                    tol=self.tol, max_iter=max(int(0.1 * self.max_iter), 1))
+            except _GLASSO_ERRORS:
+                scores.append(-np.inf)
+                continue
+            self._solutions[fold][(shrinkage, alpha)] = covariance
+            scores.append(log_likelihood(test_cov, precision))
+
+        score = float(np.mean(scores))
+        if not np.isfinite(score) or \
+                score >= 0.1 / np.finfo(np.float64).eps:
+            score = -np.inf
+        self.path_[(shrinkage, alpha)] = score
+        return score
+
+    def select(self, shrinkage=0.0, alpha_init=None):
+        """
+        Select the alpha with the best cross-validated score, walking each
+        grid from the sparsest to the densest solution and refining it
+        around the best alpha.
+
+        Parameters
+        ----------
+        shrinkage : float
+            Shrinkage intensity applied to the empirical covariances.
+        alpha_init : float
+            Previously selected alpha, around which a single narrow grid is
+            searched instead of the full path.
+
+        Returns
+        -------
+        alpha : float
+            Selected alpha.
+        score : float
+            Its cross-validated score, -inf if no alpha was stable.
+
+        """
+        if alpha_init is not None:
+            alphas = alpha_init * np.logspace(0.5, -0.5, self.n_alphas)
+            n_refinements = 1
+        else:
+            alpha_1 = self.alpha_max(shrinkage)
+            if alpha_1 <= 0:
+                return 0.0, self.score(0.0, shrinkage)
+            alphas = np.logspace(np.log10(alpha_1), np.log10(1e-2 * alpha_1),
+                                 self.n_alphas)
+            n_refinements = self.n_refinements
+
+        path = {}
+        for i in range(n_refinements):
+            for alpha in alphas:
+                path[float(alpha)] = self.score(float(alpha), shrinkage)
+            grid = sorted(path.items(), reverse=True)
+
+            # Ties go to the smallest alpha
+            best_index, best_score, last_finite = 0, -np.inf, 0
+            for index, (alpha, score) in enumerate(grid):
+                if np.isfinite(score):
+                    last_finite = index
+                if score >= best_score:
+                    best_index, best_score = index, score
+
+            if best_index == 0:
+                alpha_1, alpha_0 = grid[0][0], grid[1][0]
+            elif best_index == last_finite and best_index != len(grid) - 1:
+                alpha_1, alpha_0 = grid[best_index][0], \
+                    grid[best_index + 1][0]
+            elif best_index == len(grid) - 1:
+                alpha_1, alpha_0 = grid[best_index][0], \
+                    0.01 * grid[best_index][0]
+            else:
+                alpha_1, alpha_0 = grid[best_index - 1][0], \
+                    grid[best_index + 1][0]
+            alphas = np.logspace(np.log10(alpha_1), np.log10(alpha_0),
+                                 self.n_alphas + 2)[1:-1]
+
+        return grid[best_index][0], best_score
+
+    def fit(self, alpha_init=None, shrinkage_init=0.0):
+        """
+        Sparse inverse covariance at the selected regularization. Shrinkage
+        of the empirical covariance is increased, starting from
+        `shrinkage_init`, for as long as the graphical lasso is unstable.
+
+        Returns
+        -------
+        estimator : Obj
+            Fitted GraphicalLasso estimator, with an additional `shrinkage_`
+            attribute, or None if no setting was stable.
+
+        """
+        from sklearn.covariance import GraphicalLasso
+
+        for shrinkage in [s for s in SHRINKAGES if s >= shrinkage_init]:
+            alpha, score = self.select(shrinkage, alpha_init)
+            if not np.isfinite(score):
+                alpha_init = None
+                continue
+
+            inits = [solutions[(shrinkage, alpha)] for solutions in
+                     self._solutions if (shrinkage, alpha) in solutions]
+            try:
+                covariance, precision = _graphical_lasso(
+                    _shrink(self.emp_cov, shrinkage), alpha,
+                    cov_init=np.mean(inits, axis=0) if inits else None,
+                    tol=self.tol, max_iter=self.max_iter)
+            except _GLASSO_ERRORS:
+                alpha_init = None
+                continue
+
+            estimator = GraphicalLasso(alpha=alpha, assume_centered=True,
+                                       tol=self.tol, max_iter=self.max_iter)
+            estimator.location_ = np.zeros(self.emp_cov.shape[0])
+            estimator.covariance_ = covariance
+            estimator.precision_ = precision
+            estimator.shrinkage_ = shrinkage
+            return estimator
+        return None
+
+
+def estimate_sparse_covariance(time_series, ID=None, atlas=None,
+                               cache_dir=None):
+    """
+    Cross-validated sparse inverse covariance of a node-extracted
+    time-series array (see `CovariancePath`). Solutions are cached by the
+    contents of the time-series, so that every connectivity model of the
+    same time-series is served by a single fit. The selected regularization
+    is also cached per subject and atlas, so that later fits of other node
+    subsets start from it rather than from the full path.
+
+    Parameters
+    ----------
+    time_series : array
+        2D m x n array consisting of the time-series signal for each ROI node
+        where m = number of scans and n = number of ROI's.
+    ID : str
+        A subject id or other unique identifier.
+    atlas : str
+        Name of atlas parcellation used.
+    cache_dir : str
+        Directory of the cache. Default is the `covariance` subdirectory of
+        the PyNets cache (see `pynets.core.utils.get_cache_dir`).
+
+    Returns
+    -------
+    estimator : Obj
+        Fitted GraphicalLasso estimator, or None if the estimation was
+        unstable at every shrinkage intensity.
+
+    """
+    from sklearn.covariance import GraphicalLasso
+    from pynets.core.utils import content_hash, get_cache_dir
+
+    if cache_dir is None:
+        cache_dir = get_cache_dir("covariance")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    time_series = np.asarray(time_series, dtype="float64")
+    key = content_hash(time_series, version=COVARIANCE_VERSION)
+    cache_file = f"{cache_dir}/{key}.npz"
+    if os.path.isfile(cache_file):
+        try:
+            with np.load(cache_file) as f:
+                estimator = GraphicalLasso(alpha=float(f["alpha"]),
+                                           assume_centered=True)
+                estimator.location_ = np.zeros(time_series.shape[1])
+                estimator.covariance_ = f["covariance"]
+                estimator.precision_ = f["precision"]
+                estimator.shrinkage_ = float(f["shrinkage"])
+            print("Reusing cached sparse inverse covariance...")
+            return estimator
+        except (OSError, ValueError, KeyError):
+            print(f"Ignoring unreadable covariance cache: {cache_file}")
+
+    reg_file = None
+    prior = {}
+    if ID is not None or atlas is not None:
+        reg_key = content_hash(ID=str(ID), atlas=str(atlas),
+                               version=COVARIANCE_VERSION)
+        reg_file = f"{cache_dir}/{reg_key}.json"
+        if os.path.isfile(reg_file):
+            try:
+                with open(reg_file) as f:
+                    prior = json.load(f)
+            except (OSError, ValueError):
+                prior = {}
+
+    path = CovariancePath(time_series)
+    estimator = path.fit(alpha_init=prior.get("alpha"),
+                         shrinkage_init=prior.get("shrinkage", 0.0))
+    if estimator is None:
+        return None
+    print(f"Selected alpha={estimator.alpha:.2e} and shrinkage="
+          f"{estimator.shrinkage_} after {len(path.path_)} path "
+          f"evaluations.")
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_file, covariance=estimator.covariance_,
+             precision=estimator.precision_, alpha=estimator.alpha,
+             shrinkage=estimator.shrinkage_)
+    os.replace(tmp_file, cache_file)
+    if reg_file is not None:
+        tmp_file = f"{reg_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"alpha": estimator.alpha,
+                       "shrinkage": estimator.shrinkage_}, f)
+        os.replace(tmp_file, reg_file)
+    return estimator
+
+
+def connectivity_matrix(estimator, kind):
+    """
+    Connectivity matrix of a given kind from a fitted covariance estimator.
+
+    Parameters
+    ----------
+    estimator : Obj
+        Fitted covariance estimator with `covariance_` and `precision_`.
+    kind : str
+        'covariance', 'correlation', 'partial correlation', or 'precision'.
+
+    Returns
+    -------
+    conn_matrix : array
+        Adjacency matrix stored as an m x n array of nodes and edges.
+
+    """
+    from nilearn.connectome import cov_to_corr, prec_to_partial
+
+    if kind == "covariance":
+        return estimator.covariance_
+    elif kind == "correlation":
+        return cov_to_corr(estimator.covariance_)
+    elif kind == "partial correlation":
+        return prec_to_partial(estimator.precision_)
+    elif kind == "precision":
+        return estimator.precision_
+    raise ValueError(f"Unknown connectivity kind: {kind}")
@@ -14,61 +14,39 @@ if sys.platform.startswith('win') is False:
 warnings.filterwarnings("ignore")
 
 
-def get_optimal_cov_estimator(time_series):
-    from sklearn.covariance import GraphicalLassoCV
+def get_optimal_cov_estimator(time_series, ID=None, atlas=None):
+    """
+    Cross-validated sparse inverse covariance estimator of a node-extracted
+    time-series array, selected along a warm-started graphical lasso path
+    with increasing shrinkage of the empirical covariance as needed (see
+    `pynets.fmri.covariance`). The selected regularization is cached per
+    subject and atlas.
+
+    Parameters
+    ----------
+    time_series : array
+        2D m x n array consisting of the time-series signal for each ROI node
+        where m = number of scans and n = number of ROI's.
+    ID : str
+        A subject id or other unique identifier.
+    atlas : str
+        Name of atlas parcellation used.
+
+    Returns
+    -------
+    estimator : Obj
+        Fitted GraphicalLasso estimator, or None if the estimation was
+        unstable.
+
+    """
+    from pynets.fmri.covariance import estimate_sparse_covariance
 
-    estimator = GraphicalLassoCV(cv=5, assume_centered=True)
     print("\nSearching for best Lasso estimator...\n")
     try:
-        estimator.fit(time_series)
-        return estimator
-    except BaseException:
-        ix = 0
-        print("\nModel did not converge on first attempt. "
-              "Varying tolerance...\n")
-        while not hasattr(estimator, 'covariance_') and \
-            not hasattr(estimator, 'precision_') and ix < 3:
-            for tol in [0.1, 0.01, 0.001, 0.0001]:
-                print(f"Tolerance={tol}")
-                estimator = GraphicalLassoCV(cv=5, max_iter=200, tol=tol,
-                                             assume_centered=True)
-                try:
-                    estimator.fit(time_series)
-                    return estimator
-                except BaseException:
-                    ix += 1
-                    continue
-
-    if not hasattr(estimator, 'covariance_') and not hasattr(estimator,
-                                                             'precision_'):
-        print(
-            "Unstable Lasso estimation. Applying shrinkage to empirical "
-            "covariance..."
-        )
-        from sklearn.covariance import (
-            GraphicalLasso,
-            empirical_covariance,
-            shrunk_covariance,
-        )
-        try:
-            emp_cov = empirical_covariance(time_series, assume_centered=True)
-            for i in np.arange(0.8, 0.99, 0.01):
-                print(f"Shrinkage={i}:")
-                shrunk_cov = shrunk_covariance(emp_cov, shrinkage=i)
-                alphaRange = 10.0 ** np.arange(-8, 0)
-                for alpha in alphaRange:
-                    print(f"Auto-tuning alpha={alpha}...")
-                    estimator_shrunk = GraphicalLasso(alpha,
-                                                      assume_centered=True)
-                    try:
-                        estimator_shrunk.fit(shrunk_cov)
-                        return estimator_shrunk
-                    except BaseException:
-                        continue
-        except BaseException:
-            return None
-    else:
-        return estimator
+        return estimate_sparse_covariance(time_series, ID=ID, atlas=atlas)
+    except (FloatingPointError, ValueError, np.linalg.LinAlgError) as e:
+        print(e, "\nUnstable Lasso estimation.")
+        return None
 
 
 def get_conn_matrix(
@@ -224,6 +202,7 @@ def get_conn_matrix(
     """
     import sys
     from pynets.fmri.estimation import get_optimal_cov_estimator
+    from pynets.fmri.covariance import connectivity_matrix
     from nilearn.connectome import ConnectivityMeasure
 
     nilearn_kinds = ["cov", "covariance", "covar", "corr", "cor",
@@ -232,7 +211,6 @@ def get_conn_matrix(
                      "sps", "sparse", "precision"]
 
     conn_matrix = None
-    estimator = get_optimal_cov_estimator(time_series)
 
     def fallback_covariance(time_series):
         from sklearn.ensemble import IsolationForest
@@ -290,14 +268,12 @@ def get_conn_matrix(
             except ValueError:
                 sys.exit(1)
 
-        # Try with the best-fitting Lasso estimator
+        # Try with the best-fitting Lasso estimator, which is shared by
+        # every connectivity model of the same time-series
+        estimator = get_optimal_cov_estimator(time_series, ID=ID,
+                                              atlas=atlas)
         if estimator:
-            conn_measure = ConnectivityMeasure(cov_estimator=estimator,
-                                               kind=kind)
-            try:
-                conn_matrix = conn_measure.fit_transform([time_series])[0]
-            except (np.linalg.linalg.LinAlgError, FloatingPointError):
-                conn_matrix = fallback_covariance(time_series)
+            conn_matrix = connectivity_matrix(estimator, kind)
         else:
             conn_matrix = fallback_covariance(time_series)
     else:
@@ -414,7 +390,7 @@ def get_conn_matrix(
     )
 
 
-def timeseries_bootstrap(tseries, block_size):
+def timeseries_bootstrap(tseries, block_size, random_state=None):
     """
     Generates a bootstrap sample derived from the input time-series.
     Utilizes Circular-block-bootstrap method described in [1]_.
@@ -425,11 +401,16 @@ def timeseries_bootstrap(tseries, block_size):
         A matrix of shapes (`M`, `N`) with `M` timepoints and `N` variables
     block_size : integer
         Size of the bootstrapped blocks
+    random_state : int, RandomState instance or None
+        Seed or random number generator of the block offsets. Default is the
+        global numpy generator.
 
     Returns
     -------
     bseries : array_like
         Bootstrap sample of the input timeseries
+    block_mask : array_like
+        Indices of the `M` timepoints drawn into the bootstrap sample
 
     References
     ----------
@@ -439,28 +420,41 @@ def timeseries_bootstrap(tseries, block_size):
       2008, 18: 1253-1268.
 
     """
+    from sklearn.utils import check_random_state
+
+    rng = check_random_state(random_state)
+
     # calculate number of blocks
     k = int(np.ceil(float(tseries.shape[0]) / block_size))
 
     # generate random indices of blocks
-    r_ind = np.floor(np.random.rand(1, k) * tseries.shape[0])
+    r_ind = np.floor(rng.rand(1, k) * tseries.shape[0])
     blocks = np.dot(np.arange(0, block_size)[:, np.newaxis], np.ones([1, k]))
 
     block_offsets = np.dot(np.ones([block_size, 1]), r_ind)
     block_mask = (blocks + block_offsets).flatten("F")[: tseries.shape[0]]
-    block_mask = np.mod(block_mask, tseries.shape[0])
+    # Indices must not be truncated to 8 bits, which would wrap any
+    # timepoint past the 256th back to the start of the run
+    block_mask = np.mod(block_mask, tseries.shape[0]).astype(np.intp)
 
-    return tseries[block_mask.astype("uint8"), :], block_mask.astype("uint8")
+    return tseries[block_mask, :], block_mask
 
 
-def fill_confound_nans(confounds, dir_path):
-    """Fill the NaN values of a confounds dataframe with mean values"""
+def fill_confound_nans(confounds, dir_path=None):
+    """
+    Fill the NaN values of a confounds dataframe with mean values. The
+    corrected dataframe is returned in memory, unless `dir_path` is given, in
+    which case it is written to a temporary TSV whose path is returned.
+    """
     import uuid
     from time import strftime
     import os
 
-    run_uuid = f"{strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4()}"
     confounds_nonan = confounds.apply(lambda x: x.fillna(x.mean()), axis=0)
+    if dir_path is None:
+        return confounds_nonan
+
+    run_uuid = f"{strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4()}"
     os.makedirs(f"{dir_path}{'/confounds_tmp'}", exist_ok=True)
     conf_corr = (
         f"{dir_path}/confounds_tmp/confounds_mean_corrected_{run_uuid}.tsv"
@@ -469,6 +463,378 @@ def fill_confound_nans(confounds, dir_path):
     return conf_corr
 
 
+def load_confounds(conf):
+    """
+    Load a confounds table into memory as a 2D array, with any NaN values
+    (e.g. the first row of derivative regressors) filled with column means
+    and empty columns dropped.
+
+    Parameters
+    ----------
+    conf : str, pd.DataFrame, or array_like
+        Path to a tab-separated confounds file, a confounds dataframe, or an
+        array of shape (`T`, `K`).
+
+    Returns
+    -------
+    confounds : np.ndarray
+        Array of shape (`T`, `K`).
+
+    """
+    import pandas as pd
+
+    if isinstance(conf, str):
+        conf = pd.read_csv(conf, sep="\t")
+    if isinstance(conf, pd.DataFrame):
+        # Regressors without any value carry no information
+        conf = conf.dropna(axis=1, how="all")
+        if conf.isnull().values.any():
+            conf = fill_confound_nans(conf)
+        return conf.values.astype("float64")
+    confounds = np.asarray(conf, dtype="float64")
+    if confounds.ndim == 1:
+        confounds = confounds[:, np.newaxis]
+    return confounds
+
+
+def labels_operator(labels_data, mask_data=None, strategy="mean",
+                    background_label=0):
+    """
+    Sparse operator that reduces the voxels of a flattened volume to the
+    values of its labels.
+
+    Parameters
+    ----------
+    labels_data : array_like
+        3D atlas array of integer-based voxel intensities.
+    mask_data : array_like
+        3D array of the same shape as `labels_data`. Voxels outside of the
+        mask are treated as background.
+    strategy : str
+        'mean' or 'sum' weighting of the voxels of each label. Any other
+        strategy yields the 'sum' weighting, i.e. a membership matrix.
+    background_label : int
+        Label value of the background.
+
+    Returns
+    -------
+    operator : sp.csr_matrix
+        Matrix of shape (`N` labels, `V` voxels), with voxels flattened in C
+        order. Operators of several atlases on the same grid can be stacked
+        with `scipy.sparse.vstack`.
+    labels : np.ndarray
+        Label values, ordered as the rows of the operator. Labels without any
+        voxel inside of the mask are dropped.
+
+    """
+    import scipy.sparse as sp
+
+    labels_data = np.asarray(labels_data)
+    flat = np.rint(labels_data.ravel()).astype("int64")
+    inside = flat != background_label
+    if mask_data is not None:
+        inside &= np.asarray(mask_data).ravel() > 0
+
+    voxels = np.flatnonzero(inside)
+    labels, rows, counts = np.unique(flat[voxels], return_inverse=True,
+                                     return_counts=True)
+    if strategy == "mean":
+        weights = 1.0 / counts[rows]
+    else:
+        weights = np.ones(len(voxels))
+    operator = sp.csr_matrix((weights, (rows, voxels)),
+                             shape=(len(labels), flat.size))
+    return operator, labels
+
+
+class MultiLabelsMasker(object):
+    """
+    Extracts the signals of the labels of one or more 3D atlases from a 4D
+    image in a single pass over the data, reading a block of volumes at a
+    time through the image's array proxy. The label-to-voxel operators of
+    all atlases on the same grid are stacked into one sparse matrix, and each
+    block is resampled and smoothed at most once per distinct atlas grid.
+    Confound regression, detrending, filtering, and standardization are then
+    applied once, in memory, to the region signals of all atlases, as with
+    Nilearn's NiftiLabelsMasker. Peak memory scales with `chunk_mb` rather
+    than with the length of the run.
+    """
+
+    _REDUCERS = {
+        "median": np.median,
+        "minimum": np.min,
+        "maximum": np.max,
+        "variance": np.var,
+        "standard_deviation": np.std,
+    }
+
+    def __init__(
+        self,
+        labels_imgs,
+        mask_img=None,
+        background_label=0,
+        strategy="mean",
+        smoothing_fwhm=None,
+        standardize=True,
+        detrend=False,
+        low_pass=None,
+        high_pass=None,
+        t_r=None,
+        chunk_mb=256,
+    ):
+        self.labels_imgs = labels_imgs
+        self.mask_img = mask_img
+        self.background_label = background_label
+        self.strategy = strategy
+        self.smoothing_fwhm = smoothing_fwhm
+        self.standardize = standardize
+        self.detrend = detrend
+        self.low_pass = low_pass
+        self.high_pass = high_pass
+        self.t_r = t_r
+        self.chunk_mb = chunk_mb
+        self.grids_ = None
+        self.atlas_labels_ = None
+
+    def fit(self, imgs=None):
+        """
+        Build the stacked label-to-voxel operator of each distinct atlas grid
+        """
+        import nibabel as nib
+        import scipy.sparse as sp
+        from nilearn.image import resample_img
+
+        if self.strategy != "mean" and self.strategy != "sum" and \
+                self.strategy not in self._REDUCERS:
+            raise ValueError(f"Unknown extraction strategy: {self.strategy}")
+
+        mask_img = self.mask_img
+        if isinstance(mask_img, str):
+            mask_img = nib.load(mask_img)
+
+        grids = {}
+        members = []
+        self.atlas_labels_ = []
+        for labels_img in self.labels_imgs:
+            if isinstance(labels_img, str):
+                labels_img = nib.load(labels_img)
+            shape = labels_img.shape[:3]
+            key = (shape, np.round(labels_img.affine, 6).tobytes())
+            if key not in grids:
+                mask_data = None
+                if mask_img is not None:
+                    grid_mask = mask_img
+                    if mask_img.shape[:3] != shape or \
+                            not np.allclose(mask_img.affine,
+                                            labels_img.affine):
+                        grid_mask = resample_img(
+                            mask_img, target_affine=labels_img.affine,
+                            target_shape=shape, interpolation="nearest")
+                    mask_data = np.asarray(grid_mask.dataobj).reshape(shape)
+                grids[key] = {"shape": shape, "affine": labels_img.affine,
+                              "mask": mask_data, "operators": []}
+            grid = grids[key]
+
+            labels_data = np.asarray(labels_img.dataobj).reshape(shape)
+            operator, labels = labels_operator(
+                labels_data, grid["mask"], self.strategy,
+                self.background_label)
+            if len(labels) == 0:
+                raise ValueError("No label left after applying mask to the "
+                                 "labels image.")
+            members.append((key, sum(op.shape[0] for op in
+                                     grid["operators"]), len(labels)))
+            grid["operators"].append(operator)
+            self.atlas_labels_.append(labels)
+
+        for grid in grids.values():
+            grid["operator"] = sp.vstack(grid.pop("operators")).tocsr()
+            del grid["mask"]
+            if self.strategy in self._REDUCERS:
+                coo = grid["operator"].tocoo()
+                order = np.argsort(coo.row, kind="stable")
+                grid["groups"] = (coo.col[order],
+                                  np.cumsum(np.bincount(coo.row)[:-1]))
+        self.grids_ = grids
+        self._members = members
+        return self
+
+    def chunk_size(self, img):
+        """Number of volumes read at a time"""
+        n_voxels = int(np.prod(img.shape[:3])) + sum(
+            int(np.prod(grid["shape"])) for grid in self.grids_.values())
+        return int(max(1, (self.chunk_mb * 2 ** 20) // (8 * n_voxels)))
+
+    def _read(self, img, t0, step):
+        if len(img.shape) == 3:
+            return np.array(img.dataobj, dtype="float64")[..., np.newaxis]
+        return np.array(img.dataobj[..., t0:t0 + step], dtype="float64")
+
+    def iter_chunks(self, img):
+        """
+        Yield the first volume index of each block of volumes of a 4D image,
+        together with a dictionary of the data of the block on the grid of
+        each atlas, as arrays of shape (`V` voxels, `T` volumes).
+        """
+        import nibabel as nib
+        from nilearn.image import resample_img
+
+        resample = {key: grid["shape"] != img.shape[:3] or
+                    not np.allclose(grid["affine"], img.affine)
+                    for key, grid in self.grids_.items()}
+        n_vols = 1 if len(img.shape) == 3 else img.shape[3]
+        step = self.chunk_size(img)
+
+        if any(resample.values()):
+            # Interpolation overshoot is clipped to the range of the whole
+            # run, as when resampling it at once.
+            vmin, vmax = 0, 0
+            for t0 in range(0, n_vols, step):
+                chunk = self._read(img, t0, step)
+                vmin = min(vmin, np.nanmin(chunk))
+                vmax = max(vmax, np.nanmax(chunk))
+
+        for t0 in range(0, n_vols, step):
+            chunk = self._read(img, t0, step)
+            blocks = {}
+            for key, grid in self.grids_.items():
+                if resample[key] is True:
+                    data = np.clip(resample_img(
+                        nib.Nifti1Image(chunk, img.affine),
+                        target_affine=grid["affine"],
+                        target_shape=grid["shape"],
+                        interpolation="continuous", clip=False).get_fdata(),
+                        vmin, vmax)
+                elif len(blocks) < len(self.grids_) - 1:
+                    data = chunk.copy()
+                else:
+                    data = chunk
+                data[~np.isfinite(data)] = 0
+                if self.smoothing_fwhm is not None:
+                    self._smooth(data, grid["affine"])
+                blocks[key] = data.reshape(-1, data.shape[-1])
+            yield t0, blocks
+
+    def _smooth(self, chunk, affine):
+        """Smooth each volume of a block in place with a Gaussian kernel"""
+        from scipy.ndimage import gaussian_filter1d
+
+        vox_size = np.sqrt(np.sum(affine[:3, :3] ** 2, axis=0))
+        sigma = float(self.smoothing_fwhm) / (np.sqrt(8 * np.log(2)) *
+                                              vox_size)
+        for axis, s in enumerate(sigma):
+            if s > 0:
+                gaussian_filter1d(chunk, s, output=chunk, axis=axis)
+
+    def extract(self, img):
+        """
+        Raw region signals of a 4D image for every atlas.
+
+        Parameters
+        ----------
+        img : str or Obj
+            Path to, or nibabel image of, a 3D or 4D functional image.
+
+        Returns
+        -------
+        region_signals : list
+            Arrays of shape (`T` volumes, `N` labels), one per atlas.
+
+        """
+        return self._extract(img)
+
+    def _extract(self, img):
+        import nibabel as nib
+
+        if isinstance(img, str):
+            img = nib.load(img, mmap=True, keep_file_open=True)
+        if self.grids_ is None:
+            self.fit()
+
+        n_vols = 1 if len(img.shape) == 3 else img.shape[3]
+        signals = {key: np.zeros((n_vols, grid["operator"].shape[0]))
+                   for key, grid in self.grids_.items()}
+        for t0, blocks in self.iter_chunks(img):
+            for key, data in blocks.items():
+                grid = self.grids_[key]
+                t1 = t0 + data.shape[1]
+                if "groups" not in grid:
+                    signals[key][t0:t1] = (grid["operator"] @ data).T
+                else:
+                    voxels, splits = grid["groups"]
+                    reducer = self._REDUCERS[self.strategy]
+                    signals[key][t0:t1] = np.stack(
+                        [reducer(values, axis=0) for values in
+                         np.split(data[voxels], splits)], axis=1)
+
+        return [signals[key][:, start:start + n_labels] for
+                key, start, n_labels in self._members]
+
+    def transform(self, img, confounds=None):
+        """
+        Cleaned region signals of a 4D image for every atlas.
+
+        Parameters
+        ----------
+        img : str or Obj
+            Path to, or nibabel image of, a 3D or 4D functional image.
+        confounds : str, pd.DataFrame, or array_like
+            Confound regressors (see `load_confounds`).
+
+        Returns
+        -------
+        region_signals : list
+            Arrays of shape (`T` volumes, `N` labels), one per atlas.
+
+        """
+        from nilearn import signal
+
+        region_signals = self._extract(img)
+        if confounds is not None:
+            confounds = load_confounds(confounds)
+
+        # Cleaning acts on each signal independently, so that the signals of
+        # all atlases are cleaned at once.
+        cleaned = signal.clean(np.hstack(region_signals),
+                               detrend=self.detrend,
+                               standardize=self.standardize,
+                               confounds=confounds, low_pass=self.low_pass,
+                               high_pass=self.high_pass, t_r=self.t_r)
+        splits = np.cumsum([ts.shape[1] for ts in region_signals])[:-1]
+        return np.split(cleaned, splits, axis=1)
+
+    def fit_transform(self, img, confounds=None):
+        """Build the operators and return the cleaned region signals"""
+        return self.fit().transform(img, confounds=confounds)
+
+
+class ChunkedLabelsMasker(MultiLabelsMasker):
+    """
+    Single-atlas `MultiLabelsMasker`, whose signals are returned as one
+    array of shape (`T` volumes, `N` labels).
+    """
+
+    def __init__(self, labels_img, **kwargs):
+        super(ChunkedLabelsMasker, self).__init__([labels_img], **kwargs)
+        self.labels_img = labels_img
+        self.labels_ = None
+
+    def fit(self, imgs=None):
+        """Build the label-to-voxel operator on the grid of the labels"""
+        super(ChunkedLabelsMasker, self).fit(imgs)
+        self.labels_ = self.atlas_labels_[0]
+        return self
+
+    def extract(self, img):
+        """Raw region signals of a 4D image"""
+        return super(ChunkedLabelsMasker, self).extract(img)[0]
+
+    def transform(self, img, confounds=None):
+        """Cleaned region signals of a 4D image"""
+        return super(ChunkedLabelsMasker, self).transform(
+            img, confounds=confounds)[0]
+
+
 class TimeseriesExtraction(object):
     """
     Class for implementing various time-series extracting routines.
@@ -519,6 +885,7 @@ class TimeseriesExtraction(object):
             hardcoded_params = yaml.load(stream)
             try:
                 self.low_pass = hardcoded_params["low_pass"][0]
+                self.chunk_mb = hardcoded_params["extract_chunk_mb"][0]
             except KeyError as e:
                 print(e,
                     "ERROR: Plotting configuration not successfully extracted "
@@ -547,7 +914,8 @@ class TimeseriesExtraction(object):
                     "that the file(s) specified with the -conf flag "
                     "exist(s)")
 
-        self._func_img = nib.load(self.func_file)
+        self._func_img = nib.load(self.func_file, mmap=True,
+                                  keep_file_open=True)
         self._func_img.set_data_dtype(np.float32)
         hdr = self._func_img.header
 
@@ -588,53 +956,59 @@ class TimeseriesExtraction(object):
 
     def extract_ts_parc(self):
         """
-        API for employing Nilearn's NiftiLabelsMasker to extract fMRI
-        time-series data from spherical ROI's based on a given 3D atlas image
-        of integer-based voxel intensities. The resulting time-series can then
-        optionally be resampled using circular-block bootrapping. The final 2D
-        m x n array is ultimately saved to file in .npy format.
+        API for extracting fMRI time-series data from the parcels of a given
+        3D atlas image of integer-based voxel intensities. The 4D image is
+        streamed in blocks of volumes through a precomputed sparse
+        label-to-voxel operator (see `MultiLabelsMasker`), and confounds
+        are regressed in memory. If `net_parcels_nii_path` is a list of
+        atlases or parcellations, the time-series of all of them are
+        extracted in a single pass over the data, and `ts_within_nodes` is a
+        list of arrays ordered as the atlases. The resulting time-series can
+        then optionally be resampled using circular-block bootrapping. The
+        final 2D m x n array is ultimately saved to file in .npy format.
         """
         import nibabel as nib
-        from nilearn import input_data
-        from pynets.fmri.estimation import fill_confound_nans
-
-        self._net_parcels_map_nifti = nib.load(self.net_parcels_nii_path,
-                                               mmap=True)
-        self._net_parcels_map_nifti.set_data_dtype(np.int16)
-        self._parcel_masker = input_data.NiftiLabelsMasker(
-            labels_img=self._net_parcels_map_nifti,
+        from pynets.fmri.estimation import ChunkedLabelsMasker, \
+            MultiLabelsMasker
+
+        multi = isinstance(self.net_parcels_nii_path, (list, tuple))
+        if multi is True:
+            net_parcels_nii_paths = self.net_parcels_nii_path
+        else:
+            net_parcels_nii_paths = [self.net_parcels_nii_path]
+
+        self._net_parcels_map_nifti = []
+        for net_parcels_nii_path in net_parcels_nii_paths:
+            net_parcels_map_nifti = nib.load(net_parcels_nii_path, mmap=True)
+            net_parcels_map_nifti.set_data_dtype(np.int16)
+            self._net_parcels_map_nifti.append(net_parcels_map_nifti)
+
+        if self.smooth is not None and float(self.smooth) > 0:
+            smoothing_fwhm = float(self.smooth)
+        else:
+            smoothing_fwhm = None
+        params = dict(
+            mask_img=self._mask_img,
             background_label=0,
+            strategy=self.extract_strategy,
+            smoothing_fwhm=smoothing_fwhm,
             standardize=True,
-            smoothing_fwhm=float(self.smooth),
+            detrend=self._detrending,
             low_pass=self.low_pass,
             high_pass=self.hpass,
-            detrend=self._detrending,
             t_r=self._t_r,
-            verbose=2,
-            resampling_target="labels",
-            dtype="auto",
-            mask_img=self._mask_img,
-            strategy=self.extract_strategy
+            chunk_mb=self.chunk_mb,
         )
-
-        if self.conf is not None:
-            import pandas as pd
-            import os
-
-            confounds = pd.read_csv(self.conf, sep="\t")
-            if confounds.isnull().values.any():
-                conf_corr = fill_confound_nans(confounds, self.dir_path)
-                self.ts_within_nodes = self._parcel_masker.fit_transform(
-                    self._func_img, confounds=conf_corr
-                )
-                os.remove(conf_corr)
-            else:
-                self.ts_within_nodes = self._parcel_masker.fit_transform(
-                    self._func_img, confounds=self.conf
-                )
+        if multi is True:
+            self._parcel_masker = MultiLabelsMasker(
+                labels_imgs=self._net_parcels_map_nifti, **params)
         else:
-            self.ts_within_nodes = self._parcel_masker.fit_transform(
-                self._func_img)
+            self._net_parcels_map_nifti = self._net_parcels_map_nifti[0]
+            self._parcel_masker = ChunkedLabelsMasker(
+                labels_img=self._net_parcels_map_nifti, **params)
+
+        self.ts_within_nodes = self._parcel_masker.fit_transform(
+            self._func_img, confounds=self.conf)
 
         self._func_img.uncache()
 
@@ -647,28 +1021,49 @@ class TimeseriesExtraction(object):
         return
 
     def save_and_cleanup(self):
-        """Save the extracted time-series and clean cache"""
+        """
+        Save the extracted time-series and clean cache. With several
+        atlases, `dir_path` must be a list of derivative directories ordered
+        as the atlases, since the saved file names do not include the atlas.
+        """
         import gc
         from pynets.core import utils
 
+        if isinstance(self.ts_within_nodes, list):
+            if not isinstance(self.dir_path, (list, tuple)) or \
+                    len(self.dir_path) != len(self.ts_within_nodes):
+                raise ValueError(
+                    f"One derivative directory is required per atlas, but "
+                    f"{len(self.ts_within_nodes)} atlases were given with "
+                    f"dir_path: {self.dir_path}")
+            dir_paths = self.dir_path
+            ts_within_nodes = self.ts_within_nodes
+            net_parcels_map_niftis = self._net_parcels_map_nifti
+        else:
+            dir_paths = [self.dir_path]
+            ts_within_nodes = [self.ts_within_nodes]
+            net_parcels_map_niftis = [self._net_parcels_map_nifti]
+
         # Save time series as file
-        utils.save_ts_to_file(
-            self.roi,
-            self.network,
-            self.ID,
-            self.dir_path,
-            self.ts_within_nodes,
-            self.smooth,
-            self.hpass,
-            self.node_size,
-            self.extract_strategy,
-        )
+        for dir_path, ts in zip(dir_paths, ts_within_nodes):
+            utils.save_ts_to_file(
+                self.roi,
+                self.network,
+                self.ID,
+                dir_path,
+                ts,
+                self.smooth,
+                self.hpass,
+                self.node_size,
+                self.extract_strategy,
+            )
 
         if self._mask_path is not None:
             self._mask_img.uncache()
 
         if self._parcel_masker is not None:
             del self._parcel_masker
-            self._net_parcels_map_nifti.uncache()
+            for net_parcels_map_nifti in net_parcels_map_niftis:
+                net_parcels_map_nifti.uncache()
         gc.collect()
         return
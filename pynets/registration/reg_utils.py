@@ -22,9 +22,19 @@ except KeyError:
     print("FSLDIR environment variable not set!")
     sys.exit(1)
 
+# Version of the on-disk cache of registration transforms and outputs
+REGISTRATION_CACHE_VERSION = 1
+
+# Version of the on-disk cache of SyN mappings
+SYN_CACHE_VERSION = 1
+
+# Attributes of a DiffeomorphicMap stored in the SyN cache
+_MAPPING_ATTRS = ("disp_shape", "disp_grid2world", "domain_shape",
+                  "domain_grid2world", "codomain_shape", "codomain_grid2world",
+                  "prealign", "is_inverse", "forward", "backward")
+
 
 def gen_mask(t1w_head, t1w_brain, mask):
-    import time
     import os.path as op
     from pynets.registration import reg_utils as regutils
     from nilearn.image import math_img
@@ -59,11 +69,9 @@ def gen_mask(t1w_head, t1w_brain, mask):
     img = math_img("img > 0.0", img=t_img)
     img.to_filename(t1w_brain_mask)
     t_img.uncache()
-    time.sleep(0.5)
 
     t1w_brain = regutils.apply_mask_to_image(t1w_head, t1w_brain_mask,
                                              t1w_brain)
-    time.sleep(0.5)
 
     assert op.isfile(t1w_brain)
     assert op.isfile(t1w_brain_mask)
@@ -121,7 +129,6 @@ def atlas2t1w2dwi_align(
     registration instead. For this to succeed, must first have called
     t1w2dwi_align.
     """
-    import time
     from nilearn.image import resample_to_img
     from pynets.core.utils import checkConsecutive
     from pynets.registration import reg_utils as regutils
@@ -158,28 +165,22 @@ def atlas2t1w2dwi_align(
                 sup=True,
                 mask=t1w_brain_mask,
             )
-            time.sleep(0.5)
 
             # Apply linear transformation from template to dwi space
             regutils.applyxfm(ap_path, aligned_atlas_skull, t1w2dwi_bbr_xfm,
                               dwi_aligned_atlas, interp="nearestneighbour")
-            time.sleep(0.5)
         except BaseException:
             print(
                 "Warning: Atlas is not in correct dimensions, or input is low"
                 " quality,\nusing linear template registration.")
 
             combine_xfms(mni2t1_xfm, t1w2dwi_bbr_xfm, mni2dwi_xfm)
-            time.sleep(0.5)
             regutils.applyxfm(ap_path, aligned_atlas_t1mni, mni2dwi_xfm,
                               dwi_aligned_atlas, interp="nearestneighbour")
-            time.sleep(0.5)
     else:
         combine_xfms(mni2t1_xfm, t1w2dwi_xfm, mni2dwi_xfm)
-        time.sleep(0.5)
         regutils.applyxfm(ap_path, aligned_atlas_t1mni, mni2dwi_xfm,
                           dwi_aligned_atlas, interp="nearestneighbour")
-        time.sleep(0.5)
 
     atlas_img = nib.load(dwi_aligned_atlas)
     wm_gm_img = nib.load(wm_gm_int_in_dwi)
@@ -205,12 +206,10 @@ def atlas2t1w2dwi_align(
                                                      B0_mask,
                                                      dwi_aligned_atlas)
 
-    time.sleep(0.5)
 
     dwi_aligned_atlas_wmgm_int = regutils.apply_mask_to_image(
         dwi_aligned_atlas_wmgm_int,  B0_mask, dwi_aligned_atlas_wmgm_int)
 
-    time.sleep(0.5)
     final_dat = atlas_img_corr.get_fdata()
     unique_a = sorted(set(np.array(final_dat.flatten().tolist())))
 
@@ -249,7 +248,6 @@ def roi2dwi_align(
     A function to perform alignment of a waymask from
     MNI space --> T1w --> dwi.
     """
-    import time
     from pynets.registration import reg_utils as regutils
     from nilearn.image import resample_to_img
 
@@ -269,7 +267,6 @@ def roi2dwi_align(
     else:
         regutils.applyxfm(t1w_brain, roi, mni2t1_xfm, roi_in_t1w)
 
-    time.sleep(0.5)
     # Apply transform from t1w to native dwi space
     regutils.applyxfm(ap_path, roi_in_t1w, t1wtissue2dwi_xfm, roi_in_dwi)
 
@@ -292,7 +289,6 @@ def waymask2dwi_align(
     A function to perform alignment of a waymask from
     MNI space --> T1w --> dwi.
     """
-    import time
     from nilearn.image import math_img
     from pynets.registration import reg_utils as regutils
     from nilearn.image import resample_to_img
@@ -317,7 +313,6 @@ def waymask2dwi_align(
     else:
         regutils.applyxfm(t1w_brain, waymask_res, mni2t1_xfm, waymask_in_t1w)
 
-    time.sleep(0.5)
     # Apply transform from t1w to native dwi space
     regutils.applyxfm(
         ap_path,
@@ -325,7 +320,6 @@ def waymask2dwi_align(
         t1wtissue2dwi_xfm,
         waymask_in_dwi)
 
-    time.sleep(0.5)
 
     t_img = nib.load(waymask_in_dwi)
     mask = math_img("img > 0.01", img=t_img)
@@ -345,7 +339,6 @@ def roi2t1w_align(
     """
     A function to perform alignment of a roi from MNI space --> T1w.
     """
-    import time
     from pynets.registration import reg_utils as regutils
     from nilearn.image import resample_to_img
 
@@ -365,7 +358,6 @@ def roi2t1w_align(
     else:
         regutils.applyxfm(t1w_brain, roi_res, mni2t1_xfm, roi_in_t1w)
 
-    time.sleep(0.5)
 
     return roi_in_t1w
 
@@ -384,7 +376,6 @@ def RegisterParcellation2MNIFunc_align(
     """
     A function to perform atlas alignment from T1w atlas --> MNI.
     """
-    import time
     from pynets.registration import reg_utils as regutils
     from nilearn.image import resample_to_img
 
@@ -412,7 +403,6 @@ def RegisterParcellation2MNIFunc_align(
                 interp="nn",
                 sup=True,
             )
-            time.sleep(0.5)
         except BaseException:
             print(
                 "Warning: Atlas is not in correct dimensions, or input is "
@@ -428,7 +418,6 @@ def RegisterParcellation2MNIFunc_align(
                 interp="nearestneighbour",
                 cost="mutualinfo",
             )
-            time.sleep(0.5)
     else:
         regutils.align(
             aligned_atlas_t1w,
@@ -440,7 +429,6 @@ def RegisterParcellation2MNIFunc_align(
             interp="nearestneighbour",
             cost="mutualinfo",
         )
-        time.sleep(0.5)
     return aligned_atlas_mni
 
 
@@ -463,7 +451,6 @@ def atlas2t1w_align(
     """
     A function to perform atlas alignment from atlas --> T1w.
     """
-    import time
     from pynets.registration import reg_utils as regutils
     from nilearn.image import resample_to_img
     # from pynets.core.utils import checkConsecutive
@@ -498,7 +485,6 @@ def atlas2t1w_align(
                 sup=True,
                 mask=t1w_brain_mask,
             )
-            time.sleep(0.5)
         except BaseException:
             print(
                 "Warning: Atlas is not in correct dimensions, or input is low "
@@ -506,11 +492,9 @@ def atlas2t1w_align(
 
             regutils.applyxfm(t1w_brain, aligned_atlas_t1mni, mni2t1_xfm,
                               aligned_atlas_skull, interp="nearestneighbour")
-            time.sleep(0.5)
     else:
         regutils.applyxfm(t1w_brain, aligned_atlas_t1mni, mni2t1_xfm,
                           aligned_atlas_skull, interp="nearestneighbour")
-        time.sleep(0.5)
 
     # aligned_atlas_gm = regutils.apply_mask_to_image(aligned_atlas_skull,
     #                                                 gm_mask,
@@ -519,7 +503,6 @@ def atlas2t1w_align(
                                                     t1w_brain_mask,
                                                     aligned_atlas_gm)
 
-    time.sleep(0.5)
     atlas_img = nib.load(aligned_atlas_gm)
 
     atlas_img_corr = nib.Nifti1Image(
@@ -579,7 +562,7 @@ def segment_t1w(t1w, basename, opts=""):
     # run FAST, with options -t for the image type and -n to
     # segment into CSF (pve_0), GM (pve_1), WM (pve_2)
     cmd = f"fast -t 1 {opts} -n 3 -o {basename} {t1w}"
-    os.system(cmd)
+    run_command(cmd)
     out = {}  # the outputs
     out["wm_prob"] = f"{basename}_{'pve_2.nii.gz'}"
     out["gm_prob"] = f"{basename}_{'pve_1.nii.gz'}"
@@ -587,6 +570,118 @@ def segment_t1w(t1w, basename, opts=""):
     return out
 
 
+def run_command(cmd):
+    """
+    Run a command line in a shell, and wait for it to exit.
+
+    Parameters
+    ----------
+    cmd : str
+        Command line to run.
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If the command exits with a non-zero status.
+
+    """
+    import subprocess
+
+    subprocess.run(cmd, shell=True, check=True)
+    return
+
+
+def _fsl_version():
+    """Contents of the FSL version file, if there is one"""
+    try:
+        with open(f"{FSLDIR}/etc/fslversion", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _image_ext(path):
+    """Extension of a file path, counting .nii.gz as one"""
+    return ".nii.gz" if str(path).endswith(".nii.gz") else \
+        os.path.splitext(str(path))[1]
+
+
+def run_cached(cmd, inputs, outputs, cache_dir=None, **params):
+    """
+    Run a registration command line, unless an earlier run on inputs of
+    identical contents and with identical parameters has cached its outputs,
+    which are then copied to the requested paths instead.
+
+    Parameters
+    ----------
+    cmd : str
+        Command line to run.
+    inputs : dict
+        Dictionary of input files by role (e.g. `in`, `ref`, `warp`). Files
+        are keyed by their contents, so that copies of an image in different
+        working directories share the cached outputs.
+    outputs : dict
+        Dictionary of output file paths by role. Roles whose path is None are
+        not produced.
+    cache_dir : str
+        Directory of the cache. Default is the `registration` subdirectory of
+        the PyNets cache (see `pynets.core.utils.get_cache_dir`).
+    params : dict
+        Registration parameters, which are part of the key, along with the
+        tool and the FSL version.
+
+    Returns
+    -------
+    hit : bool
+        True if the outputs were copied from the cache.
+
+    """
+    import shutil
+    from pynets.core.utils import content_hash, get_cache_dir
+
+    inputs = {role: os.path.expandvars(str(path)) for role, path in
+              inputs.items() if path is not None}
+    outputs = {role: str(path) for role, path in outputs.items() if path is
+               not None}
+    if len(outputs) == 0:
+        run_command(cmd)
+        return False
+
+    if cache_dir is None:
+        cache_dir = get_cache_dir("registration")
+    key = content_hash(
+        *[inputs[role] for role in sorted(inputs)], tool=cmd.split()[0],
+        inputs=sorted(inputs),
+        outputs=sorted((role, _image_ext(path)) for role, path in
+                       outputs.items()),
+        fsl=_fsl_version(), version=REGISTRATION_CACHE_VERSION, **params)
+    entry = f"{cache_dir}/{key}"
+    cached = {role: f"{entry}/{role}{_image_ext(path)}" for role, path in
+              outputs.items()}
+
+    if all(os.path.isfile(i) for i in cached.values()):
+        print(f"Reusing cached {cmd.split()[0]} outputs...")
+        for role, path in outputs.items():
+            shutil.copyfile(cached[role], path)
+        return True
+
+    run_command(cmd)
+
+    # Runs with missing outputs are not cached
+    if not all(os.path.isfile(i) for i in outputs.values()):
+        return False
+    tmp_entry = f"{entry}.{os.getpid()}.tmp"
+    os.makedirs(tmp_entry, exist_ok=True)
+    for role, path in outputs.items():
+        shutil.copyfile(path, f"{tmp_entry}/{role}{_image_ext(path)}")
+    try:
+        os.replace(tmp_entry, entry)
+    except OSError:
+        # Another process cached the same outputs first
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    return False
+
+
 def align(
     inp,
     ref,
@@ -657,7 +752,9 @@ def align(
     if init is not None:
         cmd += f" -init {init}"
     print(cmd)
-    os.system(cmd)
+    run_cached(cmd, {"in": inp, "ref": ref, "wmseg": wmseg, "init": init,
+                     "schedule": sch}, {"omat": xfm, "out": out}, dof=dof,
+               searchrad=searchrad, bins=bins, interp=interp, cost=cost)
     return
 
 
@@ -707,7 +804,9 @@ def align_nonlinear(
     if config is not None:
         cmd += f" --config={config}"
     print(cmd)
-    os.system(cmd)
+    run_cached(cmd, {"in": inp, "ref": ref, "aff": xfm, "refmask": ref_mask,
+                     "inmask": in_mask, "config": config},
+               {"iout": out, "cout": warp}, warpres="8,8,8")
     return
 
 
@@ -733,10 +832,19 @@ def applyxfm(ref, inp, xfm, aligned, interp="trilinear", dof=6):
             Number of degrees of freedom to use in the alignment.
 
     """
+    from pynets.registration import transforms
+
+    try:
+        transforms.apply_transform(ref, inp, aligned, xfm=xfm, interp=interp)
+        return
+    except (ValueError, OSError) as e:
+        print(f"{e}\nFalling back to flirt...")
+
     cmd = f"flirt -in {inp} -ref {ref} -out {aligned} -init {xfm} -interp" \
           f" {interp} -dof {dof} -applyxfm"
     print(cmd)
-    os.system(cmd)
+    run_cached(cmd, {"in": inp, "ref": ref, "init": xfm}, {"out": aligned},
+               interp=interp, dof=dof)
     return
 
 
@@ -776,6 +884,29 @@ def apply_warp(
             Intermediary supersampling of output. Default is False.
 
     """
+    import subprocess
+    from pynets.registration import transforms
+
+    try:
+        transforms.apply_transform(ref, inp, out, xfm=xfm, warp=warp,
+                                   mask=mask, interp=interp, sup=sup)
+        return
+    except (ValueError, OSError, subprocess.CalledProcessError) as e:
+        print(f"{e}\nFalling back to applywarp...")
+
+    _applywarp(ref, inp, out, warp=warp, xfm=xfm, mask=mask, interp=interp,
+               sup=sup)
+    return
+
+
+def _applywarp(ref, inp, out, warp=None, xfm=None, mask=None, interp=None,
+               sup=False):
+    """Apply a warp with FSL's applywarp (see `apply_warp`)"""
+    from pynets.registration import transforms
+
+    # applywarp names nearest-neighbour interpolation differently than flirt
+    if interp is not None and transforms.interpolation_order(interp) == 0:
+        interp = "nn"
     cmd = f"applywarp --ref={ref} --in={inp} --out={out}"
     if xfm is not None:
         cmd += f" --premat={xfm}"
@@ -788,10 +919,75 @@ def apply_warp(
     if sup is True:
         cmd += " --super --superlevel=a"
     print(cmd)
-    os.system(cmd)
+    run_cached(cmd, {"ref": ref, "in": inp, "warp": warp, "premat": xfm,
+                     "mask": mask}, {"out": out}, interp=interp, sup=sup)
     return
 
 
+def apply_warps(
+        ref,
+        inps,
+        outs,
+        warp=None,
+        xfm=None,
+        mask=None,
+        interps=None,
+        sup=False):
+    """
+    Applies one warp and/or transformation matrix to a batch of Nifti1Images,
+    loading the transform only once.
+
+    Parameters
+    ----------
+        ref : str
+            File path to reference Nifti1Image to use as the target for
+            alignment.
+        inps : list
+            File paths to input Nifti1Images to be aligned for registration.
+        outs : list
+            File paths to the Nifti1Images output following registration
+            alignment.
+        warp : str
+            File path to input Nifti1Image output for the nonlinear warp
+            following alignment.
+        xfm : str
+            File path for the transformation matrix input in .xfm.
+        mask : str
+            Optional file path to a mask in reference image space.
+        interps : list
+            Interpolation method to use for each input. Default is
+            nearest-neighbour for label images, e.g. atlases and ROIs, and
+            trilinear for continuous images, e.g. tissue maps.
+        sup : bool
+            Intermediary supersampling of output. Default is False.
+
+    Returns
+    -------
+        outs : list
+            File paths to the Nifti1Images output following registration
+            alignment.
+
+    """
+    import subprocess
+    from pynets.registration import transforms
+
+    try:
+        return transforms.apply_transforms(ref, inps, outs, xfm=xfm,
+                                           warp=warp, mask=mask,
+                                           interps=interps, sup=sup)
+    except (ValueError, OSError, subprocess.CalledProcessError) as e:
+        print(f"{e}\nFalling back to applywarp...")
+
+    if interps is None:
+        interps = [None] * len(inps)
+    for inp, out, interp in zip(inps, outs, interps):
+        if interp is None:
+            interp = transforms.default_interpolation(nib.load(inp))
+        _applywarp(ref, inp, out, warp=warp, xfm=xfm, mask=mask,
+                   interp=interp, sup=sup)
+    return outs
+
+
 def inverse_warp(ref, out, warp):
     """
     Generates the inverse of a warp from a reference image space to the input
@@ -812,14 +1008,14 @@ def inverse_warp(ref, out, warp):
     """
     cmd = f"invwarp --warp={warp} --out={out} --ref={ref}"
     print(cmd)
-    os.system(cmd)
+    run_cached(cmd, {"warp": warp, "ref": ref}, {"out": out})
     return
 
 
 def combine_xfms(xfm1, xfm2, xfmout):
     """
     A function to combine two transformations, and output the resulting
-    transformation.
+    transformation, as `convert_xfm -concat`.
 
     Parameters
     ----------
@@ -831,33 +1027,40 @@ def combine_xfms(xfm1, xfm2, xfmout):
             File path to the output transformation.
 
     """
-    cmd = f"convert_xfm -omat {xfmout} -concat {xfm1} {xfm2}"
-    print(cmd)
-    os.system(cmd)
+    from pynets.registration import transforms
+
+    transforms.save_xfm(transforms.load_xfm(xfm1) @
+                        transforms.load_xfm(xfm2), xfmout)
     return
 
 
 def invert_xfm(in_mat, out_mat):
-    import os
-    cmd = f"convert_xfm -omat {out_mat} -inverse {in_mat}"
-    print(cmd)
-    os.system(cmd)
+    from pynets.registration import transforms
+
+    transforms.save_xfm(np.linalg.inv(transforms.load_xfm(in_mat)), out_mat)
     return out_mat
 
 
 def apply_mask_to_image(input, mask, output):
-    import os
-    cmd = f"fslmaths {input} -mas {mask} {output}"
-    print(cmd)
-    os.system(cmd)
+    img = nib.load(input)
+    mask_data = np.asarray(nib.load(mask).dataobj) != 0
+    data = np.asanyarray(img.dataobj)
+    if data.ndim > mask_data.ndim:
+        mask_data = mask_data.reshape(mask_data.shape + (1,) *
+                                      (data.ndim - mask_data.ndim))
+    out_img = nib.Nifti1Image((data * mask_data).astype(data.dtype),
+                              img.affine, header=img.header)
+    tmp = f"{output}.{os.getpid()}.tmp{_image_ext(output)}"
+    nib.save(out_img, tmp)
+    os.replace(tmp, output)
+    img.uncache()
     return output
 
 
 def get_wm_contour(wm_map, mask, wm_edge):
-    import os
     cmd = f"fslmaths {wm_map} -edge -bin -mas {mask} {wm_edge}"
     print(cmd)
-    os.system(cmd)
+    run_command(cmd)
     return wm_edge
 
 
@@ -870,6 +1073,105 @@ def vdc(n, vox_size):
     return vdc
 
 
+def streamline_displacements(field, streamlines, affine):
+    """
+    Interpolate a displacement field at every point of a set of streamlines,
+    in one vectorized pass over their concatenated coordinates.
+
+    Parameters
+    ----------
+    field : ndarray
+        Displacement field of shape (X, Y, Z, 3).
+    streamlines : ArraySequence
+        Streamlines.
+    affine : ndarray
+        4x4 mapping from the voxels of the field to the coordinates of the
+        streamlines.
+
+    Returns
+    -------
+    displacements : ndarray
+        Array of shape (n_points, 3), in the order of the concatenated
+        points of the streamlines. Points outside of the field are not
+        displaced.
+
+    """
+    from dipy.core.interpolation import interpolate_vector_3d
+    from dipy.tracking.streamline import Streamlines
+
+    inv_affine = np.linalg.inv(affine)
+    points = Streamlines(streamlines).get_data().astype("float64")
+    points = points @ inv_affine[:3, :3].T + inv_affine[:3, 3]
+    return np.asarray(interpolate_vector_3d(
+        np.asarray(field, dtype="float64"), points)[0])
+
+
+def streamline_voxels(streamlines, affine=np.eye(4)):
+    """
+    Voxel indices of every point of a set of streamlines, and the index of
+    the streamline of each point, following the rounding of
+    `dipy.tracking.utils.density_map`.
+
+    Parameters
+    ----------
+    streamlines : ArraySequence
+        Streamlines.
+    affine : ndarray
+        4x4 mapping from voxels to the coordinates of the streamlines.
+        Default is the identity.
+
+    Returns
+    -------
+    voxels : ndarray
+        Integer array of shape (n_points, 3). Points that map to negative
+        indices are left negative.
+    owners : ndarray
+        Index of the streamline of each point.
+
+    """
+    from dipy.tracking.streamline import Streamlines
+
+    streamlines = Streamlines(streamlines)
+    # Half-voxel shift, so that flooring yields the nearest voxel
+    inv_affine = np.linalg.inv(np.asarray(affine, dtype=float))
+    voxels = streamlines.get_data() @ inv_affine[:3, :3].T + \
+        inv_affine[:3, 3] + 0.5
+    voxels = np.floor(voxels.round(decimals=6)).astype(np.intp)
+    owners = np.repeat(np.arange(len(streamlines)), streamlines._lengths)
+    return voxels, owners
+
+
+def streamline_density(voxels, owners, vol_dims):
+    """
+    Number of streamlines passing through each voxel, counting each
+    streamline once per voxel, as `dipy.tracking.utils.density_map`. Points
+    outside of the volume are ignored.
+
+    Parameters
+    ----------
+    voxels : ndarray
+        Voxel indices of the points of the streamlines (see
+        `streamline_voxels`).
+    owners : ndarray
+        Index of the streamline of each point.
+    vol_dims : tuple
+        Shape of the volume.
+
+    Returns
+    -------
+    density : ndarray
+        Integer array of shape `vol_dims`.
+
+    """
+    vol_dims = tuple(vol_dims[:3])
+    inside = np.all((voxels >= 0) & (voxels < np.asarray(vol_dims)),
+                    axis=1)
+    n_vox = int(np.prod(vol_dims))
+    pairs = np.unique(owners[inside].astype("int64") * n_vox +
+                      np.ravel_multi_index(voxels[inside].T, vol_dims))
+    return np.bincount(pairs % n_vox, minlength=n_vox).reshape(vol_dims)
+
+
 def warp_streamlines(
     adjusted_affine,
     ref_grid_aff,
@@ -877,39 +1179,69 @@ def warp_streamlines(
     warped_fa_img,
     streams_in_curr_grid,
     brain_mask,
+    displacements=None,
 ):
-    from dipy.tracking import utils
-    from dipy.tracking.streamline import (
-        values_from_volume,
-        transform_streamlines,
-        Streamlines,
-    )
+    """
+    Deform streamlines with a SyN mapping, isocenter them, and remove
+    streamlines outside of the brain. The deformation and both affines are
+    applied to the concatenated points of the streamlines at once.
 
-    # Deform streamlines, isocenter, and remove streamlines outside brain
-    streams_in_brain = [
-        sum(d, s)
-        for d, s in zip(
-            values_from_volume(
-                mapping.get_forward_field(), streams_in_curr_grid, ref_grid_aff
-            ),
-            streams_in_curr_grid,
-        )
-    ]
-    streams_final_filt = Streamlines(
-        utils.target_line_based(
-            transform_streamlines(
-                transform_streamlines(
-                    streams_in_brain,
-                    np.linalg.inv(adjusted_affine)),
-                np.linalg.inv(
-                    warped_fa_img.affine),
-            ),
-            np.eye(4),
-            brain_mask,
-            include=True,
-        ))
-
-    return streams_final_filt
+    Parameters
+    ----------
+    adjusted_affine : ndarray
+        4x4 isocentering affine.
+    ref_grid_aff : ndarray
+        4x4 mapping from the voxels of the forward field of the mapping to
+        the coordinates of the streamlines.
+    mapping : DiffeomorphicMap
+        SyN mapping (see `wm_syn`).
+    warped_fa_img : Nifti1Image
+        FA image warped by the mapping.
+    streams_in_curr_grid : ArraySequence
+        Streamlines.
+    brain_mask : ndarray
+        Brain mask in template space.
+    displacements : ndarray
+        Displacements of the points of the streamlines. Default is to
+        interpolate them from the forward field of the mapping (see
+        `streamline_displacements`), which does not depend on the
+        isocentering affine.
+
+    Returns
+    -------
+    streams_final_filt : ArraySequence
+        Warped streamlines within the brain.
+
+    """
+    from dipy.tracking.streamline import Streamlines
+
+    if displacements is None:
+        displacements = streamline_displacements(
+            mapping.get_forward_field(), streams_in_curr_grid, ref_grid_aff)
+
+    # Deform streamlines and isocenter them in one pass
+    xfm = np.linalg.inv(warped_fa_img.affine) @ np.linalg.inv(adjusted_affine)
+    streams = Streamlines(streams_in_curr_grid)
+    warped = (streams.get_data() + displacements) @ xfm[:3, :3].T + \
+        xfm[:3, 3]
+    streams = Streamlines(np.split(warped, np.cumsum(streams._lengths)[:-1]))
+
+    # Remove streamlines outside brain. The mask test traverses the
+    # segments between points, over views into the warped points. dipy's
+    # private mask test is used where available, since it returns indices
+    # rather than copies of the streamlines.
+    try:
+        from dipy.tracking.vox2track import _streamlines_in_mask
+    except ImportError:
+        from dipy.tracking.utils import target_line_based
+
+        return Streamlines(target_line_based(list(streams), np.eye(4),
+                                             brain_mask, include=True))
+
+    in_brain = _streamlines_in_mask(
+        list(streams), np.array(brain_mask, dtype=np.uint8, copy=True),
+        np.eye(3), np.full(3, 0.5))
+    return streams[np.where(in_brain == 1)[0]]
 
 
 def rescale_affine_to_center(input_affine, voxel_dims=[1, 1, 1],
@@ -953,9 +1285,36 @@ def rescale_affine_to_center(input_affine, voxel_dims=[1, 1, 1],
     return target_affine
 
 
-def wm_syn(template_path, fa_path, template_anat_path, ap_path, working_dir):
+def _save_mapping(mapping, warped_moving, warped_affine, path):
+    """Atomically save a DiffeomorphicMap and its warped moving image"""
+    arrays = {attr: np.asarray(getattr(mapping, attr)) for attr in
+              _MAPPING_ATTRS if getattr(mapping, attr) is not None}
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, warped_moving=warped_moving.astype("float32"),
+             warped_affine=warped_affine, **arrays)
+    os.replace(tmp, path)
+
+
+def _load_mapping(path):
+    """Load a DiffeomorphicMap and its warped moving image"""
+    from dipy.align.imwarp import DiffeomorphicMap
+
+    with np.load(path) as f:
+        arrays = {attr: f[attr] for attr in f.files}
+    mapping = DiffeomorphicMap(
+        3, tuple(arrays["disp_shape"]),
+        **{attr: arrays.get(attr) for attr in _MAPPING_ATTRS[1:-3]})
+    mapping.is_inverse = bool(arrays["is_inverse"])
+    mapping.forward = arrays["forward"]
+    mapping.backward = arrays["backward"]
+    return mapping, arrays["warped_moving"], arrays["warped_affine"]
+
+
+def wm_syn(template_path, fa_path, template_anat_path, ap_path, working_dir,
+           cache_dir=None):
     """
-    A function to perform SyN registration
+    A function to perform SyN registration. The mapping is cached by the
+    contents of the images, so that it is computed once per subject.
 
     Parameters
     ----------
@@ -969,6 +1328,10 @@ def wm_syn(template_path, fa_path, template_anat_path, ap_path, working_dir):
             File path to the AP moving image.
         working_dir : str
             Path to the working directory to perform SyN and save outputs.
+        cache_dir : str
+            Directory of the cache of SyN mappings. Default is the `syn`
+            subdirectory of the PyNets cache (see
+            `pynets.core.utils.get_cache_dir`).
 
     """
     import uuid
@@ -985,6 +1348,7 @@ def wm_syn(template_path, fa_path, template_anat_path, ap_path, working_dir):
     )
     from dipy.align.imwarp import SymmetricDiffeomorphicRegistration
     from dipy.align.metrics import CCMetric
+    from pynets.core.utils import content_hash, get_cache_dir
 
     # from dipy.viz import regtools
     from nilearn.image import resample_to_img
@@ -999,6 +1363,24 @@ def wm_syn(template_path, fa_path, template_anat_path, ap_path, working_dir):
     affine_map = transform_origins(
         static, static_affine, moving, moving_affine)
 
+    run_uuid = f"{strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4()}"
+    warped_fa = f"{working_dir}/warped_fa_{run_uuid}.nii.gz"
+
+    if cache_dir is None:
+        cache_dir = get_cache_dir("syn")
+    key = content_hash(template_path, fa_path, template_anat_path, ap_path,
+                       version=SYN_CACHE_VERSION)
+    entry = f"{cache_dir}/{key}.npz"
+    if os.path.isfile(entry):
+        try:
+            mapping, warped_moving, warped_affine = _load_mapping(entry)
+            print("Reusing cached SyN mapping...")
+            nib.save(nib.Nifti1Image(warped_moving, affine=warped_affine),
+                     warped_fa)
+            return mapping, affine_map, warped_fa
+        except (OSError, KeyError, ValueError):
+            pass
+
     nbins = 32
     sampling_prop = None
     metric = MutualInformationMetric(nbins, sampling_prop)
@@ -1062,13 +1444,12 @@ def wm_syn(template_path, fa_path, template_anat_path, ap_path, working_dir):
     warped_moving = mapping.transform(moving)
 
     # Save warped FA image
-    run_uuid = f"{strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4()}"
-    warped_fa = f"{working_dir}/warped_fa_{run_uuid}.nii.gz"
     nib.save(
         nib.Nifti1Image(
             warped_moving,
             affine=template_img_res.affine),
         warped_fa)
+    _save_mapping(mapping, warped_moving, template_img_res.affine, entry)
 
     # # We show the registration result with:
     # regtools.overlay_slices(static, warped_moving, None, 0,
@@ -210,8 +210,6 @@ def direct_streamline_norm(
     from pynets.registration.reg_utils import vdc
     from nilearn.image import resample_to_img
     from dipy.io.streamline import load_tractogram
-    from dipy.tracking import utils
-    from dipy.tracking._utils import _mapping_to_voxel
     from dipy.io.stateful_tractogram import Space, StatefulTractogram, Origin
     from dipy.io.streamline import save_tractogram
 
@@ -361,6 +359,10 @@ def direct_streamline_norm(
         ref_grid_aff = vox_size * np.eye(4)
         ref_grid_aff[3][3] = 1
 
+        # The displacements of the points do not depend on the isocentering
+        displacements = regutils.streamline_displacements(
+            mapping.get_forward_field(), streams_in_curr_grid, ref_grid_aff)
+
         streams_final_filt = []
         i = 0
         # Test for various types of voxel-grid configurations
@@ -385,18 +387,17 @@ def direct_streamline_norm(
                                                            mapping,
                                                            warped_fa_img,
                                                            streams_in_curr_grid,
-                                                           brain_mask)
+                                                           brain_mask,
+                                                           displacements)
 
             i += 1
 
         # Remove streamlines with negative voxel indices
-        lin_T, offset = _mapping_to_voxel(np.eye(4))
-        streams_final_filt_final = []
-        for sl in streams_final_filt:
-            inds = np.dot(sl, lin_T)
-            inds += offset
-            if not inds.min().round(decimals=6) < 0:
-                streams_final_filt_final.append(sl)
+        voxels, owners = regutils.streamline_voxels(streams_final_filt)
+        negative = np.zeros(len(streams_final_filt), dtype=bool)
+        negative[owners[np.any(voxels < 0, axis=1)]] = True
+        streams_final_filt_final = streams_final_filt[
+            np.where(~negative)[0]]
 
         # Save streamlines
         stf = StatefulTractogram(
@@ -415,13 +416,12 @@ def direct_streamline_norm(
         # streams_warp_png) plot_gen.show_template_bundles(streamlines,
         # fa_path, streams_warp_png)
 
-        # Create and save MNI density map
+        # Create and save MNI density map from the same voxel indices
         nib.save(
             nib.Nifti1Image(
-                utils.density_map(
-                    streams_final_filt_final,
-                    affine=np.eye(4),
-                    vol_dims=warped_fa_shape),
+                regutils.streamline_density(
+                    *regutils.streamline_voxels(streams_final_filt_final),
+                    warped_fa_shape),
                 warped_fa_affine,
             ),
             density_mni,
@@ -698,7 +698,6 @@ class DmriReg(object):
         """
         A function to segment and threshold tissue types from T1w.
         """
-        import time
         import shutil
 
         # Segment the t1w brain into probability maps
@@ -721,7 +720,6 @@ class DmriReg(object):
         else:
             try:
                 maps = regutils.segment_t1w(self.t1w_brain, self.map_name)
-                time.sleep(0.5)
                 wm_mask = maps["wm_prob"]
                 gm_mask = maps["gm_prob"]
                 csf_mask = maps["csf_prob"]
@@ -741,7 +739,6 @@ class DmriReg(object):
         # Extract wm edge
         self.wm_edge = regutils.get_wm_contour(wm_mask, self.wm_mask_thr,
                                                self.wm_edge)
-        time.sleep(0.5)
         shutil.copyfile(wm_mask, self.wm_mask)
         shutil.copyfile(gm_mask, self.gm_mask)
         shutil.copyfile(csf_mask, self.csf_mask)
@@ -752,7 +749,6 @@ class DmriReg(object):
         """
         A function to perform alignment from T1w --> MNI template.
         """
-        import time
 
         # Create linear transform/ initializer T1w-->MNI
         regutils.align(
@@ -766,7 +762,6 @@ class DmriReg(object):
             cost="mutualinfo",
             searchrad=True,
         )
-        time.sleep(0.5)
         # Attempt non-linear registration of T1 to MNI template
         if self.simple is False:
             try:
@@ -783,16 +778,13 @@ class DmriReg(object):
                     warp=self.warp_t1w2mni,
                     ref_mask=self.input_mni_mask,
                 )
-                time.sleep(0.5)
                 # Get warp from MNI -> T1
                 regutils.inverse_warp(
                     self.t1w_brain, self.mni2t1w_warp, self.warp_t1w2mni
                 )
-                time.sleep(0.5)
                 # Get mat from MNI -> T1
                 self.mni2t1_xfm = regutils.invert_xfm(self.t12mni_xfm_init,
                                                       self.mni2t1_xfm)
-                time.sleep(0.5)
             except BaseException:
                 # Falling back to linear registration
                 regutils.align(
@@ -808,11 +800,9 @@ class DmriReg(object):
                     out=self.t1_aligned_mni,
                     sch=None,
                 )
-                time.sleep(0.5)
                 # Get mat from MNI -> T1
                 self.mni2t1_xfm = regutils.invert_xfm(self.t12mni_xfm,
                                                       self.mni2t1_xfm)
-                time.sleep(0.5)
         else:
             # Falling back to linear registration
             regutils.align(
@@ -828,11 +818,9 @@ class DmriReg(object):
                 out=self.t1_aligned_mni,
                 sch=None,
             )
-            time.sleep(0.5)
             # Get mat from MNI -> T1
             self.t12mni_xfm = regutils.invert_xfm(self.mni2t1_xfm,
                                                   self.t12mni_xfm)
-            time.sleep(0.5)
 
     def t1w2dwi_align(self):
         """
@@ -841,7 +829,6 @@ class DmriReg(object):
         bbr to obtain a good alignment of brain boundaries.
         Assumes input dwi is already preprocessed and brain extracted.
         """
-        import time
 
         # Align T1w-->DWI
         regutils.align(
@@ -856,10 +843,8 @@ class DmriReg(object):
             searchrad=True,
             sch=None,
         )
-        time.sleep(0.5)
         self.dwi2t1w_xfm = regutils.invert_xfm(self.t1w2dwi_xfm,
                                                self.dwi2t1w_xfm)
-        time.sleep(0.5)
         if self.simple is False:
             # Flirt bbr
             try:
@@ -878,10 +863,8 @@ class DmriReg(object):
                     cost="bbr",
                     sch="${FSLDIR}/etc/flirtsch/bbr.sch",
                 )
-                time.sleep(0.5)
                 self.t1w2dwi_bbr_xfm = regutils.invert_xfm(
                     self.dwi2t1w_bbr_xfm, self.t1w2dwi_bbr_xfm)
-                time.sleep(0.5)
                 # Apply the alignment
                 regutils.align(
                     self.t1w_brain,
@@ -896,7 +879,6 @@ class DmriReg(object):
                     searchrad=True,
                     sch=None,
                 )
-                time.sleep(0.5)
             except BaseException:
                 # Apply the alignment
                 regutils.align(
@@ -912,7 +894,6 @@ class DmriReg(object):
                     searchrad=True,
                     sch=None,
                 )
-                time.sleep(0.5)
         else:
             # Apply the alignment
             regutils.align(
@@ -928,7 +909,6 @@ class DmriReg(object):
                 searchrad=True,
                 sch=None,
             )
-            time.sleep(0.5)
 
         return
 
@@ -942,7 +922,6 @@ class DmriReg(object):
         have called both t1w2dwi_align.
         """
         import sys
-        import time
         import os.path as op
 
         # Register Lateral Ventricles and Corpus Callosum rois to t1w
@@ -964,7 +943,6 @@ class DmriReg(object):
             interp="spline",
             out=None,
         )
-        time.sleep(0.5)
 
         if sys.platform.startswith('win') is False:
             try:
@@ -989,96 +967,45 @@ class DmriReg(object):
             self.xfm_roi2mni_init,
             self.vent_mask_mni,
         )
-        time.sleep(0.5)
+        if sys.platform.startswith('win') is False:
+            try:
+                nib.load(self.corpuscallosum)
+            except indexed_gzip.ZranError as e:
+                print(e,
+                      f"\nCannot load Corpus Callosum ROI. "
+                      f"Do you have git-lfs installed?")
+                sys.exit(1)
+        else:
+            try:
+                nib.load(self.corpuscallosum)
+            except ImportError as e:
+                print(e, f"\nCannot load Corpus Callosum ROI. "
+                      f"Do you have git-lfs installed?")
+                sys.exit(1)
+
+        rois_mni = [self.vent_mask_mni, self.corpuscallosum]
+        rois_t1w = [self.vent_mask_t1w, self.corpuscallosum_mask_t1w]
         if self.simple is False:
             # Apply warp resulting from the inverse MNI->T1w created earlier
-            regutils.apply_warp(
-                self.t1w_brain,
-                self.vent_mask_mni,
-                self.vent_mask_t1w,
-                warp=self.mni2t1w_warp,
-                interp="nn",
-                sup=True,
-            )
-            time.sleep(0.5)
-
-            if sys.platform.startswith('win') is False:
-                try:
-                    nib.load(self.corpuscallosum)
-                except indexed_gzip.ZranError as e:
-                    print(e,
-                          f"\nCannot load Corpus Callosum ROI. "
-                          f"Do you have git-lfs installed?")
-                    sys.exit(1)
-            else:
-                try:
-                    nib.load(self.corpuscallosum)
-                except ImportError as e:
-                    print(e, f"\nCannot load Corpus Callosum ROI. "
-                          f"Do you have git-lfs installed?")
-                    sys.exit(1)
-
-            regutils.apply_warp(
-                self.t1w_brain,
-                self.corpuscallosum,
-                self.corpuscallosum_mask_t1w,
-                warp=self.mni2t1w_warp,
-                interp="nn",
-                sup=True,
-            )
-
+            regutils.apply_warps(self.t1w_brain, rois_mni, rois_t1w,
+                                 warp=self.mni2t1w_warp,
+                                 interps=["nn"] * len(rois_mni), sup=True)
         else:
-            regutils.applyxfm(
-                self.vent_mask_mni,
-                self.t1w_brain,
-                self.mni2t1_xfm,
-                self.vent_mask_t1w)
-            time.sleep(0.5)
-            regutils.applyxfm(
-                self.corpuscallosum,
-                self.t1w_brain,
-                self.mni2t1_xfm,
-                self.corpuscallosum_mask_t1w,
-            )
-            time.sleep(0.5)
-
-        # Applyxfm tissue maps to dwi space
+            regutils.apply_warps(self.t1w_brain, rois_mni, rois_t1w,
+                                 xfm=self.mni2t1_xfm,
+                                 interps=["trilinear"] * len(rois_mni))
+
+        # Applyxfm tissue maps to dwi space, in one batch
+        tissues_t1w = [self.vent_mask_t1w, self.csf_mask, self.gm_mask,
+                       self.wm_mask, self.corpuscallosum_mask_t1w]
+        tissues_dwi = [self.vent_mask_dwi, self.csf_mask_dwi, self.gm_in_dwi,
+                       self.wm_in_dwi, self.corpuscallosum_dwi]
         if self.t1w_brain_mask is not None:
-            regutils.applyxfm(
-                self.ap_path,
-                self.t1w_brain_mask,
-                self.t1wtissue2dwi_xfm,
-                self.t1w_brain_mask_in_dwi,
-            )
-            time.sleep(0.5)
-        regutils.applyxfm(
-            self.ap_path,
-            self.vent_mask_t1w,
-            self.t1wtissue2dwi_xfm,
-            self.vent_mask_dwi)
-        time.sleep(0.5)
-        regutils.applyxfm(
-            self.ap_path,
-            self.csf_mask,
-            self.t1wtissue2dwi_xfm,
-            self.csf_mask_dwi)
-        time.sleep(0.5)
-        regutils.applyxfm(
-            self.ap_path, self.gm_mask, self.t1wtissue2dwi_xfm, self.gm_in_dwi
-        )
-        time.sleep(0.5)
-        regutils.applyxfm(
-            self.ap_path, self.wm_mask, self.t1wtissue2dwi_xfm, self.wm_in_dwi
-        )
-        time.sleep(0.5)
-
-        regutils.applyxfm(
-            self.ap_path,
-            self.corpuscallosum_mask_t1w,
-            self.t1wtissue2dwi_xfm,
-            self.corpuscallosum_dwi,
-        )
-        time.sleep(0.5)
+            tissues_t1w.insert(0, self.t1w_brain_mask)
+            tissues_dwi.insert(0, self.t1w_brain_mask_in_dwi)
+        regutils.apply_warps(self.ap_path, tissues_t1w, tissues_dwi,
+                             xfm=self.t1wtissue2dwi_xfm,
+                             interps=["trilinear"] * len(tissues_t1w))
 
         # Threshold WM to binary in dwi space
         thr_img = nib.load(self.wm_in_dwi)
@@ -1099,41 +1026,34 @@ class DmriReg(object):
         self.wm_in_dwi = regutils.apply_mask_to_image(self.wm_in_dwi,
                                                       self.wm_in_dwi_bin,
                                                       self.wm_in_dwi)
-        time.sleep(0.5)
         # Threshold GM to binary in dwi space
         self.gm_in_dwi = regutils.apply_mask_to_image(self.gm_in_dwi,
                                                       self.gm_in_dwi_bin,
                                                       self.gm_in_dwi)
-        time.sleep(0.5)
         # Threshold CSF to binary in dwi space
         self.csf_mask = regutils.apply_mask_to_image(self.csf_mask_dwi,
                                                      self.csf_mask_dwi_bin,
                                                      self.csf_mask_dwi)
-        time.sleep(0.5)
         # Create ventricular CSF mask
         print("Creating Ventricular CSF mask...")
-        os.system(
+        regutils.run_command(
             f"fslmaths {self.vent_mask_dwi} -kernel sphere 10 -ero "
             f"-bin {self.vent_mask_dwi}"
         )
-        time.sleep(1)
-        os.system(
+        regutils.run_command(
             f"fslmaths {self.csf_mask_dwi} -add {self.vent_mask_dwi} "
             f"-bin {self.vent_csf_in_dwi}"
         )
-        time.sleep(1)
         print("Creating Corpus Callosum mask...")
-        os.system(
+        regutils.run_command(
             f"fslmaths {self.corpuscallosum_dwi} -mas {self.wm_in_dwi_bin} "
             f"-sub {self.vent_csf_in_dwi} "
             f"-bin {self.corpuscallosum_dwi}")
-        time.sleep(1)
         # Create gm-wm interface image
-        os.system(
+        regutils.run_command(
             f"fslmaths {self.gm_in_dwi_bin} -mul {self.wm_in_dwi_bin} "
             f"-add {self.corpuscallosum_dwi} "
             f"-mas {self.B0_mask} -bin {self.wm_gm_int_in_dwi}")
-        time.sleep(1)
         return
 
 
@@ -1239,7 +1159,6 @@ class FmriReg(object):
         """
         A function to segment and threshold tissue types from T1w.
         """
-        import time
 
         # Segment the t1w brain into probability maps
         if (
@@ -1274,18 +1193,15 @@ class FmriReg(object):
         self.gm_mask = regutils.apply_mask_to_image(gm_mask,
                                                     self.gm_mask_thr,
                                                     self.gm_mask)
-        time.sleep(0.5)
 
         # Threshold WM to binary in dwi space
         t_img = nib.load(wm_mask)
         mask = math_img("img > 0.50", img=t_img)
         mask.to_filename(self.wm_mask_thr)
-        time.sleep(0.5)
         self.wm_mask = regutils.apply_mask_to_image(wm_mask,
                                                     self.wm_mask_thr,
                                                     self.wm_mask)
         # Extract wm edge
-        time.sleep(0.5)
         self.wm_edge = regutils.get_wm_contour(wm_mask, self.wm_mask_thr,
                                                self.wm_edge)
 
@@ -1295,7 +1211,6 @@ class FmriReg(object):
         """
         A function to perform alignment from T1w --> MNI.
         """
-        import time
 
         # Create linear transform/ initializer T1w-->MNI
         regutils.align(
@@ -1309,7 +1224,6 @@ class FmriReg(object):
             cost="mutualinfo",
             searchrad=True,
         )
-        time.sleep(0.5)
         # Attempt non-linear registration of T1 to MNI template
         if self.simple is False:
             try:
@@ -1326,12 +1240,10 @@ class FmriReg(object):
                     warp=self.warp_t1w2mni,
                     ref_mask=self.input_mni_mask,
                 )
-                time.sleep(0.5)
                 # Get warp from T1w --> MNI
                 regutils.inverse_warp(
                     self.t1w_brain,  self.mni2t1w_warp, self.warp_t1w2mni
                 )
-                time.sleep(0.5)
                 # Get mat from MNI -> T1w
                 self.mni2t1_xfm = regutils.invert_xfm(self.t12mni_xfm_init,
                                                       self.mni2t1_xfm)
@@ -1351,7 +1263,6 @@ class FmriReg(object):
                     out=self.t1_aligned_mni,
                     sch=None,
                 )
-                time.sleep(0.5)
                 # Get mat from MNI -> T1w
                 self.t12mni_xfm = regutils.invert_xfm(self.mni2t1_xfm,
                                                       self.t12mni_xfm)
@@ -1370,7 +1281,6 @@ class FmriReg(object):
                 out=self.t1_aligned_mni,
                 sch=None,
             )
-            time.sleep(0.5)
             # Get mat from MNI -> T1w
             self.t12mni_xfm = regutils.invert_xfm(self.mni2t1_xfm,
                                                   self.t12mni_xfm)
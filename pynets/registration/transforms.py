@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Nov 11 09:27:40 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import os
+import numpy as np
+import nibabel as nib
+import warnings
+
+warnings.filterwarnings("ignore")
+
+# Spline orders of scipy.ndimage.map_coordinates, by FSL interpolation method.
+# Sinc is approximated by cubic splines.
+INTERPOLATION_ORDERS = {
+    "nn": 0,
+    "nearestneighbour": 0,
+    "nearest": 0,
+    "trilinear": 1,
+    "spline": 3,
+    "sinc": 3,
+}
+
+# NIfTI intent codes of FSL's warp coefficient files (FNIRT and TOPUP)
+FSL_COEFFICIENT_INTENTS = (2007, 2008, 2009, 2016, 2017)
+
+# Number of reference voxels resampled at a time
+CHUNK_VOXELS = 2 ** 21
+
+# Version of the on-disk cache of sampling coordinates
+TRANSFORMS_CACHE_VERSION = 1
+
+# Label images hold at most this many distinct integer values
+MAX_LABELS = 1024
+
+
+def fsl_scaling(img):
+    """
+    Matrix mapping the voxel indices of an image to FSL's mm coordinates,
+    i.e. to voxel indices scaled by the voxel sizes, with the x-axis
+    flipped for images stored in neurological order (positive determinant).
+
+    Parameters
+    ----------
+    img : Nifti1Image
+        Image.
+
+    Returns
+    -------
+    scaling : ndarray
+        4x4 matrix.
+
+    """
+    zooms = np.array(img.header.get_zooms()[:3], dtype="float64")
+    scaling = np.diag(np.append(zooms, 1.0))
+    if np.linalg.det(img.affine[:3, :3]) > 0:
+        flip = np.eye(4)
+        flip[0, 0] = -1
+        flip[0, 3] = img.shape[0] - 1
+        scaling = scaling @ flip
+    return scaling
+
+
+def load_xfm(xfm):
+    """Load a FLIRT transformation matrix"""
+    return np.loadtxt(xfm).reshape(4, 4)
+
+
+def save_xfm(mat, xfm):
+    """Save a FLIRT transformation matrix"""
+    np.savetxt(xfm, mat, fmt="%.10f", delimiter="  ")
+    return xfm
+
+
+def interpolation_order(interp):
+    """
+    Spline order of an FSL interpolation method. None is trilinear, as it is
+    for FSL.
+    """
+    if interp is None:
+        return 1
+    try:
+        return INTERPOLATION_ORDERS[interp]
+    except KeyError:
+        raise ValueError(f"Interpolation {interp} not supported.")
+
+
+def default_interpolation(img):
+    """
+    Interpolation method of an image: nearest-neighbour for label images
+    (i.e. atlases, ROIs and masks, whose values are integers of at most
+    `MAX_LABELS` distinct values), and trilinear for continuous images
+    (e.g. tissue probability maps).
+    """
+    data = np.asanyarray(img.dataobj)
+    if data.dtype.kind not in "biu" and \
+            not np.array_equal(data, np.round(data)):
+        return "trilinear"
+    return "nn" if len(np.unique(data)) <= MAX_LABELS else "trilinear"
+
+
+def load_warp(warp, ref):
+    """
+    Load a FNIRT warp as a field of relative displacements, in FSL's mm
+    coordinates of the reference image. Coefficient files are converted once
+    to a field with `fnirtfileutils` (see `reg_utils.run_cached`), including
+    the affine part, as applied by `applywarp`.
+
+    Parameters
+    ----------
+    warp : str
+        File path to a warp field or coefficient Nifti1Image.
+    ref : str
+        File path to the reference Nifti1Image of the warp.
+
+    Returns
+    -------
+    field : ndarray
+        Array of shape (X, Y, Z, 3), over the grid of the reference image.
+
+    """
+    import shutil
+    import tempfile
+    from pynets.registration.reg_utils import run_cached
+
+    warp_img = nib.load(warp)
+    if int(warp_img.header["intent_code"]) in FSL_COEFFICIENT_INTENTS:
+        tmp_dir = tempfile.mkdtemp()
+        field_path = f"{tmp_dir}/field.nii.gz"
+        try:
+            run_cached(f"fnirtfileutils --in={warp} --ref={ref} "
+                       f"--out={field_path} --withaff", {"in": warp,
+                                                         "ref": ref},
+                       {"out": field_path}, withaff=True)
+            field = np.asarray(nib.load(field_path).dataobj,
+                               dtype="float32")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        field = np.asarray(warp_img.dataobj, dtype="float32")
+    warp_img.uncache()
+
+    # ITK-style fields carry a singleton 4th dimension
+    if field.ndim == 5 and field.shape[3] == 1:
+        field = field[:, :, :, 0, :]
+    ref_shape = nib.load(ref).shape[:3]
+    if field.ndim != 4 or field.shape[:3] != ref_shape or \
+            field.shape[3] != 3:
+        raise ValueError(f"Warp {warp} of shape {field.shape} is not a "
+                         f"displacement field over the grid of {ref}.")
+    return field
+
+
+def _volumes(in_img, order):
+    """
+    Volumes of an image, prefiltered for spline interpolation, and the data
+    type of the image.
+    """
+    from scipy import ndimage
+
+    data = np.asanyarray(in_img.dataobj)
+    dtype = data.dtype
+    data = data.reshape(data.shape[:3] + (-1,))
+    vols = []
+    for i in range(data.shape[3]):
+        vol = data[..., i]
+        if order > 1:
+            vol = ndimage.spline_filter(vol, order=order,
+                                        output=np.float32)
+        elif order == 1:
+            vol = vol.astype("float32")
+        vols.append(vol)
+    return vols, dtype
+
+
+def _grid(img):
+    """Arrays describing the voxel grid of an image"""
+    return [np.asarray(img.shape[:3]), np.asarray(img.affine),
+            np.asarray(img.header.get_zooms()[:3])]
+
+
+class Warper(object):
+    """
+    Apply one spatial transform, i.e. a FLIRT matrix and/or a FNIRT warp, to
+    batches of images on the grid of a reference image, following the
+    conventions of `applywarp`.
+
+    The transform is loaded once, and the sampling coordinates of each input
+    grid are computed once. Coordinates through a warp are also cached on
+    disk by content, so that separate processes warping images of the same
+    grid (e.g. the atlases of a multiverse) skip loading the warp altogether.
+    """
+
+    def __init__(self, ref, xfm=None, warp=None, mask=None, cache_dir=None):
+        """
+        Parameters
+        ----------
+        ref : str
+            File path to reference Nifti1Image to use as the target for
+            alignment.
+        xfm : str
+            Optional file path to a transformation matrix in .xfm/.mat
+            format, applied before the warp.
+        warp : str
+            Optional file path to a warp field or coefficient Nifti1Image.
+        mask : str
+            Optional file path to a mask in reference image space.
+        cache_dir : str
+            Directory of the cache of sampling coordinates. Default is the
+            `transforms` subdirectory of the PyNets cache (see
+            `pynets.core.utils.get_cache_dir`).
+        """
+        self.ref = ref
+        self.ref_img = nib.load(ref)
+        self.xfm = xfm
+        self.warp = warp
+        self.mask = mask
+        self.cache_dir = cache_dir
+        self._mat = load_xfm(xfm) if xfm is not None else np.eye(4)
+        self._mask = np.asarray(nib.load(mask).dataobj) != 0 if mask is \
+            not None else None
+        self._field = None
+        self._warp_key = None
+        self._coords = {}
+
+    def _mm2in(self, in_img):
+        """Matrix from FSL's mm coordinates to input voxels"""
+        return np.linalg.inv(fsl_scaling(in_img)) @ np.linalg.inv(self._mat)
+
+    def _compute_coordinates(self, in_img):
+        ref_shape = self.ref_img.shape[:3]
+        ref2mm = fsl_scaling(self.ref_img)
+        mm2in = self._mm2in(in_img)
+        if self.warp is not None and self._field is None:
+            self._field = load_warp(self.warp, self.ref)
+
+        coords = np.empty((3,) + ref_shape, dtype="float32")
+        slab = max(1, int(CHUNK_VOXELS // (ref_shape[0] * ref_shape[1])))
+        for z0 in range(0, ref_shape[2], slab):
+            z1 = min(z0 + slab, ref_shape[2])
+            grid = np.stack(np.meshgrid(np.arange(ref_shape[0]),
+                                        np.arange(ref_shape[1]),
+                                        np.arange(z0, z1), indexing="ij"),
+                            axis=0).astype("float32")
+            mm = np.tensordot(ref2mm[:3, :3], grid, axes=1) + \
+                ref2mm[:3, 3, None, None, None]
+            if self._field is not None:
+                mm += np.moveaxis(self._field[:, :, z0:z1, :], -1, 0)
+            coords[:, :, :, z0:z1] = np.tensordot(mm2in[:3, :3], mm,
+                                                  axes=1) + \
+                mm2in[:3, 3, None, None, None]
+        return coords
+
+    def coordinates(self, in_img):
+        """
+        Voxel coordinates in an input image of the voxel centres of the
+        reference image.
+
+        Parameters
+        ----------
+        in_img : Nifti1Image
+            Input image.
+
+        Returns
+        -------
+        coords : ndarray
+            Array of shape (3, X, Y, Z), over the grid of the reference
+            image.
+
+        """
+        from pynets.core.utils import content_hash, get_cache_dir
+
+        grid = content_hash(*_grid(in_img))
+        if grid in self._coords:
+            return self._coords[grid]
+
+        # Affine coordinates are cheap, warped ones are cached on disk
+        if self.warp is None:
+            self._coords[grid] = self._compute_coordinates(in_img)
+            return self._coords[grid]
+
+        if self._warp_key is None:
+            self._warp_key = content_hash(os.path.expandvars(self.warp))
+        key = content_hash(*_grid(self.ref_img), *_grid(in_img), self._mat,
+                           warp=self._warp_key,
+                           version=TRANSFORMS_CACHE_VERSION)
+        cache_dir = self.cache_dir if self.cache_dir is not None else \
+            get_cache_dir("transforms")
+        path = f"{cache_dir}/{key}.npy"
+        if os.path.isfile(path):
+            try:
+                self._coords[grid] = np.load(path, mmap_mode="r")
+                return self._coords[grid]
+            except (OSError, ValueError):
+                pass
+
+        coords = self._compute_coordinates(in_img)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, coords)
+        os.replace(tmp, path)
+        self._coords[grid] = coords
+        return coords
+
+    def _supersampling(self, in_img, order, sup):
+        """Number of samples per reference voxel along each axis"""
+        if sup is False or order == 0:
+            return np.ones(3, dtype="int")
+        ratio = np.array(self.ref_img.header.get_zooms()[:3]) / \
+            np.array(in_img.header.get_zooms()[:3])
+        return np.clip(np.ceil(ratio - 1e-3), 1, 4).astype("int")
+
+    def resample(self, in_img, interp=None, sup=False):
+        """
+        Resample an image on the grid of the reference image.
+
+        Parameters
+        ----------
+        in_img : Nifti1Image
+            Image to resample. 4D images are resampled volume by volume.
+        interp : str
+            FSL interpolation method. Default is trilinear.
+        sup : bool
+            Average each reference voxel over a supersampled grid, as
+            `applywarp --super --superlevel=a`. Ignored by nearest-neighbour
+            interpolation. Default is False.
+
+        Returns
+        -------
+        out_img : Nifti1Image
+            Resampled image, with the data type of the input image.
+
+        """
+        from itertools import product
+        from scipy import ndimage
+
+        order = interpolation_order(interp)
+        ref_shape = self.ref_img.shape[:3]
+        coords = self.coordinates(in_img)
+
+        # Supersamples are offset from the voxel centres through the affine
+        # part of the transform
+        step = self._mm2in(in_img)[:3, :3] @ \
+            fsl_scaling(self.ref_img)[:3, :3]
+        n_sub = self._supersampling(in_img, order, sup)
+        shifts = [(step @ np.asarray(offset)).astype("float32") for offset
+                  in product(*[(np.arange(n) + 0.5) / n - 0.5 for n in
+                               n_sub])]
+
+        vols, dtype = _volumes(in_img, order)
+        out = np.zeros(ref_shape + (len(vols),),
+                       dtype=dtype if order == 0 else "float32")
+
+        slab = max(1, int(CHUNK_VOXELS // (ref_shape[0] * ref_shape[1])))
+        for z0 in range(0, ref_shape[2], slab):
+            z1 = min(z0 + slab, ref_shape[2])
+            slab_coords = np.asarray(coords[:, :, :, z0:z1])
+            for shift in shifts:
+                for i, vol in enumerate(vols):
+                    out[:, :, z0:z1, i] += ndimage.map_coordinates(
+                        vol, slab_coords + shift[:, None, None, None],
+                        order=order, mode="constant", cval=0,
+                        prefilter=False, output=out.dtype)
+        if len(shifts) > 1:
+            out /= len(shifts)
+
+        if self._mask is not None:
+            out *= self._mask[..., np.newaxis].astype(out.dtype)
+        if np.issubdtype(dtype, np.integer) and order > 0:
+            info = np.iinfo(dtype)
+            out = np.clip(np.rint(out), info.min, info.max)
+        out = out.astype(dtype)
+        if len(in_img.shape) == 3:
+            out = out[..., 0]
+
+        header = self.ref_img.header.copy()
+        header.set_data_dtype(dtype)
+        out_img = nib.Nifti1Image(out, self.ref_img.affine, header=header)
+        if out.ndim == 4:
+            tr = tuple(in_img.header.get_zooms()[3:4]) or (1.0,)
+            out_img.header.set_zooms(self.ref_img.header.get_zooms()[:3] +
+                                     tr)
+        return out_img
+
+
+def apply_transforms(ref, inps, outs, xfm=None, warp=None, mask=None,
+                     interps=None, sup=False):
+    """
+    Apply one precomputed FLIRT matrix and/or FNIRT warp to a batch of
+    Nifti1Images in-process, in lieu of `flirt -applyxfm` or `applywarp`
+    (see `Warper`).
+
+    Parameters
+    ----------
+    ref : str
+        File path to reference Nifti1Image to use as the target for
+        alignment.
+    inps : list
+        File paths to the input Nifti1Images to be aligned.
+    outs : list
+        File paths to the aligned Nifti1Images.
+    xfm : str
+        Optional file path to a transformation matrix in .xfm/.mat format,
+        applied before the warp.
+    warp : str
+        Optional file path to a warp field or coefficient Nifti1Image.
+    mask : str
+        Optional file path to a mask in reference image space.
+    interps : list
+        FSL interpolation method of each input. Inputs whose method is None
+        are interpolated by nearest-neighbour if they are label images, and
+        trilinearly otherwise (see `default_interpolation`).
+    sup : bool
+        Intermediary supersampling of output. Default is False.
+
+    Returns
+    -------
+    outs : list
+        File paths to the aligned Nifti1Images.
+
+    """
+    from pynets.registration.reg_utils import _image_ext
+
+    if interps is None:
+        interps = [None] * len(inps)
+    if not len(inps) == len(outs) == len(interps):
+        raise ValueError("As many outputs and interpolation methods as "
+                         "inputs are required.")
+
+    warper = Warper(ref, xfm=xfm, warp=warp, mask=mask)
+    for inp, out, interp in zip(inps, outs, interps):
+        in_img = nib.load(inp)
+        if interp is None:
+            interp = default_interpolation(in_img)
+        out_img = warper.resample(in_img, interp=interp, sup=sup)
+        tmp = f"{out}.{os.getpid()}.tmp{_image_ext(out)}"
+        nib.save(out_img, tmp)
+        os.replace(tmp, out)
+        in_img.uncache()
+    warper.ref_img.uncache()
+    return outs
+
+
+def apply_transform(ref, inp, out, xfm=None, warp=None, mask=None,
+                    interp=None, sup=False):
+    """
+    Apply a precomputed FLIRT matrix and/or FNIRT warp to a Nifti1Image
+    in-process, in lieu of `flirt -applyxfm` or `applywarp`.
+
+    Parameters
+    ----------
+    ref : str
+        File path to reference Nifti1Image to use as the target for
+        alignment.
+    inp : str
+        File path to input Nifti1Image to be aligned.
+    out : str
+        File path to the aligned Nifti1Image.
+    xfm : str
+        Optional file path to a transformation matrix in .xfm/.mat format,
+        applied before the warp.
+    warp : str
+        Optional file path to a warp field or coefficient Nifti1Image.
+    mask : str
+        Optional file path to a mask in reference image space.
+    interp : str
+        FSL interpolation method. Default is trilinear.
+    sup : bool
+        Intermediary supersampling of output. Default is False.
+
+    Returns
+    -------
+    out : str
+        File path to the aligned Nifti1Image.
+
+    """
+    return apply_transforms(ref, [inp], [out], xfm=xfm, warp=warp,
+                            mask=mask, sup=sup,
+                            interps=[interp if interp is not None else
+                                     "trilinear"])[0]
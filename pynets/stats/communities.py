@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:47:12 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import os
+import glob
+import warnings
+import numpy as np
+import networkx as nx
+
+warnings.filterwarnings("ignore")
+
+# Bump whenever community detection changes, so that stale partitions are
+# never served from the cache.
+COMMUNITY_VERSION = 1
+
+# Partitions computed by this process, by graph key and resolution
+_PARTITIONS = {}
+
+
+def graph_key(G, weight="weight"):
+    """
+    Content-addressed key of a weighted graph, covering its nodes, edges and
+    edge weights.
+
+    Parameters
+    ----------
+    G : Obj
+        NetworkX graph.
+    weight : str
+        Key for edge data used as the edge weight.
+
+    Returns
+    -------
+    key : str
+        Hexadecimal SHA-1 digest.
+
+    """
+    from pynets.core.utils import content_hash
+
+    nodes = list(G.nodes())
+    A = nx.to_scipy_sparse_matrix(G, nodelist=nodes, weight=weight,
+                                  format="csr")
+    A.sort_indices()
+    return content_hash(A.data, A.indices, A.indptr, nodes=nodes,
+                        directed=nx.is_directed(G), weight=weight,
+                        version=COMMUNITY_VERSION)
+
+
+def _cache_file(cache_dir, key, resolution):
+    return f"{cache_dir}/{key}_res-{float(resolution)!r}.npy"
+
+
+def _cached_resolutions(key, cache_dir):
+    """
+    Resolutions at which a partition of the graph is already available.
+    """
+    resolutions = set(_PARTITIONS.get(key, {}).keys())
+    for path in glob.glob(f"{cache_dir}/{key}_res-*.npy"):
+        try:
+            resolutions.add(
+                float(os.path.basename(path).split("_res-")[1][:-4]))
+        except ValueError:
+            continue
+    return sorted(resolutions)
+
+
+def _load_partition(key, resolution, cache_dir):
+    if resolution in _PARTITIONS.get(key, {}):
+        return _PARTITIONS[key][resolution]
+    cache_file = _cache_file(cache_dir, key, resolution)
+    if os.path.isfile(cache_file):
+        try:
+            ci = np.load(cache_file)
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable community cache: {cache_file}")
+            return None
+        _PARTITIONS.setdefault(key, {})[resolution] = ci
+        return ci
+    return None
+
+
+def louvain_partition(G, resolution=1.0, warm_start=False, weight="weight",
+                      cache_dir=None, key=None):
+    """
+    Louvain community affiliation vector of a graph at a given resolution.
+    Each graph is partitioned only once per resolution: partitions are kept
+    in memory and in a content-addressed on-disk cache, keyed by a hash of
+    the graph, and are served to every metric that needs community
+    assignments.
+
+    Parameters
+    ----------
+    G : Obj
+        NetworkX graph.
+    resolution : float
+        Resolution parameter of the modularity. Smaller values yield
+        larger communities.
+    warm_start : bool
+        If True, Louvain is initialized from the cached partition at the
+        nearest resolution of the same graph, if any, rather than from
+        singleton communities. Default is False.
+    weight : str
+        Key for edge data used as the edge weight.
+    cache_dir : str
+        Directory of the cache. Default is the `communities` subdirectory of
+        the PyNets cache (see `pynets.core.utils.get_cache_dir`).
+    key : str
+        Precomputed `graph_key` of G.
+
+    Returns
+    -------
+    ci : np.ndarray
+        Community affiliation vector, ordered as the nodes of G.
+
+    References
+    ----------
+    .. [1] Blondel, V. D., Guillaume, J.-L., Lambiotte, R., & Lefebvre, E.
+      (2008). Fast unfolding of communities in large networks. Journal of
+      Statistical Mechanics: Theory and Experiment, 2008(10), P10008.
+
+    """
+    import community
+    from pynets.core.utils import get_cache_dir
+
+    if cache_dir is None:
+        cache_dir = get_cache_dir("communities")
+    if key is None:
+        key = graph_key(G, weight)
+    resolution = float(resolution)
+
+    ci = _load_partition(key, resolution, cache_dir)
+    if ci is not None:
+        return ci
+
+    nodes = list(G.nodes())
+    init = None
+    if warm_start is True:
+        neighbors = _cached_resolutions(key, cache_dir)
+        if len(neighbors) > 0:
+            nearest = min(neighbors, key=lambda r: abs(np.log(r) -
+                                                       np.log(resolution)))
+            init_ci = _load_partition(key, nearest, cache_dir)
+            if init_ci is not None:
+                init = dict(zip(nodes, init_ci.tolist()))
+
+    partition = community.best_partition(G, partition=init, weight=weight,
+                                         resolution=resolution)
+    ci = np.array([partition[node] for node in nodes])
+
+    _PARTITIONS.setdefault(key, {})[resolution] = ci
+    cache_file = _cache_file(cache_dir, key, resolution)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp.npy"
+    np.save(tmp_file, ci)
+    os.replace(tmp_file, cache_file)
+
+    return ci
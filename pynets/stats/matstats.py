@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:12:41 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import warnings
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import shortest_path
+
+warnings.filterwarnings("ignore")
+
+# Upper bound on the number of cells in any one batched shortest-path
+# solution (i.e. the square of the number of stacked neighborhood nodes).
+MAX_BATCH_CELLS = 2 ** 22
+
+
+def as_adjacency(W, weight="weight"):
+    """
+    Coerce a dense array, sparse matrix, or NetworkX graph to a square
+    adjacency matrix without copying array inputs.
+
+    Parameters
+    ----------
+    W : np.ndarray, scipy.sparse matrix, or NetworkX graph
+        Binary/weighted connectivity matrix (or graph).
+    weight : str
+        Edge attribute to read when W is a NetworkX graph. If None, edges are
+        treated as binary.
+
+    Returns
+    -------
+    W : np.ndarray or scipy.sparse.csr_matrix
+        Square adjacency matrix.
+
+    """
+    if sparse.issparse(W):
+        return W.tocsr()
+    elif isinstance(W, np.ndarray):
+        return W
+    elif hasattr(W, "adj"):
+        import networkx as nx
+
+        return nx.to_scipy_sparse_matrix(W, weight=weight, format="csr")
+    else:
+        return np.asarray(W)
+
+
+def _weighted(W, weight):
+    """Binarize W when no weight attribute is requested."""
+    if weight is not None:
+        return W
+    if sparse.issparse(W):
+        W = W.copy()
+        W.data = (W.data != 0).astype("float64")
+        W.eliminate_zeros()
+        return W
+    return (W != 0).astype("float64")
+
+
+def _off_diagonal(W):
+    """Return a copy of W with self-connections removed."""
+    if sparse.issparse(W):
+        W = W.tolil(copy=True)
+        W.setdiag(0)
+        W = W.tocsr()
+        W.eliminate_zeros()
+        return W
+    W = np.array(W, dtype="float64")
+    np.fill_diagonal(W, 0)
+    return W
+
+
+def _community_onehot(ci):
+    """
+    Build an N x M community membership indicator matrix from an
+    affiliation vector.
+    """
+    _, ci = np.unique(np.asarray(ci).ravel(), return_inverse=True)
+    return sparse.csr_matrix(
+        (np.ones(len(ci)), (np.arange(len(ci)), ci)),
+        shape=(len(ci), int(ci.max()) + 1),
+    )
+
+
+def _row_sums(W):
+    return np.asarray(W.sum(axis=1)).ravel()
+
+
+def _module_strength(W, onehot):
+    """Return the dense N x M node-to-module strength matrix."""
+    return np.asarray(sparse.csr_matrix(W).dot(onehot).todense())
+
+
+def global_efficiency(G, weight="weight"):
+    """
+    Return the global efficiency of a graph, computed directly from its
+    adjacency matrix.
+
+    Parameters
+    ----------
+    G : np.ndarray, scipy.sparse matrix, or NetworkX graph
+        Binary/weighted undirected connectivity matrix whose weights are
+        interpreted as path lengths, consistent with
+        `pynets.stats.netstats.global_efficiency`.
+    weight : str
+        Edge attribute (for graphs), or None to treat edges as binary.
+
+    Returns
+    -------
+    global_efficiency : float
+
+    References
+    ----------
+    .. [1] Latora, V., and Marchiori, M. (2001). Efficient behavior of
+       small-world networks. Physical Review Letters 87.
+    .. [2] Latora, V., and Marchiori, M. (2003). Economic small-world behavior
+       in weighted networks. Eur Phys J B 32, 249-263.
+
+    """
+    W = _weighted(as_adjacency(G, weight), weight)
+    N = W.shape[0]
+    if N < 2:
+        return 0
+
+    D = shortest_path(W, method="D", directed=False)
+    np.fill_diagonal(D, np.inf)
+
+    with np.errstate(divide="ignore"):
+        return float(np.sum(1 / D) / (N * (N - 1)))
+
+
+def _neighborhood_batches(degrees):
+    """
+    Group nodes into batches whose stacked neighborhoods stay below
+    MAX_BATCH_CELLS in their all-pairs solution.
+    """
+    nodes = np.flatnonzero(degrees > 1)
+    sizes = np.cumsum(degrees[nodes])
+    while len(nodes) > 0:
+        stop = max(int(np.searchsorted(sizes, np.sqrt(MAX_BATCH_CELLS),
+                                       side="right")), 1)
+        yield nodes[:stop]
+        nodes = nodes[stop:]
+        sizes = sizes[stop:] - sizes[stop - 1]
+
+
+def _neighborhood_blocks(W, A, batch, degrees):
+    """
+    Stack the neighborhood subgraphs of every node in a batch into a single
+    block-diagonal sparse matrix.
+    """
+    k = degrees[batch]
+    # Original node index held at each stacked position, and the batch
+    # member whose neighborhood that position belongs to
+    members = A[batch].indices
+    owner = np.repeat(np.arange(len(batch)), k)
+    starts = np.cumsum(k) - k
+
+    # Every (row, col) position pair that falls inside the same block
+    counts = k[owner]
+    rows = np.repeat(np.arange(len(members)), counts)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+    cols = starts[owner[rows]] + offsets
+    vals = np.asarray(W[members[rows], members[cols]]).ravel()
+    keep = vals != 0
+
+    blocks = sparse.csr_matrix(
+        (vals[keep], (rows[keep], cols[keep])),
+        shape=(len(members), len(members)),
+    )
+    return blocks, owner
+
+
+def local_efficiency(G, weight="weight"):
+    """
+    Return the local efficiency of each node, computed by solving the
+    shortest paths of every neighborhood subgraph as one block-diagonal
+    system per batch of nodes.
+
+    Parameters
+    ----------
+    G : np.ndarray, scipy.sparse matrix, or NetworkX graph
+        Binary/weighted undirected connectivity matrix.
+    weight : str
+        Edge attribute (for graphs), or None to treat edges as binary.
+
+    Returns
+    -------
+    local_efficiency : Nx1 np.ndarray
+        Local efficiency of each node. Nodes with fewer than two neighbors
+        receive 0.
+
+    References
+    ----------
+    .. [1] Latora, V., and Marchiori, M. (2001). Efficient behavior of
+      small-world networks. Physical Review Letters 87.
+    .. [2] Latora, V., and Marchiori, M. (2003). Economic small-world behavior
+      in weighted networks. Eur Phys J B 32, 249-263.
+
+    """
+    W = _off_diagonal(_weighted(as_adjacency(G, weight), weight))
+    W = sparse.csr_matrix(abs(W))
+    W.sort_indices()
+
+    A = W.copy()
+    A.data = np.ones_like(A.data)
+    degrees = _row_sums(A).astype("int64")
+
+    efficiencies = np.zeros(W.shape[0])
+    for batch in _neighborhood_batches(degrees):
+        blocks, owner = _neighborhood_blocks(W, A, batch, degrees)
+
+        # Positions in different blocks are mutually unreachable (inf), so
+        # only within-neighborhood paths contribute to the sums below
+        D = shortest_path(blocks, method="D", directed=False)
+        np.fill_diagonal(D, np.inf)
+        with np.errstate(divide="ignore"):
+            inv = np.sum(1 / D, axis=1)
+
+        k = degrees[batch].astype("float64")
+        efficiencies[batch] = np.bincount(
+            owner, weights=inv, minlength=len(batch)) / (k * (k - 1))
+
+    return efficiencies
+
+
+def average_local_efficiency(G, weight="weight"):
+    """
+    Return the average local efficiency of all nodes with nonzero local
+    efficiency.
+
+    Parameters
+    ----------
+    G : np.ndarray, scipy.sparse matrix, or NetworkX graph
+        Binary/weighted undirected connectivity matrix.
+    weight : str
+        Edge attribute (for graphs), or None to treat edges as binary.
+
+    Returns
+    -------
+    average_local_efficiency : float
+        Average local efficiency of G.
+
+    """
+    e_loc_vec = local_efficiency(G, weight)
+    return np.nanmean(e_loc_vec[e_loc_vec != 0.])
+
+
+def weighted_transitivity(G, weight="weight"):
+    r"""
+    Compute weighted graph transitivity from the geometric mean of the
+    max-normalized edge weights of each triangle.
+
+    .. math::
+
+        T = \frac{\sum_i (W^{1/3})^3_{ii}}{\sum_i k_i (k_i - 1)}
+
+    Parameters
+    ----------
+    G : np.ndarray, scipy.sparse matrix, or NetworkX graph
+        Binary/weighted undirected connectivity matrix.
+    weight : str
+        Edge attribute (for graphs), or None to treat edges as binary.
+
+    Returns
+    -------
+    out : float
+       Transitivity
+
+    References
+    ----------
+    .. [1] Wasserman, S., and Faust, K. (1994). Social Network Analysis:
+      Methods and Applications. Cambridge: Cambridge University Press.
+    .. [2] Alain Barrat, Marc Barthelemy, Romualdo Pastor-Satorras, Alessandro
+      Vespignani: The architecture of complex weighted networks, Proc. Natl.
+      Acad. Sci. USA 101, 3747 (2004)
+
+    """
+    W = sparse.csr_matrix(
+        _off_diagonal(_weighted(as_adjacency(G, weight), weight)))
+    if W.nnz == 0:
+        return 0
+
+    Wc = W.copy()
+    Wc.data = np.cbrt(Wc.data / Wc.data.max())
+    triangles = (Wc @ Wc).multiply(Wc).sum()
+
+    A = W.copy()
+    A.data = np.ones_like(A.data)
+    k = _row_sums(A)
+    contri = np.sum(k * (k - 1))
+
+    return 0 if triangles == 0 else float(triangles / contri)
+
+
+def participation_coef(W, ci, degree="undirected"):
+    """
+    Participation coefficient is a measure of diversity of intermodular
+    connections of individual nodes.
+
+    Parameters
+    ----------
+    W : NxN np.ndarray or scipy.sparse matrix
+        binary/weighted directed/undirected connection matrix
+    ci : Nx1 np.ndarray
+        community affiliation vector
+    degree : str
+        Flag to describe nature of graph 'undirected': For undirected graphs
+                                         'in': Uses the in-degree
+                                         'out': Uses the out-degree
+    Returns
+    -------
+    P : Nx1 np.ndarray
+        Participation coefficient
+
+    References
+    ----------
+    .. [1] Guimera, R., & Amaral, L. A. N. (2005). Functional cartography of
+      complex metabolic networks. Nature, 433, 895-900.
+    .. [2] Rubinov, M., & Sporns, O. (2010). Complex network measures of brain
+      connectivity: Uses and interpretations. NeuroImage, 52, 1059-1069.
+
+    """
+    W = as_adjacency(W)
+    if degree == "in":
+        W = W.T
+
+    Ko = _row_sums(W)
+    Kc2 = np.sum(np.square(_module_strength(W, _community_onehot(ci))),
+                 axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        P = 1 - Kc2 / np.square(Ko)
+    # P=0 if for nodes with no (out) neighbors
+    P[Ko == 0] = 0
+
+    return P
+
+
+def participation_coef_sign(W, ci):
+    """
+    Participation coefficient computed separately over the positive and
+    negative weights of a signed connection matrix.
+
+    Parameters
+    ----------
+    W : NxN np.ndarray or scipy.sparse matrix
+        undirected connection matrix with positive and negative weights
+    ci : Nx1 np.ndarray
+        community affiliation vector
+
+    Returns
+    -------
+    Ppos : Nx1 np.ndarray
+        participation coefficient from positive weights
+    Pneg : Nx1 np.ndarray
+        participation coefficient from negative weights
+
+    """
+    W = sparse.csr_matrix(as_adjacency(W))
+    onehot = _community_onehot(ci)
+
+    def pcoef(W_):
+        S = _row_sums(W_)
+        Sc2 = np.sum(np.square(_module_strength(W_, onehot)), axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            P = 1 - Sc2 / np.square(S)
+        P[np.isnan(P)] = 0
+        P[S == 0] = 0
+        return P
+
+    return pcoef(W.multiply(W > 0)), pcoef(-W.multiply(W < 0))
+
+
+def diversity_coef_sign(W, ci):
+    """
+    The Shannon-entropy based diversity coefficient measures the diversity
+    of intermodular connections of individual nodes and ranges from 0 to 1.
+
+    Parameters
+    ----------
+    W : NxN np.ndarray or scipy.sparse matrix
+        undirected connection matrix with positive and negative weights
+    ci : Nx1 np.ndarray
+        community affiliation vector
+
+    Returns
+    -------
+    Hpos : Nx1 np.ndarray
+        diversity coefficient based on positive connections
+    Hneg : Nx1 np.ndarray
+        diversity coefficient based on negative connections
+
+    References
+    ----------
+    .. [1] Rubinov, M., & Sporns, O. (2010). Complex network measures of brain
+      connectivity: Uses and interpretations. NeuroImage, 52, 1059-1069.
+
+    """
+    W = sparse.csr_matrix(as_adjacency(W))
+    onehot = _community_onehot(ci)
+    m = onehot.shape[1]
+
+    def entropy(w_):
+        S = _row_sums(w_)
+        # Node-to-module strength
+        Snm = _module_strength(w_, onehot)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pnm = Snm / S[:, None]
+        pnm[np.isnan(pnm)] = 0
+        pnm[pnm == 0] = 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return -np.sum(pnm * np.log(pnm), axis=1) / np.log(m)
+
+    return entropy(W.multiply(W > 0)), entropy(-W.multiply(W < 0))
@@ -7,6 +7,7 @@ Copyright (C) 2016
 """
 import pandas as pd
 import numpy as np
+import time
 import warnings
 import networkx as nx
 from pynets.core import thresholding
@@ -268,8 +269,11 @@ def smallworldness(
         `transitivity` method of counting triangles. Default is `clustering`.
     reference : str
         Specifies whether to use a random `random`, lattice
-        `lattice` reference, or fast `fast` erdos-renyi sample for
-        clustering/transitivity. Default is `fast`.
+        `lattice` reference, or fast `fast` degree-corrected stochastic block
+        model (DCSBM) ensemble, with blocks fitted from the Louvain
+        partition of G, for clustering/transitivity. Fast ensembles are
+        cached on disk by degree sequence and partition (see
+        `pynets.stats.nullmodels`). Default is `fast`.
 
     Returns
     -------
@@ -287,32 +291,38 @@ def smallworldness(
 
     from networkx.algorithms.smallworld import random_reference, \
         lattice_reference
-    from graspy.models import DCSBMEstimator
+    from pynets.stats.nullmodels import reference_metrics
+    from pynets.stats.communities import louvain_partition
 
-    dcer = DCSBMEstimator(directed=False, loops=False)
-    dcer.fit(nx.to_numpy_array(prune_disconnected(G)[0]))
+    if approach not in ("clustering", "transitivity"):
+        raise ValueError(f"{approach}' approach not recognized!")
 
     # Compute the mean clustering coefficient and average shortest path length
     # for an equivalent random graph
     randMetrics = {"C": [], "L": []}
-    for i in range(nrand):
-        if reference != "fast":
-            Gr = random_reference(G, niter=niter, seed=i)
-            if reference == "random":
-                Gl = random_reference(G, niter=niter, seed=i)
-            elif reference == "lattice":
-                Gl = lattice_reference(G, niter=niter, seed=i)
-            else:
-                raise ValueError(f"{reference}' graph type not recognized!")
+    if reference == "fast":
+        # Degree-corrected reference ensemble, with blocks fitted from the
+        # (memoized) Louvain partition of the graph, generated once per
+        # degree sequence and partition and served from the null-model cache
+        # thereafter
+        G_conn = prune_disconnected(G)[0]
+        ensemble = reference_metrics(nx.to_numpy_array(G_conn), nrand=nrand,
+                                     y=louvain_partition(G_conn))
+        randMetrics["C"] = list(ensemble[approach])
+        randMetrics["L"] = list(ensemble["path_length"])
+
+    for i in range(nrand if reference != "fast" else 0):
+        Gr = random_reference(G, niter=niter, seed=i)
+        if reference == "random":
+            Gl = random_reference(G, niter=niter, seed=i)
+        elif reference == "lattice":
+            Gl = lattice_reference(G, niter=niter, seed=i)
         else:
-            Gr = prune_disconnected(nx.from_numpy_array(dcer.sample()[0]))[0]
-            Gl = Gr.copy()
+            raise ValueError(f"{reference}' graph type not recognized!")
         if approach == "clustering":
             randMetrics["C"].append(nx.average_clustering(Gl, weight='weight'))
-        elif approach == "transitivity":
-            randMetrics["C"].append(weighted_transitivity(Gl))
         else:
-            raise ValueError(f"{approach}' approach not recognized!")
+            randMetrics["C"].append(weighted_transitivity(Gl))
 
         randMetrics["L"].append(
             nx.average_shortest_path_length(Gr, weight="weight"))
@@ -1042,7 +1052,7 @@ class CleanGraphs(object):
             est_path,
             prune,
             norm,
-            out_fmt="edgelist_ssv"):
+            out_fmt="npy"):
         from pynets.core import utils
 
         self.thr = thr
@@ -1113,6 +1123,7 @@ class CleanGraphs(object):
         return self.G
 
     def prune_graph(self):
+        import os
         from pynets.core import utils
         from graspy.utils import remove_loops, symmetrize, get_lcc
 
@@ -1154,15 +1165,24 @@ class CleanGraphs(object):
         # Saved pruned
         if (self.prune != 0) and (self.prune is not None):
             final_mat_path = f"{self.est_path.split('.npy')[0]}{'_pruned'}"
-            utils.save_mat(self.in_mat, final_mat_path, self.out_fmt)
-            print(f"{'Source File: '}{final_mat_path}")
         elif self.prune == 0:
-            final_mat_path = f"{self.est_path.split('.npy')[0]}"
-            utils.save_mat(self.in_mat, final_mat_path, self.out_fmt)
-            print(f"{'Source File: '}{final_mat_path}")
+            final_mat_path = f"{self.est_path.split('.npy')[0]}{'_clean'}"
         else:
             raise ValueError(f"Pruning option {self.prune} invalid!")
 
+        # Always keep a binary copy, carrying over the metadata of the source
+        # graph, and export to other formats only on request
+        if self.est_path.endswith(".npy") and os.path.isfile(self.est_path):
+            meta = utils.load_connectome_meta(self.est_path)
+        else:
+            meta = {}
+        meta.update({"prune": self.prune, "norm": self.norm})
+        final_mat_path = utils.save_connectome(self.in_mat, final_mat_path,
+                                               meta)
+        if self.out_fmt != "npy":
+            utils.save_mat(self.in_mat, final_mat_path, self.out_fmt)
+        print(f"{'Source File: '}{final_mat_path}")
+
         return self.in_mat, final_mat_path
 
     def print_summary(self):
@@ -1214,64 +1234,345 @@ def save_netmets(
     return out_path_neat
 
 
-def iterate_nx_global_measures(G, metric_list_glob):
-    import time
+# Relative asymptotic cost of each metric as a function of the number of
+# nodes (n) and edges (m) of the graph. Only the ordering matters: the most
+# expensive metrics are dispatched first so that they do not end up as the
+# last, serial stragglers of a graph.
+METRIC_COSTS = {
+    "global_efficiency": lambda n, m: n * m * np.log2(n + 1),
+    "average_shortest_path_length": lambda n, m: n * m * np.log2(n + 1),
+    "smallworldness": lambda n, m: 10 * n * m * np.log2(n + 1),
+    "average_local_efficiency": lambda n, m: m * (m / max(n, 1)) ** 2,
+    "local_efficiency": lambda n, m: m * (m / max(n, 1)) ** 2,
+    "graph_number_of_cliques": lambda n, m: n ** 3,
+    "average_clustering": lambda n, m: m ** 2 / max(n, 1),
+    "weighted_transitivity": lambda n, m: m ** 2 / max(n, 1),
+    "local_clustering": lambda n, m: m ** 2 / max(n, 1),
+    "degree_assortativity_coefficient": lambda n, m: m,
+    "degree_centrality": lambda n, m: n,
+    "eigenvector_centrality": lambda n, m: 100 * m,
+    "betweenness_centrality": lambda n, m: n * m * np.log2(n + 1),
+    "communicability_centrality": lambda n, m: n ** 4,
+    "rich_club_coefficient": lambda n, m: 100 * m * np.log2(n + 1),
+    "louvain_modularity": lambda n, m: 10 * m * np.log2(n + 1),
+    "participation_coefficient": lambda n, m: m,
+    "diversity_coefficient": lambda n, m: m,
+}
+
+# Metrics whose footprint is dominated by dense n x n working arrays
+DENSE_METRICS = [
+    "global_efficiency",
+    "average_shortest_path_length",
+    "smallworldness",
+    "betweenness_centrality",
+    "communicability_centrality",
+]
+
+
+def _run_metric_task(conn, func, args, required):
+    """
+    Worker process entry point for MetricScheduler. Sends back a
+    (status, result) tuple through a pipe.
+    """
+    try:
+        if required is not None:
+            result = func(required, *args)
+        else:
+            result = func(*args)
+        conn.send(("ok", result))
+    except BaseException as e:
+        conn.send(("error", repr(e)))
+    finally:
+        conn.close()
 
-    # import random
-    num_mets = len(metric_list_glob)
-    net_met_arr = np.zeros([num_mets, 2], dtype="object")
-    j = 0
+
+class MetricScheduler(object):
+    """
+    A process-pool scheduler for graph metrics with a per-metric wall-clock
+    budget and a shared memory cap.
+
+    Metrics are dispatched to worker processes in order of decreasing
+    expected cost. A metric that exceeds its budget, or whose worker pushes
+    the combined resident memory of all workers beyond `mem_gb`, is
+    terminated and omitted from the results, so that the remaining metrics
+    of the graph are still returned.
+
+    Parameters
+    ----------
+    n_workers : int
+        Maximum number of concurrent metric workers. If None, all available
+        cores are used.
+    mem_gb : float
+        Memory cap, in GB, shared by all running workers. If None, memory is
+        not bounded.
+    budget : float
+        Wall-clock budget, in seconds, of any single metric.
+    n_nodes : int
+        Number of nodes of the graph, used to estimate metric costs.
+    n_edges : int
+        Number of edges of the graph, used to estimate metric costs.
+
+    """
+
+    def __init__(
+            self,
+            n_workers=1,
+            mem_gb=None,
+            budget=DEFAULT_TIMEOUT,
+            n_nodes=0,
+            n_edges=0):
+        import multiprocessing as mp
+
+        if n_workers is None:
+            n_workers = mp.cpu_count()
+        self.n_workers = max(int(n_workers), 1)
+        self.mem_gb = mem_gb
+        self.budget = budget
+        self.n_nodes = n_nodes
+        self.n_edges = n_edges
+        self.pending = []
+        self.results = {}
+        self.elapsed = {}
+
+        if "fork" in mp.get_all_start_methods():
+            self._ctx = mp.get_context("fork")
+        else:
+            self._ctx = mp.get_context()
+
+    def expected_cost(self, name):
+        cost = METRIC_COSTS.get(name, lambda n, m: n * m)
+        return float(cost(self.n_nodes, self.n_edges))
+
+    def expected_mem_gb(self, name):
+        if name in DENSE_METRICS:
+            return 16 * self.n_nodes ** 2 / 1e9
+        return 16 * (self.n_nodes + self.n_edges) / 1e9
+
+    def submit(self, name, func, args=(), requires=None):
+        """
+        Queue a metric. If `requires` names another metric, the task is only
+        dispatched once that metric has succeeded, and its result is passed
+        as the first argument of `func`.
+        """
+        self.pending.append((name, func, tuple(args), requires))
+
+    def _ready(self, running=()):
+        queued = [i[0] for i in self.pending] + list(running)
+        ready = []
+        for task in list(self.pending):
+            requires = task[3]
+            if requires is None or requires in self.results:
+                ready.append(task)
+            elif requires not in queued:
+                # The required metric failed, exceeded its budget, or was
+                # never requested
+                print(f"WARNING: {task[0]} cannot be calculated for G "
+                      f"without {requires}.")
+                self.pending.remove(task)
+        return sorted(ready, key=lambda t: self.expected_cost(t[0]),
+                      reverse=True)
+
+    def _finish(self, name, started, status=None, result=None):
+        self.elapsed[name] = time.time() - started
+        if status == "ok":
+            self.results[name] = result
+        elif status == "error":
+            print(f"WARNING: {name} failed for G: {result}")
+        else:
+            print(f"WARNING: {name} exceeded its {status} budget and was "
+                  f"terminated.")
+
+    def run(self):
+        """
+        Run all queued metrics and return a dictionary of the results of
+        those that succeeded.
+        """
+        if self._ctx.current_process().daemon is True:
+            # Daemonic processes (e.g. some nipype MultiProc workers) cannot
+            # spawn children, so fall back to serial, in-process execution.
+            return self._run_serial()
+
+        from multiprocessing.connection import wait
+
+        running = {}
+        while self.pending or running:
+            for task in self._ready(running):
+                if len(running) >= self.n_workers:
+                    break
+                name, func, args, requires = task
+                if running and self.mem_gb is not None and \
+                        sum(self.expected_mem_gb(i) for i in running) + \
+                        self.expected_mem_gb(name) > self.mem_gb:
+                    continue
+                self.pending.remove(task)
+                recv_conn, send_conn = self._ctx.Pipe(duplex=False)
+                proc = self._ctx.Process(
+                    target=_run_metric_task,
+                    args=(send_conn, func, args,
+                          self.results.get(requires)),
+                )
+                proc.start()
+                send_conn.close()
+                running[name] = (proc, recv_conn, time.time())
+
+            if not running:
+                continue
+
+            for conn in wait([i[1] for i in running.values()], timeout=0.05):
+                name = [k for k, v in running.items() if v[1] is conn][0]
+                proc, _, started = running.pop(name)
+                try:
+                    status, result = conn.recv()
+                except EOFError:
+                    status, result = "error", "worker exited unexpectedly"
+                conn.close()
+                proc.join()
+                self._finish(name, started, status, result)
+
+            self._enforce_limits(running)
+
+        return self.results
+
+    def _enforce_limits(self, running):
+        import psutil
+
+        now = time.time()
+        for name in list(running):
+            proc, conn, started = running[name]
+            if now - started > self.budget:
+                self._terminate(running, name)
+                self._finish(name, started, "time")
+
+        if self.mem_gb is None or not running:
+            return
+
+        rss = {}
+        for name, (proc, conn, started) in running.items():
+            try:
+                rss[name] = psutil.Process(proc.pid).memory_info().rss / 1e9
+            except psutil.Error:
+                rss[name] = 0
+        if sum(rss.values()) > self.mem_gb:
+            name = max(rss, key=rss.get)
+            started = running[name][2]
+            self._terminate(running, name)
+            self._finish(name, started, "memory")
+
+    @staticmethod
+    def _terminate(running, name):
+        proc, conn, _ = running.pop(name)
+        proc.terminate()
+        proc.join()
+        conn.close()
+
+    def _run_serial(self):
+        while self.pending:
+            ready = self._ready()
+            if not ready:
+                break
+            name, func, args, requires = ready[0]
+            self.pending.remove(ready[0])
+            started = time.time()
+            try:
+                if requires is not None:
+                    result = func(self.results[requires], *args)
+                else:
+                    result = func(*args)
+                self._finish(name, started, "ok", result)
+            except BaseException as e:
+                self._finish(name, started, "error", repr(e))
+        return self.results
+
+
+def iterate_nx_global_measures(G, metric_list_glob, scheduler=None):
+    """
+    Compute each scalar global graph metric of a list, dispatching them
+    through a MetricScheduler.
+
+    Parameters
+    ----------
+    G : Obj
+        NetworkX graph.
+    metric_list_glob : list
+        List of graph metric functions (or partials) that take G as input.
+    scheduler : Obj
+        MetricScheduler instance. Any metrics already queued on it are run
+        concurrently with the global metrics. If None, a single-worker
+        scheduler is used.
+
+    Returns
+    -------
+    net_met_val_list : list
+        Values of each metric, with NaN for metrics that failed or exceeded
+        their budget.
+    metric_list_names : list
+        Names of each metric.
+
+    """
+    if scheduler is None:
+        scheduler = MetricScheduler(n_nodes=G.number_of_nodes(),
+                                    n_edges=G.number_of_edges())
+
+    metric_list_names = []
     for i in metric_list_glob:
-        start_time = time.time()
         net_met = str(i).split("<function ")[1].split(" at")[0]
-        try:
-            try:
-                net_met_val = raw_mets(G, i)
-            except BaseException:
-                print(f"{'WARNING: '}{net_met}{' failed for G.'}")
-                # np.save("%s%s%s%s" % ('/tmp/', net_met, random.randint(1, 400), '.npy'),
-                #         np.array(nx.to_numpy_matrix(G)))
-                net_met_val = np.nan
-        except BaseException:
-            print(f"{'WARNING: '}{str(i)}{' is undefined for G'}")
-            # np.save("%s%s%s%s" % ('/tmp/', net_met, random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            net_met_val = np.nan
-        net_met_arr[j, 0] = net_met
-        net_met_arr[j, 1] = net_met_val
+        metric_list_names.append(net_met)
+        scheduler.submit(net_met, raw_mets, (G, i))
+
+    results = scheduler.run()
+
+    net_met_val_list = []
+    for net_met in metric_list_names:
+        net_met_val = results.get(net_met, np.nan)
+        net_met_val_list.append(net_met_val)
         print(net_met.replace("_", " ").title())
         print(str(net_met_val))
-        print(f"{np.round(time.time() - start_time, 3)}{'s'}")
+        print(f"{np.round(scheduler.elapsed.get(net_met, 0), 3)}{'s'}")
         print("\n")
-        j = j + 1
-    net_met_val_list = list(net_met_arr[:, 1])
 
-    # Create a list of metric names for scalar metrics
-    metric_list_names = []
-    for i in net_met_arr[:, 0]:
-        metric_list_names.append(i)
     return net_met_val_list, metric_list_names
 
 
-def community_resolution_selection(G):
-    import community
+def community_resolution_selection(G, warm_start=False):
+    """
+    Find the Louvain community affiliation vector of G, searching over
+    resolutions until more than one community is found. Partitions are
+    served from the community cache (see
+    `pynets.stats.communities.louvain_partition`), so that G is
+    partitioned at most once per resolution.
 
+    Parameters
+    ----------
+    G : Obj
+        NetworkX graph.
+    warm_start : bool
+        If True, Louvain is initialized at each resolution from the
+        partition at the previously attempted (neighbouring) resolution.
+        Default is False.
+
+    Returns
+    -------
+    ci_dict : dict
+        Community affiliation of each node.
+    ci : np.ndarray
+        Community affiliation vector.
+    resolution : float
+        Resolution of the partition.
+    num_comms : int
+        Number of communities.
+
+    """
+    from pynets.stats.communities import graph_key, louvain_partition
+
+    key = graph_key(G)
     resolution = 1
-    ci = np.array(
-        list(
-            community.best_partition(
-                G,
-                resolution=resolution).values()))
+    ci = louvain_partition(G, resolution, warm_start, key=key)
     num_comms = len(np.unique(ci))
     if num_comms == 1:
         resolution = 10
         tries = 0
         while num_comms == 1:
-            ci = np.array(
-                list(
-                    community.best_partition(
-                        G,
-                        resolution=resolution).values()))
+            ci = louvain_partition(G, resolution, warm_start, key=key)
             num_comms = len(np.unique(ci))
             print(
                 f"{'Found '}{num_comms}{' communities at resolution: '}"
@@ -1288,11 +1589,7 @@ def community_resolution_selection(G):
         resolution = 0.1
         tries = 0
         while num_comms == 1:
-            ci = np.array(
-                list(
-                    community.best_partition(
-                        G,
-                        resolution=resolution).values()))
+            ci = louvain_partition(G, resolution, warm_start, key=key)
             num_comms = len(np.unique(ci))
             print(
                 f"{'Found '}{num_comms}{' communities at resolution: '}"
@@ -1313,10 +1610,12 @@ def community_resolution_selection(G):
     return dict(zip(G.nodes(), ci)), ci, resolution, num_comms
 
 
-def get_community(G, net_met_val_list_final, metric_list_names):
+def get_community(G, net_met_val_list_final, metric_list_names,
+                  warm_start=False):
     import community
 
-    ci_dict, ci, resolution, num_comms = community_resolution_selection(G)
+    ci_dict, ci, resolution, num_comms = community_resolution_selection(
+        G, warm_start)
     modularity = community.community_louvain.modularity(ci_dict, G)
     metric_list_names.append("modularity")
     if modularity == 1.0:
@@ -1326,11 +1625,30 @@ def get_community(G, net_met_val_list_final, metric_list_names):
     return net_met_val_list_final, metric_list_names, ci
 
 
-def get_participation(in_mat, ci, metric_list_names, net_met_val_list_final):
+def get_community_metric(community, func, in_mat, engine="networkx"):
+    """
+    Compute a community-based nodal metric (e.g. get_participation or
+    get_diversity) from the output of get_community.
+    """
+    ci = community[2]
+    if ci is None:
+        raise KeyError(
+            "Community-based metrics cannot be calculated for G in the "
+            "absence of a community affiliation vector")
+    return func(in_mat, ci, [], [], engine)
+
+
+def get_participation(in_mat, ci, metric_list_names, net_met_val_list_final,
+                      engine="networkx"):
+    if engine == "matrix":
+        from pynets.stats import matstats as metric_engine
+    else:
+        from pynets.stats import netstats as metric_engine
+
     if len(in_mat[in_mat < 0.0]) > 0:
-        pc_vector = participation_coef_sign(in_mat, ci)[0]
+        pc_vector = metric_engine.participation_coef_sign(in_mat, ci)[0]
     else:
-        pc_vector = participation_coef(in_mat, ci)
+        pc_vector = metric_engine.participation_coef(in_mat, ci)
     print("\nCalculating Participation Coefficients...")
     pc_vals = list(pc_vector)
     pc_edges = list(range(len(pc_vector)))
@@ -1360,8 +1678,14 @@ def get_participation(in_mat, ci, metric_list_names, net_met_val_list_final):
     return metric_list_names, net_met_val_list_final
 
 
-def get_diversity(in_mat, ci, metric_list_names, net_met_val_list_final):
-    dc_vector = diversity_coef_sign(in_mat, ci)[0]
+def get_diversity(in_mat, ci, metric_list_names, net_met_val_list_final,
+                  engine="networkx"):
+    if engine == "matrix":
+        from pynets.stats.matstats import diversity_coef_sign as diversity
+    else:
+        diversity = diversity_coef_sign
+
+    dc_vector = diversity(in_mat, ci)[0]
     print("\nCalculating Diversity Coefficients...")
     dc_vals = list(dc_vector)
     dc_edges = list(range(len(dc_vector)))
@@ -1390,8 +1714,14 @@ def get_diversity(in_mat, ci, metric_list_names, net_met_val_list_final):
     return metric_list_names, net_met_val_list_final
 
 
-def get_local_efficiency(G, metric_list_names, net_met_val_list_final):
-    le_vector = local_efficiency(G)
+def get_local_efficiency(G, metric_list_names, net_met_val_list_final,
+                         engine="networkx"):
+    if engine == "matrix":
+        from pynets.stats import matstats
+
+        le_vector = dict(zip(G.nodes(), matstats.local_efficiency(G)))
+    else:
+        le_vector = local_efficiency(G)
     print("\nCalculating Local Efficiencies...")
     le_vals = list(le_vector.values())
     le_nodes = list(le_vector.keys())
@@ -1620,95 +1950,34 @@ def get_rich_club_coeff(G, metric_list_names, net_met_val_list_final):
     return metric_list_names, net_met_val_list_final
 
 
-def extractnetstats(
-        ID,
-        network,
-        thr,
-        conn_model,
-        est_path,
-        roi,
-        prune,
-        norm,
-        binary):
+def load_metric_lists(metric_engine, binary):
     """
-    Function interface for performing fully-automated graph analysis.
+    Parse the global and nodal graph metrics enabled in
+    global_graph_measures.yaml and local_graph_measures.yaml.
 
     Parameters
     ----------
-    ID : str
-        A subject id or other unique identifier.
-    network : str
-        Resting-state network based on Yeo-7 and Yeo-17 naming
-        (e.g. 'Default') used to filter nodes in the study of brain subgraphs.
-    thr : float
-        The value, between 0 and 1, used to threshold the graph using any
-        variety of methods triggered through other options.
-    conn_model : str
-       Connectivity estimation model (e.g. corr for correlation, cov for
-       covariance, sps for precision covariance,
-       partcorr for partial correlation). sps type is used by default.
-    est_path : str
-        File path to the thresholded graph, conn_matrix_thr, saved as a numpy
-        array in .npy format.
-    roi : str
-        File path to binarized/boolean region-of-interest Nifti1Image file.
-    prune : int
-        Indicates whether to prune final graph of disconnected nodes/isolates.
-    norm : int
-        Indicates method of normalizing resulting graph.
+    metric_engine : module
+        Module from which the PyNets global metrics are drawn (i.e.
+        `pynets.stats.netstats` or `pynets.stats.matstats`).
     binary : bool
-        Indicates whether to binarize resulting graph edges to form an
-        unweighted graph.
+        Indicates whether the graph is binarized, in which case global
+        metrics are not passed edge weights.
 
     Returns
     -------
-    out_path : str
-        Path to .csv file where graph analysis results are saved.
-
-    References
-    ----------
-    .. [1] Fornito, A., Zalesky, A., & Bullmore, E. T. (2016).
-      Fundamentals of Brain Network Analysis. In Fundamentals of Brain Network
-      Analysis. https://doi.org/10.1016/C2012-0-06036-X
-    .. [2] Aric A. Hagberg, Daniel A. Schult and Pieter J. Swart,
-      “Exploring network structure, dynamics, and function using NetworkX”,
-      in Proceedings of the 7th Python in Science Conference (SciPy2008),
-      Gäel Varoquaux, Travis Vaught, and Jarrod Millman (Eds),
-      (Pasadena, CA USA), pp. 11–15, Aug 2008
+    metric_list_global : list
+        Global metric functions (or partials) that take G as input.
+    metric_list_global_names : list
+        Names of the global metrics.
+    metric_list_nodal : list
+        Names of the nodal metrics.
 
     """
-    import time
-    import gc
-    import os
-    import os.path as op
-    import yaml
-
-    # import random
     import pkg_resources
+    import yaml
     import networkx
     import pynets.stats.netstats
-    from pathlib import Path
-
-    cg = CleanGraphs(thr, conn_model, est_path, prune, norm)
-
-    if float(norm) >= 1:
-        cg.normalize_graph()
-
-    if float(prune) >= 1:
-        [_, tmp_graph_path] = cg.prune_graph()
-    else:
-        tmp_graph_path = None
-
-    if binary is True:
-        in_mat, G = cg.binarize_graph()
-    else:
-        in_mat, G = cg.in_mat, cg.G
-
-    in_mat_len, G_len = cg.create_length_matrix()
-
-    cg.print_summary()
-
-    dir_path = op.dirname(op.realpath(est_path))
 
     # Load netstats config and parse graph algorithms as objects
     with open(
@@ -1736,7 +2005,8 @@ def extractnetstats(
                 for i in metric_list_global
                 if i in nx_algs
             ] + [
-                getattr(pynets.stats.netstats, i)
+                getattr(metric_engine, i,
+                        getattr(pynets.stats.netstats, i))
                 for i in metric_list_global
                 if i in pynets_algs
             ]
@@ -1775,178 +2045,250 @@ def extractnetstats(
             print(e, "Failed to parse local_graph_measures.yaml")
             sys.exit(1)
 
-    # Note the use of bare excepts in preceding blocks. Typically, this is considered bad practice in python. Here,
-    # we are exploiting it intentionally to facilitate uninterrupted, automated graph analysis even when algorithms are
-    # undefined. In those instances, solutions are assigned NaN's.
+    return metric_list_global, metric_list_global_names, metric_list_nodal
+
+
+def compute_graph_metrics(G, G_len, in_mat, metric_list_global,
+                          metric_list_nodal, engine="networkx",
+                          scheduling=None, precomputed=None,
+                          warm_start=False):
+    """
+    Compute the global and nodal metrics of a graph, dispatching them
+    through a MetricScheduler.
+
+    Parameters
+    ----------
+    G : Obj
+        NetworkX graph.
+    G_len : Obj
+        NetworkX graph of edge lengths (i.e. inverted weights).
+    in_mat : NxN np.ndarray
+        Adjacency matrix of G.
+    metric_list_global : list
+        Global metric functions (or partials) that take G as input.
+    metric_list_nodal : list
+        Names of the nodal metrics.
+    engine : str
+        Backend used to compute the efficiency, transitivity, participation
+        and diversity metrics. Options are `networkx` and `matrix`.
+    scheduling : dict
+        The `metric_scheduling` settings of runconfig.yaml.
+    precomputed : dict
+        Metrics that have already been computed by other means, which are
+        not recomputed. Global metrics map to their value and nodal metrics
+        to a tuple of their names and values.
+    warm_start : bool
+        Whether Louvain community detection is warm-started from the
+        partition at the neighbouring resolution.
+
+    Returns
+    -------
+    metric_list_names : list
+        Names of each metric.
+    net_met_val_list_final : list
+        Values of each metric.
 
-    # Iteratively run functions from above metric list that generate single
-    # scalar output
-    net_met_val_list_final, metric_list_names = iterate_nx_global_measures(
-        G, metric_list_global
+    """
+    if scheduling is None:
+        scheduling = {}
+    if precomputed is None:
+        precomputed = {}
+
+    scheduler = MetricScheduler(
+        n_workers=scheduling.get("n_workers", [1])[0],
+        mem_gb=scheduling.get("mem_gb", [None])[0],
+        budget=scheduling.get("budget", [DEFAULT_TIMEOUT])[0],
+        n_nodes=G.number_of_nodes(),
+        n_edges=G.number_of_edges(),
     )
 
-    # Run miscellaneous functions that generate multiple outputs
-    # Calculate modularity using the Louvain algorithm
-    if "louvain_modularity" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            net_met_val_list_final, metric_list_names, ci = get_community(
-                G, net_met_val_list_final, metric_list_names
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Louvain modularity calculation is undefined for G")
-            # np.save("%s%s%s" % ('/tmp/community_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            pass
+    # Queue the functions that generate multiple (nodal) outputs, which run
+    # concurrently with the scalar global metrics. Metrics that are undefined
+    # for G, or that exceed their budget, are omitted from the results so
+    # that graph analysis remains uninterrupted.
+    nodal_funcs = {
+        "louvain_modularity": (get_community, (G, [], [], warm_start)),
+        "local_efficiency": (get_local_efficiency, (G, [], [], engine)),
+        "local_clustering": (get_clustering, (G, [], [])),
+        "degree_centrality": (get_degree_centrality, (G, [], [])),
+        "betweenness_centrality": (get_betweenness_centrality,
+                                   (G_len, [], [])),
+        "eigenvector_centrality": (get_eigen_centrality, (G, [], [])),
+        "communicability_centrality": (get_comm_centrality, (G, [], [])),
+        "rich_club_coefficient": (get_rich_club_coeff, (G, [], [])),
+    }
+    # Participation and diversity coefficients by louvain community
+    community_funcs = {
+        "participation_coefficient": get_participation,
+        "diversity_coefficient": get_diversity,
+    }
+    for name, (func, args) in nodal_funcs.items():
+        if name in metric_list_nodal and name not in precomputed:
+            scheduler.submit(name, func, args)
+    for name, func in community_funcs.items():
+        if name in metric_list_nodal:
+            scheduler.submit(name, get_community_metric,
+                             (func, in_mat, engine),
+                             requires="louvain_modularity")
+
+    metric_list_global_names = [
+        str(i).split("<function ")[1].split(" at")[0]
+        for i in metric_list_global
+    ]
+    vals, names = iterate_nx_global_measures(
+        G, [i for i, name in zip(metric_list_global, metric_list_global_names)
+            if name not in precomputed], scheduler
+    )
+    computed = dict(zip(names, vals))
+    metric_list_names = metric_list_global_names
+    net_met_val_list_final = [
+        precomputed[name] if name in precomputed else computed[name]
+        for name in metric_list_global_names
+    ]
+
+    for name in ["louvain_modularity", "participation_coefficient",
+                 "diversity_coefficient", "local_efficiency",
+                 "local_clustering", "degree_centrality",
+                 "betweenness_centrality", "eigenvector_centrality",
+                 "communicability_centrality", "rich_club_coefficient"]:
+        if name in precomputed and name in metric_list_nodal:
+            names, vals = precomputed[name]
+            metric_list_names = metric_list_names + names
+            net_met_val_list_final = net_met_val_list_final + vals
+            continue
+        if name not in scheduler.results:
+            continue
+        if name == "louvain_modularity":
+            vals, names, _ = scheduler.results[name]
+        else:
+            names, vals = scheduler.results[name]
+        metric_list_names = metric_list_names + names
+        net_met_val_list_final = net_met_val_list_final + vals
+        print(f"{name}: {np.round(scheduler.elapsed[name], 3)}{'s'}")
 
-    # Participation Coefficient by louvain community
-    if "participation_coefficient" in metric_list_nodal:
-        try:
-            if ci is None:
-                raise KeyError(
-                    "Participation coefficient cannot be calculated for G in"
-                    " the absence of a community affiliation vector")
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_participation(
-                in_mat, ci, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Participation coefficient cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/partic_coeff_failure', random.randint(1, 400), '.npy'), in_mat)
-            pass
+    return metric_list_names, net_met_val_list_final
 
-    # Diversity Coefficient by louvain community
-    if "diversity_coefficient" in metric_list_nodal:
-        try:
-            if ci is None:
-                raise KeyError(
-                    "Diversity coefficient cannot be calculated for G in the"
-                    " absence of a community affiliation vector")
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_diversity(
-                in_mat, ci, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Diversity coefficient cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/div_coeff_failure', random.randint(1, 400), '.npy'), in_mat)
-            pass
 
-    # # Link communities
-    # if "link_communities" in metric_list_nodal:
-    #     try:
-    #         if ci is None:
-    #             raise KeyError(
-    #                 "Link communities cannot be calculated for G in the"
-    #                 " absence of a community affiliation vector")
-    #         start_time = time.time()
-    #         metric_list_names, net_met_val_list_final = get_link_communities(
-    #             in_mat, ci, metric_list_names, net_met_val_list_final
-    #         )
-    #         print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-    #     except BaseException:
-    #         print("Link communities cannot be calculated for G")
-    #         # np.save("%s%s%s" % ('/tmp/link_comms_failure', random.randint(1, 400), '.npy'), in_mat)
-    #         pass
-
-    # Local Efficiency
-    if "local_efficiency" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_local_efficiency(
-                G, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Local efficiency cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/local_eff_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            pass
+def extractnetstats(
+        ID,
+        network,
+        thr,
+        conn_model,
+        est_path,
+        roi,
+        prune,
+        norm,
+        binary,
+        engine=None):
+    """
+    Function interface for performing fully-automated graph analysis.
 
-    # Local Clustering
-    if "local_clustering" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_clustering(
-                G, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Local clustering cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/local_clust_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            pass
+    Parameters
+    ----------
+    ID : str
+        A subject id or other unique identifier.
+    network : str
+        Resting-state network based on Yeo-7 and Yeo-17 naming
+        (e.g. 'Default') used to filter nodes in the study of brain subgraphs.
+    thr : float
+        The value, between 0 and 1, used to threshold the graph using any
+        variety of methods triggered through other options.
+    conn_model : str
+       Connectivity estimation model (e.g. corr for correlation, cov for
+       covariance, sps for precision covariance,
+       partcorr for partial correlation). sps type is used by default.
+    est_path : str
+        File path to the thresholded graph, conn_matrix_thr, saved as a numpy
+        array in .npy format.
+    roi : str
+        File path to binarized/boolean region-of-interest Nifti1Image file.
+    prune : int
+        Indicates whether to prune final graph of disconnected nodes/isolates.
+    norm : int
+        Indicates method of normalizing resulting graph.
+    binary : bool
+        Indicates whether to binarize resulting graph edges to form an
+        unweighted graph.
+    engine : str
+        Backend used to compute the efficiency, transitivity, participation
+        and diversity metrics. Options are `networkx` and `matrix` (i.e.
+        vectorized computation directly on the adjacency matrix). If None,
+        the `metric_engine` setting of runconfig.yaml is used.
 
-    # Degree centrality
-    if "degree_centrality" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_degree_centrality(
-                G, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Degree centrality cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/degree_cent_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            pass
+    Returns
+    -------
+    out_path : str
+        Path to .csv file where graph analysis results are saved.
 
-    # Betweenness Centrality
-    if "betweenness_centrality" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_betweenness_centrality(
-                G_len, metric_list_names, net_met_val_list_final)
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Betweenness centrality cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/betw_cent_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G_len)))
-            pass
+    References
+    ----------
+    .. [1] Fornito, A., Zalesky, A., & Bullmore, E. T. (2016).
+      Fundamentals of Brain Network Analysis. In Fundamentals of Brain Network
+      Analysis. https://doi.org/10.1016/C2012-0-06036-X
+    .. [2] Aric A. Hagberg, Daniel A. Schult and Pieter J. Swart,
+      “Exploring network structure, dynamics, and function using NetworkX”,
+      in Proceedings of the 7th Python in Science Conference (SciPy2008),
+      Gäel Varoquaux, Travis Vaught, and Jarrod Millman (Eds),
+      (Pasadena, CA USA), pp. 11–15, Aug 2008
 
-    # Eigenvector Centrality
-    if "eigenvector_centrality" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_eigen_centrality(
-                G, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Eigenvector centrality cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/eig_cent_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            pass
+    """
+    import gc
+    import os.path as op
+    import yaml
 
-    # Communicability Centrality
-    if "communicability_centrality" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_comm_centrality(
-                G, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Communicability centrality cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/comm_cent_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            pass
+    # import random
+    import pkg_resources
+    import pynets.stats.netstats
+    import pynets.stats.matstats
+    from pathlib import Path
+    from pynets.core import utils
 
-    # Rich club coefficient
-    if "rich_club_coefficient" in metric_list_nodal:
-        try:
-            start_time = time.time()
-            metric_list_names, net_met_val_list_final = get_rich_club_coeff(
-                G, metric_list_names, net_met_val_list_final
-            )
-            print(f"{np.round(time.time() - start_time, 3)}{'s'}")
-        except BaseException:
-            print("Rich club coefficient cannot be calculated for G")
-            # np.save("%s%s%s" % ('/tmp/rich_club_failure', random.randint(1, 400), '.npy'),
-            #         np.array(nx.to_numpy_matrix(G)))
-            pass
+    with open(
+        pkg_resources.resource_filename("pynets", "runconfig.yaml"), "r"
+    ) as stream:
+        hardcoded_params = yaml.load(stream)
+        if engine is None:
+            engine = hardcoded_params.get("metric_engine", ["networkx"])[0]
+        scheduling = hardcoded_params.get("metric_scheduling", {})
+        warm_start = hardcoded_params.get("community_warm_start",
+                                          [False])[0]
+    stream.close()
+
+    if engine not in ("networkx", "matrix"):
+        raise ValueError(f"Metric engine {engine} not recognized!")
+
+    if engine == "matrix":
+        metric_engine = pynets.stats.matstats
+    else:
+        metric_engine = pynets.stats.netstats
+
+    cg = CleanGraphs(thr, conn_model, est_path, prune, norm)
+
+    if float(norm) >= 1:
+        cg.normalize_graph()
+
+    if float(prune) >= 1:
+        [_, tmp_graph_path] = cg.prune_graph()
+    else:
+        tmp_graph_path = None
+
+    if binary is True:
+        in_mat, G = cg.binarize_graph()
+    else:
+        in_mat, G = cg.in_mat, cg.G
+
+    in_mat_len, G_len = cg.create_length_matrix()
+
+    cg.print_summary()
+
+    dir_path = op.dirname(op.realpath(est_path))
+
+    metric_list_global, _, metric_list_nodal = load_metric_lists(
+        metric_engine, binary)
+
+    metric_list_names, net_met_val_list_final = compute_graph_metrics(
+        G, G_len, in_mat, metric_list_global, metric_list_nodal, engine,
+        scheduling, warm_start=warm_start)
 
     out_path_neat = save_netmets(
         dir_path, est_path, metric_list_names, net_met_val_list_final
@@ -1954,8 +2296,7 @@ def extractnetstats(
 
     # Cleanup
     if tmp_graph_path is not None:
-        if os.path.isfile(tmp_graph_path):
-            os.remove(tmp_graph_path)
+        utils.remove_mat(tmp_graph_path)
 
     del net_met_val_list_final, metric_list_names, metric_list_global
     gc.collect()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:02:19 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import os
+import warnings
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, shortest_path
+from pynets.stats.matstats import MAX_BATCH_CELLS
+
+warnings.filterwarnings("ignore")
+
+# Bump whenever sampling or the reference metrics change, so that stale
+# ensembles are never served from the cache.
+ENSEMBLE_VERSION = 1
+
+
+def dcsbm_probabilities(A, y=None):
+    """
+    Estimate the edge probability matrix of a degree-corrected stochastic
+    block model (DCSBM) from an adjacency matrix.
+
+    Parameters
+    ----------
+    A : NxN np.ndarray
+        Binary/weighted undirected connectivity matrix.
+    y : Nx1 np.ndarray
+        Block (community) affiliation vector. If None, all nodes are
+        assigned to a single block, which reduces the model to a
+        degree-only (Chung-Lu) random graph that preserves no community
+        structure.
+
+    Returns
+    -------
+    P : NxN np.ndarray
+        Edge probabilities, clipped to [0, 1], with a zero diagonal.
+
+    References
+    ----------
+    .. [1] Karrer, B., & Newman, M. E. J. (2011). Stochastic blockmodels and
+      community structure in networks. Physical Review E, 83(1), 016107.
+
+    """
+    A = np.asarray(A, dtype="float64")
+    n = A.shape[0]
+    if y is None:
+        y = np.zeros(n, dtype="int64")
+    _, y = np.unique(np.asarray(y).ravel(), return_inverse=True)
+    onehot = np.zeros((n, y.max() + 1))
+    onehot[np.arange(n), y] = 1
+
+    degrees = A.sum(axis=1)
+    block_degrees = onehot.T @ degrees
+    with np.errstate(divide="ignore", invalid="ignore"):
+        theta = np.nan_to_num(degrees / block_degrees[y])
+    omega = onehot.T @ A @ onehot
+
+    P = np.outer(theta, theta) * omega[y][:, y]
+    np.fill_diagonal(P, 0)
+    return np.clip(P, 0, 1)
+
+
+def sample_ensemble(P, nrand=10, seed=42):
+    """
+    Draw an ensemble of undirected, loopless binary graphs from an edge
+    probability matrix in a single vectorized pass.
+
+    Parameters
+    ----------
+    P : NxN np.ndarray
+        Edge probabilities.
+    nrand : int
+        Number of random graphs.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    samples : nrand x N x N np.ndarray
+        Boolean adjacency matrices.
+
+    """
+    n = P.shape[0]
+    rng = np.random.RandomState(seed)
+    iu = np.triu_indices(n, k=1)
+    upper = rng.random_sample((nrand, len(iu[0]))) < P[iu]
+
+    samples = np.zeros((nrand, n, n), dtype=bool)
+    samples[:, iu[0], iu[1]] = upper
+    return samples | samples.transpose(0, 2, 1)
+
+
+def _largest_components(samples):
+    """
+    Return an nrand x N mask of the nodes in the largest connected component
+    of each sample, labelling all samples in one block-diagonal pass.
+    """
+    nrand, n, _ = samples.shape
+    blocks = sparse.block_diag(
+        [sparse.csr_matrix(i) for i in samples], format="csr")
+    _, labels = connected_components(blocks, directed=False)
+    labels = labels.reshape(nrand, n)
+
+    # Component labels are unique across samples, so the largest component
+    # of each sample is the label of its node with the largest component
+    node_sizes = np.bincount(labels.ravel())[labels]
+    largest = labels[np.arange(nrand), np.argmax(node_sizes, axis=1)]
+    return labels == largest[:, None]
+
+
+def ensemble_metrics(samples):
+    """
+    Compute the reference clustering, transitivity, and characteristic path
+    length of the largest connected component of every graph in an
+    ensemble.
+
+    Parameters
+    ----------
+    samples : nrand x N x N np.ndarray
+        Boolean adjacency matrices.
+
+    Returns
+    -------
+    metrics : dict
+        Dictionary of nrand-length arrays with keys `clustering` (average
+        clustering coefficient), `transitivity`, and `path_length` (average
+        shortest path length).
+
+    """
+    nrand, n, _ = samples.shape
+    lcc = _largest_components(samples)
+    A = samples & lcc[:, :, None] & lcc[:, None, :]
+
+    # Triangles and triads of every node of every sample at once
+    Af = A.astype("float64")
+    triangles = np.einsum("kij,kij->ki", np.matmul(Af, Af), Af)
+    degrees = Af.sum(axis=2)
+    triads = degrees * (degrees - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        local = np.where(triads > 0, triangles / triads, 0)
+    n_lcc = lcc.sum(axis=1)
+    clustering = local.sum(axis=1) / n_lcc
+    with np.errstate(divide="ignore", invalid="ignore"):
+        transitivity = np.where(triangles.sum(axis=1) > 0,
+                                triangles.sum(axis=1) / triads.sum(axis=1), 0)
+
+    # Shortest paths of several samples per block-diagonal solve
+    path_length = np.zeros(nrand)
+    per_batch = max(int(np.sqrt(MAX_BATCH_CELLS) // max(n, 1)), 1)
+    for start in range(0, nrand, per_batch):
+        batch = range(start, min(start + per_batch, nrand))
+        blocks = sparse.block_diag(
+            [sparse.csr_matrix(A[i][lcc[i]][:, lcc[i]]) for i in batch],
+            format="csr")
+        D = shortest_path(blocks, method="D", directed=False, unweighted=True)
+        D[np.isinf(D)] = 0
+        owner = np.repeat(np.arange(len(batch)), n_lcc[list(batch)])
+        sums = np.bincount(owner, weights=D.sum(axis=1),
+                           minlength=len(batch))
+        k = n_lcc[list(batch)].astype("float64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            path_length[list(batch)] = sums / (k * (k - 1))
+
+    return {
+        "clustering": clustering,
+        "transitivity": transitivity,
+        "path_length": path_length,
+    }
+
+
+def reference_metrics(A, nrand=10, y=None, seed=42, cache_dir=None):
+    """
+    Return the DCSBM null-model reference metrics of a graph, generating the
+    ensemble only once per degree sequence and block structure. The metrics
+    of each ensemble are stored in a content-addressed on-disk cache.
+
+    Parameters
+    ----------
+    A : NxN np.ndarray
+        Binary/weighted undirected connectivity matrix.
+    nrand : int
+        Number of random graphs in the ensemble.
+    y : Nx1 np.ndarray
+        Block (community) affiliation vector. If None, a single block is
+        used, i.e. a degree-only (Chung-Lu) reference.
+    seed : int
+        Random seed.
+    cache_dir : str
+        Directory of the cache. Default is the `nullmodels` subdirectory of
+        the PyNets cache (see `pynets.core.utils.get_cache_dir`).
+
+    Returns
+    -------
+    metrics : dict
+        Dictionary of nrand-length arrays with keys `clustering`,
+        `transitivity`, and `path_length`.
+
+    """
+    from pynets.core.utils import content_hash, get_cache_dir
+
+    A = np.asarray(A, dtype="float64")
+    n = A.shape[0]
+    if y is None:
+        y = np.zeros(n, dtype="int64")
+    _, y = np.unique(np.asarray(y).ravel(), return_inverse=True)
+
+    # The DCSBM is fully determined by the degree sequence and the
+    # block-to-block edge totals
+    onehot = np.zeros((n, y.max() + 1))
+    onehot[np.arange(n), y] = 1
+    key = content_hash(A.sum(axis=1), y, onehot.T @ A @ onehot, nrand=nrand,
+                       seed=seed, version=ENSEMBLE_VERSION)
+
+    if cache_dir is None:
+        cache_dir = get_cache_dir("nullmodels")
+    cache_file = f"{cache_dir}/{key}.npz"
+
+    if os.path.isfile(cache_file):
+        try:
+            with np.load(cache_file) as cached:
+                return {i: cached[i] for i in
+                        ["clustering", "transitivity", "path_length"]}
+        except (OSError, ValueError, KeyError):
+            print(f"Ignoring unreadable null-model cache: {cache_file}")
+
+    samples = sample_ensemble(dcsbm_probabilities(A, y), nrand, seed)
+    metrics = ensemble_metrics(samples)
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_file, **metrics)
+    os.replace(tmp_file, cache_file)
+
+    return metrics
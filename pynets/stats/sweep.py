@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:21:37 2020
+Copyright (C) 2016
+@author: Derek Pisner
+"""
+import warnings
+import numpy as np
+import networkx as nx
+from scipy.sparse.csgraph import connected_components
+
+warnings.filterwarnings("ignore")
+
+
+class ThresholdSweep(object):
+    """
+    Incrementally maintained topology of an undirected graph whose edges are
+    added in decreasing order of strength, as happens across a sweep of
+    proportional thresholds. Degree, strength and (weighted) triangle counts
+    are updated edge by edge, and connected components once per batch of
+    edges, so that the graph at each threshold never needs to be analyzed
+    from scratch.
+
+    Parameters
+    ----------
+    n : int
+        Number of nodes.
+
+    References
+    ----------
+    .. [1] Drakesmith, M., Caeyenberghs, K., Dutt, A., Lewis, G., David,
+      A. S., & Jones, D. K. (2015). Overcoming the effects of false positives
+      and threshold bias in graph theoretical analyses of neuroimaging data.
+      NeuroImage. https://doi.org/10.1016/j.neuroimage.2015.05.011
+
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        """
+        Remove all edges.
+        """
+        n = self.n
+        self.adj = np.zeros((n, n), dtype=bool)
+        self._cbrt = np.zeros((n, n))
+        self.degree = np.zeros(n, dtype="int64")
+        self.strength = np.zeros(n)
+        self.triangles = np.zeros(n, dtype="int64")
+        self.weighted_triangles = np.zeros(n)
+        self.max_weight = -np.inf
+        self.n_edges = 0
+        self.n_components = n
+        self._labels = np.arange(n)
+        self._rows = []
+        self._cols = []
+        self._weights = []
+
+    def add_edges(self, rows, cols, weights):
+        """
+        Add edges to the graph. Self-loops and edges that are already present
+        are ignored.
+
+        Parameters
+        ----------
+        rows : array
+            First node of each edge.
+        cols : array
+            Second node of each edge.
+        weights : array
+            Weight of each edge.
+
+        """
+        for u, v, w in zip(rows, cols, weights):
+            if u == v or self.adj[u, v]:
+                continue
+            c = np.cbrt(w)
+
+            # Every common neighbor closes a new triangle
+            common = np.flatnonzero(self.adj[u] & self.adj[v])
+            if len(common) > 0:
+                g = c * self._cbrt[u, common] * self._cbrt[v, common]
+                self.triangles[common] += 1
+                self.triangles[u] += len(common)
+                self.triangles[v] += len(common)
+                self.weighted_triangles[common] += g
+                self.weighted_triangles[u] += g.sum()
+                self.weighted_triangles[v] += g.sum()
+
+            self.adj[u, v] = self.adj[v, u] = True
+            self._cbrt[u, v] = self._cbrt[v, u] = c
+            self.degree[u] += 1
+            self.degree[v] += 1
+            self.strength[u] += w
+            self.strength[v] += w
+            self.max_weight = max(self.max_weight, w)
+            self.n_edges += 1
+            self._rows.append(u)
+            self._cols.append(v)
+            self._weights.append(w)
+
+        self.n_components, self._labels = connected_components(
+            self.adj, directed=False)
+
+    def edges(self):
+        """
+        Return the rows, columns and weights of all edges, in the order in
+        which they were added.
+        """
+        return (np.array(self._rows, dtype="int64"),
+                np.array(self._cols, dtype="int64"),
+                np.array(self._weights, dtype="float64"))
+
+    def to_numpy_array(self):
+        """
+        Return the weighted adjacency matrix of the graph.
+        """
+        rows, cols, weights = self.edges()
+        W = np.zeros((self.n, self.n))
+        W[rows, cols] = weights
+        W[cols, rows] = weights
+        return W
+
+    def component_sizes(self):
+        """
+        Return the number of nodes and edges of each connected component.
+        """
+        labels = self._labels
+        return (np.bincount(labels, minlength=self.n_components),
+                np.bincount(labels[np.array(self._rows, dtype="int64")],
+                            minlength=self.n_components))
+
+    def clustering(self):
+        """
+        Weighted clustering coefficient of each node, as defined by
+        Onnela et al. (2005) and implemented in `networkx.clustering`.
+        """
+        triads = self.degree * (self.degree - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(
+                self.weighted_triangles == 0, 0,
+                2 * self.weighted_triangles / self.max_weight / triads)
+
+    def transitivity(self):
+        """
+        Weighted transitivity, as implemented in
+        `pynets.stats.netstats.weighted_transitivity`.
+        """
+        triangles = np.sum(2 * self.weighted_triangles / self.max_weight)
+        if triangles == 0:
+            return 0
+        return triangles / np.sum(self.degree * (self.degree - 1))
+
+    def assortativity(self, weighted=True):
+        """
+        Degree assortativity coefficient, computed as the Pearson correlation
+        of the (weighted) degrees at either end of every edge. Weights are
+        rescaled to integer percentages, as in
+        `pynets.stats.netstats.raw_mets`.
+        """
+        rows, cols, weights = self.edges()
+        if weighted is True:
+            weights = np.trunc(np.round(100 * weights, 1))
+        else:
+            weights = np.ones(len(weights))
+        degree = np.bincount(rows, weights=weights, minlength=self.n) + \
+            np.bincount(cols, weights=weights, minlength=self.n)
+        x = np.concatenate([degree[rows], degree[cols]])
+        y = np.concatenate([degree[cols], degree[rows]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return float(np.mean((x - x.mean()) * (y - y.mean())) /
+                         (x.std() * y.std()))
+
+    def efficiency_bounds(self):
+        """
+        Lower and upper bounds of the binary (topological) global efficiency
+        of the graph, derived from its connected components alone. Adjacent
+        nodes are at distance 1, and the remaining pairs of nodes of a
+        component of s nodes lie between 2 and s - 1 steps apart.
+        """
+        n = self.n
+        pairs = n * (n - 1) / 2
+        if pairs == 0:
+            return 0.0, 0.0
+        sizes, comp_edges = self.component_sizes()
+        nonadjacent = sizes * (sizes - 1) / 2 - comp_edges
+        lower = self.n_edges + np.sum(
+            nonadjacent[sizes > 2] / (sizes[sizes > 2] - 1))
+        upper = self.n_edges + np.sum(nonadjacent) / 2
+        return lower / pairs, upper / pairs
+
+    def summary(self):
+        """
+        Summary of the incrementally tracked topology of the graph.
+        """
+        n = self.n
+        sizes, _ = self.component_sizes()
+        lower, upper = self.efficiency_bounds()
+        return {
+            "n_edges": self.n_edges,
+            "density": 2 * self.n_edges / (n * (n - 1)) if n > 1 else 0,
+            "n_components": self.n_components,
+            "largest_component": int(sizes.max()) if n > 0 else 0,
+            "global_efficiency_lower": lower,
+            "global_efficiency_upper": upper,
+        }
+
+
+def _nodal_outputs(values, name, average_name):
+    """
+    Format nodal values like the `get_*` nodal metric functions of
+    `pynets.stats.netstats`.
+    """
+    names = [f"{i}_{name}" for i in range(len(values))] + [average_name]
+    vals = list(values) + [
+        np.nanmean(np.append(values[1:], 0).astype("float32"),
+                   dtype=np.float32)]
+    return names, vals
+
+
+def sweep_weights(weights, norm, conn_model):
+    """
+    Apply the absolute value, normalization and clean-up of
+    `pynets.stats.netstats.CleanGraphs` to a vector of edge weights. Max
+    normalization is deferred, since it depends on the edges retained at
+    each threshold.
+
+    Parameters
+    ----------
+    weights : np.ndarray
+        Edge weights.
+    norm : int
+        Indicates method of normalizing resulting graph.
+    conn_model : str
+       Connectivity estimation model (e.g. corr for correlation, cov for
+       covariance, sps for precision covariance, partcorr for partial
+       correlation).
+
+    Returns
+    -------
+    weights : np.ndarray
+        Transformed edge weights.
+
+    """
+    if int(norm) in [3, 4, 5]:
+        raise ValueError(
+            "Pass-to-ranks normalization depends on the complete edge set of "
+            "each graph and is not supported in a threshold sweep.")
+
+    weights = np.around(np.nan_to_num(np.abs(weights), nan=0, posinf=0),
+                        decimals=5)
+    if int(norm) >= 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if conn_model in ["corr", "partcorr"]:
+                weights = np.arctanh(weights)
+            if int(norm) == 2:
+                weights = np.log10(weights)
+        weights[~np.isfinite(weights)] = 0
+        if int(norm) not in [1, 6]:
+            weights = np.around(weights, decimals=5)
+    return weights
+
+
+def sweep_netstats(
+        ID,
+        network,
+        thrs,
+        conn_model,
+        est_path,
+        roi,
+        prune,
+        norm,
+        binary,
+        engine=None):
+    """
+    Graph analysis of a sweep of proportional thresholds of a single raw
+    graph. Edges are ranked once and added incrementally from the sparsest
+    to the densest threshold. Degree, clustering, transitivity, and
+    assortativity are updated from the incrementally tracked topology, and
+    only the remaining metrics are computed per threshold. The results match
+    those of `pynets.core.thresholding.thresh_raw_graph`,
+    `pynets.core.utils.save_mat_thresholded` and
+    `pynets.stats.netstats.extractnetstats` applied to each threshold in
+    turn, and are saved under the same names.
+
+    Parameters
+    ----------
+    ID : str
+        A subject id or other unique identifier.
+    network : str
+        Resting-state network based on Yeo-7 and Yeo-17 naming
+        (e.g. 'Default') used to filter nodes in the study of brain subgraphs.
+    thrs : list
+        Proportional thresholds, between 0 and 1.
+    conn_model : str
+       Connectivity estimation model (e.g. corr for correlation, cov for
+       covariance, sps for precision covariance,
+       partcorr for partial correlation). sps type is used by default.
+    est_path : str
+        File path to the raw (unthresholded) graph, saved as a numpy array
+        in .npy format.
+    roi : str
+        File path to binarized/boolean region-of-interest Nifti1Image file.
+    prune : int
+        Indicates whether to prune final graph of disconnected nodes/isolates.
+        It leaves the metrics of `extractnetstats` unchanged, and so has no
+        effect here either.
+    norm : int
+        Indicates method of normalizing resulting graph.
+    binary : bool
+        Indicates whether to binarize resulting graph edges to form an
+        unweighted graph.
+    engine : str
+        Backend used to compute the efficiency, transitivity, participation
+        and diversity metrics. Options are `networkx` and `matrix`. If None,
+        the `metric_engine` setting of runconfig.yaml is used.
+
+    Returns
+    -------
+    out_paths : list
+        Paths to the .csv files where graph analysis results are saved, one
+        per threshold, ready to be summarized by `collect_pandas_df_make`.
+    summary : pd.DataFrame
+        Incrementally tracked topology (number of edges, density, connected
+        components, and global efficiency bounds) at each threshold.
+
+    """
+    import os.path as op
+    import pandas as pd
+    import pkg_resources
+    import yaml
+    import pynets.stats.netstats
+    import pynets.stats.matstats
+    from nipype.utils.filemanip import fname_presuffix
+    from pynets.core import utils, thresholding
+    from pynets.stats.netstats import (load_metric_lists,
+                                       compute_graph_metrics, save_netmets)
+
+    with open(
+        pkg_resources.resource_filename("pynets", "runconfig.yaml"), "r"
+    ) as stream:
+        hardcoded_params = yaml.load(stream)
+        if engine is None:
+            engine = hardcoded_params.get("metric_engine", ["networkx"])[0]
+        scheduling = hardcoded_params.get("metric_scheduling", {})
+        warm_start = hardcoded_params.get("community_warm_start",
+                                          [False])[0]
+    stream.close()
+
+    if engine not in ("networkx", "matrix"):
+        raise ValueError(f"Metric engine {engine} not recognized!")
+
+    if engine == "matrix":
+        metric_engine = pynets.stats.matstats
+    else:
+        metric_engine = pynets.stats.netstats
+
+    metric_list_global, metric_list_global_names, metric_list_nodal = \
+        load_metric_lists(metric_engine, binary)
+
+    # Rank the edges of the raw graph once, exactly as threshold_proportional
+    # does
+    conn_matrix = np.array(utils.load_mat(est_path))
+    np.fill_diagonal(conn_matrix, 0)
+    n = len(conn_matrix)
+    rows, cols, weights, ud = thresholding.rank_edges(conn_matrix)
+    if ud != 2:
+        raise ValueError("Threshold sweeps require a symmetric graph.")
+    weights = sweep_weights(weights, norm, conn_model)
+
+    # Max-normalization is preserved across thresholds for as long as the
+    # running maximum weight does not change
+    if int(norm) in [1, 6]:
+        scales = np.maximum.accumulate(np.abs(weights))
+    else:
+        scales = np.ones(len(weights))
+
+    dir_path = op.dirname(op.realpath(est_path))
+    if "rawgraph" in est_path:
+        thr_path = est_path.replace("rawgraph", "graph")
+    else:
+        thr_path = est_path
+
+    sweep = ThresholdSweep(n)
+    scale = None
+    added = 0
+    out_paths = {}
+    summary = []
+    for thr in sorted(thrs, key=float):
+        if float(thr) > 1 or float(thr) < 0:
+            raise ValueError("Threshold must be in range [0,1]")
+        en = min(int(round((n * n - n) * float(thr) / ud)), len(weights))
+
+        if en > 0 and scales[en - 1] != scale:
+            # The weights of the retained edges changed, so start over
+            scale = scales[en - 1]
+            sweep.reset()
+            added = 0
+
+        new = weights[added:en]
+        if int(norm) in [1, 6]:
+            new = np.around(new / scale, decimals=5)
+        keep = new != 0
+        sweep.add_edges(rows[added:en][keep], cols[added:en][keep],
+                        new[keep])
+        added = max(added, en)
+
+        in_mat = sweep.to_numpy_array()
+        if binary is True:
+            in_mat_bin = thresholding.binarize(in_mat)
+            G = nx.from_numpy_array(in_mat_bin)
+        else:
+            in_mat_bin = in_mat
+            G = nx.from_numpy_array(in_mat)
+        G_len = nx.from_numpy_array(
+            thresholding.weight_conversion(in_mat, "lengths"))
+
+        # Metrics that are read off the incrementally tracked topology
+        if binary is True:
+            max_weight = 1.0
+            clustering = np.where(
+                sweep.triangles == 0, 0,
+                2 * sweep.triangles / np.maximum(
+                    sweep.degree * (sweep.degree - 1), 1))
+            transitivity = 0 if sweep.triangles.sum() == 0 else \
+                2 * sweep.triangles.sum() / np.sum(
+                    sweep.degree * (sweep.degree - 1))
+        else:
+            max_weight = sweep.max_weight
+            clustering = sweep.clustering()
+            transitivity = sweep.transitivity()
+        precomputed = {
+            "average_clustering": float(np.mean(clustering)),
+            "weighted_transitivity": float(transitivity),
+            "degree_assortativity_coefficient": sweep.assortativity(
+                weighted=binary is False),
+            "degree_centrality": _nodal_outputs(
+                sweep.degree / (n - 1), "degree_centrality",
+                "average_degree_centrality"),
+            "local_clustering": _nodal_outputs(
+                clustering, "local_clustering",
+                "average_local_clustering_nodewise"),
+        }
+        if sweep.n_edges == 0 or not np.isfinite(max_weight):
+            precomputed = {}
+
+        metric_list_names, net_met_val_list_final = compute_graph_metrics(
+            G, G_len, in_mat_bin, metric_list_global, metric_list_nodal,
+            engine, scheduling, precomputed, warm_start)
+
+        est_path_thr = fname_presuffix(thr_path,
+                                       suffix=f"_thrtype-PROP_thr-{thr}")
+        out_paths[thr] = save_netmets(dir_path, est_path_thr,
+                                      metric_list_names,
+                                      net_met_val_list_final)
+        summary.append(dict(thr=float(thr), **sweep.summary()))
+
+    return [out_paths[thr] for thr in thrs], pd.DataFrame(summary)
@@ -31,7 +31,8 @@ setup(
             'pynets=pynets.cli.pynets_run:main',
             'pynets_cloud=pynets.cli.pynets_cloud:main',
             'pynets_bids=pynets.cli.pynets_bids:main',
-            'pynets_collect=pynets.cli.pynets_collect:main'
+            'pynets_collect=pynets.cli.pynets_collect:main',
+            'pynets_benchmark=pynets.cli.pynets_benchmark:main'
         ]
     },
     include_package_data=True,
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Created on Sat Oct 24 11:02:37 2020
+
+@authors: Derek Pisner
+
+"""
+import os
+import boto3
+import pytest
+from pynets.core import cloud_utils
+
+moto = pytest.importorskip("moto")
+mock_s3 = getattr(moto, "mock_aws", None) or moto.mock_s3
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    """Fixture for an in-memory S3 stand-in with a single bucket."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("PYNETS_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setattr(cloud_utils, "RETRY_BACKOFF", 0)
+
+    from botocore.config import Config
+
+    # Older stand-ins do not strip the checksum trailers that recent clients
+    # append to uploaded parts, which would alter multipart ETags
+    try:
+        config = Config(request_checksum_calculation="when_required")
+    except TypeError:
+        config = Config()
+
+    with mock_s3():
+        client = boto3.client("s3", config=config)
+        client.create_bucket(Bucket="bids")
+
+        # Count the requests made by the client used by the module
+        calls = []
+        client.meta.events.register(
+            "before-call.s3", lambda model, **kwargs: calls.append(
+                model.name))
+        monkeypatch.setattr(cloud_utils, "s3_client",
+                            lambda service="s3", **kwargs: client)
+        yield client, calls
+
+
+def make_bids_dir(base_dir, subj="01", ses="1"):
+    """Write a small BIDS-like subject directory."""
+    files = {}
+    for mod, name in [("anat", "T1w.nii.gz"), ("dwi", "dwi.nii.gz"),
+                      ("dwi", "dwi.bval"), ("func", "bold.nii.gz")]:
+        path = f"{base_dir}/sub-{subj}/ses-{ses}/{mod}/" \
+               f"sub-{subj}_ses-{ses}_{name}"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(os.urandom(1024))
+        files[path] = mod
+    return files
+
+
+def test_push_and_get_data(s3, tmp_path):
+    """
+    Test that pushing and fetching a subject skips unchanged files
+    """
+    client, calls = s3
+    out_dir = str(tmp_path / "output")
+    files = make_bids_dir(out_dir)
+
+    status = cloud_utils.s3_push_data("bids", "ds/derivatives", out_dir,
+                                      ["dwi"], subject="01", session="1")
+    assert list(status.values()).count("transferred") == len(files)
+    keys = set(cloud_utils.get_matching_s3_objects("bids", "ds/"))
+    assert keys == {f"ds/derivatives/{os.path.relpath(i, out_dir)}"
+                    for i in files}
+
+    # A second push only lists the remote directory
+    del calls[:]
+    status = cloud_utils.s3_push_data("bids", "ds/derivatives", out_dir,
+                                      ["dwi"], subject="01", session="1")
+    assert set(status.values()) == {"skipped"}
+    assert "PutObject" not in calls and "HeadObject" not in calls
+
+    # A modified file is pushed again
+    changed = [i for i in files if i.endswith("bval")][0]
+    with open(changed, "w") as f:
+        f.write("0 1000 1000")
+    status = cloud_utils.s3_push_data("bids", "ds/derivatives", out_dir,
+                                      ["dwi"], subject="01", session="1")
+    assert list(status.values()).count("transferred") == 1
+
+    # Fetch the anatomical and diffusion data of the subject
+    bids_dir = str(tmp_path / "input")
+    cloud_utils.s3_get_data("bids", "ds/derivatives", bids_dir, ["dwi"],
+                            info="sub-01/ses-1")
+    for path, mod in files.items():
+        local = f"{bids_dir}/{os.path.relpath(path, out_dir)}"
+        if mod == "func":
+            assert not os.path.isfile(local)
+        else:
+            with open(path, "rb") as f, open(local, "rb") as g:
+                assert f.read() == g.read()
+
+    del calls[:]
+    cloud_utils.s3_get_data("bids", "ds/derivatives", bids_dir, ["dwi"],
+                            info="sub-01/ses-1", force=True)
+    assert "GetObject" not in calls and "HeadObject" not in calls
+
+
+def test_multipart_etag(s3, tmp_path, monkeypatch):
+    """
+    Test that the ETag of multipart uploads is predicted and recognized
+    """
+    client, _ = s3
+    mib = 1024 ** 2
+    monkeypatch.setattr(cloud_utils, "MULTIPART_THRESHOLD", 6 * mib)
+    monkeypatch.setattr(cloud_utils, "MULTIPART_CHUNKSIZE", 5 * mib)
+    path = str(tmp_path / "tractogram.trk")
+    with open(path, "wb") as f:
+        f.write(os.urandom(11 * mib))
+
+    status = cloud_utils.s3_transfer(client, "bids",
+                                     [("tractogram.trk", path, None)],
+                                     upload=True)
+    assert status == {"tractogram.trk": "transferred"}
+    etag = client.head_object(Bucket="bids",
+                              Key="tractogram.trk")["ETag"].strip('"')
+    assert etag.endswith("-3")
+    assert cloud_utils.upload_etag(path) == etag
+    assert cloud_utils._etag_matches(path, etag, 11 * mib)
+    assert not cloud_utils._etag_matches(path, etag.replace("-3", "-2"),
+                                         11 * mib)
+
+
+def test_with_retries(monkeypatch):
+    """
+    Test that transient errors are retried, and others raised
+    """
+    from botocore.exceptions import ClientError
+
+    monkeypatch.setattr(cloud_utils, "RETRY_BACKOFF", 0)
+
+    def error(status):
+        return ClientError({"Error": {"Code": str(status)},
+                            "ResponseMetadata": {"HTTPStatusCode": status}},
+                           "GetObject")
+
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise error(503)
+        return "ok"
+
+    assert cloud_utils.with_retries(flaky) == "ok"
+    assert len(attempts) == 3
+
+    def missing():
+        attempts.append(1)
+        raise error(404)
+
+    del attempts[:]
+    with pytest.raises(ClientError):
+        cloud_utils.with_retries(missing)
+    assert len(attempts) == 1
+
+
+def test_single_retry_layer(monkeypatch):
+    """
+    Test that requests wrapped by with_retries are not also retried by
+    botocore
+    """
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    client = cloud_utils.s3_client(max_attempts=1)
+    assert client.meta.config.retries["total_max_attempts"] == 1
+    assert cloud_utils.transfer_config().num_download_attempts == 1
+    client = cloud_utils.s3_client()
+    assert client.meta.config.retries["total_max_attempts"] == \
+        cloud_utils.MAX_RETRIES
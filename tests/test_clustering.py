@@ -91,6 +91,125 @@ def test_make_local_connectivity_scorr():
     assert out_img is not None
 
 
+@pytest.mark.parametrize("local_corr", ['tcorr', 'scorr'])
+def test_local_connectivity_synthetic(local_corr):
+    """
+    Test the vectorized local connectivity builders against a voxel-wise
+    reference on synthetic data
+    """
+    from itertools import product
+
+    rng = np.random.RandomState(42)
+    shape = (7, 6, 5)
+    mask = rng.rand(*shape) > 0.3
+    mask[0, 0, :] = True
+    func = rng.randn(*shape, 30)
+    func += rng.randn(3, 30)[rng.randint(0, 3, shape)]
+    # A voxel without variance
+    func[0, 0, 0] = 1
+    func_img = nib.Nifti1Image(func.astype('float32'), np.eye(4))
+    mask_img = nib.Nifti1Image(mask.astype('uint8'), np.eye(4))
+
+    W = getattr(clustools, f"make_local_connectivity_{local_corr}")(
+        func_img, mask_img, thresh=0.2)
+
+    coords = np.argwhere(mask)
+    ts = func[mask].astype('float32').astype('float64')
+    if local_corr == 'scorr':
+        z = (ts - ts.mean(1)[:, None]) / np.where(
+            ts.std(1) > 0, ts.std(1), 1)[:, None]
+        z[ts.std(1) == 0] = 0
+        features = np.dot(z, z.T)
+    else:
+        features = ts
+    ref = np.zeros((len(coords), len(coords)))
+    for i, j in product(range(len(coords)), repeat=2):
+        if np.abs(coords[i] - coords[j]).max() > 1 or \
+                ts[i].std() == 0 or ts[j].std() == 0:
+            continue
+        r = np.corrcoef(features[i], features[j])[0, 1]
+        if r >= 0.2:
+            ref[j, i] = r
+
+    assert W.format == 'csr'
+    assert W.shape == (mask.sum(), mask.sum())
+    assert np.allclose(W.toarray(), ref, atol=1e-5)
+
+
+def test_parcellate_ncut_multi_k():
+    """
+    Test ncut parcellations at several k from one cached eigen decomposition
+    """
+    import tempfile
+    from scipy.sparse.linalg import eigsh
+
+    rng = np.random.RandomState(42)
+    shape = (10, 8, 6)
+    mask = np.ones(shape, dtype='bool')
+    func = rng.randn(*shape, 60)
+    func[:5] += rng.randn(60)
+    func[:, :4] += rng.randn(60)
+    mask_img = nib.Nifti1Image(mask.astype('uint8'), np.eye(4))
+    W = clustools.make_local_connectivity_tcorr(
+        nib.Nifti1Image(func.astype('float32'), np.eye(4)), mask_img,
+        thresh=0.1)
+
+    # Shift-invert finds the leading eigenvalues of the LaPlacian
+    eigen_val, eigen_vec = clustools.ncut(W, 8)
+    P, _, bound = clustools._normalized_laplacian(W)
+    ref = np.sort(eigsh(P, 8, which='LA')[0])[::-1]
+    assert np.allclose(eigen_val, ref, atol=1e-6)
+    assert np.all(eigen_val <= bound)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        out_imgs = clustools.parcellate_ncut(W, [2, 4], mask_img,
+                                             eigen_cache=cache_dir, k_max=8)
+        assert len(out_imgs) == 2
+        for out_img, k in zip(out_imgs, [2, 4]):
+            labels = np.asarray(out_img.dataobj)
+            assert out_img.shape == shape
+            assert 0 < len(np.unique(labels)) <= k
+        assert len(os.listdir(cache_dir)) == 1
+
+        # A smaller k is served by the cached decomposition
+        cached_val, cached_vec = clustools.ncut(W, 4, eigen_cache=cache_dir)
+        assert np.allclose(cached_val, eigen_val[:4])
+        assert np.allclose(np.abs(cached_vec), np.abs(eigen_vec[:, :4]),
+                           atol=1e-4)
+        out_img = clustools.parcellate_ncut(W, 3, mask_img,
+                                            eigen_cache=cache_dir)
+        assert len(np.unique(np.asarray(out_img.dataobj))) <= 3
+        assert len(os.listdir(cache_dir)) == 1
+
+
+@pytest.mark.parametrize("clust_type", ['kmeans', 'ward', 'ncut'])
+def test_bootstrap_parcellate(clust_type):
+    """
+    Test the bootstrapped consensus parcellation of a masked time-series
+    """
+    rng = np.random.RandomState(0)
+    shape = (8, 6, 4)
+    mask = np.ones(shape, dtype='bool')
+    mask[0, 0, 0] = False
+    signals = rng.randn(2, 300)
+    func = 0.5 * rng.randn(*shape, 300)
+    func[:4] += signals[0]
+    func[4:] += signals[1]
+    mask_img = nib.Nifti1Image(mask.astype('uint8'), np.eye(4))
+    ts_data = func[mask].T.astype('float32')
+
+    out_img = clustools.bootstrap_parcellate(
+        ts_data, mask_img, 2, clust_type, block_size=17, n_boot=4,
+        local_corr='tcorr', thresh=0.1)
+
+    labels = np.asarray(out_img.dataobj)
+    assert out_img.shape == shape
+    assert labels[~mask].sum() == 0
+    halves = [np.unique(labels[:4][mask[:4]]), np.unique(labels[4:])]
+    assert all(len(i) == 1 for i in halves)
+    assert halves[0][0] != halves[1][0]
+
+
 @pytest.mark.parametrize("clust_type", ['kmeans', 'rena', 'average', 'complete', 'ward', 'ncut',
                                         pytest.param('single', marks=pytest.mark.xfail)])
 # 1 connected component
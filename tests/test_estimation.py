@@ -26,7 +26,8 @@ from pathlib import Path
 logger = logging.getLogger(__name__)
 logger.setLevel(50)
 from pynets.fmri.estimation import (get_conn_matrix, timeseries_bootstrap,
-                                    fill_confound_nans, TimeseriesExtraction)
+                                    fill_confound_nans, TimeseriesExtraction,
+                                    ChunkedLabelsMasker, MultiLabelsMasker)
 from pynets.dmri.estimation import (create_anisopowermap, tens_mod_fa_est,
                                     tens_mod_est, csa_mod_est, csd_mod_est,
                                     streams2graph, sfm_mod_est)
@@ -67,6 +68,69 @@ def test_get_conn_matrix(conn_model_in, time_series):
     assert (pass_args == outs[2:]).all()
 
 
+def test_estimate_sparse_covariance():
+    """Test the warm-started graphical lasso path and its cache."""
+    import warnings
+    from sklearn.covariance import GraphicalLassoCV
+    from pynets.fmri.covariance import (estimate_sparse_covariance,
+                                        CovariancePath)
+
+    warnings.simplefilter('ignore')
+    rng = np.random.RandomState(42)
+    time_series = rng.standard_normal((60, 12))
+    time_series[:, 1] += time_series[:, 0]
+    time_series[:, 3] -= time_series[:, 2]
+
+    ref = GraphicalLassoCV(cv=5, assume_centered=True).fit(time_series)
+    path = CovariancePath(time_series)
+    estimator = path.fit()
+    assert np.isclose(estimator.alpha, ref.alpha_)
+    assert np.allclose(estimator.precision_, ref.precision_, atol=1e-2)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        estimator = estimate_sparse_covariance(time_series, ID='002',
+                                               atlas='atlas',
+                                               cache_dir=cache_dir)
+        cached = estimate_sparse_covariance(time_series, ID='002',
+                                            atlas='atlas',
+                                            cache_dir=cache_dir)
+        assert np.array_equal(cached.precision_, estimator.precision_)
+
+        # A node subset starts from the cached regularization
+        subset = CovariancePath(time_series[:, :10])
+        assert subset.fit(alpha_init=estimator.alpha) is not None
+        assert len(subset.path_) == subset.n_alphas
+        assert len(os.listdir(cache_dir)) == 2
+
+
+def test_graphical_lasso_fallback(monkeypatch):
+    """
+    Test that the public graphical lasso of scikit-learn, used when its
+    private, warm-startable solver cannot be imported, selects the same
+    regularization and precision.
+    """
+    import sys
+    import warnings
+    from pynets.fmri.covariance import CovariancePath
+
+    warnings.simplefilter('ignore')
+    rng = np.random.RandomState(42)
+    time_series = rng.standard_normal((60, 12))
+    time_series[:, 1] += time_series[:, 0]
+    time_series[:, 3] -= time_series[:, 2]
+
+    estimator = CovariancePath(time_series).fit()
+
+    monkeypatch.setitem(sys.modules, "sklearn.covariance._graph_lasso", None)
+    with pytest.raises(ImportError):
+        from sklearn.covariance._graph_lasso import _graphical_lasso
+    fallback = CovariancePath(time_series).fit()
+
+    assert np.isclose(fallback.alpha, estimator.alpha)
+    assert fallback.shrinkage_ == estimator.shrinkage_
+    assert np.allclose(fallback.precision_, estimator.precision_, atol=1e-3)
+
+
 def test_timeseries_bootstrap():
     """Test bootstrapping a sample of time series."""
 
@@ -76,6 +140,12 @@ def test_timeseries_bootstrap():
     assert np.shape(bseries[0]) == np.shape(tseries)
     assert len(bseries[1]) == len(tseries)
 
+    # Timepoints past the 256th are drawn too
+    tseries = np.arange(600)[:, np.newaxis] * np.ones((1, 3))
+    bseries, block_mask = timeseries_bootstrap(tseries, 24, random_state=0)
+    assert block_mask.max() > 255
+    assert np.array_equal(bseries[:, 0], block_mask)
+
 
 def test_fill_confound_nans():
     """ Testing filling pd dataframe np.nan values with mean."""
@@ -241,6 +311,107 @@ def test_timseries_extraction_extract(conf):
         conf_file.close()
 
 
+@pytest.mark.parametrize("strategy", ['mean', 'sum', 'median'])
+@pytest.mark.parametrize("smooth", [None, 4])
+@pytest.mark.parametrize("resample", [False, True])
+def test_chunked_labels_masker(strategy, smooth, resample):
+    """Test streamed extraction of parcel time-series against Nilearn."""
+    try:
+        from nilearn.maskers import NiftiLabelsMasker
+    except ImportError:
+        from nilearn.input_data import NiftiLabelsMasker
+
+    rng = np.random.RandomState(42)
+    if resample:
+        func_img = nib.Nifti1Image(
+            rng.rand(15, 16, 17, 20).astype('float32'),
+            np.diag([1.5, 1.5, 1.5, 1]))
+    else:
+        func_img = nib.Nifti1Image(rng.rand(10, 11, 12, 20).astype('float32'),
+                                   np.diag([2, 2, 2, 1]))
+    labels = rng.randint(0, 6, (10, 11, 12))
+    labels[:2] = 0
+    labels_img = nib.Nifti1Image(labels.astype('int16'), np.diag([2, 2, 2, 1]))
+    mask_img = nib.Nifti1Image((rng.rand(10, 11, 12) > 0.3).astype('uint8'),
+                               np.diag([2, 2, 2, 1]))
+    confounds = pd.DataFrame({'Conf1': rng.rand(20), 'Conf2': rng.rand(20)})
+    confounds.loc[0, 'Conf2'] = np.nan
+
+    kwargs = dict(labels_img=labels_img, mask_img=mask_img,
+                  smoothing_fwhm=smooth, standardize=True, detrend=True,
+                  high_pass=0.01, t_r=2, strategy=strategy)
+    ref = NiftiLabelsMasker(resampling_target='labels',
+                            **kwargs).fit_transform(
+        func_img, confounds=confounds.fillna(confounds.mean()).values)
+
+    # Blocks of a few volumes at a time
+    masker = ChunkedLabelsMasker(chunk_mb=0.02, **kwargs)
+    ts = masker.fit_transform(func_img, confounds=confounds)
+
+    assert masker.chunk_size(func_img) < func_img.shape[-1]
+    assert ts.shape == ref.shape
+    assert np.allclose(ts, ref, atol=1e-4)
+
+
+@pytest.mark.parametrize("strategy", ['mean', 'median'])
+def test_multi_labels_masker(strategy):
+    """Test one-pass extraction of the time-series of several atlases."""
+    rng = np.random.RandomState(42)
+    func_img = nib.Nifti1Image(rng.rand(10, 11, 12, 20).astype('float32'),
+                               np.diag([2, 2, 2, 1]))
+    labels = rng.randint(0, 6, (10, 11, 12))
+    atlases = [nib.Nifti1Image(labels.astype('int16'), np.diag([2, 2, 2, 1])),
+               nib.Nifti1Image(np.ceil(labels / 2).astype('int16'),
+                               np.diag([2, 2, 2, 1])),
+               nib.Nifti1Image(rng.randint(0, 4, (7, 8, 9)).astype('int16'),
+                               np.diag([3, 3, 3, 1]))]
+    confounds = rng.rand(20, 2)
+
+    kwargs = dict(smoothing_fwhm=4, standardize=True, detrend=True,
+                  high_pass=0.01, t_r=2, strategy=strategy, chunk_mb=0.02)
+    masker = MultiLabelsMasker(atlases, **kwargs)
+    ts_list = masker.fit_transform(func_img, confounds=confounds)
+
+    # Atlases on the same grid share one stacked operator
+    assert len(masker.grids_) == 2
+    assert len(ts_list) == len(atlases)
+    for atlas, ts in zip(atlases, ts_list):
+        ref = ChunkedLabelsMasker(atlas, **kwargs).fit_transform(
+            func_img, confounds=confounds)
+        assert ts.shape == ref.shape
+        assert np.allclose(ts, ref)
+
+    # Time-series extraction with a list of parcellations
+    with tempfile.TemporaryDirectory() as dir_path:
+        func_file = f"{dir_path}/func.nii.gz"
+        func_img.to_filename(func_file)
+        net_parcels_nii_paths = []
+        for i, atlas in enumerate(atlases):
+            net_parcels_nii_paths.append(f"{dir_path}/parcels_{i}.nii.gz")
+            atlas.to_filename(net_parcels_nii_paths[-1])
+        dir_paths = [f"{dir_path}/atlas_{i}" for i in range(len(atlases))]
+
+        te = TimeseriesExtraction(net_parcels_nii_path=net_parcels_nii_paths,
+                                  node_size=None, conf=None,
+                                  func_file=func_file, roi=None,
+                                  dir_path=dir_paths, ID='002',
+                                  network=None, smooth=0, hpass=None,
+                                  mask=None, extract_strategy=strategy)
+        te.prepare_inputs()
+        te.extract_ts_parc()
+        assert [ts.shape[1] for ts in te.ts_within_nodes] == \
+            [len(np.unique(np.asarray(atlas.dataobj))) - 1 for atlas in
+             atlases]
+        te.save_and_cleanup()
+        for i in range(len(atlases)):
+            assert len(os.listdir(f"{dir_paths[i]}/timeseries")) == 1
+
+        # A single directory would have each atlas overwrite the last
+        te.dir_path = dir_path
+        with pytest.raises(ValueError):
+            te.save_and_cleanup()
+
+
 # dMRI
 def test_create_anisopowermap(dmri_estimation_data):
     """ Test creating an anisotropic power map."""
@@ -451,3 +622,83 @@ def test_streams2graph(fa_wei, dsn):
                                 directget, fa_path, min_length, error_margin)[2]
 
     assert conn_matrix is not None
+
+
+@pytest.mark.parametrize("fiber_density", [True, False])
+@pytest.mark.parametrize("fa_wei", [True, False])
+@pytest.mark.parametrize("error_margin", [1, 2])
+def test_streamline_connectome(fiber_density, fa_wei, error_margin,
+                               tmp_path):
+    """
+    Test that the vectorized streamline-to-connectome engine reproduces a
+    point-by-point labeling of every streamline
+    """
+    from itertools import combinations
+    from dipy.tracking.streamline import values_from_volume
+    from pynets.core import nodemaker
+    from pynets.dmri.estimation import StreamlineConnectome
+
+    rng = np.random.RandomState(42)
+    shape = (20, 20, 20)
+    atlas_data = np.zeros(shape, dtype="uint16")
+    for lab, sl in enumerate([np.s_[2:8, 2:8, 2:8], np.s_[12:18, 2:8, 2:8],
+                              np.s_[2:8, 12:18, 2:8], np.s_[12:18, 12:18,
+                                                            12:18],
+                              np.s_[8:12, 8:12, 8:12]]):
+        atlas_data[sl] = lab + 1
+    fa_data = rng.rand(*shape).astype(np.float32)
+    streamlines = []
+    for _ in range(200):
+        a, b = rng.uniform(1, 18, size=(2, 3))
+        n_points = rng.randint(2, 30)
+        streamlines.append(np.linspace(a, b, n_points).astype(np.float32))
+
+    start_time = time.time()
+    connectome = StreamlineConnectome(atlas_data, error_margin, (1, 1, 1),
+                                      fa_data=fa_data if fa_wei else None,
+                                      cache_dir=str(tmp_path))
+    connectome.add(streamlines, chunk_size=64)
+    conn_matrix = connectome.conn_matrix(fiber_density=fiber_density,
+                                         fa_weighting=fa_wei)
+    print("%s%s%s" % ('StreamlineConnectome --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+    # Point-by-point reference
+    n_nodes = 5
+    counts = np.zeros((n_nodes, n_nodes))
+    lengths = {}
+    fas = {}
+    fa_vals = values_from_volume(fa_data, streamlines, np.eye(4))
+    fa_all = np.concatenate(fa_vals)
+    fa_min = fa_all[fa_all > 0].min()
+    fa_max = fa_all.max()
+    for s, vals in zip(streamlines, fa_vals):
+        vox = np.floor(s + 0.5).astype(int)
+        [i, j, k] = np.vstack([nodemaker.get_sphere(v, error_margin,
+                                                    (1, 1, 1), shape)
+                               for v in vox]).T
+        endlabels = [lab for lab in np.unique(atlas_data[i, j, k]) if
+                     lab > 0]
+        for u, v in combinations(endlabels, 2):
+            counts[u - 1, v - 1] += 1
+            lengths.setdefault((u - 1, v - 1), []).append(len(s))
+            fas.setdefault((u - 1, v - 1), []).append(
+                np.mean((vals - fa_min) / (fa_max - fa_min)))
+    expected = counts.copy()
+    if fiber_density is True:
+        volumes = np.array([np.sum(atlas_data == i) for i in
+                            range(1, n_nodes + 1)])
+        total_fibers = np.count_nonzero(counts)
+        total_volume = np.sum(volumes[(counts > 0).any(axis=1)])
+        for (u, v), lens in lengths.items():
+            expected[u, v] = counts[u, v] / total_fibers / np.mean(lens) * \
+                (2.0 * total_volume / (volumes[u] + volumes[v])) * 1000
+    if fa_wei is True:
+        for (u, v), vals in fas.items():
+            expected[u, v] *= np.mean(vals)
+    expected = np.maximum(expected, expected.T)
+
+    assert connectome.n_streamlines == len(streamlines)
+    assert np.count_nonzero(counts) > 0
+    np.testing.assert_allclose(conn_matrix, expected, rtol=1e-5)
+    assert len(os.listdir(str(tmp_path))) == 1
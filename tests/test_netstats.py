@@ -48,6 +48,191 @@ def test_average_local_efficiency():
     assert average_local_efficiency.dtype == float
 
 
+@pytest.mark.parametrize("blocks", [True, False])
+def test_null_model_ensemble(blocks):
+    """
+    Test the cached DCSBM reference ensemble used by smallworldness
+    """
+    import os
+    import tempfile
+    from pynets.stats import nullmodels
+
+    cache_dir = str(tempfile.mkdtemp())
+    np.random.seed(42)
+    in_mat = np.random.rand(40, 40)
+    in_mat = (in_mat + in_mat.T) / 2
+    in_mat[in_mat < 0.7] = 0
+    np.fill_diagonal(in_mat, 0)
+    y = np.random.randint(0, 3, in_mat.shape[0]) if blocks else None
+
+    samples = nullmodels.sample_ensemble(
+        nullmodels.dcsbm_probabilities(in_mat, y), nrand=3)
+    ref = nullmodels.ensemble_metrics(samples)
+    for i in range(3):
+        [Gr, _] = netstats.prune_disconnected(
+            nx.from_numpy_array(samples[i].astype('float64')))
+        assert np.isclose(ref['clustering'][i], nx.average_clustering(Gr))
+        assert np.isclose(ref['transitivity'][i],
+                          netstats.weighted_transitivity(Gr))
+        assert np.isclose(ref['path_length'][i],
+                          nx.average_shortest_path_length(Gr))
+
+    start_time = time.time()
+    metrics = nullmodels.reference_metrics(in_mat, nrand=3, y=y,
+                                           cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    metrics_cached = nullmodels.reference_metrics(in_mat, nrand=3, y=y,
+                                                  cache_dir=cache_dir)
+    print("%s%s%s" % ('Null-model ensemble --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+    assert len(os.listdir(cache_dir)) == 1
+    for key in ['clustering', 'transitivity', 'path_length']:
+        assert np.allclose(metrics[key], ref[key])
+        assert np.allclose(metrics_cached[key], metrics[key])
+
+
+@pytest.mark.parametrize("n_batches", [1, 4])
+def test_threshold_sweep(n_batches):
+    """
+    Test that the incrementally tracked topology of a threshold sweep matches
+    that of each graph analyzed from scratch
+    """
+    from pynets.core import thresholding
+    from pynets.stats.sweep import ThresholdSweep
+
+    x = np.random.rand(30, 30)
+    x = np.around((x + x.T) / 2, 5)
+    np.fill_diagonal(x, 0)
+    rows, cols, weights, _ = thresholding.rank_edges(x)
+
+    start_time = time.time()
+    sweep = ThresholdSweep(len(x))
+    for batch in np.array_split(np.arange(120), n_batches):
+        sweep.add_edges(rows[batch], cols[batch], weights[batch])
+        G = nx.from_numpy_array(sweep.to_numpy_array())
+        H = nx.from_numpy_array(thresholding.threshold_proportional(
+            x, (batch[-1] + 1) / (30 * 29 / 2)))
+        assert nx.is_isomorphic(G, H)
+
+        assert np.allclose(sweep.clustering(),
+                           list(nx.clustering(G, weight="weight").values()))
+        assert np.isclose(sweep.transitivity(),
+                          netstats.weighted_transitivity(G))
+        assert sweep.n_components == nx.number_connected_components(G)
+        assert np.array_equal(sweep.degree, [d for _, d in G.degree()])
+        lower, upper = sweep.efficiency_bounds()
+        assert lower - 1e-12 <= nx.global_efficiency(G) <= upper + 1e-12
+
+        for u, v, d in G.edges(data=True):
+            d["weight"] = int(np.round(100 * d["weight"], 1))
+        assert np.isclose(sweep.assortativity(),
+                          nx.degree_assortativity_coefficient(
+                              G, weight="weight"))
+    print("%s%s%s" % ('Threshold sweep --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+
+@pytest.mark.parametrize("binary", [True, False])
+@pytest.mark.parametrize("prune", [0, 1])
+@pytest.mark.parametrize("norm", [0, 1, 2, 6])
+def test_sweep_netstats(tmp_path, monkeypatch, binary, prune, norm):
+    """
+    Test that a threshold sweep saves the same graph metrics, under the same
+    names, as thresholding and analyzing each threshold from scratch
+    """
+    import pandas as pd
+    from pynets.core import thresholding, utils
+    from pynets.stats.sweep import sweep_netstats
+
+    monkeypatch.setenv("PYNETS_CACHE", str(tmp_path / "cache"))
+    graph_dir = tmp_path / "sub-002" / "graphs"
+    graph_dir.mkdir(parents=True)
+    est_path = str(graph_dir / "rawgraph_sub-002_modality-func_model-corr.npy")
+    x = np.random.rand(25, 25)
+    x = (x + x.T) / 2
+    np.fill_diagonal(x, 0)
+    np.save(est_path, x)
+    ID = '002'
+    network = 'Default'
+    roi = None
+    thrs = ['0.1', '0.2', '0.3']
+
+    start_time = time.time()
+    out_paths = []
+    for thr in thrs:
+        [thr_type, _, conn_matrix_thr, thr, thr_path] = \
+            thresholding.thresh_raw_graph(x, thr, False, False, False,
+                                          est_path)
+        thr_path = utils.save_mat_thresholded(
+            conn_matrix_thr, thr_path, thr_type, ID, network, thr, 'corr',
+            roi, prune, norm, binary)[0]
+        out_paths.append(netstats.extractnetstats(
+            ID, network, thr, 'corr', thr_path, roi, prune, norm, binary))
+    print("%s%s%s" % ('Per-threshold analysis --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+    # The sweep saves its results under the same names
+    dfs = [pd.read_csv(out_path) for out_path in out_paths]
+
+    start_time = time.time()
+    sweep_paths, summary = sweep_netstats(ID, network, thrs, 'corr',
+                                          est_path, roi, prune, norm, binary)
+    print("%s%s%s" % ('Threshold sweep --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+    assert sweep_paths == out_paths
+    assert list(summary['thr']) == [float(thr) for thr in thrs]
+    for df, out_path in zip(dfs, sweep_paths):
+        df_sweep = pd.read_csv(out_path)
+        assert list(df_sweep.columns) == list(df.columns)
+        assert np.allclose(df_sweep.values, df.values, equal_nan=True)
+
+
+@pytest.mark.parametrize("warm_start", [True, False])
+def test_louvain_partition_cache(tmp_path, monkeypatch, warm_start):
+    """
+    Test that each graph is partitioned only once per resolution, and that
+    cached partitions are served to every caller
+    """
+    import community
+    from pynets.stats import communities
+
+    G = nx.karate_club_graph()
+    monkeypatch.setenv("PYNETS_CACHE", str(tmp_path))
+    monkeypatch.setattr(communities, "_PARTITIONS", {})
+    best_partition = community.best_partition
+    calls = []
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs.get("partition"))
+        return best_partition(*args, **kwargs)
+
+    monkeypatch.setattr(community, "best_partition", counted)
+
+    start_time = time.time()
+    ci_dict, ci, resolution, num_comms = \
+        netstats.community_resolution_selection(G, warm_start)
+    assert len(calls) == 1
+    assert num_comms == len(np.unique(ci)) > 1
+    assert ci_dict == dict(zip(G.nodes(), ci))
+
+    # Served from memory, then from disk
+    assert np.array_equal(communities.louvain_partition(G, 1), ci)
+    monkeypatch.setattr(communities, "_PARTITIONS", {})
+    assert np.array_equal(communities.louvain_partition(G, 1), ci)
+    assert len(calls) == 1
+
+    ci_res = communities.louvain_partition(G, 2, warm_start)
+    assert len(calls) == 2
+    assert len(ci_res) == len(G)
+    if warm_start is True:
+        assert calls[-1] == ci_dict
+    else:
+        assert calls[-1] is None
+    print("%s%s%s" % ('Louvain partition cache --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+
 # used random node_comm_aff_mat
 def test_create_communities():
     """
@@ -221,6 +406,31 @@ def test_extractnetstats(binary, prune, norm):
         pass
 
 
+def test_extractnetstats_cleanup(tmp_path):
+    """
+    Test that the temporary pruned graph, along with its metadata sidecar, is
+    removed once its graph metrics are saved
+    """
+    import os
+    from pynets.core import utils
+
+    graph_dir = tmp_path / "graphs"
+    graph_dir.mkdir()
+    est_path = str(graph_dir / "graph_sub-002_thrtype-PROP_thr-0.5.npy")
+    x = np.random.rand(20, 20)
+    x = (x + x.T) / 2
+    x[x < 0.5] = 0
+    np.fill_diagonal(x, 0)
+    utils.save_mat(x, est_path, "npy", meta={"thr": 0.5})
+
+    out_path = netstats.extractnetstats('002', None, 0.5, 'corr', est_path,
+                                        None, 1, 0, False)
+    assert out_path is not None
+    assert sorted(os.listdir(str(graph_dir))) == sorted(
+        [os.path.basename(est_path),
+         os.path.basename(utils.connectome_meta_path(est_path))])
+
+
 def test_raw_mets():
     """
     Test raw_mets extraction functionality
@@ -275,6 +485,32 @@ def test_smallworldness():
     assert sigma > 1
 
 
+def test_smallworldness_fast_blocks(tmp_path, monkeypatch):
+    """
+    Test that the fast small-world reference is a DCSBM whose blocks are the
+    Louvain partition of the graph, rather than a degree-only ensemble
+    """
+    from pynets.stats import nullmodels, communities
+
+    monkeypatch.setenv("PYNETS_CACHE", str(tmp_path))
+    G = nx.connected_caveman_graph(4, 6)
+    fitted = {}
+
+    original = nullmodels.reference_metrics
+
+    def capture(A, nrand=10, y=None, **kwargs):
+        fitted["y"] = y
+        return original(A, nrand=nrand, y=y, **kwargs)
+
+    monkeypatch.setattr(nullmodels, "reference_metrics", capture)
+    omega = netstats.smallworldness(G, nrand=3, reference="fast")
+
+    assert np.isfinite(omega)
+    assert fitted["y"] is not None
+    assert np.array_equal(fitted["y"], communities.louvain_partition(G))
+    assert len(np.unique(fitted["y"])) > 1
+
+
 def test_participation_coef_sign():
     """
     Test participation coefficient computation
@@ -314,6 +550,52 @@ def test_weighted_transitivity(binarize):
     assert transitivity >= 0
 
 
+@pytest.mark.parametrize("sparse_input", [True, False])
+@pytest.mark.parametrize("metric", ['global_efficiency', 'local_efficiency',
+                                    'weighted_transitivity',
+                                    'participation_coef',
+                                    'diversity_coef_sign'])
+def test_matstats_engine(metric, sparse_input):
+    """
+    Test that the matrix-native metric engine reproduces netstats
+    """
+    from scipy import sparse
+    from pynets.stats import matstats
+
+    np.random.seed(42)
+    in_mat = np.random.rand(60, 60)
+    in_mat = (in_mat + in_mat.T) / 2
+    in_mat[in_mat < 0.7] = 0
+    np.fill_diagonal(in_mat, 0)
+    G = nx.from_numpy_array(in_mat)
+    ci = np.random.randint(0, 4, in_mat.shape[0])
+    W = sparse.csr_matrix(in_mat) if sparse_input else in_mat
+
+    start_time = time.time()
+    if metric == 'global_efficiency':
+        assert np.isclose(matstats.global_efficiency(W),
+                          netstats.global_efficiency(G))
+    elif metric == 'local_efficiency':
+        assert np.allclose(matstats.local_efficiency(W),
+                           list(netstats.local_efficiency(G).values()))
+        assert np.isclose(matstats.average_local_efficiency(W),
+                          netstats.average_local_efficiency(G))
+    elif metric == 'weighted_transitivity':
+        assert np.isclose(matstats.weighted_transitivity(W),
+                          netstats.weighted_transitivity(G))
+    elif metric == 'participation_coef':
+        assert np.allclose(matstats.participation_coef(W, ci),
+                           netstats.participation_coef(in_mat, ci))
+    elif metric == 'diversity_coef_sign':
+        signed_mat = in_mat - 0.2 * (in_mat > 0)
+        W = sparse.csr_matrix(signed_mat) if sparse_input else signed_mat
+        for H, H_nx in zip(matstats.diversity_coef_sign(W, ci),
+                           netstats.diversity_coef_sign(signed_mat, ci)):
+            assert np.allclose(H, H_nx)
+    print("%s%s%s" % ('Matrix engine --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+
 @pytest.mark.parametrize("fmt", ['npy', 'txt'])
 @pytest.mark.parametrize("conn_model", ['corr', 'partcorr', 'cov', 'sps'])
 @pytest.mark.parametrize("prune", [pytest.param(0, marks=pytest.mark.xfail(raises=UnboundLocalError)), 1, 2, 3])
@@ -380,6 +662,29 @@ def test_iterate_nx_global_measures(true_metric):
     netstats.iterate_nx_global_measures(G, metric_list_glob)
 
 
+@pytest.mark.parametrize("n_workers", [1, 2])
+@pytest.mark.parametrize("mem_gb", [None, 1])
+def test_metric_scheduler(n_workers, mem_gb):
+    """ Test process-pool metric scheduling with a per-metric budget
+    """
+    scheduler = netstats.MetricScheduler(n_workers=n_workers, mem_gb=mem_gb,
+                                         budget=1, n_nodes=10, n_edges=20)
+    scheduler.submit('global_efficiency', np.sum, ([1, 2, 3],))
+    scheduler.submit('smallworldness', time.sleep, (10,))
+    scheduler.submit('average_clustering', np.max, (), requires='global_efficiency')
+    scheduler.submit('weighted_transitivity', np.max, (), requires='smallworldness')
+
+    start_time = time.time()
+    results = scheduler.run()
+    print("%s%s%s" % ('Metric scheduling --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+    assert results['global_efficiency'] == 6
+    assert results['average_clustering'] == 6
+    assert 'smallworldness' not in results
+    assert 'weighted_transitivity' not in results
+    assert time.time() - start_time < 10
+
+
 @pytest.mark.parametrize("sim_num_comms", [1, 5, 10])
 @pytest.mark.parametrize("sim_size", [1, 5, 10])
 def test_community_resolution_selection(sim_num_comms, sim_size):
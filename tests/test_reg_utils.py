@@ -6,6 +6,8 @@ Created on Monday July 29 16:19:14 2019
 
 """
 import numpy as np
+import pytest
+from subprocess import CalledProcessError
 from pynets.registration import reg_utils
 import os
 import nibabel as nib
@@ -44,6 +46,222 @@ def test_align():
     assert highres2standard_linear is not None
 
 
+def test_run_cached(tmp_path, monkeypatch):
+    """
+    Test the content-addressed cache of registration outputs
+    """
+    monkeypatch.setenv("PYNETS_CACHE", str(tmp_path/"cache"))
+    inp = tmp_path/"in.mat"
+    np.savetxt(str(inp), np.eye(4))
+    copy_path = tmp_path/"copy.mat"
+    np.savetxt(str(copy_path), np.eye(4))
+
+    def run(inp, out, **params):
+        return reg_utils.run_cached(f"cp {inp} {out}", {"in": inp},
+                                    {"omat": out}, **params)
+
+    out = tmp_path/"out.mat"
+    assert run(inp, out, dof=6) is False
+    assert np.allclose(np.loadtxt(str(out)), np.eye(4))
+
+    # A copy of the same input is served from the cache, even when the
+    # command itself would fail
+    out_2 = tmp_path/"out_2.mat"
+    assert reg_utils.run_cached(f"cp {tmp_path}/none.mat {out_2}",
+                                {"in": copy_path}, {"omat": out_2},
+                                dof=6) is True
+    assert np.allclose(np.loadtxt(str(out_2)), np.eye(4))
+
+    # New parameters or new contents are not
+    assert run(inp, tmp_path/"out_3.mat", dof=12) is False
+    np.savetxt(str(copy_path), 2 * np.eye(4))
+    assert run(copy_path, tmp_path/"out_4.mat", dof=6) is False
+
+    # Failed runs raise, and are not cached
+    for i in range(2):
+        with pytest.raises(CalledProcessError):
+            run(tmp_path/"none.mat", tmp_path/"missing.mat")
+
+
+@pytest.mark.parametrize("sign", [1, -1])
+def test_apply_transform(tmp_path, sign):
+    """
+    Test the in-process application of FLIRT matrices
+    """
+    from pynets.registration import transforms
+
+    rng = np.random.RandomState(42)
+    affine = np.diag([sign * 2.0, 2.0, 2.0, 1.0])
+    data = rng.rand(20, 22, 24).astype("float32")
+    inp = str(tmp_path/"in.nii.gz")
+    nib.save(nib.Nifti1Image(data, affine), inp)
+
+    # A translation of 4 mm along FSL's x-axis, which is flipped for images
+    # of positive determinant
+    xfm = str(tmp_path/"shift.mat")
+    shift = np.eye(4)
+    shift[0, 3] = 4
+    transforms.save_xfm(shift, xfm)
+    aligned = str(tmp_path/"aligned.nii.gz")
+    reg_utils.applyxfm(inp, inp, xfm, aligned, interp="trilinear")
+    out = nib.load(aligned).get_fdata()
+    if sign > 0:
+        assert np.allclose(out[:-2], data[2:], atol=1e-5)
+    else:
+        assert np.allclose(out[2:], data[:-2], atol=1e-5)
+
+    # Combined and inverted matrices cancel out
+    combined = str(tmp_path/"combined.mat")
+    reg_utils.invert_xfm(xfm, str(tmp_path/"inv.mat"))
+    reg_utils.combine_xfms(xfm, str(tmp_path/"inv.mat"), combined)
+    assert np.allclose(transforms.load_xfm(combined), np.eye(4))
+
+    # Nearest-neighbour interpolation preserves labels and their data type
+    labels = rng.randint(0, 5, (20, 22, 24)).astype("int16")
+    nib.save(nib.Nifti1Image(labels, affine), inp)
+    shift[:3, 3] = [1.3, -0.7, 2.1]
+    transforms.save_xfm(shift, xfm)
+    reg_utils.apply_warp(inp, inp, aligned, xfm=xfm, interp="nn", sup=True)
+    out_img = nib.load(aligned)
+    assert out_img.get_data_dtype() == np.int16
+    assert set(np.unique(np.asarray(out_img.dataobj))) <= set(range(5))
+
+
+def test_apply_warps(tmp_path, monkeypatch):
+    """
+    Test the batched application of a warp, with the sampling coordinates
+    cached on disk
+    """
+    from pynets.registration import transforms
+
+    monkeypatch.setenv("PYNETS_CACHE", str(tmp_path/"cache"))
+    rng = np.random.RandomState(42)
+    affine = np.diag([-1.0, 1.0, 1.0, 1.0])
+    ref = str(tmp_path/"ref.nii.gz")
+    nib.save(nib.Nifti1Image(np.zeros((16, 18, 20), dtype="float32"),
+                             affine), ref)
+
+    # A uniform displacement of 2 mm along x
+    field = np.zeros((16, 18, 20, 3), dtype="float32")
+    field[..., 0] = 2
+    warp_img = nib.Nifti1Image(field, affine)
+    warp_img.header["intent_code"] = 2006
+    warp = str(tmp_path/"warp.nii.gz")
+    nib.save(warp_img, warp)
+
+    labels = rng.randint(0, 7, (16, 18, 20)).astype("int16")
+    prob = rng.rand(16, 18, 20).astype("float32")
+    inps = [str(tmp_path/"labels.nii.gz"), str(tmp_path/"prob.nii.gz")]
+    nib.save(nib.Nifti1Image(labels, affine), inps[0])
+    nib.save(nib.Nifti1Image(prob, affine), inps[1])
+    assert transforms.default_interpolation(nib.load(inps[0])) == "nn"
+    assert transforms.default_interpolation(nib.load(inps[1])) == \
+        "trilinear"
+
+    for i in range(2):
+        outs = [str(tmp_path/f"labels_{i}.nii.gz"),
+                str(tmp_path/f"prob_{i}.nii.gz")]
+        reg_utils.apply_warps(ref, inps, outs, warp=warp, sup=True)
+        assert len(os.listdir(str(tmp_path/"cache"/"transforms"))) == 1
+        out_labels = nib.load(outs[0])
+        assert out_labels.get_data_dtype() == np.int16
+        assert np.array_equal(np.asarray(out_labels.dataobj)[:-2],
+                              labels[2:])
+        assert np.allclose(nib.load(outs[1]).get_fdata()[:-2], prob[2:],
+                           atol=1e-5)
+
+
+@pytest.mark.parametrize("private", [True, False])
+def test_warp_streamlines(monkeypatch, private):
+    """
+    Test the vectorized warping of streamlines, and their density map, with
+    and without dipy's private mask test
+    """
+    import sys
+    from dipy.tracking import utils
+    from dipy.tracking.streamline import (Streamlines, transform_streamlines,
+                                          values_from_volume)
+
+    class Mapping(object):
+        def get_forward_field(self):
+            return field
+
+    rng = np.random.RandomState(42)
+    shape = (30, 32, 28)
+    field = rng.randn(*shape + (3,)).astype("float32")
+    streams = Streamlines([np.cumsum(rng.randn(rng.randint(5, 40), 3),
+                                     axis=0) + rng.uniform(10, 50, 3)
+                           for i in range(200)])
+    ref_grid_aff = np.diag([2.0, 2.0, 2.0, 1.0])
+    adjusted_affine = np.eye(4)
+    adjusted_affine[:3, 3] = [-1, 2, 3]
+    warped_fa_img = nib.Nifti1Image(np.zeros(shape, dtype="float32"),
+                                    ref_grid_aff)
+    brain_mask = np.zeros(shape, dtype=bool)
+    brain_mask[5:25, 5:27, 5:23] = True
+
+    if private is False:
+        monkeypatch.setitem(sys.modules, "dipy.tracking.vox2track", None)
+    warped = reg_utils.warp_streamlines(adjusted_affine, ref_grid_aff,
+                                        Mapping(), warped_fa_img, streams,
+                                        brain_mask)
+
+    # Streamline-by-streamline reference
+    displaced = [s + np.asarray(d) for d, s in
+                 zip(values_from_volume(field, streams, ref_grid_aff),
+                     streams)]
+    expected = Streamlines(utils.target_line_based(
+        transform_streamlines(transform_streamlines(
+            displaced, np.linalg.inv(adjusted_affine)),
+            np.linalg.inv(warped_fa_img.affine)),
+        np.eye(4), brain_mask, include=True))
+    assert 0 < len(warped) == len(expected)
+    assert np.allclose(warped.get_data(), expected.get_data(), atol=1e-4)
+
+    voxels, owners = reg_utils.streamline_voxels(warped)
+    inside = np.ones(len(warped), dtype=bool)
+    inside[owners[np.any((voxels < 0) | (voxels >= shape), axis=1)]] = False
+    warped = warped[np.where(inside)[0]]
+    assert np.array_equal(
+        reg_utils.streamline_density(*reg_utils.streamline_voxels(warped),
+                                     shape),
+        utils.density_map(warped, np.eye(4), shape))
+
+
+@pytest.mark.parametrize("inverse", [False, True])
+def test_syn_mapping_cache(tmp_path, inverse):
+    """
+    Test that a cached SyN mapping transforms images as the original does
+    """
+    from dipy.align.imwarp import DiffeomorphicMap
+
+    rng = np.random.RandomState(42)
+    shape = (12, 14, 10)
+    grid2world = np.diag([2.0, 2.0, 2.0, 1.0])
+    prealign = np.eye(4)
+    prealign[:3, 3] = [1.5, -2, 0.5]
+    mapping = DiffeomorphicMap(3, shape, grid2world, shape, grid2world,
+                               shape, grid2world, prealign)
+    mapping.forward = rng.randn(*shape + (3,)).astype("float32")
+    mapping.backward = -mapping.forward
+    if inverse is True:
+        mapping = mapping.inverse()
+
+    moving = rng.rand(*shape)
+    path = str(tmp_path / "mapping.npz")
+    reg_utils._save_mapping(mapping, moving, grid2world, path)
+    loaded, warped_moving, warped_affine = reg_utils._load_mapping(path)
+
+    assert loaded.is_inverse == mapping.is_inverse
+    assert np.allclose(warped_moving, moving.astype("float32"))
+    assert np.array_equal(warped_affine, grid2world)
+    assert np.allclose(loaded.get_forward_field(),
+                       mapping.get_forward_field())
+    assert np.allclose(loaded.transform(moving), mapping.transform(moving))
+    assert np.allclose(loaded.transform_inverse(moving),
+                       mapping.transform_inverse(moving))
+
+
 def test_applyxfm():
     """
     Test applyxfm functionality
@@ -65,8 +283,10 @@ def test_applyxfm():
     out_align_file = f"{anat_dir}/highres2standard.nii.gz"
     out_align = nib.load(out_align_file)
     out_align_data = out_align.get_data()
-    check_eq_arrays = np.array_equal(out_applyxfm_data, out_align_data)
-    assert check_eq_arrays is True
+    # Transforms are applied in-process, so compare with flirt's output up
+    # to interpolation error
+    assert np.corrcoef(out_applyxfm_data.ravel(),
+                       out_align_data.ravel())[0, 1] > 0.99
 
     ## Second test: Apply xfm to standard space roi (invert xfm first) >> native space roi.
     # ref is native space anat image
@@ -7,6 +7,7 @@ Created on Wed Dec 27 16:19:14 2017
 
 """
 import os
+import time
 import numpy as np
 
 try:
@@ -208,6 +209,95 @@ def test_conn_mat_operations(cp, thr, mat_size):
         test_weight_conversion(x_rand, cp)
 
 
+@pytest.mark.parametrize("symmetric", [True, False])
+@pytest.mark.parametrize("thr", [0.05, 0.2, 0.5, 0.9])
+def test_density_cuts(symmetric, thr):
+    """
+    Test that the sort-based density thresholding gives the same edge sets
+    as stepping the absolute threshold and re-measuring density.
+    """
+    x = np.random.rand(50, 50)
+    x[np.random.rand(50, 50) < 0.2] = 0
+    if symmetric is True:
+        x = (x + x.T) / 2
+
+    expected = x.copy()
+    np.fill_diagonal(expected, 0)
+    work_thr = 0
+    for i in range(1, 10000):
+        work_thr = work_thr + 0.01
+        cand = thresholding.threshold_absolute(expected, work_thr)
+        if thr >= nx.density(nx.from_numpy_array(cand)):
+            expected = cand
+            break
+
+    conn_matrix = thresholding.density_thresholding(x.copy(), thr)
+    assert np.array_equal(conn_matrix, expected)
+    assert thresholding.est_density(conn_matrix) == nx.density(
+        nx.from_numpy_array(conn_matrix))
+
+    cuts, densities = thresholding.density_cuts(x, [thr, 0.0, 1.0])
+    assert np.isclose(cuts[0], work_thr)
+    assert densities[0] <= thr
+    assert np.isnan(cuts[2])
+
+    rows, cols, weights, ud = thresholding.rank_edges(x)
+    assert ud == (2 if symmetric is True else 1)
+    assert np.all(np.diff(weights) <= 0)
+
+
+@pytest.mark.parametrize("directed", [True, False])
+@pytest.mark.parametrize("cut_mode", ["or", "and"])
+def test_disparity_backbone(directed, cut_mode):
+    """
+    Test that the closed-form disparity backbone matches the integral
+    definition of the edge significance.
+    """
+    from scipy import integrate
+
+    x = np.random.rand(30, 30)
+    x[np.random.rand(30, 30) < 0.5] = 0
+    np.fill_diagonal(x, 0)
+    if directed is False:
+        x = np.maximum(x, x.T)
+
+    alpha_t = 0.3
+    rows, cols, weights, alpha_out, alpha_in = thresholding.disparity_alphas(
+        x, directed=directed)
+    assert len(weights) == np.count_nonzero(x)
+    for u, v, a_out, a_in in zip(rows[:20], cols[:20], alpha_out[:20],
+                                 alpha_in[:20]):
+        for k, s, p, a in [
+            (np.count_nonzero(x[u]), x[u].sum(), x[u, v] / x[u].sum(),
+             a_out),
+            (np.count_nonzero(x[:, v]), x[:, v].sum(), x[u, v] / x[:, v].sum(),
+             a_in)]:
+            if k > 1:
+                expected = 1 - (k - 1) * integrate.quad(
+                    lambda z: (1 - z) ** (k - 2), 0, p)[0]
+                assert np.isclose(a, expected)
+
+    start_time = time.time()
+    B = thresholding.disparity_backbone(x, alpha_t=alpha_t,
+                                        directed=directed, cut_mode=cut_mode)
+    print("%s%s%s" % ('Disparity backbone --> finished: ',
+                      np.round(time.time() - start_time, 1), 's'))
+    if directed is True and cut_mode == "and":
+        keep = (alpha_out < alpha_t) & (alpha_in < alpha_t)
+    else:
+        keep = (alpha_out < alpha_t) | (alpha_in < alpha_t)
+    assert B.nnz == np.sum(keep)
+    assert np.allclose(B.toarray()[B.toarray() != 0], x[B.toarray() != 0])
+    if directed is False:
+        assert np.allclose(B.toarray(), B.toarray().T)
+
+    thr_type, _, conn_matrix_thr = thresholding.perform_thresholding(
+        np.maximum(x, x.T), alpha_t, False, False, True)
+    assert thr_type == "DISPARITY"
+    assert np.count_nonzero(conn_matrix_thr) <= np.count_nonzero(
+        np.maximum(x, x.T))
+
+
 @pytest.mark.parametrize("thr", [0.0, 0.2, 0.4, 0.6, 0.8, 1.0])
 def test_edge_cases(thr):
     # local_thresholding_prop: nng.number_of_edges() == 0 and number_before >= maximum_edges
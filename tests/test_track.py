@@ -231,3 +231,263 @@ def test_track_ensemble_particle():
                                        space=Space.VOXMM, origin=Origin.NIFTI),
                     streams, bbox_valid_check=False)
     assert isinstance(streamlines, ArraySequence)
+
+
+def test_run_tracking_resident_context(tmp_path, monkeypatch):
+    """
+    Test that tracking inputs are staged once, and that the tissue
+    classifier and the PMF generator shared by all curvatures are built on
+    the first seed batch only
+    """
+    from dipy.data import get_sphere
+    from nibabel.streamlines.array_sequence import ArraySequence
+    from pynets.core.perfbench import SyntheticData
+    from pynets.dmri import track
+
+    data = SyntheticData(str(tmp_path / "inputs"), "small")
+    dwi = data.dwi
+    context = track.prepare_tracking_context(
+        data.recon, [dwi["B0_mask"], dwi["atlas"], dwi["wm_gm_int"],
+                     dwi["B0_mask"], dwi["gm"], dwi["csf"], dwi["wm"]],
+        None, str(tmp_path / "context"))
+    assert all([np.load(context[i]).shape == nib.load(dwi["atlas"]).shape
+                for i in track.TRACKING_TISSUES])
+
+    prep_calls = []
+    prep_tissues = track.prep_tissues
+
+    def _prep_tissues(*args):
+        prep_calls.append(args[4])
+        return prep_tissues(*args)
+
+    monkeypatch.setattr(track, "prep_tissues", _prep_tissues)
+    sphere = get_sphere('repulsion724')
+    for curv in [40, 40, 30]:
+        streamlines = track.run_tracking((0.5, curv), context, 500, "det", 2,
+                                         500, 2, 1, 15, 6, 5, "local", 20,
+                                         sphere, "wm")
+        assert isinstance(streamlines, ArraySequence)
+        assert len(streamlines) > 0
+
+    assert prep_calls == ["wm"]
+    assert track._TRACKING_CONTEXT["token"] == context["token"]
+    assert len(track._TRACKING_CONTEXT["pmf_generators"]) == 1
+
+    # A new run replaces the inputs held by the worker
+    context = track.prepare_tracking_context(
+        data.recon, [dwi["B0_mask"], dwi["atlas"], dwi["wm_gm_int"],
+                     dwi["B0_mask"], dwi["gm"], dwi["csf"], dwi["wm"]],
+        None, str(tmp_path / "context2"))
+    track.run_tracking((0.5, 40), context, 500, "det", 2, 500, 2, 1, 15, 6,
+                       5, "local", 20, sphere, "wm")
+    assert prep_calls == ["wm", "wm"]
+    assert track._TRACKING_CONTEXT["token"] == context["token"]
+
+
+def test_pmf_generator_memmap(tmp_path):
+    """
+    Test that the PMF generator reads the SH coefficients from the staged
+    memory map, rather than from a private copy
+    """
+    import os
+    from dipy.data import get_sphere
+    from pynets.core.perfbench import SyntheticData
+    from pynets.dmri import track
+
+    data = SyntheticData(str(tmp_path / "inputs"), "small")
+    dwi = data.dwi
+    context = track.prepare_tracking_context(
+        data.recon, [dwi["B0_mask"], dwi["atlas"], dwi["wm_gm_int"],
+                     dwi["B0_mask"], dwi["gm"], dwi["csf"], dwi["wm"]],
+        None, str(tmp_path / "context"))
+    ctx = track._tracking_context(context, "wm")
+    mod_fit = ctx["mod_fit"]
+    assert isinstance(mod_fit, np.memmap)
+    assert mod_fit.dtype == np.float64
+    assert mod_fit.filename == os.path.abspath(context["reconstruction"])
+
+    pmf_gen = track._pmf_generator(ctx, get_sphere('repulsion724'))
+    point = np.array(np.unravel_index(
+        np.argmax(np.abs(mod_fit).sum(axis=-1)), mod_fit.shape[:3]),
+        dtype=float)
+    assert np.any(np.asarray(pmf_gen.get_pmf(point)) != 0)
+
+    # Changes to the memory map are seen by the generator
+    mod_fit[tuple(point.astype(int))] = 0
+    assert np.all(np.asarray(pmf_gen.get_pmf(point)) == 0)
+    track._TRACKING_CONTEXT.clear()
+
+
+def test_seed_scheduler():
+    """
+    Test that seeds are shifted toward productive ensemble cells and
+    under-covered parcels
+    """
+    from pynets.dmri import track
+
+    atlas_data = np.zeros((10, 10, 10), dtype="uint16")
+    atlas_data[:5] = 1
+    atlas_data[5:] = 2
+    seeding_data = np.ones((10, 10, 10))
+    cells = [("prob", 0.2, 40), ("prob", 0.5, 40)]
+    scheduler = track.SeedScheduler(cells, seeding_data, atlas_data, 1000,
+                                    random_state=42)
+
+    allocation = scheduler.allocate()
+    assert allocation[cells[0]] == allocation[cells[1]] == 500
+    seeds = scheduler.draw_seeds(1000)
+    assert seeds.shape == (1000, 3)
+    assert np.all((seeds >= -0.5) & (seeds <= 9.5))
+    assert 0.4 < np.mean(seeds[:, 0] < 4.5) < 0.6
+
+    scheduler.update(cells[0], 500, 400)
+    scheduler.update(cells[1], 500, 50)
+    allocation = scheduler.allocate()
+    assert allocation[cells[0]] > allocation[cells[1]] >= 100
+    assert scheduler.acceptance_rates()[cells[0]] == 401 / 502
+
+    # Parcel 1 is covered by ten times more streamlines than parcel 2
+    scheduler.update_coverage(np.array([[90., 10.], [10., 0.]]))
+    seeds = np.round(scheduler.draw_seeds(5000)).astype(int)
+    assert np.mean(atlas_data[tuple(seeds.T)] == 2) > 0.55
+
+    current = np.array([[0, 2, 1], [2, 0, 1], [1, 1, 0]])
+    assert track.connectome_change(current, current) == 0
+    assert track.connectome_change(current, 2 * current) == 0
+    assert track.connectome_change(current, current, "corr") < 1e-12
+    assert 0 < track.connectome_change(current, np.ones((3, 3))) < 1
+    with pytest.raises(ValueError):
+        track.connectome_change(current, current, "l2")
+
+
+def test_streamline_accumulator(tmp_path):
+    """
+    Test that streamlines streamed to disk in batches are stored, iterated,
+    saved, mapped, and connected as if held in memory
+    """
+    from dipy.io.stateful_tractogram import Space, Origin
+    from dipy.io.streamline import load_tractogram
+    from dipy.tracking import utils
+    from nibabel.streamlines.array_sequence import ArraySequence
+    from pynets.dmri import track
+    from pynets.dmri.estimation import StreamlineConnectome
+
+    rng = np.random.RandomState(42)
+    shape = (20, 20, 20)
+    reference = nib.Nifti1Image(np.zeros(shape, dtype="float32"), np.eye(4))
+    atlas_data = np.zeros(shape, dtype="uint16")
+    atlas_data[2:8] = 1
+    atlas_data[12:18] = 2
+    streamlines = [np.linspace(*rng.uniform(1, 18, size=(2, 3)),
+                               rng.randint(2, 30)).astype("float32")
+                   for _ in range(300)]
+    invalid = np.array([[5., 5., 5.], [25., 5., 5.]], dtype="float32")
+
+    accumulator = track.StreamlineAccumulator(
+        str(tmp_path / "streams.h5"), reference=reference,
+        connectomes={"graph": StreamlineConnectome(
+            atlas_data, 2, (1, 1, 1), cache_dir=str(tmp_path))},
+        chunk_size=64)
+    n_added = [accumulator.add(ArraySequence(streamlines[:150] + [invalid])),
+               accumulator.add(streamlines[150:])]
+    assert n_added == [150, 150]
+    assert len(accumulator) == 300
+
+    stored = accumulator.streamlines()
+    assert all([np.allclose(i, j) for i, j in zip(stored, streamlines)])
+    assert sum([len(i) for i in accumulator.iter_chunks()]) == 300
+    assert all([np.allclose(i, j) for i, j in zip(accumulator, streamlines)])
+    assert np.array_equal(accumulator.density, utils.density_map(
+        streamlines, affine=np.eye(4), vol_dims=shape))
+
+    expected = StreamlineConnectome(atlas_data, 2, (1, 1, 1),
+                                    cache_dir=str(tmp_path))
+    expected.add(streamlines)
+    assert np.allclose(
+        accumulator.connectomes["graph"].conn_matrix(fa_weighting=False),
+        expected.conn_matrix(fa_weighting=False))
+
+    trk = str(tmp_path / "streams.trk")
+    accumulator.save(trk, reference)
+    loaded = load_tractogram(trk, reference, to_origin=Origin.NIFTI,
+                             to_space=Space.VOXMM).streamlines
+    assert len(loaded) == 300
+    assert all([np.allclose(i, j, atol=1e-4) for i, j in
+                zip(loaded, streamlines)])
+
+    # The connectome state is restored only for identical inputs
+    state = str(tmp_path / "streams_connectome.npz")
+    accumulator.connectomes["graph"].save(state, trk)
+    restored = StreamlineConnectome(atlas_data, 2, (1, 1, 1),
+                                    cache_dir=str(tmp_path))
+    assert restored.restore(state, trk) is True
+    assert np.allclose(restored.conn_matrix(fa_weighting=False),
+                       expected.conn_matrix(fa_weighting=False))
+    assert StreamlineConnectome(atlas_data, 3, (1, 1, 1),
+                                cache_dir=str(tmp_path)).restore(
+        state, trk) is False
+    assert restored.restore(str(tmp_path / "missing.npz")) is False
+
+    accumulator.close(remove=True)
+    assert not (tmp_path / "streams.h5").exists()
+
+
+def _set_tracking_context(barrier, token):
+    """Hold a tracking context in one process of a pool."""
+    from pynets.dmri import track
+
+    track._TRACKING_CONTEXT["token"] = token
+    barrier.wait(timeout=60)
+
+
+def _tracking_context_size(barrier):
+    """Size of the tracking context held by one process of a pool."""
+    from pynets.dmri import track
+
+    barrier.wait(timeout=60)
+    return len(track._TRACKING_CONTEXT)
+
+
+def test_release_tracking_context(tmp_path, monkeypatch):
+    """
+    Test that the tracking inputs held by the parent process and by every
+    worker are released when ensemble tractography returns
+    """
+    import multiprocessing
+    from dipy.data import get_sphere
+    from joblib import Parallel, delayed
+    from pynets.core.perfbench import SyntheticData
+    from pynets.dmri import track
+
+    n_jobs = 2
+    with multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(n_jobs)
+        Parallel(n_jobs=n_jobs, backend='loky', batch_size=1)(
+            delayed(_set_tracking_context)(barrier, "token")
+            for _ in range(n_jobs))
+        track._TRACKING_CONTEXT["token"] = "token"
+
+        track.release_tracking_context(n_jobs)
+        assert track._TRACKING_CONTEXT == {}
+        assert Parallel(n_jobs=n_jobs, backend='loky', batch_size=1)(
+            delayed(_tracking_context_size)(barrier)
+            for _ in range(n_jobs)) == [0] * n_jobs
+
+    releases = []
+    release_tracking_context = track.release_tracking_context
+
+    def _release_tracking_context(*args):
+        releases.append(dict(track._TRACKING_CONTEXT))
+        return release_tracking_context(*args)
+
+    monkeypatch.setattr(track, "release_tracking_context",
+                        _release_tracking_context)
+    data = SyntheticData(str(tmp_path / "inputs"), "small")
+    dwi = data.dwi
+    track.track_ensemble(
+        data.params["target_samples"], dwi["wm_gm_int"], dwi["atlas"],
+        data.recon, get_sphere("repulsion724"), "det", [40, 30], [0.2, 0.5],
+        "local", 2, 6, 5, None, dwi["B0_mask"], dwi["B0_mask"], dwi["gm"],
+        dwi["csf"], dwi["wm"], "wm", str(tmp_path / "work"))
+    assert len(releases) == 1 and "token" in releases[0]
+    assert track._TRACKING_CONTEXT == {}
@@ -7,6 +7,7 @@ Created on Wed Dec 27 16:19:14 2017
 """
 import numpy as np
 import os
+import time
 try:
     import cPickle as pickle
 except ImportError:
@@ -128,6 +129,89 @@ def test_collect_pandas_df():
     assert len(net_mets_csv_list) == 9
 
 
+@pytest.mark.parametrize("symmetric", [True, False])
+def test_connectome_store(symmetric):
+    import tempfile
+    import networkx as nx
+
+    dir_path = str(tempfile.TemporaryDirectory().name)
+    os.makedirs(dir_path)
+
+    est_path = f"{dir_path}/G_out.npy"
+    conn_matrix = np.random.rand(10, 10)
+    conn_matrix[np.random.rand(10, 10) < 0.3] = 0
+    if symmetric is True:
+        conn_matrix = (conn_matrix + conn_matrix.T) / 2
+    meta = {"labels": list(np.arange(10)),
+            "coords": [np.array([1.0, 2.0, 3.0])] * 10,
+            "thr": 0.2, "thr_type": "PROP"}
+
+    start_time = time.time()
+    utils.save_mat(conn_matrix, est_path, "npy", meta=meta)
+    loaded = utils.load_mat(est_path)
+    print("%s%s%s" % ('Connectome store round-trip --> finished: ',
+                      np.round(time.time() - start_time, 1), 's'))
+
+    # Same matrix as the networkx round-trip, readable by plain numpy
+    expected = nx.to_numpy_array(nx.from_numpy_array(conn_matrix))
+    assert isinstance(loaded, np.ndarray)
+    assert np.array_equal(loaded, expected)
+    assert np.array_equal(np.load(est_path), expected)
+
+    conn_matrix_mmap, meta_loaded = utils.load_connectome(est_path)
+    assert np.array_equal(conn_matrix_mmap, expected)
+    assert meta_loaded["labels"] == list(range(10))
+    assert meta_loaded["coords"][0] == [1.0, 2.0, 3.0]
+    assert meta_loaded["thr"] == 0.2
+
+    # The .npy file is standard, with its metadata in a sidecar
+    assert np.load(est_path, mmap_mode="r").offset + expected.nbytes == \
+        os.path.getsize(est_path)
+    assert os.path.isfile(utils.connectome_meta_path(est_path))
+
+    os.remove(utils.connectome_meta_path(est_path))
+    np.save(est_path, conn_matrix)
+    assert utils.load_connectome_meta(est_path) == {}
+    assert np.array_equal(utils.load_mat(est_path), expected)
+
+
+def test_remove_mat(tmp_path):
+    """
+    Test that removing a graph also removes its metadata sidecar and exports
+    """
+    est_path = str(tmp_path / "G_out.npy")
+    conn_matrix = np.random.rand(10, 10)
+    utils.save_mat(conn_matrix, est_path, "npy", meta={"thr": 0.2})
+    utils.save_mat(conn_matrix, est_path, "graphml")
+    utils.save_mat(conn_matrix, est_path, "txt")
+    np.savetxt(str(tmp_path / "other.txt"), conn_matrix)
+    assert len(os.listdir(str(tmp_path))) == 5
+
+    utils.remove_mat(est_path)
+    assert os.listdir(str(tmp_path)) == ["other.txt"]
+
+
+def test_prune_cache(tmp_path):
+    """
+    Test that cache files are evicted by age, then least recently used first
+    """
+    now = time.time()
+    sizes = {"old": 10, "a": 40, "b": 40, "c": 40, "d.123.tmp": 40}
+    ages = {"old": 40, "a": 3, "b": 2, "c": 1, "d.123.tmp": 50}
+    for name, size in sizes.items():
+        path = tmp_path / "sub" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"0" * size)
+        used = now - ages[name] * 86400
+        os.utime(path, (used, used))
+
+    assert utils.prune_cache(str(tmp_path), max_bytes=None,
+                             max_age=30 * 86400) == 1
+    assert utils.prune_cache(str(tmp_path), max_bytes=100) == 1
+    assert sorted(os.listdir(tmp_path / "sub")) == ["b", "c", "d.123.tmp"]
+    assert utils.prune_cache(str(tmp_path)) == 0
+
+
 @pytest.mark.parametrize("node_size", [6, None])
 @pytest.mark.parametrize("hpass", [100, None])
 @pytest.mark.parametrize("smooth", [6, None])
@@ -479,3 +563,164 @@ def test_build_hp_dict(modality):
         db.add_hp_columns(hyperparams)
         db.add_row_from_df(pd.DataFrame([{'AUC': 0.8}], index=[0]),
                            hyperparam_dict)
+
+
+def test_telemetry(tmp_path):
+    """
+    Test that every executed node of a workflow, including iterables,
+    JoinNodes and MapNodes, is recorded to the telemetry ledger, and that
+    resource suggestions are derived from the recorded usage
+    """
+    from nipype.pipeline import engine as pe
+    from nipype.interfaces import utility as niu
+    from pynets.core import telemetry
+
+    def write_array(size, out_dir):
+        import numpy as np
+        out_file = f"{out_dir}/array_{size}.npy"
+        np.save(out_file, np.ones(size))
+        return out_file
+
+    def total(in_files):
+        import numpy as np
+        return float(sum([np.load(i).sum() for i in in_files]))
+
+    ledger = str(tmp_path / "telemetry.sqlite")
+    wf = pe.Workflow(name="telemetry_wf", base_dir=str(tmp_path))
+    write_node = pe.Node(niu.Function(input_names=["size", "out_dir"],
+                                      output_names=["out_file"],
+                                      function=write_array),
+                         name="write_node")
+    write_node.iterables = ("size", [10, 20])
+    write_node.inputs.out_dir = str(tmp_path)
+    join_node = pe.JoinNode(niu.Function(input_names=["in_files"],
+                                         output_names=["total"],
+                                         function=total),
+                            joinsource="write_node", joinfield=["in_files"],
+                            name="join_node")
+    map_node = pe.MapNode(niu.Function(input_names=["size", "out_dir"],
+                                       output_names=["out_file"],
+                                       function=write_array),
+                          iterfield=["size"], name="map_node")
+    map_node.inputs.size = [30, 40, 50]
+    map_node.inputs.out_dir = str(tmp_path)
+    wf.connect([(write_node, join_node, [("out_file", "in_files")])])
+    wf.add_nodes([map_node])
+
+    start_time = time.time()
+    wf.run(plugin="Linear", plugin_args={
+        "status_callback": telemetry.TelemetryCallback(run_id="run-0",
+                                                       ledger=ledger)})
+    print("%s%s%s" % ('Telemetry --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+    df = telemetry.read_ledger(ledger, run_id="run-0")
+    assert sorted(df["node"]) == ["join_node", "map_node", "write_node",
+                                  "write_node"]
+    assert (df["status"] == "end").all()
+    assert (df["wall_s"] >= 0).all()
+    assert (df["finish"] >= df["start"]).all()
+    runs = df.set_index("node")
+    assert runs.loc["map_node", "n_items"] == 3
+    assert runs.loc["map_node", "output_bytes"] == sum(
+        [os.path.getsize(f"{tmp_path}/array_{i}.npy") for i in [30, 40, 50]])
+    assert runs.loc["join_node", "input_bytes"] == sum(
+        [os.path.getsize(f"{tmp_path}/array_{i}.npy") for i in [10, 20]])
+
+    # Two overlapping runs of node_a and one of node_b, per run
+    records = []
+    for run in range(3):
+        for node, start, finish, cpu, rss in [("node_a", 0, 10, 150, 1.1),
+                                              ("node_a", 5, 15, 90, 0.9),
+                                              ("node_b", 15, 20, 400, 3.0)]:
+            records.append(dict(run_id=f"synthetic-{run}", version="x",
+                                node=node, status="end", start=start,
+                                finish=finish, wall_s=finish - start,
+                                cpu_percent=cpu, peak_rss_gb=rss))
+    telemetry.write_records(records, ledger)
+    runtime_dict = telemetry.suggest_runtime_dict(ledger, version="x")
+    assert runtime_dict["node_a"][0] == 2
+    assert runtime_dict["node_a"][1] >= 1.1 * 1.2
+    assert runtime_dict["node_b"] == (4, 3.75)
+    assert telemetry.suggest_procmem(ledger, run_id="synthetic-0") == [4, 4]
+
+    # Ledgers written before the file-size columns were renamed are migrated
+    import sqlite3
+    old_ledger = str(tmp_path / "old_telemetry.sqlite")
+    con = sqlite3.connect(old_ledger)
+    con.execute(telemetry.LEDGER_SCHEMA.replace(
+        "input_bytes", "bytes_read").replace("output_bytes", "bytes_written"))
+    con.execute("INSERT INTO node_runs (run_id, node, bytes_read) "
+                "VALUES ('old', 'node_a', 7)")
+    con.commit()
+    con.close()
+    telemetry.write_records([dict(run_id="old", node="node_b",
+                                  output_bytes=9)], old_ledger)
+    df = telemetry.read_ledger(old_ledger, run_id="old").set_index("node")
+    assert df.loc["node_a", "input_bytes"] == 7
+    assert df.loc["node_b", "output_bytes"] == 9
+
+
+
+def test_perfbench(tmp_path):
+    """
+    Test that benchmarks are timed on synthetic data, recorded to the
+    history, and flagged when slower than their historical baseline
+    """
+    import socket
+    from pynets.core import perfbench
+
+    history = str(tmp_path / "benchmarks.jsonl")
+    names = ["perform_thresholding:prop", "perform_thresholding:mst"]
+
+    start_time = time.time()
+    results = perfbench.run_benchmarks(names=names, repeat=1,
+                                       history=history, min_time=0,
+                                       work_dir=str(tmp_path / "work"))
+    print("%s%s%s" % ('Benchmarks --> finished: ',
+                      str(np.round(time.time() - start_time, 1)), 's'))
+
+    assert [i["name"] for i in results] == names
+    assert all([i["status"] == "ok" for i in results])
+    assert all([i["seconds"] > 0 for i in results])
+    assert all([i["baseline"] is None for i in results])
+    assert len(perfbench.read_history(history)) == 2
+
+    # An implausibly fast past timing makes the next run a regression
+    perfbench.append_history([dict(results[0], seconds=1e-9)] * 5, history)
+    results = perfbench.run_benchmarks(names=names[:1], repeat=1,
+                                       history=history, min_time=0,
+                                       record=False,
+                                       work_dir=str(tmp_path / "work"))
+    assert results[0]["status"] == "regressed"
+    assert results[0]["ratio"] > 1.25
+    assert len(perfbench.read_history(history)) == 7
+    assert perfbench.baseline_seconds(perfbench.read_history(history),
+                                      names[0], "small",
+                                      socket.gethostname()) == 1e-9
+
+    with pytest.raises(ValueError):
+        perfbench.run_benchmarks(names=["not_a_benchmark"], history=history)
+
+
+def test_perfbench_reset_caches(tmp_path):
+    """
+    Test that every timed benchmark call starts with empty in-process memos
+    """
+    import importlib
+    from pynets.core import perfbench
+
+    memos = [getattr(importlib.import_module(module), name)
+             for module, name in perfbench.MEMOS]
+
+    perfbench._reset_caches(str(tmp_path / "first"))
+    for memo in memos:
+        if isinstance(memo, set):
+            memo.add("stale")
+        else:
+            memo["stale"] = None
+
+    perfbench._reset_caches(str(tmp_path / "second"))
+    assert all([len(memo) == 0 for memo in memos])
+    assert os.environ["PYNETS_CACHE"] == str(tmp_path / "second")
+    assert os.path.isdir(str(tmp_path / "second"))
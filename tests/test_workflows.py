@@ -497,3 +497,58 @@ def test_struct_all(node_size, parc, conn_model, conn_model_list, thr, max_thr,
     assert nx.is_directed_acyclic_graph(dmri_connectometry_wf._graph) is True
     # plugin_args = {'n_procs': int(procmem[0]), 'memory_gb': int(procmem[1]), 'scheduler': 'mem_thread'}
     # out = dmri_connectometry_wf.run(plugin=plugin_type, plugin_args=plugin_args)
+
+
+@pytest.mark.parametrize("multi_graph", [True, False])
+def test_raw_graph_sweep(tmp_path, monkeypatch, multi_graph):
+    """
+    Test that the threshold sweep of raw graphs saves the same graph metrics
+    as the per-threshold workflow
+    """
+    import numpy as np
+    import pandas as pd
+    from nipype.pipeline import engine as pe
+    from pynets.core.interfaces import NetworkAnalysis, NetworkAnalysisSweep
+    from pynets.core.utils import flatten
+    from pynets.core.workflows import raw_graph_workflow
+
+    monkeypatch.setenv("PYNETS_CACHE", str(tmp_path / "cache"))
+    graphs = []
+    for i in range(2 if multi_graph else 1):
+        graph_dir = tmp_path / f"atlas{i}" / "graphs"
+        graph_dir.mkdir(parents=True)
+        x = np.random.rand(20, 20)
+        x = (x + x.T) / 2
+        np.fill_diagonal(x, 0)
+        graphs.append(str(graph_dir / f"rawgraph_sub-002_model-corr_{i}.npy"))
+        np.save(graphs[-1], x)
+
+    outs = {}
+    for interface, iterfield in [
+        (NetworkAnalysis(), ["ID", "network", "thr", "conn_model",
+                             "est_path", "roi", "prune", "norm", "binary"]),
+        (NetworkAnalysisSweep(), ["ID", "network", "conn_model", "est_path",
+                                  "roi", "prune", "norm", "binary"]),
+    ]:
+        wf = pe.Workflow(name=f"wf_{type(interface).__name__}",
+                         base_dir=str(tmp_path / "work"))
+        wf.config["execution"]["crashdump_dir"] = str(tmp_path)
+        net_mets_node = pe.MapNode(interface=interface,
+                                   name="NetworkAnalysis",
+                                   iterfield=iterfield, nested=True)
+        wf = raw_graph_workflow(True, None, graphs if multi_graph else None,
+                                None if multi_graph else graphs[0], '002',
+                                None, 'corr', None, 0, 1, False, False, False,
+                                False, 0.2, 0.4, 0.1, wf, net_mets_node)
+        res = wf.run()
+        node = [i for i in res.nodes() if i.name == "NetworkAnalysis"][0]
+        out_paths = sorted(flatten(node.result.outputs.out_path_neat))
+        outs[type(interface).__name__] = {
+            i: pd.read_csv(i) for i in out_paths}
+
+    assert list(outs["NetworkAnalysisSweep"]) == list(outs["NetworkAnalysis"])
+    assert len(outs["NetworkAnalysis"]) == 3 * len(graphs)
+    for out_path, df in outs["NetworkAnalysis"].items():
+        df_sweep = outs["NetworkAnalysisSweep"][out_path]
+        assert list(df_sweep.columns) == list(df.columns)
+        assert np.allclose(df_sweep.values, df.values, equal_nan=True)